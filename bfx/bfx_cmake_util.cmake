@@ -1,5 +1,10 @@
 set(BFX_CMAKE_ROOT_DIR ${CMAKE_CURRENT_LIST_DIR})
 
+# 生成脚本写出的依赖文件使用绝对路径，按新行为处理 DEPFILE
+if(POLICY CMP0116)
+    cmake_policy(SET CMP0116 NEW)
+endif()
+
 ## @name bfx_get_include_dirs
     ## @brief append include directories to OUT_VAR
     ## @param OUT_VAR list of includes
@@ -58,13 +63,97 @@ macro(bfx_get_all_srcs OUT_VAR)
     bfx_get_l2proto_srcs(${OUT_VAR})
 endmacro()
 
+## @name bfx_find_puml_translator
+    ## @brief locate python3 and bfx_puml_translate.py, probe jinja2 once per build tree when FSM_OPTIONS needs it
+    ## @note the default native backend does not need jinja2; the probe only runs for
+    ##       OPTIONS --backend jinja2 or --templates, and its result is cached in BFX_PUML_JINJA2_FOUND
+##
+macro(bfx_find_puml_translator)
+    # 查找 Python 脚本路径
+    if(EXISTS ${BFX_CMAKE_ROOT_DIR}/fsm/bfx_puml_translate.py)
+        set(PYTHON_SCRIPT ${BFX_CMAKE_ROOT_DIR}/fsm/bfx_puml_translate.py)
+    endif()
+    
+    # 检查 Python 解释器
+    find_package(Python3 3.10 REQUIRED)
+    
+    # 只有jinja2后端或自定义模板需要导入 Jinja2 模块，结果写入缓存
+    list(FIND FSM_OPTIONS --templates FSM_TEMPLATES_INDEX)
+    if(Python3_Interpreter_FOUND AND NOT BFX_PUML_JINJA2_FOUND
+       AND ("jinja2" IN_LIST FSM_OPTIONS OR FSM_TEMPLATES_INDEX GREATER -1))
+        execute_process(
+            COMMAND ${Python3_EXECUTABLE} -c "import jinja2"
+            RESULT_VARIABLE JINJA2_IMPORT_RESULT
+            OUTPUT_QUIET
+            ERROR_QUIET
+        )
+        if(NOT JINJA2_IMPORT_RESULT EQUAL 0)
+            message(FATAL_ERROR "Python module 'jinja2' not found. Please install it with: pip install jinja2, "
+                                "or drop OPTIONS --backend jinja2 / --templates to use the native backend")
+        endif()
+        set(BFX_PUML_JINJA2_FOUND TRUE CACHE INTERNAL "python3 can import jinja2")
+    endif()
+endmacro()
+
+## @name bfx_puml_profile_options
+    ## @brief append --profile to FSM_OPTIONS and set FSM_PROFILE_DEPENDS from FSM_PROFILE
+    ## @note a --templates directory in FSM_OPTIONS is made absolute and its template files are
+    ##       added to FSM_PROFILE_DEPENDS, so editing a template regenerates the FSM
+##
+macro(bfx_puml_profile_options)
+    set(FSM_PROFILE_DEPENDS)
+    if(FSM_PROFILE)
+        get_filename_component(FSM_PROFILE_ABS_PATH ${FSM_PROFILE} ABSOLUTE)
+        if(NOT EXISTS ${FSM_PROFILE_ABS_PATH})
+            message(FATAL_ERROR "FSM profile '${FSM_PROFILE}' does not exist")
+        endif()
+        list(APPEND FSM_OPTIONS --profile ${FSM_PROFILE_ABS_PATH})
+        set(FSM_PROFILE_DEPENDS ${FSM_PROFILE_ABS_PATH})
+    endif()
+    list(FIND FSM_OPTIONS --templates FSM_TEMPLATES_INDEX)
+    if(FSM_TEMPLATES_INDEX GREATER -1)
+        math(EXPR FSM_TEMPLATES_INDEX "${FSM_TEMPLATES_INDEX} + 1")
+        list(GET FSM_OPTIONS ${FSM_TEMPLATES_INDEX} FSM_TEMPLATES_DIR)
+        get_filename_component(FSM_TEMPLATES_DIR ${FSM_TEMPLATES_DIR} ABSOLUTE)
+        list(REMOVE_AT FSM_OPTIONS ${FSM_TEMPLATES_INDEX})
+        list(INSERT FSM_OPTIONS ${FSM_TEMPLATES_INDEX} ${FSM_TEMPLATES_DIR})
+        foreach(FSM_TEMPLATE_FILE fsm.h.j2 fsm.c.j2 fsm_tables.c.j2)
+            if(EXISTS ${FSM_TEMPLATES_DIR}/${FSM_TEMPLATE_FILE})
+                list(APPEND FSM_PROFILE_DEPENDS ${FSM_TEMPLATES_DIR}/${FSM_TEMPLATE_FILE})
+            endif()
+        endforeach()
+    endif()
+endmacro()
+
+## @name bfx_puml_depfile
+    ## @brief set FSM_DEPFILE_OPTIONS (script arguments) and FSM_DEPFILE_ARGS (add_custom_command arguments)
+    ##        so that the generator writes a depfile listing the input and every !include file
+    ## @param STAMP output of the custom command, the depfile is STAMP.d
+    ## @note DEPFILE needs Ninja, Makefile generators from CMake 3.20 or any generator from 3.21;
+    ##       with older generators only the top-level files are dependencies
+##
+macro(bfx_puml_depfile STAMP)
+    set(FSM_DEPFILE_OPTIONS)
+    set(FSM_DEPFILE_ARGS)
+    if(CMAKE_GENERATOR MATCHES "Ninja" OR NOT CMAKE_VERSION VERSION_LESS 3.21
+       OR (CMAKE_GENERATOR MATCHES "Makefiles" AND NOT CMAKE_VERSION VERSION_LESS 3.20))
+        set(FSM_DEPFILE_OPTIONS --depfile ${STAMP}.d)
+        set(FSM_DEPFILE_ARGS DEPFILE ${STAMP}.d)
+    endif()
+endmacro()
+
 ## @name bfx_add_puml_fsm
     ## @brief add script pre-compiler to cmake-target
     ## @param TARGET_NAME cmake-target
     ## @param PUML_FILE FSM description file(.puml) path
-    ## @param OUTPUT_DIR generate .c/.h to which path
+    ## @param OUTPUT_DIR generate .c/.h (and .bin with OPTIONS --image) to which path
+    ## @param OPTIONS (optional) extra generator arguments, e.g. OPTIONS --dispatch dense
+    ## @param PROFILE (optional) event frequency file, tables are regenerated when it changes
+    ## @note tables are generated into <name>_tables.c (--split), so editing transitions
+    ##       leaves <name>.h/<name>.c untouched and only recompiles the tables
 ##
 function(bfx_add_puml_fsm TARGET_NAME PUML_FILE OUTPUT_DIR)
+    cmake_parse_arguments(PARSE_ARGV 3 FSM "" "PROFILE" "OPTIONS")
     if(NOT TARGET ${TARGET_NAME})
         message(FATAL_ERROR "Target '${TARGET_NAME}' does not exist")
     endif()
@@ -78,40 +167,38 @@ function(bfx_add_puml_fsm TARGET_NAME PUML_FILE OUTPUT_DIR)
     
     # 生成的 C/H 文件名
     set(GENERATED_C_FILE ${OUTPUT_DIR}/${PUML_NAME}.c)
+    set(GENERATED_TABLES_FILE ${OUTPUT_DIR}/${PUML_NAME}_tables.c)
     set(GENERATED_H_FILE ${OUTPUT_DIR}/${PUML_NAME}.h)
-    
-    # 查找 Python 脚本路径
-    if(EXISTS ${BFX_CMAKE_ROOT_DIR}/fsm/bfx_puml_translate.py)
-        set(PYTHON_SCRIPT ${BFX_CMAKE_ROOT_DIR}/fsm/bfx_puml_translate.py)
+    set(GENERATED_BIN_FILE)
+    if("--image" IN_LIST FSM_OPTIONS)
+        set(GENERATED_BIN_FILE ${OUTPUT_DIR}/${PUML_NAME}.bin)
     endif()
     
-    # 检查 Python 解释器
-    find_package(Python3 REQUIRED)
-    
-    # 检查是否能导入 Jinja2 模块
-    if(Python3_Interpreter_FOUND)
-        execute_process(
-            COMMAND ${Python3_EXECUTABLE} -c "import jinja2"
-            RESULT_VARIABLE JINJA2_IMPORT_RESULT
-            OUTPUT_QUIET
-            ERROR_QUIET
-        )
-        if(NOT JINJA2_IMPORT_RESULT EQUAL 0)
-            message(FATAL_ERROR "Python module 'jinja2' not found. Please install it with: pip install jinja2")
-        endif()
-    endif()
+    # 查找 Python 与生成脚本
+    bfx_find_puml_translator()
+    bfx_puml_profile_options()
 
     # 创建输出目录
     file(MAKE_DIRECTORY ${OUTPUT_DIR})
     
     # 创建自定义命令来生成代码
+    # 脚本只重写内容变化的文件，因此用 stamp 文件记录生成时间
+    set(GENERATED_STAMP ${CMAKE_CURRENT_BINARY_DIR}/${PUML_NAME}_fsm.stamp)
+    bfx_puml_depfile(${GENERATED_STAMP})
     add_custom_command(
-        OUTPUT ${GENERATED_C_FILE} ${GENERATED_H_FILE}
+        OUTPUT ${GENERATED_STAMP}
+        BYPRODUCTS ${GENERATED_C_FILE} ${GENERATED_TABLES_FILE} ${GENERATED_H_FILE} ${GENERATED_BIN_FILE}
         COMMAND ${Python3_EXECUTABLE}
                 ${PYTHON_SCRIPT}
                 ${PUML_ABS_PATH}
-                ${OUTPUT_DIR}
-        DEPENDS ${PUML_ABS_PATH} ${PYTHON_SCRIPT}
+                --output-dir ${OUTPUT_DIR}
+                --cache-dir ${CMAKE_CURRENT_BINARY_DIR}/bfx_fsm_cache
+                --split
+                ${FSM_DEPFILE_OPTIONS}
+                ${FSM_OPTIONS}
+        COMMAND ${CMAKE_COMMAND} -E touch ${GENERATED_STAMP}
+        DEPENDS ${PUML_ABS_PATH} ${PYTHON_SCRIPT} ${FSM_PROFILE_DEPENDS}
+        ${FSM_DEPFILE_ARGS}
         COMMENT "Generating C code from PlantUML: ${PUML_NAME}.puml"
         WORKING_DIRECTORY ${CMAKE_CURRENT_SOURCE_DIR}
         VERBATIM
@@ -120,6 +207,7 @@ function(bfx_add_puml_fsm TARGET_NAME PUML_FILE OUTPUT_DIR)
     # 将生成的文件添加到目标
     target_sources(${TARGET_NAME} PRIVATE
         ${GENERATED_C_FILE}
+        ${GENERATED_TABLES_FILE}
     )
     
     # 添加包含目录
@@ -134,11 +222,11 @@ function(bfx_add_puml_fsm TARGET_NAME PUML_FILE OUTPUT_DIR)
     
     # 创建自定义目标来追踪生成的文件
     add_custom_target(${PUML_NAME}_fsm_generated
-        DEPENDS ${GENERATED_C_FILE} ${GENERATED_H_FILE}
+        DEPENDS ${GENERATED_STAMP}
     )
     
     # 设置生成文件的属性
-    set_source_files_properties(${GENERATED_C_FILE} ${GENERATED_H_FILE}
+    set_source_files_properties(${GENERATED_C_FILE} ${GENERATED_TABLES_FILE} ${GENERATED_H_FILE}
         PROPERTIES
             GENERATED TRUE
             SKIP_AUTOMOC TRUE  # 如果是 Qt 项目
@@ -147,8 +235,10 @@ function(bfx_add_puml_fsm TARGET_NAME PUML_FILE OUTPUT_DIR)
     # 清理生成的文件
     set_property(DIRECTORY ${CMAKE_CURRENT_SOURCE_DIR} APPEND PROPERTY
         ADDITIONAL_CLEAN_FILES
-        ${OUTPUT_DIR}/${PUML_NAME}.c
-        ${OUTPUT_DIR}/${PUML_NAME}.h
+        ${GENERATED_C_FILE}
+        ${GENERATED_TABLES_FILE}
+        ${GENERATED_H_FILE}
+        ${GENERATED_BIN_FILE}
     )
     
     # 打印成功信息
@@ -156,3 +246,315 @@ function(bfx_add_puml_fsm TARGET_NAME PUML_FILE OUTPUT_DIR)
     message(STATUS "  Input: ${PUML_ABS_PATH}")
     message(STATUS "  Output: ${OUTPUT_DIR}")
 endfunction()
+
+## @name bfx_add_puml_fsm_batch
+    ## @brief add all FSMs of a cmake-target as one script pre-compiler command
+    ## @param TARGET_NAME cmake-target
+    ## @param OUTPUT_DIR generate .c/.h (and .bin with OPTIONS --image) to which path
+    ## @param ARGN FSM description files(.puml) path
+    ## @param OPTIONS (optional) extra generator arguments applied to every FSM, e.g. OPTIONS --dispatch dense
+    ## @param PROFILE (optional) event frequency file shared by every FSM
+    ## @note the script runs once per build and generates every FSM in a process pool;
+    ##       tables go to <name>_tables.c (--split) as in bfx_add_puml_fsm
+##
+function(bfx_add_puml_fsm_batch TARGET_NAME OUTPUT_DIR)
+    cmake_parse_arguments(PARSE_ARGV 2 FSM "" "PROFILE" "OPTIONS")
+    if(NOT TARGET ${TARGET_NAME})
+        message(FATAL_ERROR "Target '${TARGET_NAME}' does not exist")
+    endif()
+    if(NOT FSM_UNPARSED_ARGUMENTS)
+        message(FATAL_ERROR "No PlantUML file given for target '${TARGET_NAME}'")
+    endif()
+    
+    # 查找 Python 与生成脚本
+    bfx_find_puml_translator()
+    bfx_puml_profile_options()
+    
+    # 收集输入与输出
+    set(PUML_ABS_PATHS)
+    set(GENERATED_C_FILES)
+    set(GENERATED_H_FILES)
+    set(GENERATED_BIN_FILES)
+    set(MANIFEST_CONTENT "")
+    foreach(PUML_FILE ${FSM_UNPARSED_ARGUMENTS})
+        get_filename_component(PUML_ABS_PATH ${PUML_FILE} ABSOLUTE)
+        if(NOT EXISTS ${PUML_ABS_PATH})
+            message(FATAL_ERROR "PlantUML file '${PUML_FILE}' does not exist")
+        endif()
+        get_filename_component(PUML_NAME ${PUML_FILE} NAME_WE)
+        list(APPEND PUML_ABS_PATHS ${PUML_ABS_PATH})
+        list(APPEND GENERATED_C_FILES ${OUTPUT_DIR}/${PUML_NAME}.c ${OUTPUT_DIR}/${PUML_NAME}_tables.c)
+        list(APPEND GENERATED_H_FILES ${OUTPUT_DIR}/${PUML_NAME}.h)
+        if("--image" IN_LIST FSM_OPTIONS)
+            list(APPEND GENERATED_BIN_FILES ${OUTPUT_DIR}/${PUML_NAME}.bin)
+        endif()
+        string(APPEND MANIFEST_CONTENT "${PUML_ABS_PATH}\n")
+    endforeach()
+    
+    # 写入清单文件，内容不变时保持时间戳，避免重复生成
+    set(MANIFEST_FILE ${CMAKE_CURRENT_BINARY_DIR}/${TARGET_NAME}_puml_fsm.manifest)
+    file(WRITE ${MANIFEST_FILE}.tmp "${MANIFEST_CONTENT}")
+    configure_file(${MANIFEST_FILE}.tmp ${MANIFEST_FILE} COPYONLY)
+    
+    # 创建输出目录
+    file(MAKE_DIRECTORY ${OUTPUT_DIR})
+    
+    # 所有状态机共用一条自定义命令
+    # 脚本只重写内容变化的文件，因此用 stamp 文件记录生成时间
+    set(GENERATED_STAMP ${CMAKE_CURRENT_BINARY_DIR}/${TARGET_NAME}_puml_fsm.stamp)
+    bfx_puml_depfile(${GENERATED_STAMP})
+    add_custom_command(
+        OUTPUT ${GENERATED_STAMP}
+        BYPRODUCTS ${GENERATED_C_FILES} ${GENERATED_H_FILES} ${GENERATED_BIN_FILES}
+        COMMAND ${Python3_EXECUTABLE}
+                ${PYTHON_SCRIPT}
+                --manifest ${MANIFEST_FILE}
+                --output-dir ${OUTPUT_DIR}
+                --cache-dir ${CMAKE_CURRENT_BINARY_DIR}/bfx_fsm_cache
+                --split
+                ${FSM_DEPFILE_OPTIONS}
+                ${FSM_OPTIONS}
+        COMMAND ${CMAKE_COMMAND} -E touch ${GENERATED_STAMP}
+        DEPENDS ${PUML_ABS_PATHS} ${MANIFEST_FILE} ${PYTHON_SCRIPT} ${FSM_PROFILE_DEPENDS}
+        ${FSM_DEPFILE_ARGS}
+        COMMENT "Generating C code from PlantUML for target: ${TARGET_NAME}"
+        WORKING_DIRECTORY ${CMAKE_CURRENT_SOURCE_DIR}
+        VERBATIM
+    )
+    
+    # 将生成的文件添加到目标
+    target_sources(${TARGET_NAME} PRIVATE
+        ${GENERATED_C_FILES}
+    )
+    
+    # 添加包含目录
+    target_include_directories(${TARGET_NAME} PRIVATE
+        ${OUTPUT_DIR}
+    )
+    
+    # 创建自定义目标来追踪生成的文件，并在构建目标前先生成
+    add_custom_target(${TARGET_NAME}_puml_fsm_generated
+        DEPENDS ${GENERATED_STAMP}
+    )
+    add_dependencies(${TARGET_NAME}
+        ${TARGET_NAME}_puml_fsm_generated
+    )
+    
+    # 设置生成文件的属性
+    set_source_files_properties(${GENERATED_C_FILES} ${GENERATED_H_FILES}
+        PROPERTIES
+            GENERATED TRUE
+            SKIP_AUTOMOC TRUE  # 如果是 Qt 项目
+    )
+    
+    # 清理生成的文件
+    set_property(DIRECTORY ${CMAKE_CURRENT_SOURCE_DIR} APPEND PROPERTY
+        ADDITIONAL_CLEAN_FILES
+        ${GENERATED_C_FILES}
+        ${GENERATED_H_FILES}
+        ${GENERATED_BIN_FILES}
+    )
+    
+    # 打印成功信息
+    list(LENGTH PUML_ABS_PATHS PUML_COUNT)
+    message(STATUS "Added ${PUML_COUNT} PlantUML FSM(s) generation for target '${TARGET_NAME}'")
+    message(STATUS "  Output: ${OUTPUT_DIR}")
+endfunction()
+
+## @name bfx_add_puml_cover
+    ## @brief generate transition-covering event sequences of an FSM for a test target
+    ## @param TARGET_NAME cmake-target, usually the gtest executable
+    ## @param PUML_FILE FSM description file(.puml) path
+    ## @param OUTPUT_DIR generate <name>_cover.h to which path, <name>.h must be generated there as well
+    ## @param OPTIONS (optional) extra arguments of bfx_fsm_cover.py, e.g. OPTIONS --reset-cost 4
+    ## @note <name>_cover.h only holds const data and needs no source file
+##
+function(bfx_add_puml_cover TARGET_NAME PUML_FILE OUTPUT_DIR)
+    cmake_parse_arguments(PARSE_ARGV 3 COVER "" "" "OPTIONS")
+    if(NOT TARGET ${TARGET_NAME})
+        message(FATAL_ERROR "Target '${TARGET_NAME}' does not exist")
+    endif()
+    if(NOT EXISTS ${PUML_FILE})
+        message(FATAL_ERROR "PlantUML file '${PUML_FILE}' does not exist")
+    endif()
+
+    get_filename_component(PUML_ABS_PATH ${PUML_FILE} ABSOLUTE)
+    get_filename_component(PUML_NAME ${PUML_FILE} NAME_WE)
+    set(GENERATED_COVER_FILE ${OUTPUT_DIR}/${PUML_NAME}_cover.h)
+    set(COVER_SCRIPT ${BFX_CMAKE_ROOT_DIR}/fsm/bfx_fsm_cover.py)
+    find_package(Python3 3.10 REQUIRED)
+    file(MAKE_DIRECTORY ${OUTPUT_DIR})
+
+    # 脚本只重写内容变化的文件，因此用 stamp 文件记录生成时间
+    set(GENERATED_STAMP ${CMAKE_CURRENT_BINARY_DIR}/${PUML_NAME}_cover.stamp)
+    bfx_puml_depfile(${GENERATED_STAMP})
+    add_custom_command(
+        OUTPUT ${GENERATED_STAMP}
+        BYPRODUCTS ${GENERATED_COVER_FILE}
+        COMMAND ${Python3_EXECUTABLE}
+                ${COVER_SCRIPT}
+                ${PUML_ABS_PATH}
+                --output-dir ${OUTPUT_DIR}
+                --cache-dir ${CMAKE_CURRENT_BINARY_DIR}/bfx_fsm_cache
+                ${FSM_DEPFILE_OPTIONS}
+                ${COVER_OPTIONS}
+        COMMAND ${CMAKE_COMMAND} -E touch ${GENERATED_STAMP}
+        DEPENDS ${PUML_ABS_PATH} ${COVER_SCRIPT} ${BFX_CMAKE_ROOT_DIR}/fsm/bfx_puml_translate.py
+        ${FSM_DEPFILE_ARGS}
+        COMMENT "Generating covering sequences from PlantUML: ${PUML_NAME}.puml"
+        WORKING_DIRECTORY ${CMAKE_CURRENT_SOURCE_DIR}
+        VERBATIM
+    )
+    add_custom_target(${PUML_NAME}_cover_generated
+        DEPENDS ${GENERATED_STAMP}
+    )
+    add_dependencies(${TARGET_NAME}
+        ${PUML_NAME}_cover_generated
+    )
+    target_include_directories(${TARGET_NAME} PRIVATE
+        ${OUTPUT_DIR}
+    )
+    set_source_files_properties(${GENERATED_COVER_FILE}
+        PROPERTIES
+            GENERATED TRUE
+    )
+    set_property(DIRECTORY ${CMAKE_CURRENT_SOURCE_DIR} APPEND PROPERTY
+        ADDITIONAL_CLEAN_FILES
+        ${GENERATED_COVER_FILE}
+    )
+endfunction()
+
+## @name bfx_add_linker_sections
+    ## @brief regenerate linker script fragments and section headers from linker tool projects at build time
+    ## @param TARGET_NAME cmake-target
+    ## @param OUTPUT_DIR generate <project>.ld (or .sct) and <project>.h to which path
+    ## @param ARGN project files(.json) saved by bfx_linker_app_gui.py
+    ## @param LINKER (optional) gcc (default), keil or all
+    ## @param LINK (optional) pass the gcc fragments to the linker as implicit linker scripts,
+    ##        which extend the default script of the toolchain
+    ## @param OPTIONS (optional) extra arguments of bfx_linker_cli.py, e.g. OPTIONS --templates my_templates
+    ## @note every project is rendered by one command in a process pool; outputs whose content
+    ##       did not change (apart from the generation time) keep their timestamp
+##
+function(bfx_add_linker_sections TARGET_NAME OUTPUT_DIR)
+    cmake_parse_arguments(PARSE_ARGV 2 LINKER_SECTIONS "LINK" "LINKER" "OPTIONS")
+    if(NOT TARGET ${TARGET_NAME})
+        message(FATAL_ERROR "Target '${TARGET_NAME}' does not exist")
+    endif()
+    if(NOT LINKER_SECTIONS_UNPARSED_ARGUMENTS)
+        message(FATAL_ERROR "No linker project file given for target '${TARGET_NAME}'")
+    endif()
+    if(NOT LINKER_SECTIONS_LINKER)
+        set(LINKER_SECTIONS_LINKER gcc)
+    endif()
+    if(NOT LINKER_SECTIONS_LINKER MATCHES "^(gcc|keil|all)$")
+        message(FATAL_ERROR "LINKER must be gcc, keil or all, got '${LINKER_SECTIONS_LINKER}'")
+    endif()
+    if(LINKER_SECTIONS_LINK AND LINKER_SECTIONS_LINKER STREQUAL "keil")
+        message(FATAL_ERROR "LINK only applies to gcc linker script fragments")
+    endif()
+    set(LINKER_SCRIPT ${BFX_CMAKE_ROOT_DIR}/tools/linker/bfx_linker_cli.py)
+    set(LINKER_TOOL_DEPENDS
+        ${LINKER_SCRIPT}
+        ${BFX_CMAKE_ROOT_DIR}/tools/linker/src/data_manager.py
+        ${BFX_CMAKE_ROOT_DIR}/tools/linker/src/template_handler.py
+        ${BFX_CMAKE_ROOT_DIR}/tools/linker/template/bfx_ld_template_gcc.j2
+        ${BFX_CMAKE_ROOT_DIR}/tools/linker/template/bfx_ld_template_armlink.j2
+        ${BFX_CMAKE_ROOT_DIR}/tools/linker/template/bfx_header_template.h.j2
+    )
+
+    # 模板渲染需要 Jinja2，结果写入缓存
+    find_package(Python3 3.10 REQUIRED)
+    if(NOT BFX_LINKER_JINJA2_FOUND)
+        execute_process(
+            COMMAND ${Python3_EXECUTABLE} -c "import jinja2"
+            RESULT_VARIABLE JINJA2_IMPORT_RESULT
+            OUTPUT_QUIET
+            ERROR_QUIET
+        )
+        if(NOT JINJA2_IMPORT_RESULT EQUAL 0)
+            message(FATAL_ERROR "Python module 'jinja2' not found. Please install it with: pip install jinja2")
+        endif()
+        set(BFX_LINKER_JINJA2_FOUND TRUE CACHE INTERNAL "python3 can import jinja2")
+    endif()
+
+    # 收集输入与输出
+    set(PROJECT_ABS_PATHS)
+    set(GENERATED_SCRIPT_FILES)
+    set(GENERATED_GCC_FILES)
+    set(GENERATED_H_FILES)
+    foreach(PROJECT_FILE ${LINKER_SECTIONS_UNPARSED_ARGUMENTS})
+        get_filename_component(PROJECT_ABS_PATH ${PROJECT_FILE} ABSOLUTE)
+        if(NOT EXISTS ${PROJECT_ABS_PATH})
+            message(FATAL_ERROR "Linker project file '${PROJECT_FILE}' does not exist")
+        endif()
+        get_filename_component(PROJECT_NAME_WE ${PROJECT_FILE} NAME_WE)
+        list(APPEND PROJECT_ABS_PATHS ${PROJECT_ABS_PATH})
+        if(NOT LINKER_SECTIONS_LINKER STREQUAL "keil")
+            list(APPEND GENERATED_GCC_FILES ${OUTPUT_DIR}/${PROJECT_NAME_WE}.ld)
+        endif()
+        if(NOT LINKER_SECTIONS_LINKER STREQUAL "gcc")
+            list(APPEND GENERATED_SCRIPT_FILES ${OUTPUT_DIR}/${PROJECT_NAME_WE}.sct)
+        endif()
+        list(APPEND GENERATED_H_FILES ${OUTPUT_DIR}/${PROJECT_NAME_WE}.h)
+    endforeach()
+    list(APPEND GENERATED_SCRIPT_FILES ${GENERATED_GCC_FILES})
+
+    # 创建输出目录
+    file(MAKE_DIRECTORY ${OUTPUT_DIR})
+
+    # 脚本只重写内容变化的文件，因此用 stamp 文件记录生成时间
+    set(GENERATED_STAMP ${CMAKE_CURRENT_BINARY_DIR}/${TARGET_NAME}_linker_sections.stamp)
+    add_custom_command(
+        OUTPUT ${GENERATED_STAMP}
+        BYPRODUCTS ${GENERATED_SCRIPT_FILES} ${GENERATED_H_FILES}
+        COMMAND ${Python3_EXECUTABLE}
+                ${LINKER_SCRIPT}
+                ${PROJECT_ABS_PATHS}
+                --output-dir ${OUTPUT_DIR}
+                --linker ${LINKER_SECTIONS_LINKER}
+                ${LINKER_SECTIONS_OPTIONS}
+        COMMAND ${CMAKE_COMMAND} -E touch ${GENERATED_STAMP}
+        DEPENDS ${PROJECT_ABS_PATHS} ${LINKER_TOOL_DEPENDS}
+        COMMENT "Generating linker sections for target: ${TARGET_NAME}"
+        WORKING_DIRECTORY ${CMAKE_CURRENT_SOURCE_DIR}
+        VERBATIM
+    )
+
+    # 创建自定义目标来追踪生成的文件，并在构建目标前先生成
+    add_custom_target(${TARGET_NAME}_linker_sections_generated
+        DEPENDS ${GENERATED_STAMP}
+    )
+    add_dependencies(${TARGET_NAME}
+        ${TARGET_NAME}_linker_sections_generated
+    )
+
+    # 添加包含目录
+    target_include_directories(${TARGET_NAME} PRIVATE
+        ${OUTPUT_DIR}
+    )
+
+    # 链接脚本片段作为输入文件交给链接器，片段变化时重新链接
+    if(LINKER_SECTIONS_LINK)
+        target_link_options(${TARGET_NAME} PRIVATE ${GENERATED_GCC_FILES})
+        set_property(TARGET ${TARGET_NAME} APPEND PROPERTY LINK_DEPENDS ${GENERATED_GCC_FILES})
+    endif()
+
+    # 设置生成文件的属性
+    set_source_files_properties(${GENERATED_SCRIPT_FILES} ${GENERATED_H_FILES}
+        PROPERTIES
+            GENERATED TRUE
+    )
+
+    # 清理生成的文件
+    set_property(DIRECTORY ${CMAKE_CURRENT_SOURCE_DIR} APPEND PROPERTY
+        ADDITIONAL_CLEAN_FILES
+        ${GENERATED_SCRIPT_FILES}
+        ${GENERATED_H_FILES}
+    )
+
+    # 打印成功信息
+    list(LENGTH PROJECT_ABS_PATHS PROJECT_COUNT)
+    message(STATUS "Added ${PROJECT_COUNT} linker section project(s) for target '${TARGET_NAME}'")
+    message(STATUS "  Output: ${OUTPUT_DIR}")
+endfunction()
@@ -20,56 +20,233 @@
 
 /* Private function prototypes ---------------------------------------------------*/
 
-static inline void BFX_FsmGetTransitionInfo(BFX_FSM_HANDLE *handle, uint8_t stateId, 
-                                           BFX_FSM_TRAN_RECORD const **tranTbl, uint8_t *tranTblCnt);
-static inline uint8_t BFX_FsmProcessTransition(BFX_FSM_HANDLE *handle, BFX_FSM_TRAN_RECORD const *tranTbl, 
-                                              uint8_t tranTblCnt, uint8_t event, void *arg, uint16_t argSize);
+static inline BFX_FSM_TRAN_RECORD const *BFX_FsmFindTransition(BFX_FSM_STATE const *stateHandle, BFX_FSM_EVENT_ID event);
+static inline BFX_FSM_STATE_ID BFX_FsmLookupTables(BFX_FSM_HANDLE const *handle, BFX_FSM_STATE_ID stateId,
+                                                   BFX_FSM_EVENT_ID event);
+static inline BFX_FSM_STATE_ID BFX_FsmLookupDispatch(BFX_FSM_HANDLE const *handle, BFX_FSM_STATE_ID stateId,
+                                                     BFX_FSM_EVENT_ID event);
+#ifdef BFX_FSM_IMAGE_ENABLE
+static inline BFX_FSM_STATE_ID BFX_FsmLookupImage(BFX_FSM_HANDLE const *handle, BFX_FSM_STATE_ID stateId,
+                                                  BFX_FSM_EVENT_ID event);
+#endif
 
 /* Exported function prototypes --------------------------------------------------*/
 
 /* Private function definitions --------------------------------------------------*/
 
-static inline uint8_t BFX_FsmGetNextState(BFX_FSM_STATE const * stateTbl, uint8_t nextState)
+static inline BFX_FSM_STATE_ID BFX_FsmGetNextState(BFX_FSM_HANDLE const *handle, BFX_FSM_STATE_ID nextState)
 {
+    /* default substate chains resolved by the generator */
+    if (handle->leafTargets) {
+        return nextState;
+    }
+    BFX_FSM_STATE const *stateTbl = handle->stateTbl;
     if (stateTbl[nextState - 1].defaultStateID == nextState) {
         return nextState;
     }
-    uint8_t indexNextState = nextState;
+    BFX_FSM_STATE_ID indexNextState = nextState;
     while (stateTbl[indexNextState - 1].defaultStateID != indexNextState) {
         indexNextState = stateTbl[indexNextState - 1].defaultStateID;
     }
     return indexNextState;
 }
 
-static inline void BFX_FsmCallActionEvent(BFX_FSM_STATE const * stateHandle, uint8_t event, void *arg, uint16_t argSize)
+static inline BFX_FSM_ACTION_CALLBACK BFX_FsmGetAction(BFX_FSM_HANDLE const *handle, BFX_FSM_STATE_ID stateId)
+{
+#ifdef BFX_FSM_IMAGE_ENABLE
+    /* image states are bound to callbacks by ID when loading */
+    if (handle->imageStateTbl != NULL) {
+        return (stateId <= handle->actionCnt) ? handle->actionTbl[stateId - 1] : NULL;
+    }
+#endif
+    return handle->stateTbl[stateId - 1].actionTbl;
+}
+
+static inline void BFX_FsmCallActionEvent(BFX_FSM_ACTION_CALLBACK action, BFX_FSM_EVENT_ID event, uint16_t instance,
+                                          void *arg, uint16_t argSize)
 {
     BFX_FSM_ACTION_CTX ctx = {
         .eventID = event,
+        .instance = instance,
     };
-    stateHandle->actionTbl(&ctx, arg, argSize);
+    if (action != NULL) {
+        action(&ctx, arg, argSize);
+    }
 }
 
-static inline void BFX_FsmGetTransitionInfo(BFX_FSM_HANDLE *handle, uint8_t stateId, 
-                                           BFX_FSM_TRAN_RECORD const **tranTbl, uint8_t *tranTblCnt)
+#ifdef BFX_FSM_TRACE_ENABLE
+static inline void BFX_FsmTraceWrite(BFX_FSM_TRACE *trace, BFX_FSM_TRACE_RECORD const *record)
 {
-    *tranTbl = handle->stateTbl[stateId - 1].tranTbl;
-    *tranTblCnt = handle->stateTbl[stateId - 1].tranTblCnt;
+    trace->buf[trace->head] = *record;
+    trace->head = (uint16_t)((trace->head + 1) % trace->depth);
+    if (trace->count < trace->depth) {
+        trace->count++;
+    } else {
+        trace->lost++;
+    }
 }
+#endif
 
-static inline uint8_t BFX_FsmProcessTransition(BFX_FSM_HANDLE *handle, BFX_FSM_TRAN_RECORD const *tranTbl, 
-                                              uint8_t tranTblCnt, uint8_t event, void *arg, uint16_t argSize)
+static inline void BFX_FsmEnterState(BFX_FSM_HANDLE const *handle, BFX_FSM_STATE_ID *currentState, uint16_t instance,
+                                     BFX_FSM_STATE_ID nextState, BFX_FSM_EVENT_ID event, void *arg, uint16_t argSize)
 {
+#ifdef BFX_FSM_TRACE_ENABLE
+    /* only the handle's own state is traced, records do not identify instances */
+    BFX_FSM_TRACE *trace = (instance == BFX_FSM_INSTANCE_NONE) ? handle->trace : NULL;
+    BFX_FSM_TRACE_RECORD record = {
+        .fromState = *currentState,
+        .event = event,
+    };
+    if (trace != NULL) {
+        record.timestamp = BFX_FsmTraceTimestamp();
+    }
+#endif
+    *currentState = BFX_FsmGetNextState(handle, nextState);
+    BFX_FsmCallActionEvent(BFX_FsmGetAction(handle, *currentState), event, instance, arg, argSize);
+#ifdef BFX_FSM_TRACE_ENABLE
+    if (trace != NULL) {
+        uint32_t duration = BFX_FsmTraceTimestamp() - record.timestamp;
+        record.toState = *currentState;
+        record.duration = (uint16_t)(duration > 0xFFFF ? 0xFFFF : duration);
+        BFX_FsmTraceWrite(trace, &record);
+    }
+#endif
+}
+
+static inline BFX_FSM_TRAN_RECORD const *BFX_FsmFindTransition(BFX_FSM_STATE const *stateHandle, BFX_FSM_EVENT_ID event)
+{
+    BFX_FSM_TRAN_RECORD const *tranTbl = stateHandle->tranTbl;
+    BFX_FSM_EVENT_ID tranTblCnt = stateHandle->tranTblCnt;
     if (tranTbl == NULL || tranTblCnt == 0) {
-        return 1;
+        return NULL;
+    }
+    switch (stateHandle->tranTblType) {
+        case BFX_FSM_TRAN_COMB:
+            if (event != 0 && event <= tranTblCnt && tranTbl[event - 1].event == event) {
+                return &tranTbl[event - 1];
+            }
+            return NULL;
+        case BFX_FSM_TRAN_SORTED: {
+            BFX_FSM_EVENT_ID low = 0;
+            BFX_FSM_EVENT_ID high = tranTblCnt;
+            while (low < high) {
+                BFX_FSM_EVENT_ID mid = (BFX_FSM_EVENT_ID)(low + (high - low) / 2);
+                if (tranTbl[mid].event == event) {
+                    return &tranTbl[mid];
+                }
+                if (tranTbl[mid].event < event) {
+                    low = mid + 1;
+                } else {
+                    high = mid;
+                }
+            }
+            return NULL;
+        }
+        default:
+            for (BFX_FSM_EVENT_ID i = 0; i < tranTblCnt; i++) {
+                if (tranTbl[i].event == event) {
+                    return &tranTbl[i];
+                }
+            }
+            return NULL;
     }
-    for (uint8_t i = 0; i < tranTblCnt; i++) {
-        if (tranTbl[i].event == event) {
-            handle->currentStateId = BFX_FsmGetNextState(handle->stateTbl, tranTbl[i].nextState);
-            BFX_FsmCallActionEvent(&(handle->stateTbl[handle->currentStateId - 1]), event, arg, argSize);
-            return 0;
+}
+
+static inline BFX_FSM_STATE_ID BFX_FsmLookupTables(BFX_FSM_HANDLE const *handle, BFX_FSM_STATE_ID stateId,
+                                                   BFX_FSM_EVENT_ID event)
+{
+    /* current state first, then father states in turn */
+    while (stateId != 0) {
+        BFX_FSM_TRAN_RECORD const *record = BFX_FsmFindTransition(&(handle->stateTbl[stateId - 1]), event);
+        if (record != NULL) {
+            return record->nextState;
+        }
+        stateId = handle->stateTbl[stateId - 1].fatherStateID;
+    }
+    return 0;
+}
+
+static inline BFX_FSM_STATE_ID BFX_FsmLookupDispatch(BFX_FSM_HANDLE const *handle, BFX_FSM_STATE_ID stateId,
+                                                     BFX_FSM_EVENT_ID event)
+{
+    /* same result as the linear lookup for handles that are reset or not started yet */
+    if (stateId == 0 || stateId > handle->maxStateId || event == 0 || event > handle->maxEventId) {
+        return 0;
+    }
+    /* row already merges the transitions inherited from father states */
+    return handle->dispatchTbl[(uint32_t)(stateId - 1) * handle->maxEventId + (event - 1)];
+}
+
+#ifdef BFX_FSM_IMAGE_ENABLE
+static inline BFX_FSM_STATE_ID BFX_FsmLookupImage(BFX_FSM_HANDLE const *handle, BFX_FSM_STATE_ID stateId,
+                                                  BFX_FSM_EVENT_ID event)
+{
+    /* own records sorted by event, father states searched in turn like the generated tables */
+    while (stateId != 0) {
+        BFX_FSM_IMAGE_STATE const *state = &handle->imageStateTbl[stateId - 1];
+        BFX_FSM_IMAGE_TRAN const *tranTbl = &handle->imageTranTbl[state->tranIndex];
+        uint16_t low = 0;
+        uint16_t high = state->tranCnt;
+        while (low < high) {
+            uint16_t mid = (uint16_t)(low + (high - low) / 2);
+            if (tranTbl[mid].event == event) {
+                return (BFX_FSM_STATE_ID)tranTbl[mid].nextState;
+            }
+            if (tranTbl[mid].event < event) {
+                low = mid + 1;
+            } else {
+                high = mid;
+            }
+        }
+        stateId = (BFX_FSM_STATE_ID)state->fatherStateID;
+    }
+    return 0;
+}
+
+static uint32_t BFX_FsmImageCrc(uint32_t crc, uint8_t const *data, uint32_t size)
+{
+    /* CRC-32 as zlib, bitwise to keep flash usage low; only runs when checking an image */
+    crc = ~crc;
+    for (uint32_t i = 0; i < size; i++) {
+        crc ^= data[i];
+        for (uint8_t bit = 0; bit < 8; bit++) {
+            crc = (crc >> 1) ^ (0xEDB88320u & (0u - (crc & 1u)));
         }
     }
-    return 1;
+    return ~crc;
+}
+#endif
+
+#ifdef BFX_FSM_NAMES_ENABLE
+static inline uint32_t BFX_FsmNameHash(uint32_t seed, char const *name, uint16_t len)
+{
+    /* FNV-1a with a final mix so that the low bits depend on every byte, same as name_hash() in the generator */
+    uint32_t hash = 0x811C9DC5u ^ seed;
+    for (uint16_t i = 0; i < len; i++) {
+        hash = (hash ^ (uint8_t)name[i]) * 0x01000193u;
+    }
+    hash ^= hash >> 16;
+    hash *= 0x85EBCA6Bu;
+    return hash ^ (hash >> 13);
+}
+#endif
+
+/* next state of stateId on event, 0 if neither the state nor its fathers handle it */
+static inline BFX_FSM_STATE_ID BFX_FsmLookupNextState(BFX_FSM_HANDLE const *handle, BFX_FSM_STATE_ID stateId,
+                                                      BFX_FSM_EVENT_ID event)
+{
+#ifdef BFX_FSM_IMAGE_ENABLE
+    /* tables of a loaded binary image */
+    if (handle->imageStateTbl != NULL) {
+        return BFX_FsmLookupImage(handle, stateId, event);
+    }
+#endif
+
+    /* dense dispatch table, O(1) lookup */
+    if (handle->dispatchTbl != NULL) {
+        return BFX_FsmLookupDispatch(handle, stateId, event);
+    }
+    return BFX_FsmLookupTables(handle, stateId, event);
 }
 
 /* Exported function definitions -------------------------------------------------*/
@@ -83,35 +260,97 @@ static inline uint8_t BFX_FsmProcessTransition(BFX_FSM_HANDLE *handle, BFX_FSM_T
  * @param argSize Size of the argument in bytes.
  * @return uint8_t 0 if the event is processed successfully, 1 otherwise.
  */
-uint8_t BFX_FsmProcessEvent(BFX_FSM_HANDLE *handle, uint8_t event, void *arg, uint16_t argSize)
+uint8_t BFX_FsmProcessEvent(BFX_FSM_HANDLE *handle, BFX_FSM_EVENT_ID event, void *arg, uint16_t argSize)
 {
-    /* process event in current state */
-    BFX_FSM_TRAN_RECORD const *tranTbl;
-    uint8_t tranTblCnt;
-    BFX_FsmGetTransitionInfo(handle, handle->currentStateId, &tranTbl, &tranTblCnt);
-    if (BFX_FsmProcessTransition(handle, tranTbl, tranTblCnt, event, arg, argSize) == 0) {
-        return 0;
+    BFX_FSM_STATE_ID nextState = BFX_FsmLookupNextState(handle, handle->currentStateId, event);
+    if (nextState == 0) {
+        return 1;
+    }
+    BFX_FsmEnterState(handle, &handle->currentStateId, BFX_FSM_INSTANCE_NONE, nextState, event, arg, argSize);
+    return 0;
+}
+
+/**
+ * @brief Process an event in one instance of a shared FSM.
+ *
+ * Instances share the handle's const tables and keep only their current state ID;
+ * the handle's own current state is not touched. Action callbacks get the instance
+ * index in BFX_FSM_ACTION_CTX.instance.
+ *
+ * @param handle Pointer to the FSM handle holding the shared tables.
+ * @param instanceTbl Current state ID of every instance, e.g. g_<project>_instances.
+ * @param instance Index of the instance in instanceTbl.
+ * @param event The event to process.
+ * @param arg Pointer to the argument associated with the event.
+ * @param argSize Size of the argument in bytes.
+ * @return uint8_t 0 if the event is processed successfully, 1 otherwise (also for instances in state 0).
+ */
+uint8_t BFX_FsmProcessInstance(BFX_FSM_HANDLE const *handle, BFX_FSM_STATE_ID *instanceTbl, uint16_t instance,
+                               BFX_FSM_EVENT_ID event, void *arg, uint16_t argSize)
+{
+    BFX_FSM_STATE_ID *currentState = &instanceTbl[instance];
+    BFX_FSM_STATE_ID nextState = (*currentState != 0) ? BFX_FsmLookupNextState(handle, *currentState, event) : 0;
+    if (nextState == 0) {
+        return 1;
     }
+    BFX_FsmEnterState(handle, currentState, instance, nextState, event, arg, argSize);
+    return 0;
+}
 
-    /* process event in father states */
-    uint8_t fatherState = handle->stateTbl[handle->currentStateId - 1].fatherStateID;
-    while (fatherState != 0) {
-        BFX_FsmGetTransitionInfo(handle, fatherState, &tranTbl, &tranTblCnt);
-        if (BFX_FsmProcessTransition(handle, tranTbl, tranTblCnt, event, arg, argSize) == 0) {
-            return 0;
+/**
+ * @brief Process the same event in a range of instances of a shared FSM.
+ *
+ * Instances are walked in order against the same tables, and consecutive instances in the
+ * same state reuse one table lookup, so grouping instances by state makes a batch cheaper.
+ *
+ * @param handle Pointer to the FSM handle holding the shared tables.
+ * @param instanceTbl Current state ID of every instance, e.g. g_<project>_instances.
+ * @param instanceCnt Number of instances to process, starting from instanceTbl[0].
+ * @param event The event to process.
+ * @param arg Pointer to the argument passed to every action callback.
+ * @param argSize Size of the argument in bytes.
+ * @return uint16_t Number of instances that processed the event.
+ */
+uint16_t BFX_FsmProcessInstances(BFX_FSM_HANDLE const *handle, BFX_FSM_STATE_ID *instanceTbl, uint16_t instanceCnt,
+                                 BFX_FSM_EVENT_ID event, void *arg, uint16_t argSize)
+{
+    uint16_t processed = 0;
+    BFX_FSM_STATE_ID lookupState = 0; // instances in state 0 are not started and never match
+    BFX_FSM_STATE_ID nextState = 0;
+    for (uint16_t i = 0; i < instanceCnt; i++) {
+        if (instanceTbl[i] != lookupState) {
+            lookupState = instanceTbl[i];
+            nextState = (lookupState != 0) ? BFX_FsmLookupNextState(handle, lookupState, event) : 0;
+        }
+        if (nextState != 0) {
+            BFX_FsmEnterState(handle, &instanceTbl[i], i, nextState, event, arg, argSize);
+            processed++;
         }
-        fatherState = handle->stateTbl[fatherState - 1].fatherStateID;
     }
-    return 1;
+    return processed;
+}
+
+/**
+ * @brief Put a range of instances into one state, e.g. <PROJECT>_INITIAL_STATE.
+ *
+ * @param instanceTbl Current state ID of every instance.
+ * @param instanceCnt Number of instances to reset, starting from instanceTbl[0].
+ * @param stateID The state ID to reset to, 0 marks the instances as not started.
+ */
+void BFX_FsmResetInstances(BFX_FSM_STATE_ID *instanceTbl, uint16_t instanceCnt, BFX_FSM_STATE_ID stateID)
+{
+    for (uint16_t i = 0; i < instanceCnt; i++) {
+        instanceTbl[i] = stateID;
+    }
 }
 
 /**
  * @brief Get the current state ID of the finite state machine.
  * 
  * @param handle Pointer to the FSM handle.
- * @return uint8_t The current state ID.
+ * @return BFX_FSM_STATE_ID The current state ID.
  */
-uint8_t BFX_FsmGetCurrentStateID(BFX_FSM_HANDLE *handle)
+BFX_FSM_STATE_ID BFX_FsmGetCurrentStateID(BFX_FSM_HANDLE *handle)
 {
     return handle->currentStateId;
 }
@@ -123,8 +362,192 @@ uint8_t BFX_FsmGetCurrentStateID(BFX_FSM_HANDLE *handle)
  * @param stateID The state ID to reset to.
  * @return uint8_t 0 if the reset is successful, 1 otherwise.
  */
-uint8_t BFX_FsmResetTo(BFX_FSM_HANDLE *handle, uint8_t stateID)
+uint8_t BFX_FsmResetTo(BFX_FSM_HANDLE *handle, BFX_FSM_STATE_ID stateID)
 {
     handle->currentStateId = stateID;
     return 0;
-}
\ No newline at end of file
+}
+
+#ifdef BFX_FSM_TRACE_ENABLE
+/**
+ * @brief Timestamp of trace records, override it with a free-running timer.
+ *
+ * @return uint32_t Current time in ticks, 0 by default.
+ */
+__attribute__((weak)) uint32_t BFX_FsmTraceTimestamp(void)
+{
+    return 0;
+}
+
+/**
+ * @brief Move the oldest trace records out of the ring buffer.
+ *
+ * @param trace Pointer to the trace ring buffer.
+ * @param out Buffer receiving the records, oldest first.
+ * @param maxCnt Capacity of out in records.
+ * @return uint16_t Number of records copied.
+ */
+uint16_t BFX_FsmTraceDrain(BFX_FSM_TRACE *trace, BFX_FSM_TRACE_RECORD *out, uint16_t maxCnt)
+{
+    uint16_t cnt = trace->count < maxCnt ? trace->count : maxCnt;
+    uint16_t tail = (uint16_t)((trace->head + trace->depth - trace->count) % trace->depth);
+    for (uint16_t i = 0; i < cnt; i++) {
+        out[i] = trace->buf[tail];
+        tail = (uint16_t)((tail + 1) % trace->depth);
+    }
+    trace->count -= cnt;
+    return cnt;
+}
+#endif
+
+#ifdef BFX_FSM_IMAGE_ENABLE
+/**
+ * @brief Check a binary FSM image generated with --image before running it.
+ *
+ * @param image Pointer to the image, 4-byte aligned, usually in flash.
+ * @param imageSize Bytes available at image.
+ * @return uint8_t BFX_FSM_IMAGE_OK, or BFX_FSM_IMAGE_ERR_xxx.
+ */
+uint8_t BFX_FsmCheckImage(void const *image, uint32_t imageSize)
+{
+    BFX_FSM_IMAGE_HEADER const *header = (BFX_FSM_IMAGE_HEADER const *)image;
+    if (image == NULL || ((uintptr_t)image & 3u) != 0) {
+        return BFX_FSM_IMAGE_ERR_ALIGN;
+    }
+    if (imageSize < sizeof(BFX_FSM_IMAGE_HEADER) || header->magic != BFX_FSM_IMAGE_MAGIC ||
+        header->version != BFX_FSM_IMAGE_VERSION || header->headerSize != sizeof(BFX_FSM_IMAGE_HEADER) ||
+        header->imageSize > imageSize || (header->stateTblOffset & 3u) != 0 || (header->tranTblOffset & 3u) != 0 ||
+        header->stateTblOffset < sizeof(BFX_FSM_IMAGE_HEADER) ||
+        header->stateTblOffset > header->imageSize ||
+        (header->imageSize - header->stateTblOffset) / sizeof(BFX_FSM_IMAGE_STATE) < header->stateCnt ||
+        header->tranTblOffset < header->stateTblOffset + (uint32_t)header->stateCnt * sizeof(BFX_FSM_IMAGE_STATE) ||
+        header->tranTblOffset > header->imageSize ||
+        (header->imageSize - header->tranTblOffset) / sizeof(BFX_FSM_IMAGE_TRAN) < header->tranCnt) {
+        return BFX_FSM_IMAGE_ERR_HEADER;
+    }
+
+    uint8_t const *bytes = (uint8_t const *)image;
+    uint32_t crcOffset = (uint32_t)offsetof(BFX_FSM_IMAGE_HEADER, crc);
+    uint32_t crc = BFX_FsmImageCrc(0, bytes, crcOffset);
+    crc = BFX_FsmImageCrc(crc, bytes + crcOffset + sizeof(header->crc), header->imageSize - crcOffset - sizeof(header->crc));
+    if (crc != header->crc) {
+        return BFX_FSM_IMAGE_ERR_CRC;
+    }
+
+    /* IDs must fit this build, so that the runtime needs no bounds checks */
+    if ((BFX_FSM_STATE_ID_WIDTH == 8 && header->stateCnt > 0xFFu) ||
+        (BFX_FSM_EVENT_ID_WIDTH == 8 && header->eventCnt > 0xFFu) ||
+        header->initialState > header->stateCnt) {
+        return BFX_FSM_IMAGE_ERR_RANGE;
+    }
+    BFX_FSM_IMAGE_STATE const *stateTbl = (BFX_FSM_IMAGE_STATE const *)(bytes + header->stateTblOffset);
+    BFX_FSM_IMAGE_TRAN const *tranTbl = (BFX_FSM_IMAGE_TRAN const *)(bytes + header->tranTblOffset);
+    for (uint32_t i = 0; i < header->stateCnt; i++) {
+        BFX_FSM_IMAGE_STATE const *state = &stateTbl[i];
+        if (state->tranIndex > header->tranCnt || header->tranCnt - state->tranIndex < state->tranCnt ||
+            state->defaultStateID == 0 || state->defaultStateID > header->stateCnt ||
+            state->fatherStateID > header->stateCnt) {
+            return BFX_FSM_IMAGE_ERR_RANGE;
+        }
+        /* father chain must end within stateCnt steps */
+        uint16_t fatherState = state->fatherStateID;
+        for (uint32_t depth = 0; fatherState != 0; depth++) {
+            if (depth >= header->stateCnt) {
+                return BFX_FSM_IMAGE_ERR_RANGE;
+            }
+            fatherState = stateTbl[fatherState - 1].fatherStateID;
+        }
+        for (uint16_t j = 0; j < state->tranCnt; j++) {
+            BFX_FSM_IMAGE_TRAN const *record = &tranTbl[state->tranIndex + j];
+            if (record->event == 0 || record->event > header->eventCnt ||
+                record->nextState == 0 || record->nextState > header->stateCnt ||
+                (j != 0 && record->event <= record[-1].event)) {
+                return BFX_FSM_IMAGE_ERR_RANGE;
+            }
+        }
+    }
+    return BFX_FSM_IMAGE_OK;
+}
+
+/**
+ * @brief Run a handle from a binary FSM image, the tables are used in place without copying.
+ *
+ * @param handle Pointer to the FSM handle, replaced by the image and set to its initial state.
+ * @param image Pointer to the image, 4-byte aligned, must stay valid while the handle is used.
+ * @param imageSize Bytes available at image.
+ * @param signature Model the firmware was built from, i.e. <PROJECT>_IMAGE_SIGNATURE; images of other
+ *        models (e.g. with renumbered states) are rejected, as their IDs do not match actionTbl.
+ * @param actionTbl Callbacks by state ID - 1, e.g. g_<project>_actionTbl; NULL entries are skipped.
+ * @param actionCnt Number of entries in actionTbl.
+ * @return uint8_t BFX_FSM_IMAGE_OK, or BFX_FSM_IMAGE_ERR_xxx with the handle unchanged.
+ */
+uint8_t BFX_FsmLoadImage(BFX_FSM_HANDLE *handle, void const *image, uint32_t imageSize, uint32_t signature,
+                         BFX_FSM_ACTION_CALLBACK const *actionTbl, BFX_FSM_STATE_ID actionCnt)
+{
+    uint8_t result = BFX_FsmCheckImage(image, imageSize);
+    if (result != BFX_FSM_IMAGE_OK) {
+        return result;
+    }
+    BFX_FSM_IMAGE_HEADER const *header = (BFX_FSM_IMAGE_HEADER const *)image;
+    if (header->signature != signature) {
+        return BFX_FSM_IMAGE_ERR_SIGNATURE;
+    }
+    uint8_t const *bytes = (uint8_t const *)image;
+    handle->stateTbl = NULL;
+    handle->stateCnt = (BFX_FSM_STATE_ID)header->stateCnt;
+    handle->currentStateId = (BFX_FSM_STATE_ID)header->initialState;
+    handle->maxStateId = 0;
+    handle->maxEventId = 0;
+    handle->dispatchTbl = NULL;
+    handle->leafTargets = 1;
+    handle->imageStateTbl = (BFX_FSM_IMAGE_STATE const *)(bytes + header->stateTblOffset);
+    handle->imageTranTbl = (BFX_FSM_IMAGE_TRAN const *)(bytes + header->tranTblOffset);
+    handle->actionTbl = actionTbl;
+    handle->actionCnt = (actionTbl != NULL) ? actionCnt : 0;
+    return BFX_FSM_IMAGE_OK;
+}
+#endif
+
+#ifdef BFX_FSM_NAMES_ENABLE
+/**
+ * @brief Look up the ID of a state or event name in an index generated with --names.
+ *
+ * @param index Name index, e.g. &g_<project>_eventNames or &g_<project>_stateNames.
+ * @param name Name to look up, need not be NUL terminated (e.g. a token inside a command line).
+ * @param len Length of name in bytes.
+ * @return uint16_t ID of the name, 0 if it is not in the index.
+ */
+uint16_t BFX_FsmLookupName(BFX_FSM_NAME_INDEX const *index, char const *name, uint16_t len)
+{
+    if (index->cnt == 0) {
+        return 0;
+    }
+    uint16_t seed = index->seedTbl[BFX_FsmNameHash(0, name, len) % index->cnt];
+    uint16_t slot = (seed & BFX_FSM_NAME_DIRECT) ? (uint16_t)(seed & ~BFX_FSM_NAME_DIRECT)
+                                                 : (uint16_t)(BFX_FsmNameHash(seed, name, len) % index->cnt);
+    uint16_t id = index->slotTbl[slot];
+
+    /* one comparison against the only candidate, stops at its terminator */
+    char const *candidate = index->namePool + index->nameOffsetTbl[id - 1];
+    uint16_t i = 0;
+    while (i < len && candidate[i] != '\0' && candidate[i] == name[i]) {
+        i++;
+    }
+    return (i == len && candidate[len] == '\0') ? id : 0;
+}
+
+/**
+ * @brief Get the name of a state or event ID from an index generated with --names.
+ *
+ * @param index Name index, e.g. &g_<project>_eventNames or &g_<project>_stateNames.
+ * @param id State or event ID.
+ * @return char const* NUL terminated name, NULL if id is out of range.
+ */
+char const *BFX_FsmGetName(BFX_FSM_NAME_INDEX const *index, uint16_t id)
+{
+    if (id == 0 || id > index->cnt) {
+        return NULL;
+    }
+    return index->namePool + index->nameOffsetTbl[id - 1];
+}
+#endif
@@ -15,39 +15,190 @@
 
 /* Config macros -----------------------------------------------------------------*/
 
+/* width of state / event IDs, 8 or 16; must cover the <PROJECT>_xxx_ID_WIDTH of every generated FSM */
+#ifndef BFX_FSM_STATE_ID_WIDTH
+#define BFX_FSM_STATE_ID_WIDTH 8
+#endif
+#ifndef BFX_FSM_EVENT_ID_WIDTH
+#define BFX_FSM_EVENT_ID_WIDTH 8
+#endif
+
+/* define BFX_FSM_TRACE_ENABLE to record every transition of handles that have a trace buffer */
+// #define BFX_FSM_TRACE_ENABLE
+
+/* define BFX_FSM_IMAGE_ENABLE to run FSMs from binary images generated with --image, see BFX_FsmLoadImage */
+// #define BFX_FSM_IMAGE_ENABLE
+
+/* define BFX_FSM_NAMES_ENABLE to look up state / event IDs by name with the indexes generated with --names */
+// #define BFX_FSM_NAMES_ENABLE
+
+/* placement of the tables generated with --names, e.g. __attribute__((section(".fsm_names"))) to keep them
+   in a flash region that is left out of release images */
+#ifndef BFX_FSM_NAMES_SECTION
+#define BFX_FSM_NAMES_SECTION
+#endif
+
+/* ordering between an ISR posting to a generated event queue (--queue) and the task draining it;
+   the default compiler barrier is enough on single-core MCUs, redefine with a DMB for multi-core targets */
+#ifndef BFX_FSM_QUEUE_BARRIER
+#define BFX_FSM_QUEUE_BARRIER() __asm__ volatile("" : : : "memory")
+#endif
+
 /* Export macros -----------------------------------------------------------------*/
 
 #define BFX_STATUS_FATHER_NONE 0
 
+/* BFX_FSM_ACTION_CTX.instance of handles processed with BFX_FsmProcessEvent */
+#define BFX_FSM_INSTANCE_NONE 0xFFFFu
+
+/* encoding of BFX_FSM_STATE.tranTbl */
+#define BFX_FSM_TRAN_LINEAR 0 // records in declaration order, linear search
+#define BFX_FSM_TRAN_SORTED 1 // records sorted by event, binary search
+#define BFX_FSM_TRAN_COMB   2 // row of a comb-compressed shared table, tranTbl[event - 1] checked by event
+
+/* BFX_FSM_NAME_INDEX.seedTbl entry holding the slot itself, for buckets with a single name */
+#define BFX_FSM_NAME_DIRECT 0x8000u
+
+/* binary image, little endian, every section 4-byte aligned */
+#define BFX_FSM_IMAGE_MAGIC   0x46584642u // "BFXF"
+#define BFX_FSM_IMAGE_VERSION 1
+
+/* result of BFX_FsmCheckImage / BFX_FsmLoadImage */
+#define BFX_FSM_IMAGE_OK         0
+#define BFX_FSM_IMAGE_ERR_ALIGN  1 // image is not 4-byte aligned
+#define BFX_FSM_IMAGE_ERR_HEADER 2 // bad magic, version or section layout, or truncated image
+#define BFX_FSM_IMAGE_ERR_CRC    3 // CRC mismatch
+#define BFX_FSM_IMAGE_ERR_RANGE  4 // IDs do not fit BFX_FSM_xxx_ID_WIDTH, or tables are inconsistent
+#define BFX_FSM_IMAGE_ERR_SIGNATURE 5 // image was generated from another model, see BFX_FsmLoadImage
+
 /* Exported typedef --------------------------------------------------------------*/
 
+#if BFX_FSM_STATE_ID_WIDTH == 8
+typedef uint8_t BFX_FSM_STATE_ID;
+#elif BFX_FSM_STATE_ID_WIDTH == 16
+typedef uint16_t BFX_FSM_STATE_ID;
+#else
+#error "BFX_FSM_STATE_ID_WIDTH must be 8 or 16"
+#endif
+
+#if BFX_FSM_EVENT_ID_WIDTH == 8
+typedef uint8_t BFX_FSM_EVENT_ID;
+#elif BFX_FSM_EVENT_ID_WIDTH == 16
+typedef uint16_t BFX_FSM_EVENT_ID;
+#else
+#error "BFX_FSM_EVENT_ID_WIDTH must be 8 or 16"
+#endif
+
 typedef struct tagBFX_FSM_TRAN_RECORD {
-    uint8_t event;
-    uint8_t nextState;
+    BFX_FSM_EVENT_ID event;
+    BFX_FSM_STATE_ID nextState;
 } BFX_FSM_TRAN_RECORD;
 
 typedef struct tagBFX_FSM_ACTION_CTX {
-    uint8_t eventID;
+    BFX_FSM_EVENT_ID eventID;
     uint8_t entryType;
+    uint16_t instance; // index passed to BFX_FsmProcessInstance(s), BFX_FSM_INSTANCE_NONE for the handle itself
 } BFX_FSM_ACTION_CTX;
 
 typedef void (*BFX_FSM_ACTION_CALLBACK)(BFX_FSM_ACTION_CTX *ctx, void *arg, uint16_t argSize);
 
+/* element of the event queue generated with --queue, arg must stay valid until the event is drained */
+typedef struct tagBFX_FSM_QUEUED_EVENT {
+    void *arg;
+    uint16_t argSize;
+    BFX_FSM_EVENT_ID event;
+} BFX_FSM_QUEUED_EVENT;
+
+#ifdef BFX_FSM_TRACE_ENABLE
+/* 12 bytes, same layout for every ID width, decoded by bfx_fsm_trace.py */
+typedef struct tagBFX_FSM_TRACE_RECORD {
+    uint32_t timestamp; // BFX_FsmTraceTimestamp() before the action callback
+    uint16_t fromState;
+    uint16_t toState;
+    uint16_t event;
+    uint16_t duration; // ticks spent in the action callback, saturated to 0xFFFF
+} BFX_FSM_TRACE_RECORD;
+
+typedef struct tagBFX_FSM_TRACE {
+    BFX_FSM_TRACE_RECORD *buf;
+    uint16_t depth; // number of records in buf
+    uint16_t head; // next record to write
+    uint16_t count; // records not drained yet
+    uint32_t lost; // records overwritten before being drained
+} BFX_FSM_TRACE;
+#endif
+
+#ifdef BFX_FSM_IMAGE_ENABLE
+/* 40 bytes, no padding on any ABI; written by bfx_puml_translate.py --image */
+typedef struct tagBFX_FSM_IMAGE_HEADER {
+    uint32_t magic; // BFX_FSM_IMAGE_MAGIC
+    uint16_t version; // BFX_FSM_IMAGE_VERSION
+    uint16_t headerSize; // sizeof(BFX_FSM_IMAGE_HEADER)
+    uint16_t stateCnt;
+    uint16_t eventCnt;
+    uint16_t initialState; // leaf state entered when loading, 0 if none
+    uint16_t reserved;
+    uint32_t tranCnt; // records in the transition table
+    uint32_t stateTblOffset; // offsets from the start of the image
+    uint32_t tranTblOffset;
+    uint32_t imageSize;
+    uint32_t signature; // <PROJECT>_IMAGE_SIGNATURE of the model the image was generated from
+    uint32_t crc; // CRC-32 of every byte of the image except this field
+} BFX_FSM_IMAGE_HEADER;
+
+/* pointer free state record, indexed by state ID - 1 */
+typedef struct tagBFX_FSM_IMAGE_STATE {
+    uint32_t tranIndex; // first record of this state in the transition table
+    uint16_t tranCnt; // own records, sorted by event
+    uint16_t defaultStateID;
+    uint16_t fatherStateID;
+    uint16_t reserved;
+} BFX_FSM_IMAGE_STATE;
+
+typedef struct tagBFX_FSM_IMAGE_TRAN {
+    uint16_t event;
+    uint16_t nextState; // already resolved to a leaf state
+} BFX_FSM_IMAGE_TRAN;
+#endif
+
+#ifdef BFX_FSM_NAMES_ENABLE
+/* minimal perfect hash from names to IDs, generated with --names; bucket and slot count are both cnt */
+typedef struct tagBFX_FSM_NAME_INDEX {
+    uint16_t const *seedTbl; // per bucket: seed of the slot hash, or BFX_FSM_NAME_DIRECT | slot
+    uint16_t const *slotTbl; // ID stored in each slot
+    uint32_t const *nameOffsetTbl; // offset of each name in namePool, indexed by ID - 1
+    char const *namePool; // NUL terminated names in ID order
+    uint16_t cnt;
+} BFX_FSM_NAME_INDEX;
+#endif
+
 typedef struct tagBFX_FSM_STATE {
-    uint8_t stateID;
-    uint8_t defaultStateID;
-    uint8_t fatherStateID;
-    uint8_t tranTblCnt;
+    BFX_FSM_STATE_ID stateID;
+    BFX_FSM_STATE_ID defaultStateID;
+    BFX_FSM_STATE_ID fatherStateID;
+    BFX_FSM_EVENT_ID tranTblCnt;
     BFX_FSM_TRAN_RECORD const *tranTbl;
     BFX_FSM_ACTION_CALLBACK actionTbl;
+    uint8_t tranTblType; // BFX_FSM_TRAN_xxx, tranTblCnt is the row span for BFX_FSM_TRAN_COMB
 } BFX_FSM_STATE;
 
 typedef struct tagBFX_FSM_HANDLE {
     BFX_FSM_STATE const *stateTbl;
-    uint8_t stateCnt;
-    uint8_t currentStateId;
-    uint8_t maxStateId; // todo
-    uint8_t maxEventId; // todo
+    BFX_FSM_STATE_ID stateCnt;
+    BFX_FSM_STATE_ID currentStateId;
+    BFX_FSM_STATE_ID maxStateId; // number of rows in dispatchTbl
+    BFX_FSM_EVENT_ID maxEventId; // number of columns in dispatchTbl
+    BFX_FSM_STATE_ID const *dispatchTbl; // dense [maxStateId][maxEventId] next state table, NULL to use tranTbl
+    uint8_t leafTargets; // 1 if every nextState is already resolved through default substates to a leaf
+#ifdef BFX_FSM_TRACE_ENABLE
+    BFX_FSM_TRACE *trace; // ring buffer of transition records, NULL to disable
+#endif
+#ifdef BFX_FSM_IMAGE_ENABLE
+    BFX_FSM_IMAGE_STATE const *imageStateTbl; // state table inside a loaded image, NULL to use stateTbl
+    BFX_FSM_IMAGE_TRAN const *imageTranTbl; // transition table inside the same image
+    BFX_FSM_ACTION_CALLBACK const *actionTbl; // callbacks of image states by state ID - 1, NULL entries skipped
+    BFX_FSM_STATE_ID actionCnt; // number of entries in actionTbl
+#endif
 } BFX_FSM_HANDLE;
 
 /* C++ ---------------------------------------------------------------------------*/
@@ -57,9 +208,27 @@ extern "C" {
 
 /* Exported function -------------------------------------------------------------*/
 
-uint8_t BFX_FsmProcessEvent(BFX_FSM_HANDLE *handle, uint8_t event, void *arg, uint16_t argSize);
-uint8_t BFX_FsmGetCurrentStateID(BFX_FSM_HANDLE *handle);
-uint8_t BFX_FsmResetTo(BFX_FSM_HANDLE *handle, uint8_t stateID);
+uint8_t BFX_FsmProcessEvent(BFX_FSM_HANDLE *handle, BFX_FSM_EVENT_ID event, void *arg, uint16_t argSize);
+BFX_FSM_STATE_ID BFX_FsmGetCurrentStateID(BFX_FSM_HANDLE *handle);
+uint8_t BFX_FsmResetTo(BFX_FSM_HANDLE *handle, BFX_FSM_STATE_ID stateID);
+uint8_t BFX_FsmProcessInstance(BFX_FSM_HANDLE const *handle, BFX_FSM_STATE_ID *instanceTbl, uint16_t instance,
+                               BFX_FSM_EVENT_ID event, void *arg, uint16_t argSize);
+uint16_t BFX_FsmProcessInstances(BFX_FSM_HANDLE const *handle, BFX_FSM_STATE_ID *instanceTbl, uint16_t instanceCnt,
+                                 BFX_FSM_EVENT_ID event, void *arg, uint16_t argSize);
+void BFX_FsmResetInstances(BFX_FSM_STATE_ID *instanceTbl, uint16_t instanceCnt, BFX_FSM_STATE_ID stateID);
+#ifdef BFX_FSM_TRACE_ENABLE
+uint32_t BFX_FsmTraceTimestamp(void);
+uint16_t BFX_FsmTraceDrain(BFX_FSM_TRACE *trace, BFX_FSM_TRACE_RECORD *out, uint16_t maxCnt);
+#endif
+#ifdef BFX_FSM_IMAGE_ENABLE
+uint8_t BFX_FsmCheckImage(void const *image, uint32_t imageSize);
+uint8_t BFX_FsmLoadImage(BFX_FSM_HANDLE *handle, void const *image, uint32_t imageSize, uint32_t signature,
+                         BFX_FSM_ACTION_CALLBACK const *actionTbl, BFX_FSM_STATE_ID actionCnt);
+#endif
+#ifdef BFX_FSM_NAMES_ENABLE
+uint16_t BFX_FsmLookupName(BFX_FSM_NAME_INDEX const *index, char const *name, uint16_t len);
+char const *BFX_FsmGetName(BFX_FSM_NAME_INDEX const *index, uint16_t id);
+#endif
 
 /* C++ ---------------------------------------------------------------------------*/
 #ifdef __cplusplus
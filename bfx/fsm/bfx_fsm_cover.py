@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+状态机转移覆盖测试序列生成
+由PlantUML模型求出覆盖全部转移（含从父状态继承的转移）的近似最短事件序列，输出供gtest回放的头文件或JSON。
+按有向中国邮递员问题求解：以复位为回到初始状态的边，对出入度不平衡的状态按最短路做最小费用配对，
+再求欧拉回路并在复位处切分为多条序列。
+"""
+
+import argparse
+import heapq
+import json
+import os
+import sys
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from bfx_puml_translate import PlantUMLParser, load_model, write_depfile, write_if_changed
+
+# 复位（BFX_FsmResetTo回到初始状态）折算的事件数，越大越倾向于少而长的序列
+DEFAULT_RESET_COST = 1
+
+# 一步转移：(源状态ID, 事件ID, 目标状态ID)，事件ID为None表示复位
+Edge = Tuple[int, Optional[int], int]
+
+@dataclass(slots=True)
+class CoverPlan:
+    """覆盖序列，状态与事件均为ID，与生成的C代码一致"""
+    initial_state: int
+    sequences: List[List[Tuple[int, int]]]  # 每条序列从初始状态开始，元素为(事件ID, 处理后的状态ID)
+    transition_cnt: int  # 需要覆盖的(状态, 事件)转移数
+    naive_event_cnt: int  # 每条转移单独从初始状态走最短路的事件总数，用于对比
+    uncovered: List[Tuple[int, int]] = field(default_factory=list)  # 从初始状态不可达的(状态, 事件)
+
+    @property
+    def event_cnt(self) -> int:
+        return sum(len(sequence) for sequence in self.sequences)
+
+def transition_graph(parser: PlantUMLParser) -> Dict[int, List[Tuple[int, int]]]:
+    """叶子状态间的转移图：状态ID -> [(事件ID, 目标状态ID)]，已合并父状态的转移，与运行时的查找结果一致"""
+    graph = {}
+    for state, row in parser.get_dispatch_matrix():
+        if parser.resolve_default_leaf(state) is not state:
+            continue  # 复合状态只作为父状态参与查找，运行时不会停留在其上
+        graph[state.id] = [(event_id, target.id) for event_id, target in enumerate(row, 1) if target is not None]
+    return graph
+
+def _shortest_paths(graph: Dict[int, List[Tuple[int, int]]], source: int, initial: int,
+                    reset_cost: int) -> Tuple[Dict[int, int], Dict[int, Edge]]:
+    """从source出发的最短路（Dijkstra），事件边代价为1，任意状态可复位到初始状态，返回(距离, 前驱边)"""
+    dist = {source: 0}
+    prev: Dict[int, Edge] = {}
+    heap = [(0, source)]
+    while heap:
+        cost, node = heapq.heappop(heap)
+        if cost > dist[node]:
+            continue
+        steps = [(event_id, target, 1) for event_id, target in graph[node]]
+        if node != initial:
+            steps.append((None, initial, reset_cost))
+        for event_id, target, step_cost in steps:
+            if cost + step_cost < dist.get(target, cost + step_cost + 1):
+                dist[target] = cost + step_cost
+                prev[target] = (node, event_id, target)
+                heapq.heappush(heap, (cost + step_cost, target))
+    return dist, prev
+
+def _path(prev: Dict[int, Edge], source: int, target: int) -> List[Edge]:
+    """由前驱边还原source到target的路径"""
+    path = []
+    while target != source:
+        edge = prev[target]
+        path.append(edge)
+        target = edge[0]
+    path.reverse()
+    return path
+
+def _transport(supply: Dict[int, int], demand: Dict[int, int],
+               cost: Dict[Tuple[int, int], int]) -> Dict[Tuple[int, int], int]:
+    """供需平衡的运输问题，逐次最短增广路求最小费用，返回各(供应状态, 需求状态)的流量
+
+    残量网络中供应点到需求点的弧容量不限，已有流量的弧带负费用的反向弧，用Bellman-Ford求最短增广路。
+    """
+    flow: Dict[Tuple[int, int], int] = {}
+    supply, demand = dict(supply), dict(demand)
+    while any(supply.values()):
+        dist = {('s', u): 0 for u, left in supply.items() if left}
+        prev: Dict[Tuple[str, int], Tuple[str, int]] = {}
+        for _ in range(len(supply) + len(demand)):
+            changed = False
+            for node, node_cost in list(dist.items()):
+                side, state = node
+                if side == 's':
+                    arcs = [(('d', v), cost[state, v]) for v in demand]
+                else:
+                    arcs = [(('s', u), -cost[u, state]) for u in supply if flow.get((u, state))]
+                for target, arc_cost in arcs:
+                    if node_cost + arc_cost < dist.get(target, node_cost + arc_cost + 1):
+                        dist[target] = node_cost + arc_cost
+                        prev[target] = node
+                        changed = True
+            if not changed:
+                break
+        sink = min((v for v, left in demand.items() if left and ('d', v) in dist), key=lambda v: dist['d', v])
+        path = [('d', sink)]
+        while path[-1] in prev:
+            path.append(prev[path[-1]])
+        arcs = list(zip(path[1:], path))  # (起点, 终点)
+        amount = min([supply[path[-1][1]], demand[sink]] +
+                     [flow[head[1], tail[1]] for tail, head in arcs if tail[0] == 'd'])
+        for tail, head in arcs:
+            if tail[0] == 's':
+                flow[tail[1], head[1]] = flow.get((tail[1], head[1]), 0) + amount
+            else:
+                flow[head[1], tail[1]] -= amount
+        supply[path[-1][1]] -= amount
+        demand[sink] -= amount
+    return {pair: amount for pair, amount in flow.items() if amount}
+
+def _euler_circuit(edges: List[Edge], start: int) -> List[Edge]:
+    """出入度平衡的多重图上从start出发的欧拉回路（Hierholzer），同一状态按事件ID顺序优先走"""
+    out: Dict[int, List[Edge]] = {}
+    for edge in sorted(edges, key=lambda e: (e[0], e[1] is None, e[1] or 0, e[2]), reverse=True):
+        out.setdefault(edge[0], []).append(edge)
+    circuit = []
+    stack: List[Tuple[int, Optional[Edge]]] = [(start, None)]
+    while stack:
+        node, via = stack[-1]
+        if out.get(node):
+            edge = out[node].pop()
+            stack.append((edge[2], edge))
+        else:
+            stack.pop()
+            if via is not None:
+                circuit.append(via)
+    circuit.reverse()
+    return circuit
+
+def plan_cover(parser: PlantUMLParser, reset_cost: int = DEFAULT_RESET_COST) -> CoverPlan:
+    """求覆盖从初始状态可达的全部转移的事件序列"""
+    if not parser.top_level_initial or parser.top_level_initial not in parser.states:
+        raise ValueError(f"{parser.project_name}: covering sequences need a top level initial state")
+    initial = parser.resolve_default_leaf(parser.states[parser.top_level_initial]).id
+    graph = transition_graph(parser)
+
+    # 只覆盖从初始状态可达的停留状态上的转移
+    reachable, _ = _shortest_paths(graph, initial, initial, reset_cost)
+    required: List[Edge] = [(state, event_id, target) for state in sorted(reachable)
+                            for event_id, target in graph[state]]
+    uncovered = [(state, event_id) for state in sorted(set(graph) - set(reachable))
+                 for event_id, _ in graph[state]]
+    naive = sum(reachable[state] + 1 for state, _, _ in required)
+    if not required:
+        return CoverPlan(initial, [], 0, 0, uncovered)
+
+    # 入度多于出度的状态需要额外走出去，按最短路配对到出度多于入度的状态
+    balance: Dict[int, int] = {}
+    for state, _, target in required:
+        balance[state] = balance.get(state, 0) - 1
+        balance[target] = balance.get(target, 0) + 1
+    supply = {state: count for state, count in balance.items() if count > 0}
+    demand = {state: -count for state, count in balance.items() if count < 0}
+    paths = {state: _shortest_paths(graph, state, initial, reset_cost) for state in supply}
+    cost = {(u, v): paths[u][0][v] for u in supply for v in demand}
+    edges = list(required)
+    for (u, v), amount in _transport(supply, demand, cost).items():
+        edges.extend(_path(paths[u][1], u, v) * amount)
+
+    # 欧拉回路在复位处切分为序列
+    sequences: List[List[Edge]] = [[]]
+    for edge in _euler_circuit(edges, initial):
+        if edge[1] is None:
+            sequences.append([])
+        else:
+            sequences[-1].append(edge)
+
+    # 序列末尾已在别处覆盖的转移不必再走
+    visits: Dict[Edge, int] = {}
+    for sequence in sequences:
+        for edge in sequence:
+            visits[edge] = visits.get(edge, 0) + 1
+    for sequence in sequences:
+        while sequence and visits[sequence[-1]] > 1:
+            visits[sequence.pop()] -= 1
+    return CoverPlan(
+        initial_state=initial,
+        sequences=[[(event_id, target) for _, event_id, target in sequence] for sequence in sequences if sequence],
+        transition_cnt=len(required),
+        naive_event_cnt=naive,
+        uncovered=uncovered,
+    )
+
+def generate_cover_header(parser: PlantUMLParser, plan: CoverPlan) -> str:
+    """生成<项目名>_cover.h：覆盖序列的步骤表与序列表，每步给出事件与处理后应停留的状态"""
+    project = parser.project_name
+    upper = project.upper()
+    states = {state.id: state.get_macro_name(project) for state in parser.states.values()}
+    events = {event.id: f"{upper}_{event.name.upper()}" for event in parser.events.values()}
+    steps = [step for sequence in plan.sequences for step in sequence]
+    out = [f"/**\n * @file {project}_cover.h\n * @brief transition-covering event sequences of {project}\n"
+           " * @generator BufferFlowX\n**/\n"
+           f"#ifndef __BFX_{upper}_COVER_H__\n#define __BFX_{upper}_COVER_H__\n\n",
+           "/* headers import ".ljust(111, '-') + "*/\n", f'#include "{project}.h"\n\n',
+           "/* cover types ".ljust(111, '-') + "*/\n",
+           "#ifndef BFX_FSM_COVER_TYPES\n#define BFX_FSM_COVER_TYPES\n"
+           "/* one event and the leaf state expected after processing it */\n"
+           "typedef struct tagBFX_FSM_COVER_STEP {\n    BFX_FSM_EVENT_ID event;\n    BFX_FSM_STATE_ID expected;\n"
+           "} BFX_FSM_COVER_STEP;\n\n"
+           "/* steps [first, first + cnt) replayed from <PROJECT>_INITIAL_STATE */\n"
+           "typedef struct tagBFX_FSM_COVER_SEQ {\n    uint16_t first;\n    uint16_t cnt;\n} BFX_FSM_COVER_SEQ;\n"
+           "#endif\n\n",
+           "/* cover sequences ".ljust(111, '-') + "*/\n",
+           f"#define {upper}_COVER_TRAN_CNT {plan.transition_cnt}\n"
+           f"#define {upper}_COVER_STEP_CNT {len(steps)}\n"
+           f"#define {upper}_COVER_SEQ_CNT {len(plan.sequences)}\n\n"]
+    write = out.append
+    if steps:
+        write(f"static const BFX_FSM_COVER_STEP g_{project}_coverSteps[{upper}_COVER_STEP_CNT] = {{\n")
+        for index, sequence in enumerate(plan.sequences):
+            write(f"    /* sequence {index} */\n")
+            for event_id, state_id in sequence:
+                write(f"    {{ {events[event_id]}, {states[state_id]} }},\n")
+        write("};\n")
+        write(f"static const BFX_FSM_COVER_SEQ g_{project}_coverSeqs[{upper}_COVER_SEQ_CNT] = {{\n")
+        first = 0
+        for sequence in plan.sequences:
+            write(f"    {{ {first}, {len(sequence)} }},\n")
+            first += len(sequence)
+        write("};\n")
+    write("#endif\n")
+    return ''.join(out)
+
+def cover_json(parser: PlantUMLParser, plan: CoverPlan) -> Dict:
+    """覆盖序列的JSON形式，状态与事件用名称，便于主机脚本与硬件在环回放"""
+    states = {state.id: state.full_name for state in parser.states.values()}
+    events = {event.id: event.name for event in parser.events.values()}
+    return {
+        'project': parser.project_name,
+        'initial': states[plan.initial_state],
+        'transitions': plan.transition_cnt,
+        'events': plan.event_cnt,
+        'sequences': [[{'event': events[event_id], 'state': states[state_id]} for event_id, state_id in sequence]
+                      for sequence in plan.sequences],
+        'uncovered': [{'state': states[state], 'event': events[event_id]} for state, event_id in plan.uncovered],
+    }
+
+def main():
+    """主函数"""
+    arg_parser = argparse.ArgumentParser(description="状态机转移覆盖测试序列生成")
+    arg_parser.add_argument('plantuml_file', help="PlantUML文件")
+    arg_parser.add_argument('-o', '--output-dir', help="输出<项目名>_cover.h的目录")
+    arg_parser.add_argument('--json', metavar='FILE', help="把序列以JSON写入文件，-表示stdout")
+    arg_parser.add_argument('--reset-cost', type=int, default=DEFAULT_RESET_COST,
+                            help=f"一次复位折算的事件数，默认{DEFAULT_RESET_COST}")
+    arg_parser.add_argument('--cache-dir', default=os.environ.get('BFX_PUML_CACHE_DIR'), help="解析模型缓存目录")
+    arg_parser.add_argument('--depfile', metavar='FILE',
+                            help="写入Makefile格式的依赖文件，列出输入及全部!include文件，目标为去掉.d后缀的FILE")
+    args = arg_parser.parse_args()
+    if args.reset_cost < 0:
+        arg_parser.error("--reset-cost must not be negative")
+
+    parser, _ = load_model(args.plantuml_file, args.cache_dir)
+    if args.depfile:
+        write_depfile(args.depfile, parser.sources)
+    try:
+        plan = plan_cover(parser, args.reset_cost)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+        write_if_changed(os.path.join(args.output_dir, f"{parser.project_name}_cover.h"),
+                         generate_cover_header(parser, plan))
+    report = cover_json(parser, plan)
+    if args.json:
+        text = json.dumps(report, ensure_ascii=False, indent=2) + '\n'
+        if args.json == '-':
+            sys.stdout.write(text)
+        else:
+            write_if_changed(args.json, text)
+    for item in report['uncovered']:
+        print(f"-- warning: {parser.project_name}: {item['state']} : {item['event']} "
+              f"is unreachable from the initial state", file=sys.stderr)
+    print(f"-- {parser.project_name}: {plan.transition_cnt} transitions covered by {plan.event_cnt} events "
+          f"in {len(plan.sequences)} sequences (one sequence per transition: {plan.naive_event_cnt} events)",
+          file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+状态机二进制镜像读取与校验
+解析bfx_puml_translate.py --image生成的镜像，按与BFX_FsmCheckImage相同的规则校验，并可与PlantUML模型逐项比对
+"""
+
+import argparse
+import os
+import sys
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+from bfx_puml_translate import (IMAGE_HEADER, IMAGE_MAGIC, IMAGE_STATE, IMAGE_TRAN, IMAGE_VERSION, PRUNE_MODES,
+                                GenerateOptions, PlantUMLParser, image_crc, load_model, model_signature,
+                                prepare_model)
+
+IMAGE_ALIGN = 4
+# 运行时按ID位宽能容纳的最大状态/事件数
+ID_LIMITS = {8: 0xFF, 16: 0xFFFF}
+
+@dataclass(slots=True)
+class ImageState:
+    """镜像中的一个状态，下标为状态ID - 1"""
+    tran_index: int
+    tran_cnt: int
+    default_state: int
+    father_state: int
+
+@dataclass(slots=True)
+class FsmImage:
+    """解析后的镜像，字段与BFX_FSM_IMAGE_HEADER一致"""
+    version: int
+    state_cnt: int
+    event_cnt: int
+    initial_state: int
+    tran_cnt: int
+    state_tbl_offset: int
+    tran_tbl_offset: int
+    image_size: int
+    signature: int
+    crc: int
+    states: List[ImageState] = field(default_factory=list)
+    transitions: List[Tuple[int, int]] = field(default_factory=list)  # (事件ID, 目标状态ID)
+
+    def state_transitions(self, state_id: int) -> List[Tuple[int, int]]:
+        """状态自身的转移，按事件ID排序"""
+        state = self.states[state_id - 1]
+        return self.transitions[state.tran_index:state.tran_index + state.tran_cnt]
+
+    def lookup(self, state_id: int, event_id: int) -> int:
+        """与BFX_FsmProcessEvent相同的查找顺序：先本状态后父状态，返回目标状态ID，不处理时为0"""
+        while state_id != 0:
+            for record_event, next_state in self.state_transitions(state_id):
+                if record_event == event_id:
+                    return next_state
+            state_id = self.states[state_id - 1].father_state
+        return 0
+
+def read_header(data: bytes) -> Optional[FsmImage]:
+    """只解析头部，长度不足或magic不符时返回None"""
+    if len(data) < IMAGE_HEADER.size:
+        return None
+    (magic, version, header_size, state_cnt, event_cnt, initial_state, _, tran_cnt, state_tbl_offset,
+     tran_tbl_offset, image_size, signature, crc) = IMAGE_HEADER.unpack_from(data)
+    if magic != IMAGE_MAGIC or header_size != IMAGE_HEADER.size:
+        return None
+    return FsmImage(version=version, state_cnt=state_cnt, event_cnt=event_cnt, initial_state=initial_state,
+                    tran_cnt=tran_cnt, state_tbl_offset=state_tbl_offset, tran_tbl_offset=tran_tbl_offset,
+                    image_size=image_size, signature=signature, crc=crc)
+
+def validate_image(data: bytes, state_id_width: int = 16, event_id_width: int = 16) -> List[str]:
+    """按BFX_FsmCheckImage的规则校验镜像，返回问题列表，为空表示可以加载
+
+    state_id_width/event_id_width为固件中BFX_FSM_STATE_ID_WIDTH/BFX_FSM_EVENT_ID_WIDTH。
+    """
+    image = read_header(data)
+    if image is None:
+        return ["not a BFX FSM image (bad magic or header size)"]
+    if image.version != IMAGE_VERSION:
+        return [f"version {image.version} is not supported, expected {IMAGE_VERSION}"]
+    if image.image_size > len(data):
+        return [f"truncated: header says {image.image_size} bytes, got {len(data)}"]
+    problems = []
+    if image.state_tbl_offset % IMAGE_ALIGN or image.tran_tbl_offset % IMAGE_ALIGN:
+        problems.append("section offsets are not 4-byte aligned")
+    state_tbl_end = image.state_tbl_offset + image.state_cnt * IMAGE_STATE.size
+    if (image.state_tbl_offset < IMAGE_HEADER.size or image.tran_tbl_offset < state_tbl_end or
+            image.tran_tbl_offset + image.tran_cnt * IMAGE_TRAN.size > image.image_size):
+        problems.append("sections overlap or exceed the image size")
+    if problems:
+        return problems
+    if image_crc(data[:image.image_size]) != image.crc:
+        return [f"CRC mismatch: header 0x{image.crc:08X}, computed 0x{image_crc(data[:image.image_size]):08X}"]
+
+    if image.state_cnt > ID_LIMITS[state_id_width]:
+        problems.append(f"{image.state_cnt} states do not fit {state_id_width}-bit state IDs")
+    if image.event_cnt > ID_LIMITS[event_id_width]:
+        problems.append(f"{image.event_cnt} events do not fit {event_id_width}-bit event IDs")
+    if image.initial_state > image.state_cnt:
+        problems.append(f"initial state {image.initial_state} out of range")
+    _read_tables(image, data)
+    for state_id, state in enumerate(image.states, start=1):
+        if state.tran_index + state.tran_cnt > image.tran_cnt:
+            problems.append(f"state {state_id}: transitions exceed the transition table")
+            continue
+        if not 1 <= state.default_state <= image.state_cnt or state.father_state > image.state_cnt:
+            problems.append(f"state {state_id}: default or father state out of range")
+            continue
+        father, depth = state.father_state, 0
+        while father != 0 and depth < image.state_cnt and father <= image.state_cnt:
+            father, depth = image.states[father - 1].father_state, depth + 1
+        if father != 0:
+            problems.append(f"state {state_id}: father chain does not end")
+        events = [event for event, _ in image.state_transitions(state_id)]
+        if any(not 1 <= event <= image.event_cnt for event in events):
+            problems.append(f"state {state_id}: event out of range")
+        if any(not 1 <= target <= image.state_cnt for _, target in image.state_transitions(state_id)):
+            problems.append(f"state {state_id}: target state out of range")
+        if any(a >= b for a, b in zip(events, events[1:])):
+            problems.append(f"state {state_id}: transitions are not sorted by event")
+    return problems
+
+def _read_tables(image: FsmImage, data: bytes):
+    """读出状态表与转移表"""
+    image.states = [ImageState(tran_index, tran_cnt, default_state, father_state)
+                    for tran_index, tran_cnt, default_state, father_state, _ in
+                    (IMAGE_STATE.unpack_from(data, image.state_tbl_offset + i * IMAGE_STATE.size)
+                     for i in range(image.state_cnt))]
+    image.transitions = [IMAGE_TRAN.unpack_from(data, image.tran_tbl_offset + i * IMAGE_TRAN.size)
+                         for i in range(image.tran_cnt)]
+
+def read_image(data: bytes, state_id_width: int = 16, event_id_width: int = 16) -> FsmImage:
+    """解析并校验镜像，不能加载时抛出ValueError"""
+    problems = validate_image(data, state_id_width, event_id_width)
+    if problems:
+        raise ValueError('; '.join(problems))
+    image = read_header(data)
+    _read_tables(image, data)
+    return image
+
+def compare_with_model(image: FsmImage, parser: PlantUMLParser) -> List[str]:
+    """镜像与模型逐项比对：签名、初始状态，以及每个(状态, 事件)的目标，返回差异列表"""
+    differences = []
+    if image.signature != model_signature(parser):
+        differences.append(f"signature 0x{image.signature:08X} does not match the model "
+                           f"0x{model_signature(parser):08X}: state or event IDs differ")
+        return differences
+    initial = parser.states.get(parser.top_level_initial) if parser.top_level_initial else None
+    initial_id = parser.resolve_default_leaf(initial).id if initial is not None else 0
+    if image.initial_state != initial_id:
+        differences.append(f"initial state {image.initial_state}, model {initial_id}")
+    event_names = {event.id: event.name for event in parser.events.values()}
+    for state, row in parser.get_dispatch_matrix():
+        for event_id, target in enumerate(row, start=1):
+            expected = target.id if target is not None else 0
+            actual = image.lookup(state.id, event_id)
+            if actual != expected:
+                differences.append(f"{state.full_name} --{event_names[event_id]}--> {actual}, model {expected}")
+    return differences
+
+def main():
+    """主函数"""
+    arg_parser = argparse.ArgumentParser(description="状态机二进制镜像读取与校验")
+    arg_parser.add_argument('image', help="bfx_puml_translate.py --image生成的.bin文件")
+    arg_parser.add_argument('--model', metavar='PUML', help="与PlantUML模型逐项比对")
+    arg_parser.add_argument('--profile', metavar='FILE', help="生成镜像时使用的事件频度文件")
+    arg_parser.add_argument('--prune', choices=PRUNE_MODES, default='off', help="生成镜像时使用的死代码处理方式")
+    arg_parser.add_argument('--cache-dir', default=os.environ.get('BFX_PUML_CACHE_DIR'), help="解析模型缓存目录")
+    arg_parser.add_argument('--state-id-width', type=int, choices=sorted(ID_LIMITS), default=8,
+                            help="固件的BFX_FSM_STATE_ID_WIDTH")
+    arg_parser.add_argument('--event-id-width', type=int, choices=sorted(ID_LIMITS), default=8,
+                            help="固件的BFX_FSM_EVENT_ID_WIDTH")
+    args = arg_parser.parse_args()
+
+    with open(args.image, 'rb') as f:
+        data = f.read()
+    problems = validate_image(data, args.state_id_width, args.event_id_width)
+    if not problems:
+        image = read_image(data, args.state_id_width, args.event_id_width)
+        print(f"-- {args.image}: {image.image_size} bytes, {image.state_cnt} states, {image.event_cnt} events, "
+              f"{image.tran_cnt} transitions, signature 0x{image.signature:08X}, CRC 0x{image.crc:08X}")
+        if args.model:
+            options = GenerateOptions(profile=os.path.abspath(args.profile) if args.profile else None,
+                                      prune=args.prune)
+            parser, _ = load_model(args.model, args.cache_dir)
+            parser, _ = prepare_model(parser, options)
+            problems = compare_with_model(image, parser)
+    for problem in problems:
+        print(f"-- {args.image}: {problem}", file=sys.stderr)
+    if problems:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+状态机跟踪回放与分歧定位
+按时间顺序把BFX_FSM_TRACE_RECORD转储喂给PlantUML模型，找到设备状态与模型预期第一次不一致的记录，并给出前后的上下文。
+按块向量化比较，内存占用只与块大小和上下文长度有关，与转储大小无关。
+"""
+
+import argparse
+import os
+import sys
+from dataclasses import dataclass
+from typing import Iterable, List, Optional
+
+import numpy as np
+
+from bfx_fsm_sim import FsmSimulator
+from bfx_fsm_trace import CHUNK_RECORDS, TRACE_RECORD_DTYPE, iter_trace_chunks
+from bfx_puml_translate import GenerateOptions, PRUNE_MODES, PlantUMLParser, load_model, prepare_model
+
+# 分歧原因
+DIVERGENCE_INVALID = 'invalid'  # 记录中的ID超出模型范围
+DIVERGENCE_STATE = 'state'  # 源状态不是模型当前状态：记录丢失，或设备发生了模型之外的转移
+DIVERGENCE_TRANSITION = 'transition'  # 模型在该状态下对该事件的目标与记录不一致，或模型不处理该事件
+
+@dataclass(slots=True)
+class Divergence:
+    """第一次分歧，index为该记录在全部转储中的序号（从0开始）"""
+    index: int
+    reason: str
+    record: np.void
+    model_state: int  # 处理该记录前模型所在的状态
+    expected_state: int  # 模型对该记录事件的目标，0为不处理
+    before: np.ndarray  # 分歧前的记录
+    after: np.ndarray  # 分歧后的记录
+
+class TraceReplayer:
+    """逐块回放跟踪记录
+
+    相邻记录首尾相接且每条记录的目标都与模型一致时，模型状态与设备状态全程一致，
+    因此整块只需两次向量比较，无需逐条推进模型。
+    """
+
+    def __init__(self, parser: PlantUMLParser, start_state: Optional[int] = None, context: int = 8):
+        simulator = FsmSimulator(parser)
+        self.project_name = simulator.project_name
+        self.state_names = simulator.state_names
+        self.event_names = simulator.event_names
+        self.state_cnt = simulator.state_cnt
+        self.event_cnt = simulator.event_cnt
+        self.initial_state = simulator.initial_state
+        self.expected = simulator.transition[:, :self.event_cnt + 1].astype(np.int64)  # [源状态, 事件] -> 目标
+        self.context = context
+        self.state = start_state  # 模型当前状态，None表示以第一条记录的源状态为准
+        self.position = 0  # 已确认一致的记录数
+        self.history = np.empty(0, dtype=TRACE_RECORD_DTYPE)  # 最近context条一致的记录
+
+    def feed(self, records: np.ndarray) -> Optional[Divergence]:
+        """回放一块记录，发生分歧时返回分歧，after只含本块内的记录"""
+        if len(records) == 0:
+            return None
+        from_state = records['from_state'].astype(np.int64)
+        to_state = records['to_state'].astype(np.int64)
+        event = records['event'].astype(np.int64)
+
+        valid = ((from_state >= 1) & (from_state <= self.state_cnt) & (to_state >= 1) &
+                 (to_state <= self.state_cnt) & (event <= self.event_cnt))
+        expected = self.expected[np.where(valid, from_state, 0), np.where(valid, event, 0)]
+        model_state = np.empty_like(from_state)
+        model_state[0] = from_state[0] if self.state is None else self.state
+        model_state[1:] = to_state[:-1]
+        diverged = np.flatnonzero(~valid | (from_state != model_state) | (expected != to_state))
+
+        if len(diverged) == 0:
+            self.state = int(to_state[-1])
+            self.position += len(records)
+            self._remember(records)
+            return None
+
+        index = int(diverged[0])
+        if not valid[index]:
+            reason = DIVERGENCE_INVALID
+        elif from_state[index] != model_state[index]:
+            reason = DIVERGENCE_STATE
+        else:
+            reason = DIVERGENCE_TRANSITION
+        self._remember(records[:index])
+        divergence = Divergence(
+            index=self.position + index,
+            reason=reason,
+            record=records[index].copy(),
+            model_state=int(model_state[index]),
+            expected_state=int(self.expected[model_state[index], event[index]]) if valid[index] else 0,
+            before=self.history.copy(),
+            after=np.array(records[index + 1:index + 1 + self.context]),
+        )
+        self.position += index
+        return divergence
+
+    def _remember(self, records: np.ndarray):
+        """保留最近context条记录作为上下文"""
+        if self.context == 0 or len(records) == 0:
+            return
+        self.history = np.concatenate([self.history, records[-self.context:]])[-self.context:]
+
+    def replay(self, chunks: Iterable[np.ndarray]) -> Optional[Divergence]:
+        """回放全部记录，在第一次分歧处停止，并从后续块补齐after上下文"""
+        chunks = iter(chunks)
+        for records in chunks:
+            divergence = self.feed(records)
+            if divergence is None:
+                continue
+            for records in chunks:
+                missing = self.context - len(divergence.after)
+                if missing <= 0:
+                    break
+                divergence.after = np.concatenate([divergence.after, records[:missing]])
+            return divergence
+        return None
+
+    def state_name(self, state: int) -> str:
+        """状态ID对应的完整名，越界时返回ID本身"""
+        return self.state_names[state] if 1 <= state <= self.state_cnt else f'#{state}'
+
+    def event_name(self, event: int) -> str:
+        """事件ID对应的名称，越界时返回ID本身"""
+        return self.event_names[event] if 1 <= event <= self.event_cnt else f'#{event}'
+
+    def format_record(self, index: int, record: np.void) -> str:
+        """一条记录的文本形式"""
+        return (f"{index:>12} {int(record['timestamp']):>10}  {self.state_name(int(record['from_state']))} "
+                f"--{self.event_name(int(record['event']))}--> {self.state_name(int(record['to_state']))}")
+
+    def format_divergence(self, divergence: Divergence) -> List[str]:
+        """分歧报告，分歧记录以>>标出"""
+        if divergence.reason == DIVERGENCE_INVALID:
+            detail = "record holds an ID outside the model"
+        elif divergence.reason == DIVERGENCE_STATE:
+            detail = (f"device left {self.state_name(int(divergence.record['from_state']))} "
+                      f"but the model is in {self.state_name(divergence.model_state)}")
+        elif divergence.expected_state == 0:
+            detail = (f"model does not handle {self.event_name(int(divergence.record['event']))} "
+                      f"in {self.state_name(divergence.model_state)}")
+        else:
+            detail = f"model expects {self.state_name(divergence.expected_state)}"
+        lines = [f"-- first divergence at record {divergence.index}: {detail}",
+                 f"   {'record':>12} {'timestamp':>10}  transition"]
+        first = divergence.index - len(divergence.before)
+        lines += ['   ' + self.format_record(first + i, record) for i, record in enumerate(divergence.before)]
+        lines.append('>> ' + self.format_record(divergence.index, divergence.record))
+        lines += ['   ' + self.format_record(divergence.index + 1 + i, record)
+                  for i, record in enumerate(divergence.after)]
+        return lines
+
+def replay_trace(plantuml_file: str, trace_files: List[str], options: Optional[GenerateOptions] = None,
+                 cache_dir: Optional[str] = None, start: Optional[str] = None, context: int = 8,
+                 chunk_records: int = CHUNK_RECORDS):
+    """按生成代码时的选项还原模型并回放转储，返回(回放器, 第一次分歧或None)
+
+    start为起始状态名，'initial'表示模型初始状态，None表示以第一条记录的源状态为准
+    """
+    parser, _ = load_model(plantuml_file, cache_dir)
+    parser, _ = prepare_model(parser, options or GenerateOptions())
+    replayer = TraceReplayer(parser, context=context)
+    if start == 'initial':
+        replayer.state = replayer.initial_state
+    elif start is not None:
+        if start not in parser.states:
+            raise ValueError(f"unknown start state {start}")
+        replayer.state = parser.states[start].id
+    return replayer, replayer.replay(iter_trace_chunks(trace_files, chunk_records))
+
+def main():
+    """主函数"""
+    arg_parser = argparse.ArgumentParser(description="状态机跟踪回放与分歧定位")
+    arg_parser.add_argument('plantuml_file', help="PlantUML文件")
+    arg_parser.add_argument('traces', nargs='+', help="BFX_FSM_TRACE_RECORD二进制转储，按时间顺序，'-'表示stdin")
+    arg_parser.add_argument('--profile', metavar='FILE', help="生成代码时使用的事件频度文件，保证ID一致")
+    arg_parser.add_argument('--prune', choices=PRUNE_MODES, default='off', help="生成代码时使用的死代码处理方式")
+    arg_parser.add_argument('--cache-dir', default=os.environ.get('BFX_PUML_CACHE_DIR'), help="解析模型缓存目录")
+    arg_parser.add_argument('--start', metavar='STATE',
+                            help="起始状态完整名，'initial'为模型初始状态，默认取第一条记录的源状态")
+    arg_parser.add_argument('--context', type=int, default=8, help="分歧前后各打印的记录数")
+    args = arg_parser.parse_args()
+
+    options = GenerateOptions(profile=os.path.abspath(args.profile) if args.profile else None, prune=args.prune)
+    replayer, divergence = replay_trace(args.plantuml_file, args.traces, options, args.cache_dir,
+                                        args.start, args.context)
+    if divergence is None:
+        final = replayer.state_name(replayer.state) if replayer.state is not None else '-'
+        print(f"-- {replayer.position} records match the model, final state {final}")
+        return
+    print('\n'.join(replayer.format_divergence(divergence)))
+    sys.exit(1)
+
+if __name__ == "__main__":
+    main()
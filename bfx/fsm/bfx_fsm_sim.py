@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+PlantUML状态机主机侧仿真器
+转移表以NumPy数组保存，语义与BFX_FsmProcessEvent一致；支持单条长轨迹与多条独立轨迹的批量仿真
+"""
+
+import argparse
+import os
+import sys
+import time
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from bfx_puml_translate import GenerateOptions, PRUNE_MODES, PlantUMLParser, load_model, prepare_model
+
+# 单条轨迹切成若干段并行求每段的状态映射，段数越多NumPy调用越少、每次处理的元素越多
+SEGMENT_CNT = 1024
+# 状态数超过该值时，分段映射的计算量（事件数×状态数）过大，单条轨迹改为逐事件查表
+SEGMENT_STATE_LIMIT = 64
+
+EventSeq = Union[Sequence[int], Sequence[str], np.ndarray]
+
+class FsmSimulator:
+    """状态机仿真器，parser为prepare_model得到的模型时，状态与事件ID与生成的C代码一致"""
+
+    def __init__(self, parser: PlantUMLParser):
+        states = sorted(parser.states.values(), key=lambda s: s.id)
+        events = sorted(parser.events.values(), key=lambda e: e.id)
+        self.project_name = parser.project_name
+        self.state_names: List[str] = [''] + [state.full_name for state in states]  # 下标为状态ID
+        self.event_names: List[str] = [''] + [event.name for event in events]  # 下标为事件ID
+        self.state_ids: Dict[str, int] = {name: state_id for state_id, name in enumerate(self.state_names) if name}
+        self.event_ids: Dict[str, int] = {name: event_id for event_id, name in enumerate(self.event_names) if name}
+        self.state_cnt = len(states)
+        self.event_cnt = len(events)
+        self.noop_event = self.event_cnt + 1  # 越界事件统一映射到该列，不发生转移
+
+        # 转移表：[状态ID, 事件ID] -> 目标叶子状态ID，0为无转移；已合并父状态的转移，第0行保留给无效状态
+        dtype = np.uint8 if self.state_cnt < 0x100 else np.uint16
+        self.transition = np.zeros((self.state_cnt + 1, self.event_cnt + 2), dtype=dtype)
+        for state, row in parser.get_dispatch_matrix():
+            self.transition[state.id, 1:self.event_cnt + 1] = [target.id if target else 0 for target in row]
+
+        # 没有事件名的转移对应事件ID 0，同样先查本状态再沿父状态链查找
+        unnamed: Dict[str, int] = {}
+        for transition in parser.transitions:
+            to_state = parser.states.get(transition.to_state)
+            if transition.from_state != '[*]' and transition.event not in parser.events and to_state is not None:
+                unnamed.setdefault(transition.from_state, parser.resolve_default_leaf(to_state).id)
+        for state in states:
+            node = state
+            while node is not None and node.full_name not in unnamed:
+                node = node.parent
+            if node is not None:
+                self.transition[state.id, 0] = unnamed[node.full_name]
+
+        # 单步表：无转移时停留在当前状态
+        stay = np.arange(self.state_cnt + 1, dtype=dtype)[:, None]
+        self.step_table = np.where(self.transition != 0, self.transition, stay).astype(dtype)
+        self._step_flat = self.step_table.ravel()
+        self._width = self.step_table.shape[1]
+
+        initial = parser.states.get(parser.top_level_initial) if parser.top_level_initial else None
+        self.initial_state = parser.resolve_default_leaf(initial).id if initial is not None else 0
+
+    @classmethod
+    def from_file(cls, plantuml_file: str, cache_dir: Optional[str] = None,
+                  options: Optional[GenerateOptions] = None) -> 'FsmSimulator':
+        """由PlantUML文件构建仿真器，可复用生成器的模型缓存；options为生成代码时的选项，按其删减与重排以保证ID一致"""
+        parser, _ = load_model(plantuml_file, cache_dir)
+        parser, _ = prepare_model(parser, options or GenerateOptions())
+        return cls(parser)
+
+    def encode_events(self, events: EventSeq) -> np.ndarray:
+        """事件名或事件ID序列转换为ID数组，越界的ID映射为不发生转移的事件"""
+        if len(events) and isinstance(events[0], str):
+            events = [self.event_ids.get(name, self.noop_event) for name in events]
+        events = np.asarray(events, dtype=np.intp)
+        return np.where((events < 0) | (events > self.event_cnt), self.noop_event, events)
+
+    def process_event(self, state: int, event: int) -> Tuple[int, int]:
+        """单个事件，返回(新状态, 返回值)，返回值与BFX_FsmProcessEvent相同：0已处理，1未处理"""
+        if event < 0 or event > self.event_cnt:
+            return state, 1
+        next_state = int(self.transition[state, event])
+        return (next_state, 0) if next_state else (state, 1)
+
+    def run(self, events: EventSeq, start: Optional[int] = None,
+            return_states: bool = False) -> Union[int, np.ndarray]:
+        """仿真单条轨迹，返回最终状态；return_states为True时返回每个事件处理后的状态"""
+        events = self.encode_events(events)
+        state = self.initial_state if start is None else start
+        if len(events) == 0:
+            return np.empty(0, dtype=self.step_table.dtype) if return_states else state
+        if self.state_cnt > SEGMENT_STATE_LIMIT:
+            return self._run_sequential(events, state, return_states)
+
+        # 第一遍：切段，对每段同时计算所有起始状态经过该段后的状态
+        seg_cnt = min(SEGMENT_CNT, len(events))
+        seg_len = -(-len(events) // seg_cnt)
+        padded = np.full(seg_cnt * seg_len, self.noop_event, dtype=np.intp)
+        padded[:len(events)] = events
+        seg_events = padded.reshape(seg_cnt, seg_len).T.copy()  # [段内位置, 段]
+        mapping = np.tile(np.arange(self.state_cnt + 1, dtype=np.intp), (seg_cnt, 1))
+        for column in seg_events:
+            mapping = self._step_flat[mapping * self._width + column[:, None]]
+
+        # 串联各段映射，得到每段的起始状态
+        starts = np.empty(seg_cnt, dtype=np.intp)
+        for seg, seg_mapping in enumerate(mapping.tolist()):
+            starts[seg] = state
+            state = seg_mapping[state]
+        if not return_states:
+            return int(state)
+
+        # 第二遍：各段起始状态已知，按段并行记录每个事件后的状态
+        history = np.empty((seg_len, seg_cnt), dtype=self.step_table.dtype)
+        current = starts
+        for position, column in enumerate(seg_events):
+            current = self._step_flat[current * self._width + column]
+            history[position] = current
+        return history.T.reshape(-1)[:len(events)]
+
+    def _run_sequential(self, events: np.ndarray, state: int, return_states: bool) -> Union[int, np.ndarray]:
+        """状态数较多时逐事件查表"""
+        table = self._step_flat.tolist()
+        width = self._width
+        if not return_states:
+            for event in events.tolist():
+                state = table[state * width + event]
+            return state
+        history = []
+        append = history.append
+        for event in events.tolist():
+            state = table[state * width + event]
+            append(state)
+        return np.asarray(history, dtype=self.step_table.dtype)
+
+    def run_batch(self, traces: Union[np.ndarray, Sequence[EventSeq]], lengths: Optional[Sequence[int]] = None,
+                  starts: Optional[Sequence[int]] = None, return_states: bool = False) -> np.ndarray:
+        """批量仿真多条独立轨迹，每步对所有轨迹同时查表
+
+        traces为[轨迹, 事件]的二维数组，或长度不等的事件序列列表（按最长补齐）；lengths给出各轨迹的有效长度。
+        返回各轨迹的最终状态，return_states为True时返回[轨迹, 事件]的状态数组。
+        """
+        if not isinstance(traces, np.ndarray):
+            encoded = [self.encode_events(trace) for trace in traces]
+            if lengths is None:
+                lengths = [len(trace) for trace in encoded]
+            traces = np.full((len(encoded), max((len(trace) for trace in encoded), default=0)),
+                             self.noop_event, dtype=np.intp)
+            for row, trace in zip(traces, encoded):
+                row[:len(trace)] = trace
+        else:
+            traces = self.encode_events(traces.reshape(-1)).reshape(traces.shape)
+
+        trace_cnt, step_cnt = traces.shape
+        if lengths is not None:
+            traces[np.arange(step_cnt)[None, :] >= np.asarray(lengths)[:, None]] = self.noop_event
+        states = (np.full(trace_cnt, self.initial_state, dtype=np.intp) if starts is None
+                  else np.asarray(starts, dtype=np.intp).copy())
+
+        columns = np.ascontiguousarray(traces.T)
+        history = np.empty((step_cnt, trace_cnt), dtype=self.step_table.dtype) if return_states else None
+        for position, column in enumerate(columns):
+            states = self._step_flat[states * self._width + column]
+            if history is not None:
+                history[position] = states
+        return history.T if history is not None else states.astype(self.step_table.dtype)
+
+def read_trace(trace_file: str) -> List[str]:
+    """读取事件轨迹文件：事件名以空白分隔，忽略#注释"""
+    events = []
+    with open(trace_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            events.extend(line.split('#', 1)[0].split())
+    return events
+
+def main():
+    """主函数"""
+    arg_parser = argparse.ArgumentParser(description="PlantUML状态机仿真器")
+    arg_parser.add_argument('plantuml_file', help="PlantUML文件")
+    arg_parser.add_argument('traces', nargs='+', help="事件轨迹文件，事件名以空白分隔")
+    arg_parser.add_argument('--profile', metavar='FILE', help="生成代码时使用的事件频度文件，保证ID一致")
+    arg_parser.add_argument('--prune', choices=PRUNE_MODES, default='off', help="生成代码时使用的死代码处理方式")
+    arg_parser.add_argument('--cache-dir', default=os.environ.get('BFX_PUML_CACHE_DIR'), help="解析模型缓存目录")
+    args = arg_parser.parse_args()
+
+    options = GenerateOptions(profile=os.path.abspath(args.profile) if args.profile else None, prune=args.prune)
+    simulator = FsmSimulator.from_file(args.plantuml_file, args.cache_dir, options)
+    traces = [read_trace(trace_file) for trace_file in args.traces]
+    start = time.perf_counter()
+    final_states = simulator.run_batch(traces)
+    elapsed = time.perf_counter() - start
+    for trace_file, state in zip(args.traces, final_states):
+        print(f"{trace_file}: {simulator.state_names[state]}")
+    event_cnt = sum(len(trace) for trace in traces)
+    print(f"-- {event_cnt} events in {elapsed:.3f}s", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
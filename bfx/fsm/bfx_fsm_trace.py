@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+状态机转移跟踪解码器
+读取BFX_FSM_TRACE_RECORD的二进制转储（内存映射，按块处理），用PlantUML模型统计各转移的次数、回调耗时直方图与状态热度
+"""
+
+import argparse
+import json
+import os
+import sys
+from typing import BinaryIO, Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from bfx_fsm_sim import FsmSimulator
+from bfx_puml_translate import GenerateOptions, PRUNE_MODES, PlantUMLParser, load_model, prepare_model
+
+# 与bfx_fsm.h中的BFX_FSM_TRACE_RECORD一致，小端，12字节
+TRACE_RECORD_DTYPE = np.dtype([
+    ('timestamp', '<u4'),
+    ('from_state', '<u2'),
+    ('to_state', '<u2'),
+    ('event', '<u2'),
+    ('duration', '<u2'),
+])
+# 每次处理的记录数，内存占用与转储大小无关
+CHUNK_RECORDS = 1 << 20
+# 默认的耗时分桶下界：0、1、2、4 ... 32768 tick，最后一桶含饱和值0xFFFF
+DEFAULT_LATENCY_BINS = (0,) + tuple(1 << shift for shift in range(16))
+
+def open_trace(trace_file: str) -> np.ndarray:
+    """以只读内存映射打开转储，忽略末尾不完整的记录"""
+    record_cnt = os.path.getsize(trace_file) // TRACE_RECORD_DTYPE.itemsize
+    if record_cnt == 0:
+        return np.empty(0, dtype=TRACE_RECORD_DTYPE)
+    return np.memmap(trace_file, dtype=TRACE_RECORD_DTYPE, mode='r', shape=(record_cnt,))
+
+def iter_stream_chunks(stream: BinaryIO, chunk_records: int = CHUNK_RECORDS) -> Iterator[np.ndarray]:
+    """从不可寻址的流（管道、串口转储）逐块读取记录，末尾不完整的记录被忽略"""
+    itemsize = TRACE_RECORD_DTYPE.itemsize
+    pending = b''
+    while True:
+        data = stream.read(chunk_records * itemsize - len(pending))
+        if not data:
+            return
+        pending += data
+        usable = len(pending) - len(pending) % itemsize
+        if usable:
+            yield np.frombuffer(pending[:usable], dtype=TRACE_RECORD_DTYPE)
+            pending = pending[usable:]
+
+def iter_trace_chunks(trace_files: Sequence[str], chunk_records: int = CHUNK_RECORDS) -> Iterator[np.ndarray]:
+    """按时间顺序逐块产出各转储中的记录，'-'表示stdin"""
+    for trace_file in trace_files:
+        if trace_file == '-':
+            yield from iter_stream_chunks(sys.stdin.buffer, chunk_records)
+            continue
+        records = open_trace(trace_file)
+        for start in range(0, len(records), chunk_records):
+            yield records[start:start + chunk_records]
+
+class TraceDecoder:
+    """按(源状态, 事件)累计跟踪记录；目标状态由模型确定，与模型不一致的记录单独计数"""
+
+    def __init__(self, parser: PlantUMLParser, latency_bins: Sequence[int] = DEFAULT_LATENCY_BINS):
+        simulator = FsmSimulator(parser)
+        self.project_name = simulator.project_name
+        self.state_names = simulator.state_names
+        self.event_names = simulator.event_names
+        self.state_cnt = simulator.state_cnt
+        self.event_cnt = simulator.event_cnt
+        self.expected = simulator.transition[:, :self.event_cnt + 1].astype(np.int64)  # [源状态, 事件] -> 目标
+        self.latency_bins = np.asarray(latency_bins, dtype=np.int64)
+
+        key_cnt = (self.state_cnt + 1) * (self.event_cnt + 1)
+        self.counts = np.zeros(key_cnt, dtype=np.int64)
+        self.latency = np.zeros(key_cnt * len(self.latency_bins), dtype=np.int64)  # [键, 分桶]
+        self.heatmap = np.zeros((self.state_cnt + 1, self.state_cnt + 1), dtype=np.int64)  # [源状态, 目标状态]
+        self.records = 0
+        self.invalid = 0  # ID越界的记录
+        self.unexpected = 0  # 目标状态与模型不一致的记录
+        self.max_duration = 0
+        self.first_timestamp: Optional[int] = None
+        self.last_timestamp: Optional[int] = None
+
+    def feed(self, records: np.ndarray):
+        """累计一块记录"""
+        if len(records) == 0:
+            return
+        from_state = records['from_state'].astype(np.int64)
+        to_state = records['to_state'].astype(np.int64)
+        event = records['event'].astype(np.int64)
+        duration = records['duration'].astype(np.int64)
+        self.records += len(records)
+        if self.first_timestamp is None:
+            self.first_timestamp = int(records['timestamp'][0])
+        self.last_timestamp = int(records['timestamp'][-1])
+
+        valid = (from_state <= self.state_cnt) & (to_state <= self.state_cnt) & (event <= self.event_cnt)
+        self.invalid += int(len(records) - np.count_nonzero(valid))
+        from_state, to_state, event, duration = from_state[valid], to_state[valid], event[valid], duration[valid]
+        if len(from_state) == 0:
+            return
+
+        self.unexpected += int(np.count_nonzero(self.expected[from_state, event] != to_state))
+        keys = from_state * (self.event_cnt + 1) + event
+        self.counts += np.bincount(keys, minlength=len(self.counts))
+        bins = np.searchsorted(self.latency_bins, duration, side='right') - 1
+        self.latency += np.bincount(keys * len(self.latency_bins) + bins, minlength=len(self.latency))
+        self.heatmap += np.bincount(from_state * (self.state_cnt + 1) + to_state,
+                                    minlength=self.heatmap.size).reshape(self.heatmap.shape)
+        self.max_duration = max(self.max_duration, int(duration.max()))
+
+    def feed_file(self, trace_file: str, chunk_records: int = CHUNK_RECORDS):
+        """按块读取整个转储"""
+        for records in iter_trace_chunks([trace_file], chunk_records):
+            self.feed(records)
+
+    def _percentile(self, hist: np.ndarray, fraction: float) -> int:
+        """由直方图估计分位数，返回所在分桶的下界"""
+        target = fraction * hist.sum()
+        return int(self.latency_bins[int(np.searchsorted(np.cumsum(hist), target))])
+
+    def summary(self) -> Dict:
+        """统计结果，可直接序列化为JSON；转移按次数从多到少排列"""
+        latency = self.latency.reshape(len(self.counts), len(self.latency_bins))
+        transitions = []
+        fired = np.flatnonzero(self.counts)
+        for key in fired[np.argsort(-self.counts[fired], kind='stable')]:
+            from_state, event = divmod(int(key), self.event_cnt + 1)
+            hist = latency[key]
+            transitions.append({
+                'from': self.state_names[from_state],
+                'event': self.event_names[event],
+                'to': self.state_names[int(self.expected[from_state, event])],
+                'count': int(self.counts[key]),
+                'latency_hist': hist.tolist(),
+                'latency_p50': self._percentile(hist, 0.5),
+                'latency_p99': self._percentile(hist, 0.99),
+            })
+        visits = self.heatmap.sum(axis=0)
+        return {
+            'project': self.project_name,
+            'records': self.records,
+            'invalid': self.invalid,
+            'unexpected': self.unexpected,
+            'first_timestamp': self.first_timestamp,
+            'last_timestamp': self.last_timestamp,
+            'max_duration': self.max_duration,
+            'latency_bins': self.latency_bins.tolist(),
+            'transitions': transitions,
+            'state_visits': {self.state_names[state]: int(visits[state]) for state in np.flatnonzero(visits)},
+            'heatmap': self.heatmap.tolist(),
+        }
+
+def decode_trace(plantuml_file: str, trace_files: List[str], options: Optional[GenerateOptions] = None,
+                 cache_dir: Optional[str] = None) -> Dict:
+    """按生成代码时的选项还原模型，解码一个或多个转储"""
+    parser, _ = load_model(plantuml_file, cache_dir)
+    parser, _ = prepare_model(parser, options or GenerateOptions())
+    decoder = TraceDecoder(parser)
+    for trace_file in trace_files:
+        decoder.feed_file(trace_file)
+    return decoder.summary()
+
+def main():
+    """主函数"""
+    arg_parser = argparse.ArgumentParser(description="状态机转移跟踪解码器")
+    arg_parser.add_argument('plantuml_file', help="PlantUML文件")
+    arg_parser.add_argument('traces', nargs='+', help="BFX_FSM_TRACE_RECORD二进制转储，按时间顺序，'-'表示stdin")
+    arg_parser.add_argument('--profile', metavar='FILE', help="生成代码时使用的事件频度文件，保证ID一致")
+    arg_parser.add_argument('--prune', choices=PRUNE_MODES, default='off', help="生成代码时使用的死代码处理方式")
+    arg_parser.add_argument('--cache-dir', default=os.environ.get('BFX_PUML_CACHE_DIR'), help="解析模型缓存目录")
+    arg_parser.add_argument('--top', type=int, default=20, help="打印次数最多的前N条转移")
+    arg_parser.add_argument('--json', metavar='FILE', help="完整统计结果写入JSON文件")
+    args = arg_parser.parse_args()
+
+    options = GenerateOptions(profile=os.path.abspath(args.profile) if args.profile else None, prune=args.prune)
+    summary = decode_trace(args.plantuml_file, args.traces, options, args.cache_dir)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2, ensure_ascii=False)
+
+    print(f"-- {summary['records']} records, {summary['invalid']} invalid, "
+          f"{summary['unexpected']} not matching the model")
+    print(f"{'count':>10} {'p50':>6} {'p99':>6}  transition")
+    for transition in summary['transitions'][:args.top]:
+        print(f"{transition['count']:>10} {transition['latency_p50']:>6} {transition['latency_p99']:>6}  "
+              f"{transition['from']} --{transition['event']}--> {transition['to']}")
+    print(f"{'visits':>10}  state")
+    for state, visits in sorted(summary['state_visits'].items(), key=lambda item: -item[1]):
+        print(f"{visits:>10}  {state}")
+    if summary['invalid'] or summary['unexpected']:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,40 @@
 #!/usr/bin/env python3
 """
 PlantUML状态图转C代码生成器
-支持简单状态图，支持嵌套状态（单层嵌套）
+支持简单状态图，支持多层嵌套状态
 """
 
+import argparse
+import gc
+import hashlib
+import json
+import marshal
+import mmap
+import os
 import re
+import socket
+import struct
 import sys
-from dataclasses import dataclass, field
-from typing import List, Dict, Optional, Tuple
-from jinja2 import Template
+import tempfile
+import time
+import tracemalloc
+import zlib
+from contextlib import contextmanager, nullcontext
+from dataclasses import asdict, dataclass, field
+from functools import lru_cache
+from typing import IO, TYPE_CHECKING, ContextManager, Iterator, List, Dict, Optional, Tuple, Union
 
-@dataclass
+if TYPE_CHECKING:
+    from jinja2 import Template
+
+@dataclass(slots=True)
 class Event:
     """事件类"""
     name: str
     comment: str = ""
     id: int = 0
 
-@dataclass
+@dataclass(slots=True, eq=False)
 class State:
     """状态类"""
     name: str
@@ -27,93 +44,533 @@ class State:
     initial_substate: Optional[str] = None  # 初始子状态名
     is_composite: bool = False
     children: Dict[str, 'State'] = field(default_factory=dict)
+    line: int = 0  # 声明所在行号
+    callback_qualified: bool = field(default=False, repr=False)  # 回调名使用完整路径，避免多层嵌套时重名
+    # 名称缓存：完整名在构造时确定，宏名/回调名按项目名缓存
+    full_name: str = field(init=False, repr=False, default="")
+    _macro_cache: Optional[Tuple[str, str]] = field(init=False, repr=False, default=None)
+    _callback_cache: Optional[Tuple[str, str]] = field(init=False, repr=False, default=None)
+
+    def __post_init__(self):
+        if self.parent:
+            self.full_name = f"{self.parent.full_name}_{self.name}"
+        else:
+            self.full_name = self.name
     
     def get_full_name(self) -> str:
         """获取完整状态名（包含父状态前缀）"""
-        if self.parent:
-            return f"{self.parent.get_full_name()}_{self.name}"
-        return self.name
+        return self.full_name
     
     def get_macro_name(self, project_name: str) -> str:
         """获取宏定义名"""
-        full_name = self.get_full_name()
-        return f"{project_name.upper()}_{full_name.upper()}"
+        cache = self._macro_cache
+        if cache is None or cache[0] != project_name:
+            cache = (project_name, f"{project_name.upper()}_{self.full_name.upper()}")
+            self._macro_cache = cache
+        return cache[1]
     
     def get_callback_name(self, project_name: str) -> str:
         """获取回调函数名"""
+        cache = self._callback_cache
+        if cache is not None and cache[0] == project_name:
+            return cache[1]
+
         # 状态名转换为首字母大写，其余小写
         def capitalize_name(name: str) -> str:
             parts = name.split('_')
             return ''.join(part.capitalize() for part in parts)
         
-        if self.parent:
+        if self.callback_qualified:
+            # 与其他状态重名的嵌套状态：BFX_project_Grandparent_Parent_Child_ActionCb
+            path = []
+            state = self
+            while state is not None:
+                path.append(capitalize_name(state.name))
+                state = state.parent
+            callback_name = f"BFX_{project_name}_{'_'.join(reversed(path))}_ActionCb"
+        elif self.parent:
             # 嵌套状态：BFX_project_Parent_Child_ActionCb
             parent_cap = capitalize_name(self.parent.name)
             child_cap = capitalize_name(self.name)
-            return f"BFX_{project_name}_{parent_cap}_{child_cap}_ActionCb"
+            callback_name = f"BFX_{project_name}_{parent_cap}_{child_cap}_ActionCb"
         else:
             # 顶层状态：BFX_project_State_ActionCb
             state_cap = capitalize_name(self.name)
-            return f"BFX_{project_name}_{state_cap}_ActionCb"
+            callback_name = f"BFX_{project_name}_{state_cap}_ActionCb"
+        self._callback_cache = (project_name, callback_name)
+        return callback_name
 
-@dataclass
+@dataclass(slots=True)
 class Transition:
     """状态转移类"""
     from_state: str
     to_state: str
     event: str
     event_comment: str = ""
+    line: int = 0  # 所在行号
+
+# 转移分发方式：linear为逐状态线性转移表，dense为状态×事件稠密矩阵（O(1)查找，占用stateCnt*eventCnt字节），
+# sparse为按状态在线性表、排序表与梳状压缩共享表之间选择
+DISPATCH_MODES = ('linear', 'dense', 'sparse')
+
+# 死代码处理：off不分析，warn删除不可达状态与被遮蔽的转移并给出警告，error发现时生成失败
+PRUNE_MODES = ('off', 'warn', 'error')
+
+# 代码生成后端：native直接拼接字符串，不依赖jinja2；jinja2渲染内置或自定义模板，两者输出逐字节一致
+EMIT_BACKENDS = ('native', 'jinja2')
+# 实例数组初始化时每行的实例数
+INSTANCES_PER_LINE = 4
+# --queue未指定深度时按事件数确定，不小于QUEUE_MIN_DEPTH；BFX_QFIFO.size为int16_t，深度不超过QUEUE_MAX_DEPTH
+QUEUE_MIN_DEPTH = 4
+QUEUE_MAX_DEPTH = 1024
+# --trace生成的<项目名>_TRACE_DEPTH默认值
+TRACE_DEPTH = 64
+# 自定义模板目录中的文件名（.h、.c、--split时的转移表.c），缺少的文件使用内置模板
+TEMPLATE_FILES = ('fsm.h.j2', 'fsm.c.j2', 'fsm_tables.c.j2')
+
+# 转移表编码，与bfx_fsm.h中的宏一致
+TRAN_TBL_LINEAR = 'BFX_FSM_TRAN_LINEAR'
+TRAN_TBL_SORTED = 'BFX_FSM_TRAN_SORTED'
+TRAN_TBL_COMB = 'BFX_FSM_TRAN_COMB'
+TRAN_RECORD_SIZE = 2  # 8位状态/事件ID时的sizeof(BFX_FSM_TRAN_RECORD)
+
+# 状态/事件ID可选的位宽，与bfx_fsm.h中的BFX_FSM_STATE_ID_WIDTH、BFX_FSM_EVENT_ID_WIDTH一致
+ID_WIDTHS = (8, 16)
+
+@dataclass(frozen=True)
+class TargetAbi:
+    """目标ABI中与FSM表布局相关的尺寸与对齐（字节）"""
+    pointer_size: int
+    pointer_align: int
+    uint16_align: int
+    uint32_align: int
+
+# 占用统计可选的目标ABI
+TARGET_ABIS = {
+    'ilp32': TargetAbi(pointer_size=4, pointer_align=4, uint16_align=2, uint32_align=4),  # Cortex-M、RISC-V 32、x86
+    'lp64': TargetAbi(pointer_size=8, pointer_align=8, uint16_align=2, uint32_align=4),  # x86-64、AArch64主机
+    'msp430': TargetAbi(pointer_size=2, pointer_align=2, uint16_align=2, uint32_align=2),
+    'avr': TargetAbi(pointer_size=2, pointer_align=1, uint16_align=1, uint32_align=1),
+}
+DEFAULT_ABI = 'ilp32'
+
+def _struct_size(fields: List[Tuple[int, int]]) -> Tuple[int, int]:
+    """按C的布局规则计算结构体的(大小, 对齐)，fields为各成员的(大小, 对齐)"""
+    offset = 0
+    align = 1
+    for size, field_align in fields:
+        offset = -(-offset // field_align) * field_align
+        offset += size
+        align = max(align, field_align)
+    return -(-offset // align) * align, align
+
+def fsm_struct_sizes(state_id_width: int, event_id_width: int, abi: TargetAbi, queue: bool = False,
+                     trace: bool = False, image: bool = False, names: bool = False) -> Dict[str, int]:
+    """bfx_fsm.h中各结构体在目标ABI上的sizeof，queue为True时包含--queue事件队列用到的结构体，
+    trace为True时按定义了BFX_FSM_TRACE_ENABLE计算句柄并包含跟踪缓冲区的结构体，
+    image为True时按定义了BFX_FSM_IMAGE_ENABLE计算句柄，names为True时包含名称索引的结构体"""
+    def integer(width: int) -> Tuple[int, int]:
+        return {8: (1, 1), 16: (2, abi.uint16_align), 32: (4, abi.uint32_align)}[width]
+    state_id, event_id, u8, u16, u32 = (integer(state_id_width), integer(event_id_width),
+                                        integer(8), integer(16), integer(32))
+    pointer = (abi.pointer_size, abi.pointer_align)
+    handle = [pointer, state_id, state_id, state_id, event_id, pointer, u8]
+    if trace:
+        handle.append(pointer)
+    if image:
+        # imageStateTbl, imageTranTbl, actionTbl, actionCnt
+        handle += [pointer, pointer, pointer, state_id]
+    sizes = {
+        'BFX_FSM_TRAN_RECORD': _struct_size([event_id, state_id])[0],
+        'BFX_FSM_STATE': _struct_size([state_id, state_id, state_id, event_id, pointer, pointer, u8])[0],
+        'BFX_FSM_HANDLE': _struct_size(handle)[0],
+    }
+    if trace:
+        sizes['BFX_FSM_TRACE_RECORD'] = _struct_size([u32, u16, u16, u16, u16])[0]
+        sizes['BFX_FSM_TRACE'] = _struct_size([pointer, u16, u16, u16, u32])[0]
+    if queue:
+        sizes['BFX_FSM_QUEUED_EVENT'] = _struct_size([pointer, u16, event_id])[0]
+        sizes['BFX_QFIFO'] = _struct_size([pointer] + [u16] * 5)[0]
+    if names:
+        sizes['BFX_FSM_NAME_INDEX'] = _struct_size([pointer] * 4 + [u16])[0]
+    return sizes
+
+def _tran_record_size(state_id_width: int, event_id_width: int) -> int:
+    """默认ABI上一条转移记录的字节数，用于ROM预算与去重统计"""
+    return fsm_struct_sizes(state_id_width, event_id_width, TARGET_ABIS[DEFAULT_ABI])['BFX_FSM_TRAN_RECORD']
+
+def compute_footprint(layout: Dict, abi_name: str = DEFAULT_ABI) -> Dict:
+    """由生成统计中的表规模计算目标ABI上的ROM/RAM占用（字节），含结构体内部填充，不含回调函数代码
+
+    各可选功能按定义了对应的BFX_FSM_xxx_ENABLE、深度为生成的默认值计算。
+    """
+    abi = TARGET_ABIS[abi_name]
+    sizes = fsm_struct_sizes(layout['state_id_width'], layout['event_id_width'], abi,
+                             queue=bool(layout.get('queue_depth')), trace=bool(layout.get('trace')),
+                             image=bool(layout.get('image')), names=bool(layout.get('names')))
+    record = sizes['BFX_FSM_TRAN_RECORD']
+    rom = {
+        'state_table': layout['states'] * sizes['BFX_FSM_STATE'],
+        'transition_tables': layout['tran_records'] * record,
+        'comb_table': layout['comb_slots'] * record,
+        'dispatch_table': layout['dispatch_cells'] * (layout['state_id_width'] // 8),
+    }
+    if layout.get('image'):
+        # g_<项目名>_actionTbl，每个状态一个回调指针
+        rom['action_table'] = layout['states'] * abi.pointer_size
+    if layout.get('names'):
+        # 状态与事件各一个BFX_FSM_NAME_INDEX；非空时另有种子表、槽位表、偏移表与名称池
+        rom['name_index'] = sum(sizes['BFX_FSM_NAME_INDEX'] + (index['cnt'] * (2 + 2 + 4) + index['pool_size']
+                                                                if index['cnt'] else 0)
+                                for index in layout['names'])
+    rom['total'] = sum(rom.values())
+    ram = {'handle': sizes['BFX_FSM_HANDLE']}
+    if layout.get('instances'):
+        ram['instances'] = layout['instances'] * (layout['state_id_width'] // 8)
+    if layout.get('queue_depth'):
+        # 环形缓冲区始终空出一个元素
+        ram['event_queue'] = (layout['queue_depth'] + 1) * sizes['BFX_FSM_QUEUED_EVENT'] + sizes['BFX_QFIFO']
+    if layout.get('trace'):
+        ram['trace_buffer'] = TRACE_DEPTH * sizes['BFX_FSM_TRACE_RECORD'] + sizes['BFX_FSM_TRACE']
+    ram['total'] = sum(ram.values())
+    return {
+        'state_id_width': layout['state_id_width'],
+        'event_id_width': layout['event_id_width'],
+        'sizeof': sizes,
+        'rom': rom,
+        'ram': ram,
+    }
+
+# 二进制镜像：小端、各段4字节对齐，布局与目标ABI及ID位宽无关，与bfx_fsm.h中的BFX_FSM_IMAGE_xxx一致
+IMAGE_MAGIC = b'BFXF'
+IMAGE_VERSION = 1
+# magic, version, headerSize, stateCnt, eventCnt, initialState, reserved,
+# tranCnt, stateTblOffset, tranTblOffset, imageSize, signature, crc
+IMAGE_HEADER = struct.Struct('<4sHHHHHHIIIIII')
+IMAGE_STATE = struct.Struct('<IHHHH')  # tranIndex, tranCnt, defaultStateID, fatherStateID, reserved
+IMAGE_TRAN = struct.Struct('<HH')  # event, nextState
+IMAGE_CRC_OFFSET = IMAGE_HEADER.size - 4
+
+def image_crc(image: bytes) -> int:
+    """镜像的CRC-32（与zlib相同），覆盖除头部crc字段外的全部字节"""
+    return zlib.crc32(image[IMAGE_CRC_OFFSET + 4:], zlib.crc32(image[:IMAGE_CRC_OFFSET]))
+
+def model_signature(parser: 'PlantUMLParser') -> int:
+    """按ID排列的状态名与事件名的CRC-32，镜像与固件的状态/事件ID及回调表对应时才相等"""
+    names = [state.full_name for state in sorted(parser.states.values(), key=lambda s: s.id)]
+    names.append('')
+    names.extend(event.name for event in sorted(parser.events.values(), key=lambda e: e.id))
+    return zlib.crc32('\n'.join(names).encode('utf-8'))
+
+def event_queue_depth(parser: 'PlantUMLParser', options: 'GenerateOptions') -> int:
+    """--queue生成的事件队列深度，未启用时为0；未指定深度时每种事件可各有一个待处理，不超过QUEUE_MAX_DEPTH"""
+    if options.queue is None:
+        return 0
+    return options.queue or min(QUEUE_MAX_DEPTH, max(QUEUE_MIN_DEPTH, len(parser.events)))
+
+# --names生成的名称索引：FNV-1a加末尾混合，与bfx_fsm.c中的BFX_FsmNameHash一致
+NAME_HASH_BASIS = 0x811C9DC5
+NAME_HASH_PRIME = 0x01000193
+NAME_DIRECT = 0x8000  # 桶内只有一个名称时，种子表直接保存其槽位
+NAME_SEEDS_PER_LINE = 8
+
+def name_hash(name: bytes, seed: int) -> int:
+    """名称的32位哈希，seed为0时用于分桶，否则用于把桶内名称散列到槽位"""
+    h = NAME_HASH_BASIS ^ seed
+    for byte in name:
+        h = ((h ^ byte) * NAME_HASH_PRIME) & 0xFFFFFFFF
+    h ^= h >> 16
+    h = (h * 0x85EBCA6B) & 0xFFFFFFFF
+    return h ^ (h >> 13)
+
+@dataclass(slots=True)
+class NameIndex:
+    """名称到ID的最小完美哈希：按name_hash(名称, 0)分桶，每个桶一个种子把桶内名称散列到互不冲突的槽位"""
+    names: List[bytes]  # UTF-8编码的名称，按ID排列，ID从1开始
+    seeds: List[int]  # 各桶的种子，或NAME_DIRECT | 槽位
+    slots: List[int]  # 各槽位的ID
+
+    @classmethod
+    def build(cls, names: List[str]) -> 'NameIndex':
+        """桶数与槽位数都等于名称数，大桶先找种子，只有一个名称的桶最后直接占用剩余槽位"""
+        encoded = [name.encode('utf-8') for name in names]
+        cnt = len(encoded)
+        if cnt >= NAME_DIRECT:
+            # 槽位与NAME_DIRECT共用种子表的16位
+            raise ValueError(f"{cnt} names do not fit a name index, at most {NAME_DIRECT - 1} are supported")
+        buckets: List[List[int]] = [[] for _ in range(cnt)]
+        for index, name in enumerate(encoded):
+            buckets[name_hash(name, 0) % cnt].append(index)
+        seeds = [0] * cnt
+        slots = [0] * cnt
+        for bucket in sorted(range(cnt), key=lambda b: -len(buckets[b])):
+            members = buckets[bucket]
+            if len(members) < 2:
+                break
+            for seed in range(1, NAME_DIRECT):
+                taken = {name_hash(encoded[index], seed) % cnt for index in members}
+                if len(taken) == len(members) and not any(slots[slot] for slot in taken):
+                    break
+            else:
+                raise ValueError(f"no perfect hash seed for {len(members)} names in one bucket")
+            seeds[bucket] = seed
+            for index in members:
+                slots[name_hash(encoded[index], seed) % cnt] = index + 1
+        free = [slot for slot in range(cnt) if not slots[slot]]
+        for bucket in range(cnt):
+            if len(buckets[bucket]) == 1:
+                slot = free.pop()
+                seeds[bucket] = NAME_DIRECT | slot
+                slots[slot] = buckets[bucket][0] + 1
+        return cls(encoded, seeds, slots)
+
+    def lookup(self, name: str) -> int:
+        """与BFX_FsmLookupName相同的查找，返回ID，未知名称返回0"""
+        if not self.names:
+            return 0
+        encoded = name.encode('utf-8')
+        seed = self.seeds[name_hash(encoded, 0) % len(self.names)]
+        slot = seed & ~NAME_DIRECT if seed & NAME_DIRECT else name_hash(encoded, seed) % len(self.names)
+        name_id = self.slots[slot]
+        return name_id if self.names[name_id - 1] == encoded else 0
+
+def _c_string(name: bytes) -> str:
+    """名称转为C字符串字面量的内容，非ASCII字节按八进制转义，?转义以免构成三字符组"""
+    return ''.join(f"\\{chr(byte)}" if byte in b'"\\?' else chr(byte) if 0x20 <= byte < 0x7F else f"\\{byte:03o}"
+                   for byte in name)
+
+def name_index_context(parser: 'PlantUMLParser', kind: str, items: List, macros: List[str]) -> Dict:
+    """--names生成的一个名称索引的渲染变量，items为按ID排列的状态或事件，macros为对应的ID宏"""
+    names = [item.full_name if kind == 'state' else item.name for item in items]
+    index = NameIndex.build(names)
+    offsets, offset = [], 0
+    for name in index.names:
+        offsets.append(offset)
+        offset += len(name) + 1
+    def rows(values: List[str]) -> List[str]:
+        return [', '.join(values[start:start + NAME_SEEDS_PER_LINE])
+                for start in range(0, len(values), NAME_SEEDS_PER_LINE)]
+    return {
+        'prefix': f"g_{parser.project_name}_{kind}Name",
+        'cnt': len(names),
+        'seed_rows': rows([f"0x{seed:04X}" for seed in index.seeds]),
+        'slots': [macros[name_id - 1] for name_id in index.slots],
+        'offset_rows': rows([str(offset) for offset in offsets]),
+        'pool': [_c_string(name) for name in index.names],
+        'pool_size': offset + 1,  # 字符串字面量末尾还有一个NUL
+    }
+
+def build_image(parser: 'PlantUMLParser') -> bytes:
+    """把模型序列化为二进制镜像：头部、状态表、各状态按事件排序的转移表，以及CRC
+
+    状态表只含本状态的转移，父状态的转移由运行时沿fatherStateID查找；目标已沿初始子状态解析到叶子。
+    与线性表相同，同一事件先声明的转移优先；没有事件名的转移不写入镜像。
+    """
+    states = sorted(parser.states.values(), key=lambda s: s.id)
+    if len(states) > 0xFFFF or len(parser.events) > 0xFFFF:
+        raise ValueError(f"{parser.project_name}: too many states or events for a binary image")
+    own_records: Dict[str, Dict[int, int]] = {}
+    for transition in parser.transitions:
+        event = parser.events.get(transition.event)
+        to_state = parser.states.get(transition.to_state)
+        if transition.from_state == '[*]' or event is None or to_state is None:
+            continue
+        records = own_records.setdefault(transition.from_state, {})
+        records.setdefault(event.id, parser.resolve_default_leaf(to_state).id)
+
+    state_tbl = bytearray()
+    tran_tbl = bytearray()
+    tran_cnt = 0
+    for state in states:
+        records = sorted(own_records.get(state.full_name, {}).items())
+        child = state.children.get(state.initial_substate) if state.initial_substate else None
+        state_tbl += IMAGE_STATE.pack(tran_cnt, len(records), child.id if child is not None else state.id,
+                                      state.parent.id if state.parent else 0, 0)
+        for event_id, target_id in records:
+            tran_tbl += IMAGE_TRAN.pack(event_id, target_id)
+        tran_cnt += len(records)
+
+    initial = parser.states.get(parser.top_level_initial) if parser.top_level_initial else None
+    state_tbl_offset = IMAGE_HEADER.size
+    tran_tbl_offset = state_tbl_offset + len(state_tbl)
+    image_size = tran_tbl_offset + len(tran_tbl)
+    image = bytearray(IMAGE_HEADER.pack(
+        IMAGE_MAGIC, IMAGE_VERSION, IMAGE_HEADER.size, len(states), len(parser.events),
+        parser.resolve_default_leaf(initial).id if initial is not None else 0, 0,
+        tran_cnt, state_tbl_offset, tran_tbl_offset, image_size, model_signature(parser), 0))
+    image += state_tbl
+    image += tran_tbl
+    struct.pack_into('<I', image, IMAGE_CRC_OFFSET, image_crc(image))
+    return bytes(image)
+
+def _lookup_cost(encoding: str, record_cnt: int) -> int:
+    """单次查找最坏情况下的比较次数，二分查找多计一次循环开销"""
+    if encoding == TRAN_TBL_COMB:
+        return 1
+    if encoding == TRAN_TBL_SORTED:
+        return record_cnt.bit_length() + 1
+    return record_cnt
+
+@dataclass(frozen=True)
+class GenerateOptions:
+    """代码生成选项，影响生成内容，参与渲染结果缓存的键"""
+    dispatch: str = 'linear'
+    flash_budget: Optional[int] = None  # sparse模式下转移记录的ROM预算（字节）
+    profile: Optional[str] = None  # 事件频度文件，按频度重排状态表与转移表
+    prune: str = 'off'  # PRUNE_MODES之一
+    trace: bool = False  # 生成由BFX_FSM_TRACE_ENABLE控制的转移跟踪缓冲区
+    image: bool = False  # 同时生成<项目名>.bin二进制镜像，以及由BFX_FSM_IMAGE_ENABLE控制的回调表
+    backend: str = 'native'  # EMIT_BACKENDS之一
+    templates: Optional[str] = None  # 自定义jinja2模板目录，指定时总是使用jinja2渲染
+    split: bool = False  # 转移表单独生成到<项目名>_tables.c，改动转移时.h与.c保持不变
+    instances: int = 0  # 大于0时生成共享表的实例数组g_<项目名>_instances，每个实例只保存当前状态ID
+    queue: Optional[int] = None  # 不为None时生成BFX_QFIFO事件队列，0表示按模型确定深度
+    names: bool = False  # 生成由BFX_FSM_NAMES_ENABLE控制的状态/事件名称索引，按名称O(1)查找ID
+
+# PlantUML行分类正则：多行模式下对整块文本finditer，每行只匹配一次
+# 状态名与事件名按约束不含空白和.$%+-*/等符号，名称直接用字符类匹配
+_PUML_LINE_RE = re.compile(r"""
+    ^[ \t]*(?:
+      (?P<start>@startuml[^\s]*(?:[ \t]+(?P<project>[^\s]+))?.*)
+    | (?P<skip>['@].*)
+    | (?P<transition>(?P<from_state>[^\s:>{}-]+)[ \t]*-->[ \t]*(?P<to_state>[^\s:]+)[ \t]*:[ \t]*
+                     (?P<event>[^\s/]*)[ \t]*(?:/[ \t]*(?P<event_comment>(?:.*[^\s])?))?)
+    | (?P<decl>(?P<decl_name>[^\s:>{}-]+)[ \t]*:[ \t]*(?P<decl_comment>(?:.*[^\s])?))
+    | (?P<composite>state[ \t]+(?P<composite_name>[^\s{]+)[ \t]*\{)
+    | (?P<end>\})
+    | (?P<initial>\[\*\][ \t]*-->[ \t]*(?P<initial_target>[^\s:]+))
+    | (?P<include>!include(?P<include_once>_once)?[ \t]+(?P<include_path>(?:.*[^\s])?))
+    | (?P<unknown>[^\s].*)
+    )[ \t\r]*$
+""", re.VERBOSE | re.MULTILINE)
+
+# 不产出给解析器的记号类型：注释、@指令和无法识别的行
+_PUML_IGNORED_KINDS = frozenset(('skip', 'unknown'))
+
+PUML_CHUNK_SIZE = 1 << 20
+
+def _iter_puml_chunks(source: Union[str, IO, mmap.mmap], chunk_size: int) -> Iterator[str]:
+    """把文本、文件对象或mmap切成以整行结尾的文本块，内存占用取决于块大小而非文件大小"""
+    if isinstance(source, str):
+        yield source
+        return
+    if isinstance(source, mmap.mmap):
+        reader = (source[pos:pos + chunk_size] for pos in range(0, len(source), chunk_size))
+    else:
+        reader = iter(lambda: source.read(chunk_size), source.read(0))
+    
+    rest = None
+    for data in reader:
+        if rest:
+            data = rest + data
+        # 只在换行处切块，保证多字节字符和单行不会被拆开
+        newline = b'\n' if isinstance(data, bytes) else '\n'
+        cut = data.rfind(newline) + 1
+        rest = data[cut:]
+        if cut:
+            chunk = data[:cut]
+            yield chunk.decode('utf-8') if isinstance(chunk, bytes) else chunk
+    if rest:
+        yield rest.decode('utf-8') if isinstance(rest, bytes) else rest
+
+def tokenize_puml(source: Union[str, IO, mmap.mmap],
+                  chunk_size: int = PUML_CHUNK_SIZE) -> Iterator[Tuple[int, str, 're.Match']]:
+    """逐行切分PlantUML，产出(行号, 记号类型, 匹配结果)，空行、注释和无法识别的行不产出"""
+    lineno = 1
+    for chunk in _iter_puml_chunks(source, chunk_size):
+        pos = 0
+        count = chunk.count
+        for m in _PUML_LINE_RE.finditer(chunk):
+            start = m.start()
+            lineno += count('\n', pos, start)
+            pos = start
+            kind = m.lastgroup
+            if kind not in _PUML_IGNORED_KINDS:
+                yield lineno, kind, m
+        lineno += count('\n', pos)
 
 class PlantUMLParser:
     """PlantUML解析器"""
     
     def __init__(self):
         self.project_name = ""
-        self.states: Dict[str, State] = {}  # 状态名 -> State对象
+        self.states: Dict[str, State] = {}  # 完整状态名 -> State对象
+        self.short_names: Dict[str, State] = {}  # 短状态名 -> 最先声明的State对象
         self.events: Dict[str, Event] = {}  # 事件名 -> Event对象
         self.transitions: List[Transition] = []
         self.current_parent: Optional[State] = None
         self.top_level_initial: Optional[str] = None
+        self.sources: List[str] = []  # 读取过的文件（输入文件及其!include），按读取顺序
+        # 待解析的名称引用及其所在的复合状态，全部读完后再解析，允许引用后声明的状态
+        self._pending_transitions: List[Tuple[Transition, Optional[State]]] = []
+        self._pending_initials: List[Tuple[str, Optional[State]]] = []
+        self.state_heat: Dict[str, int] = {}  # 完整状态名 -> 事件频度（来自profile），未加载时为空
         
-    def parse(self, uml_text: str):
-        """解析PlantUML文本"""
-        lines = uml_text.strip().split('\n')
-        
-        # 提取项目名
-        for line in lines:
-            line = line.strip()
-            if line.startswith('@startuml'):
-                parts = line.split()
-                if len(parts) > 1:
-                    self.project_name = parts[1]
-                break
-        
-        # 状态栈，用于处理嵌套状态
-        state_stack: List[State] = []
-        
-        for line in lines:
-            line = line.strip()
-            
-            # 跳过空行和注释
-            if not line or line.startswith("'") or line.startswith('@'):
-                continue
+    def parse(self, uml_text: str, base_dir: str = "."):
+        """解析PlantUML文本，!include的相对路径以base_dir为基准"""
+        self.parse_stream(uml_text, base_dir)
+    
+    def parse_file(self, plantuml_file: str, use_mmap: bool = False):
+        """流式解析PlantUML文件，不整体读入内存；use_mmap为True时通过内存映射读取"""
+        self._parse_with_gc_paused(self._parse_file, plantuml_file, [], [], use_mmap)
+    
+    def parse_stream(self, source: Union[str, IO, mmap.mmap], base_dir: str = "."):
+        """单遍解析：每行只分类一次，边读边构建模型"""
+        self._parse_with_gc_paused(self._build_model, source, base_dir, [], [])
+    
+    def _parse_with_gc_paused(self, parse_func, *args):
+        """建模期间只新增对象、不产生垃圾，暂停循环垃圾回收避免对不断增长的模型反复扫描"""
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            with _phase('parse'):
+                parse_func(*args)
+            with _phase('resolve'):
+                self._resolve_references()
+        finally:
+            if gc_enabled:
+                gc.enable()
+    
+    def _parse_file(self, plantuml_file: str, state_stack: List[State], include_stack: List[str],
+                    use_mmap: bool = False):
+        """解析一个文件，被!include的文件共享包含处的状态栈"""
+        plantuml_file = os.path.abspath(plantuml_file)
+        if plantuml_file in include_stack:
+            raise ValueError(f"circular !include: {' -> '.join(include_stack + [plantuml_file])}")
+        self.sources.append(plantuml_file)
+        include_stack.append(plantuml_file)
+        base_dir = os.path.dirname(plantuml_file)
+        with open(plantuml_file, 'rb') as f:
+            if use_mmap and os.fstat(f.fileno()).st_size > 0:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    self._build_model(mm, base_dir, state_stack, include_stack)
+            else:
+                self._build_model(f, base_dir, state_stack, include_stack)
+        include_stack.pop()
+    
+    def _build_model(self, source: Union[str, IO, mmap.mmap], base_dir: str,
+                     state_stack: List[State], include_stack: List[str]):
+        """按记号流构建状态、事件与转移"""
+        # state_stack为状态栈，用于处理嵌套状态
+        for lineno, kind, m in tokenize_puml(source):
+            # 处理状态转移: "state1 --> state2 : event/comment"
+            if kind == 'transition':
+                self._parse_transition(m, state_stack, lineno)
             
             # 处理状态声明: "statename: comment"
-            if ':' in line and not line.startswith('state ') and not '-->' in line:
-                parts = line.split(':', 1)
-                state_name = parts[0].strip()
-                comment = parts[1].strip() if len(parts) > 1 else ""
+            elif kind == 'decl':
+                state_name, comment = m.group('decl_name', 'decl_comment')
                 
                 # 创建状态对象
                 state = State(
                     name=state_name,
                     comment=comment,
-                    parent=state_stack[-1] if state_stack else None
+                    parent=state_stack[-1] if state_stack else None,
+                    line=lineno
                 )
                 
-                # 添加到状态字典
-                full_name = state.get_full_name()
-                self.states[full_name] = state
+                # 添加到符号表
+                self._register_state(state)
                 
                 # 如果是嵌套状态，添加到父状态的children中
                 if state.parent:
@@ -121,13 +578,13 @@ class PlantUMLParser:
                     state.parent.is_composite = True
             
             # 处理复合状态开始: "state statename {"
-            elif line.startswith('state ') and line.endswith('{'):
-                state_name = line[6:-1].strip()
+            elif kind == 'composite':
+                state_name = m.group('composite_name')
                 
                 # 查找或创建复合状态
                 if state_stack:
                     # 嵌套状态，需要完整名
-                    parent_full = state_stack[-1].get_full_name()
+                    parent_full = state_stack[-1].full_name
                     full_name = f"{parent_full}_{state_name}" if parent_full else state_name
                 else:
                     full_name = state_name
@@ -135,89 +592,88 @@ class PlantUMLParser:
                 if full_name not in self.states:
                     state = State(
                         name=state_name,
-                        parent=state_stack[-1] if state_stack else None
+                        parent=state_stack[-1] if state_stack else None,
+                        line=lineno
                     )
-                    self.states[full_name] = state
+                    self._register_state(state)
                 
                 # 压栈
                 state_stack.append(self.states[full_name])
             
             # 处理复合状态结束: "}"
-            elif line == '}':
+            elif kind == 'end':
                 if state_stack:
                     state_stack.pop()
             
-            # 处理状态转移: "state1 --> state2 : event/comment"
-            elif '-->' in line and ':' in line:
-                self._parse_transition(line, state_stack)
-            
             # 处理初始状态: "[*] --> state"
-            elif '[*] -->' in line:
-                self._parse_initial_state(line, state_stack)
+            elif kind == 'initial':
+                self._parse_initial_state(m.group('initial_target'), state_stack)
+            
+            # 项目名取第一个@startuml
+            elif kind == 'start':
+                if not self.project_name and m.group('project'):
+                    self.project_name = m.group('project')
+            
+            # 处理子图包含: "!include sub.iuml"，内容按原位置展开
+            elif kind == 'include':
+                include_file = os.path.join(base_dir, m.group('include_path').strip('"<>'))
+                if m.group('include_once') and os.path.abspath(include_file) in self.sources:
+                    continue
+                self._parse_file(include_file, state_stack, include_stack)
     
-    def _parse_transition(self, line: str, state_stack: List[State]):
+    def _register_state(self, state: State):
+        """将状态登记到完整名与短名符号表"""
+        self.states[state.full_name] = state
+        self.short_names.setdefault(state.name, state)
+    
+    def _parse_transition(self, m: 're.Match', state_stack: List[State], lineno: int):
         """解析状态转移"""
-        # 提取源状态和目标状态
-        parts = line.split('-->')
-        from_state = parts[0].strip()
-        
-        # 提取事件部分
-        event_part = parts[1].split(':', 1)
-        to_state = event_part[0].strip()
-        
-        if len(event_part) > 1:
-            event_info = event_part[1].strip()
-            # 事件可能带有注释: "event/comment"
-            if '/' in event_info:
-                event_name, event_comment = event_info.split('/', 1)
-                event_name = event_name.strip()
-                event_comment = event_comment.strip()
-            else:
-                event_name = event_info
-                event_comment = ""
-        else:
-            event_name = ""
-            event_comment = ""
-        
-        # 构建完整状态名（考虑当前上下文）
-        from_full = self._resolve_state_name(from_state, state_stack)
-        to_full = self._resolve_state_name(to_state, state_stack)
+        # 提取源状态、目标状态，事件可能带有注释: "event/comment"
+        from_state, to_state, event_name, event_comment = m.group('from_state', 'to_state', 'event', 'event_comment')
+        event_comment = event_comment or ""
         
         # 记录事件
         if event_name and event_name not in self.events:
             self.events[event_name] = Event(name=event_name)
         
-        # 记录转移
+        # 记录转移，状态名暂为原始名称，解析完成后再转换为完整名称
         transition = Transition(
-            from_state=from_full,
-            to_state=to_full,
+            from_state=from_state,
+            to_state=to_state,
             event=event_name,
-            event_comment=event_comment
+            event_comment=event_comment,
+            line=lineno
         )
         self.transitions.append(transition)
+        self._pending_transitions.append((transition, state_stack[-1] if state_stack else None))
     
-    def _parse_initial_state(self, line: str, state_stack: List[State]):
+    def _parse_initial_state(self, target_state: str, state_stack: List[State]):
         """解析初始状态"""
-        # 提取目标状态
-        target_state = line.split('-->')[1].strip()
+        self._pending_initials.append((target_state, state_stack[-1] if state_stack else None))
+    
+    def _resolve_references(self):
+        """全部状态声明读完后，把转移和初始状态中的名称解析为完整名称"""
+        for transition, scope in self._pending_transitions:
+            transition.from_state = self._resolve_state_name(transition.from_state, scope)
+            transition.to_state = self._resolve_state_name(transition.to_state, scope)
         
-        if state_stack:
-            # 嵌套初始状态
-            parent_state = state_stack[-1]
-            target_full = self._resolve_state_name(target_state, state_stack)
-            
-            # 设置父状态的初始子状态
-            for state in self.states.values():
-                if state.get_full_name() == target_full and state.parent == parent_state:
-                    parent_state.initial_substate = state.name
-                    break
-        else:
-            # 顶层初始状态
-            target_full = self._resolve_state_name(target_state, state_stack)
-            self.top_level_initial = target_full
+        for target_state, scope in self._pending_initials:
+            target_full = self._resolve_state_name(target_state, scope)
+            if scope is not None:
+                # 嵌套初始状态，设置父状态的初始子状态
+                state = self.states.get(target_full)
+                if state is not None and state.parent is scope:
+                    scope.initial_substate = state.name
+            else:
+                # 顶层初始状态
+                self.top_level_initial = target_full
+        
+        self._pending_transitions.clear()
+        self._pending_initials.clear()
+        self._qualify_callback_names()
     
-    def _resolve_state_name(self, state_name: str, state_stack: List[State]) -> str:
-        """解析状态名为完整名称"""
+    def _resolve_state_name(self, state_name: str, scope: Optional[State]) -> str:
+        """解析状态名为完整名称，由内向外依次在各层复合状态中查找"""
         if state_name == '[*]':
             return '[*]'
         
@@ -225,22 +681,143 @@ class PlantUMLParser:
         if '.' in state_name:
             return state_name.replace('.', '_')
         
-        # 在当前上下文中查找状态
-        if state_stack:
-            # 首先在父状态的子状态中查找
-            parent = state_stack[-1]
-            for child in parent.children.values():
-                if child.name == state_name:
-                    return child.get_full_name()
+        # 在当前及外层复合状态的子状态中查找
+        while scope is not None:
+            child = scope.children.get(state_name)
+            if child is not None:
+                return child.full_name
+            scope = scope.parent
+        
+        # 顶层状态
+        state = self.states.get(state_name)
+        if state is not None and state.parent is None:
+            return state.full_name
         
         # 在整个状态图中查找
-        for state in self.states.values():
-            if state.name == state_name:
-                return state.get_full_name()
+        state = self.short_names.get(state_name)
+        if state is not None:
+            return state.full_name
         
         # 如果没有找到，返回原始名称（可能是顶层状态）
         return state_name
     
+    def _qualify_callback_names(self):
+        """多层嵌套时“父状态+状态名”可能重名，重名的嵌套状态改用完整路径作为回调名"""
+        by_callback: Dict[str, List[State]] = {}
+        for state in self.states.values():
+            state.callback_qualified = False
+            state._callback_cache = None
+            by_callback.setdefault(state.get_callback_name(self.project_name), []).append(state)
+        for states in by_callback.values():
+            if len(states) > 1:
+                for state in states:
+                    if state.parent is not None:
+                        state.callback_qualified = True
+                        state._callback_cache = None
+    
+    def resolve_default_leaf(self, state: State) -> State:
+        """沿初始子状态链找到进入该状态后最终停留的状态"""
+        while state.initial_substate:
+            child = state.children.get(state.initial_substate)
+            if child is None:
+                break
+            state = child
+        return state
+    
+    def find_dead_code(self) -> Tuple[List[State], List[Transition]]:
+        """图分析，返回(从初始状态不可达的状态, 永远不会触发的转移)
+
+        运行时停留在沿初始子状态链解析后的状态上，事件先查本状态、再沿父状态链查找，每张表取第一条匹配的转移。
+        从初始状态出发按这一规则遍历：可达的停留状态及其祖先之外的状态不可达；所有可达停留状态都用不到的转移
+        （被同表前面的同名事件或子状态的同名事件遮蔽）永远不会触发。没有顶层初始状态时不做可达性分析。
+        """
+        by_state: Dict[str, List[Transition]] = {}
+        for transition in self.transitions:
+            if transition.from_state != '[*]' and transition.from_state in self.states:
+                by_state.setdefault(transition.from_state, []).append(transition)
+
+        def fired_transitions(state: State) -> Dict[str, Transition]:
+            """停留在该状态时每个事件实际触发的转移"""
+            fired: Dict[str, Transition] = {}
+            node = state
+            while node is not None:
+                for transition in by_state.get(node.full_name, ()):
+                    fired.setdefault(transition.event, transition)
+                node = node.parent
+            return fired
+
+        initial = self.states.get(self.top_level_initial) if self.top_level_initial else None
+        if initial is not None:
+            pending = [self.resolve_default_leaf(initial)]
+        else:
+            pending = [state for state in self.states.values() if self.resolve_default_leaf(state) is state]
+        resting = {state.full_name for state in pending}
+        used = set()
+        while pending:
+            for transition in fired_transitions(pending.pop()).values():
+                used.add(id(transition))
+                target = self.states.get(transition.to_state)
+                if initial is None or target is None:
+                    continue
+                target = self.resolve_default_leaf(target)
+                if target.full_name not in resting:
+                    resting.add(target.full_name)
+                    pending.append(target)
+
+        live = set()
+        for state_full_name in resting:
+            node = self.states[state_full_name]
+            while node is not None and node.full_name not in live:
+                live.add(node.full_name)
+                node = node.parent
+        dead_states = [state for state in self.states.values() if state.full_name not in live]
+        dead_transitions = [transition for transition in self.transitions
+                            if transition.from_state in by_state and id(transition) not in used]
+        return dead_states, dead_transitions
+
+    def prune_dead_code(self) -> List[str]:
+        """删除不可达状态与永远不会触发的转移并重新分配ID，返回每一项的说明"""
+        dead_states, dead_transitions = self.find_dead_code()
+        dead_names = {state.full_name for state in dead_states}
+        messages = [f"line {state.line}: state {state.full_name} is unreachable from the initial state"
+                    for state in dead_states]
+        messages += [f"line {transition.line}: transition {transition.from_state} --> {transition.to_state}"
+                     f"{' : ' + transition.event if transition.event else ''} is shadowed and never fires"
+                     for transition in dead_transitions if transition.from_state not in dead_names]
+        if not messages:
+            return messages
+
+        for state in dead_states:
+            del self.states[state.full_name]
+            if state.parent is not None and state.parent.children.get(state.name) is state:
+                del state.parent.children[state.name]
+        self.short_names = {}
+        for state in self.states.values():
+            self.short_names.setdefault(state.name, state)
+        dead_transition_ids = {id(transition) for transition in dead_transitions}
+        self.transitions = [transition for transition in self.transitions
+                            if id(transition) not in dead_transition_ids
+                            and transition.from_state not in dead_names and transition.to_state not in dead_names]
+        self.assign_ids()
+        return messages
+
+    def apply_profile(self, profile: Dict[Tuple[str, str], int]):
+        """按(完整状态名, 事件名)的频度重排：热点状态排在状态表前部且彼此相邻，
+        各转移表中高频转移先被比较；频度相同时保持图中顺序，并重新分配ID
+        """
+        heat: Dict[str, int] = {}
+        for (state_full_name, _), count in profile.items():
+            heat[state_full_name] = heat.get(state_full_name, 0) + count
+        
+        # 排序稳定，同一事件的多条转移保持原有先后，不改变"先出现者优先"的语义
+        declared = {name: index for index, name in enumerate(self.states)}
+        ordered = sorted(self.states.values(), key=lambda state: (-heat.get(state.full_name, 0),
+                                                                 declared[state.full_name]))
+        self.states = {state.full_name: state for state in ordered}
+        self.transitions.sort(key=lambda t: (-heat.get(t.from_state, 0), -profile.get((t.from_state, t.event), 0)))
+        self.state_heat = heat
+        self.assign_ids()
+    
     def assign_ids(self):
         """为状态和事件分配ID"""
         # 分配状态ID（从1开始）
@@ -255,6 +832,62 @@ class PlantUMLParser:
             event.id = event_id
             event_id += 1
     
+    def to_model(self) -> Dict:
+        """导出已解析并分配ID的模型，只含内置类型，可直接marshal"""
+        return {
+            'project_name': self.project_name,
+            'top_level_initial': self.top_level_initial,
+            'sources': list(self.sources),
+            'states': [(state.name, state.comment, state.id, state.parent.full_name if state.parent else None,
+                        state.initial_substate, state.is_composite, state.line,
+                        [child.full_name for child in state.children.values()])
+                       for state in self.states.values()],
+            'events': [(event.name, event.comment, event.id) for event in self.events.values()],
+            'transitions': [(t.from_state, t.to_state, t.event, t.event_comment, t.line)
+                            for t in self.transitions],
+        }
+    
+    @classmethod
+    def from_model(cls, model: Dict) -> 'PlantUMLParser':
+        """由to_model导出的模型还原解析器，无需重新解析"""
+        parser = cls()
+        parser.project_name = model['project_name']
+        parser.top_level_initial = model['top_level_initial']
+        parser.sources = list(model['sources'])
+        state_children = []
+        for name, comment, state_id, parent_name, initial_substate, is_composite, line, children in model['states']:
+            state = State(name=name, comment=comment, id=state_id,
+                          parent=parser.states[parent_name] if parent_name is not None else None,
+                          initial_substate=initial_substate, is_composite=is_composite, line=line)
+            parser._register_state(state)
+            state_children.append((state, children))
+        # 子状态可能晚于父状态声明，全部还原后再挂接children
+        for state, children in state_children:
+            for child_name in children:
+                child = parser.states[child_name]
+                state.children[child.name] = child
+        parser._qualify_callback_names()
+        for name, comment, event_id in model['events']:
+            parser.events[name] = Event(name=name, comment=comment, id=event_id)
+        parser.transitions = [Transition(from_state=from_state, to_state=to_state, event=event,
+                                         event_comment=event_comment, line=line)
+                              for from_state, to_state, event, event_comment, line in model['transitions']]
+        return parser
+    
+    def get_id_widths(self) -> Tuple[int, int]:
+        """能容纳本模型的最窄(状态ID位宽, 事件ID位宽)
+
+        状态ID位宽同时覆盖状态数，事件ID位宽同时覆盖单个状态的转移记录数（tranTblCnt）。
+        """
+        record_cnt = max((len(records) for records in self.get_state_transitions().values()), default=0)
+        widths = []
+        for kind, value in (('states', len(self.states)), ('events', max(len(self.events), record_cnt))):
+            width = next((width for width in ID_WIDTHS if value < (1 << width)), None)
+            if width is None:
+                raise ValueError(f"{self.project_name}: too many {kind} ({value}) for {ID_WIDTHS[-1]}-bit IDs")
+            widths.append(width)
+        return widths[0], widths[1]
+
     def get_state_transitions(self) -> Dict[str, List[Tuple[str, str, str]]]:
         """获取每个状态的转移表"""
         state_transitions = {}
@@ -266,24 +899,25 @@ class PlantUMLParser:
             if transition.from_state not in state_transitions:
                 state_transitions[transition.from_state] = []
             
-            # 查找目标状态ID
-            to_state_id = 0
-            for state in self.states.values():
-                if state.get_full_name() == transition.to_state:
-                    to_state_id = state.get_macro_name(self.project_name)
-                    break
-            
-            # 查找事件ID
-            event_id = 0
-            if transition.event in self.events:
-                event_id = f"{self.project_name.upper()}_{transition.event.upper()}"
-            
-            state_transitions[transition.from_state].append(
-                (event_id, to_state_id, transition.event_comment)
-            )
+            state_transitions[transition.from_state].append(self._transition_record(transition))
         
         return state_transitions
     
+    def _transition_record(self, transition: Transition) -> Tuple[str, str, str]:
+        """转移记录的(事件宏, 目标状态宏, 注释)，目标为复合状态时已沿初始子状态链解析，未定义的事件或状态为0"""
+        # 查找目标状态ID
+        to_state_id = 0
+        to_state = self.states.get(transition.to_state)
+        if to_state is not None:
+            to_state_id = self.resolve_default_leaf(to_state).get_macro_name(self.project_name)
+        
+        # 查找事件ID
+        event_id = 0
+        if transition.event in self.events:
+            event_id = f"{self.project_name.upper()}_{transition.event.upper()}"
+        
+        return (event_id, to_state_id, transition.event_comment)
+    
     def get_state_info(self) -> List[Dict]:
         """获取所有状态的信息"""
         state_info = []
@@ -293,14 +927,9 @@ class PlantUMLParser:
         
         for state in self.states.values():
             # 确定默认状态ID
-            if state.initial_substate:
-                # 查找初始子状态
-                for child in state.children.values():
-                    if child.name == state.initial_substate:
-                        default_id = child.get_macro_name(self.project_name)
-                        break
-                else:
-                    default_id = state.get_macro_name(self.project_name)
+            child = state.children.get(state.initial_substate) if state.initial_substate else None
+            if child is not None:
+                default_id = child.get_macro_name(self.project_name)
             else:
                 default_id = state.get_macro_name(self.project_name)
             
@@ -311,10 +940,10 @@ class PlantUMLParser:
                 father_id = "BFX_STATUS_FATHER_NONE"
             
             # 获取转移表名
-            trans_tbl_name = f"g_{self.project_name}_{state.get_full_name().lower()}_TransTbl"
+            trans_tbl_name = f"g_{self.project_name}_{state.full_name.lower()}_TransTbl"
             
             # 检查该状态是否有转移表
-            state_full_name = state.get_full_name()
+            state_full_name = state.full_name
             empty_trans_tbl = state_full_name not in state_transitions or len(state_transitions[state_full_name]) == 0
             
             state_info.append({
@@ -325,12 +954,365 @@ class PlantUMLParser:
                 'callback_name': state.get_callback_name(self.project_name),
                 'empty_trans_tbl': empty_trans_tbl
             })
-        
+
         return state_info
 
-def generate_header_file(parser: PlantUMLParser, template_str: str) -> str:
-    """生成.h文件"""
-    template = Template(template_str)
+    def get_dispatch_matrix(self) -> List[Tuple[State, List[Optional[State]]]]:
+        """获取状态×事件稠密转移矩阵，按状态ID排列，每行按事件ID给出目标叶子状态（无转移为None）
+
+        与运行时线性查找的语义一致：本状态转移表中先出现的转移优先，本状态未处理的事件沿父状态链继承。
+        """
+        event_cnt = len(self.events)
+        own_rows: Dict[str, List[Optional[State]]] = {}
+        for transition in self.transitions:
+            if transition.from_state == '[*]':
+                continue
+            event = self.events.get(transition.event)
+            to_state = self.states.get(transition.to_state)
+            if event is None or to_state is None:
+                continue
+            row = own_rows.setdefault(transition.from_state, [None] * event_cnt)
+            if row[event.id - 1] is None:
+                row[event.id - 1] = self.resolve_default_leaf(to_state)
+
+        matrix = []
+        for state in sorted(self.states.values(), key=lambda s: s.id):
+            row = [None] * event_cnt
+            node = state
+            while node is not None:
+                own_row = own_rows.get(node.full_name)
+                if own_row is not None:
+                    row = [target if target is not None else inherited
+                           for target, inherited in zip(row, own_row)]
+                node = node.parent
+            matrix.append((state, row))
+        return matrix
+
+    def plan_transition_tables(self, flash_budget: Optional[int] = None) -> Tuple[Dict[str, Dict], List]:
+        """为每个状态选择转移表编码，返回(完整状态名 -> 编码方案, 梳状压缩共享表的槽位)
+
+        先按查找代价在线性表与按事件ID排序的二分查找表之间选择（两者ROM相同），再按节省的查找代价
+        从大到小把状态放入梳状压缩（行位移）共享表，实现O(1)查找。放入后转移记录总字节数超出
+        flash_budget且比原编码更大时放弃该状态；flash_budget为None时不限制。结果只取决于模型，可复现。
+        """
+        rows: Dict[str, List[Transition]] = {}
+        for transition in self.transitions:
+            if transition.from_state != '[*]' and transition.from_state in self.states:
+                rows.setdefault(transition.from_state, []).append(transition)
+
+        record_size = _tran_record_size(*self.get_id_widths())
+        plans = {}
+        total_records = 0
+        for state_full_name, transitions in rows.items():
+            # 同一事件取先出现的转移，与线性查找一致；含未定义事件（ID为0）的状态只能用线性表
+            first_by_event: Dict[int, Transition] = {}
+            linear_only = False
+            for transition in transitions:
+                event = self.events.get(transition.event)
+                if event is None:
+                    linear_only = True
+                else:
+                    first_by_event.setdefault(event.id, transition)
+            encoding, records = TRAN_TBL_LINEAR, transitions
+            if not linear_only and (_lookup_cost(TRAN_TBL_SORTED, len(first_by_event))
+                                    < _lookup_cost(TRAN_TBL_LINEAR, len(transitions))):
+                encoding = TRAN_TBL_SORTED
+                records = [first_by_event[event_id] for event_id in sorted(first_by_event)]
+            plans[state_full_name] = {
+                'encoding': encoding,
+                'records': records,
+                'events': None if linear_only else sorted(first_by_event.items()),
+            }
+            total_records += len(records)
+
+        # 梳状压缩：每行选择最小的、与已占用槽位不冲突的起始位置，槽位记录事件ID作为校验
+        slots: List[Optional[Tuple[str, str, str]]] = []
+        bases = set()
+        state_order = {name: index for index, name in enumerate(self.states)}
+        candidates = [name for name, plan in plans.items()
+                      if plan['events'] is not None and _lookup_cost(plan['encoding'], len(plan['records'])) > 1]
+        # 有profile时按"节省的比较次数×状态频度"排序，预算优先给热点状态
+        candidates.sort(key=lambda name: (-(_lookup_cost(plans[name]['encoding'], len(plans[name]['records'])) - 1)
+                                          * max(self.state_heat.get(name, 0), 1),
+                                          state_order[name]))
+        occupied = bytearray()  # 按槽位查找下一个空位
+        occupied_mask = 0  # 按位与整行一次检查冲突
+        for state_full_name in candidates:
+            plan = plans[state_full_name]
+            offsets = [event_id - 1 for event_id, _ in plan['events']]
+            # 首个事件只能落在空槽位上，直接跳到下一个空槽位
+            row_mask = sum(1 << offset for offset in offsets)
+            first = offsets[0]
+            pos = first
+            while True:
+                free = occupied.find(0, pos)
+                pos = free if free >= 0 else max(pos, len(occupied))
+                base = pos - first
+                if not (occupied_mask >> base) & row_mask and base not in bases:
+                    break
+                pos += 1
+            growth = max(0, base + offsets[-1] + 1 - len(slots))
+            new_total = total_records - len(plan['records']) + growth
+            if (flash_budget is not None and new_total * record_size > flash_budget
+                    and growth > len(plan['records'])):
+                continue
+
+            slots.extend([None] * growth)
+            occupied.extend(bytes(growth))
+            owner = self.states[state_full_name].get_macro_name(self.project_name)
+            for (event_id, transition), offset in zip(plan['events'], offsets):
+                event_macro, to_state_macro, _ = self._transition_record(transition)
+                slots[base + offset] = (event_macro, to_state_macro, owner)
+                occupied[base + offset] = 1
+            occupied_mask |= row_mask << base
+            bases.add(base)
+            total_records = new_total
+            plan.update(encoding=TRAN_TBL_COMB, records=[], base=base, span=offsets[-1] + 1)
+
+        for plan in plans.values():
+            plan['records'] = [self._transition_record(transition) for transition in plan['records']]
+        return plans, slots
+
+@lru_cache(maxsize=None)
+def _compile_template(template_str: str) -> 'Template':
+    """编译模板，同一进程内只编译一次；jinja2在首次渲染时才导入，native后端与客户端模式无需加载"""
+    from jinja2 import Template
+    return Template(template_str)
+
+def _render(template_str: Optional[str], emitter, context: Dict) -> str:
+    """template_str为None时用native后端emitter拼接，否则用jinja2渲染"""
+    return emitter(context) if template_str is None else _compile_template(template_str).render(**context)
+
+def load_templates(options: GenerateOptions) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+    """按生成选项确定(.h模板, .c模板, 转移表.c模板)，native后端返回(None, None, None)"""
+    builtins = (HEADER_TEMPLATE, SOURCE_TEMPLATE, TABLES_TEMPLATE)
+    if options.templates is None:
+        return builtins if options.backend == 'jinja2' else (None, None, None)
+    templates = []
+    for file_name, builtin in zip(TEMPLATE_FILES, builtins):
+        template_path = os.path.join(options.templates, file_name)
+        if os.path.exists(template_path):
+            with open(template_path, 'r', encoding='utf-8') as f:
+                builtin = f.read()
+        templates.append(builtin)
+    return templates[0], templates[1], templates[2]
+
+def _banner(title: str) -> str:
+    """生成文件中的分节注释，与模板中的分节行等宽"""
+    return f"/* {title} ".ljust(111, '-') + "*/\n"
+
+def emit_header(context: Dict) -> str:
+    """native后端：按HEADER_TEMPLATE的格式拼接.h内容"""
+    project = context['project_name']
+    upper = project.upper()
+    state_id_width, event_id_width = context['state_id_width'], context['event_id_width']
+    out = [f"/**\n * @file {project}.h\n * @brief FSM of {project}\n * @generator BufferFlowX\n**/\n"
+           f"#ifndef __BFX_{upper}_H__\n#define __BFX_{upper}_H__\n\n",
+           _banner("headers import"), '#include "bfx_fsm.h"\n',
+           '#include "bfx_qfifo.h"\n\n' if context['queue_depth'] else "\n",
+           _banner("ID width"),
+           f"#define {upper}_STATE_ID_WIDTH {state_id_width}\n#define {upper}_EVENT_ID_WIDTH {event_id_width}\n"
+           f"#if BFX_FSM_STATE_ID_WIDTH < {upper}_STATE_ID_WIDTH || BFX_FSM_EVENT_ID_WIDTH < {upper}_EVENT_ID_WIDTH\n"
+           f'#error "{project} needs BFX_FSM_STATE_ID_WIDTH >= {state_id_width} and '
+           f'BFX_FSM_EVENT_ID_WIDTH >= {event_id_width}"\n#endif\n\n',
+           _banner("state macros")]
+    write = out.append
+    for macro in context['state_macros']:
+        write(f"#define {macro['name']} {macro['id']} // {macro['comment']}\n" if macro['comment']
+              else f"#define {macro['name']} {macro['id']}\n")
+    write("\n")
+    if context['initial_state_macro']:
+        write(f"\n#define {context['initial_state_macro']} {context['initial_state_id']}\n")
+    write("\n" + _banner("event macros"))
+    for macro in context['event_macros']:
+        write(f"#define {macro['name']} {macro['id']}\n")
+    write("\n" + _banner("FSM generated") + f"extern BFX_FSM_HANDLE g_{project}_fsmHandle;\n")
+    if context['trace']:
+        write(f"#ifdef BFX_FSM_TRACE_ENABLE\n#ifndef {upper}_TRACE_DEPTH\n#define {upper}_TRACE_DEPTH {TRACE_DEPTH}\n#endif\n"
+              f"extern BFX_FSM_TRACE g_{project}_trace;\n#endif\n")
+    if context['image_signature']:
+        write(f"#ifdef BFX_FSM_IMAGE_ENABLE\n#define {upper}_IMAGE_SIGNATURE {context['image_signature']}\n"
+              f"extern BFX_FSM_ACTION_CALLBACK const g_{project}_actionTbl[];\n#endif\n")
+    if context['instances']:
+        write(f"#define {upper}_INSTANCE_CNT {context['instances']}\n"
+              f"extern BFX_FSM_STATE_ID g_{project}_instances[{upper}_INSTANCE_CNT];\n")
+    if context['queue_depth']:
+        write(f"#ifndef {upper}_QUEUE_DEPTH\n#define {upper}_QUEUE_DEPTH {context['queue_depth']}\n#endif\n"
+              f'#ifdef __cplusplus\nextern "C" {{\n#endif\n'
+              f"extern BFX_QFIFO g_{project}_eventQueue;\n"
+              f"uint8_t BFX_{project}_PostEvent(BFX_FSM_EVENT_ID event, void *arg, uint16_t argSize);\n"
+              f"uint16_t BFX_{project}_DrainEvents(uint16_t maxCnt);\n"
+              "#ifdef __cplusplus\n}\n#endif\n")
+    if context['names']:
+        write(f"#ifdef BFX_FSM_NAMES_ENABLE\nextern BFX_FSM_NAME_INDEX const g_{project}_stateNames;\n"
+              f"extern BFX_FSM_NAME_INDEX const g_{project}_eventNames;\n#endif\n")
+    write("\n" + _banner("state callback"))
+    for state in context['state_info']:
+        write(f"\n__attribute__((weak)) void {state['callback_name']}"
+              f"(BFX_FSM_ACTION_CTX *ctx, void *arg, uint16_t argSize);")
+    write("\n#endif")
+    return ''.join(out)
+
+def emit_source(context: Dict) -> str:
+    """native后端：按SOURCE_TEMPLATE的格式拼接.c内容"""
+    project = context['project_name']
+    out = [f"/**\n * @file {project}.c\n * @brief FSM of {project}\n * @generator BufferFlowX\n**/\n"
+           '#ifdef __cplusplus\nextern "C" {\n#endif\n',
+           _banner("headers import"), f'#include <stddef.h>\n#include "{project}.h"\n\n',
+           _banner("state callback")]
+    write = out.append
+    for state in context['state_info']:
+        write(f"\n__attribute__((weak)) void {state['callback_name']}"
+              f"(BFX_FSM_ACTION_CTX *ctx, void *arg, uint16_t argSize)\n{{\n}}")
+    write("\n\n")
+    if not context['split']:
+        _emit_tables_body(context, write)
+    if context['instances']:
+        write(_banner("instances") + f"BFX_FSM_STATE_ID g_{project}_instances[{project.upper()}_INSTANCE_CNT]")
+        if context['initial_state_macro']:
+            write(" = {\n" + ''.join(f"    {', '.join(row)},\n" for row in context['instance_rows']) + "}")
+        write(";\n")
+    if context['queue_depth']:
+        _emit_event_queue(context, write)
+    write("#ifdef __cplusplus\n}\n#endif")
+    return ''.join(out)
+
+def _emit_event_queue(context: Dict, write):
+    """按SOURCE_TEMPLATE的格式输出事件队列及其投递、批量处理函数"""
+    project = context['project_name']
+    depth = f"{project.upper()}_QUEUE_DEPTH"
+    queue = f"&g_{project}_eventQueue"
+    write(_banner("event queue") +
+          f"BFX_FSM_QUEUED_EVENT g_{project}_eventQueueBuf[{depth} + 1];\n"
+          "/* BFX_QFIFO.size is an int16_t byte count, an overridden depth must not wrap it */\n"
+          f"typedef char BFX_{project}_QueueSizeCheck[(sizeof(g_{project}_eventQueueBuf) <= INT16_MAX) ? 1 : -1];\n"
+          f"BFX_QFIFO g_{project}_eventQueue = {{\n"
+          f"    .buf = (char *)g_{project}_eventQueueBuf,\n"
+          f"    .size = sizeof(g_{project}_eventQueueBuf),\n}};\n\n"
+          f"uint8_t BFX_{project}_PostEvent(BFX_FSM_EVENT_ID event, void *arg, uint16_t argSize)\n{{\n"
+          "    char *data;\n    uint16_t acquired;\n"
+          f"    BFX_QfifoSendAcquireNoSplit({queue}, sizeof(BFX_FSM_QUEUED_EVENT), &data, &acquired);\n"
+          "    if (acquired < sizeof(BFX_FSM_QUEUED_EVENT)) {\n"
+          f"        BFX_QfifoSendUndo({queue});\n        return 1;\n    }}\n"
+          "    BFX_FSM_QUEUED_EVENT *queued = (BFX_FSM_QUEUED_EVENT *)data;\n"
+          "    queued->arg = arg;\n    queued->argSize = argSize;\n    queued->event = event;\n"
+          f"    BFX_FSM_QUEUE_BARRIER();\n    BFX_QfifoSendCommit({queue});\n    return 0;\n}}\n\n"
+          f"uint16_t BFX_{project}_DrainEvents(uint16_t maxCnt)\n{{\n"
+          "    uint16_t drained = 0;\n    while (drained < maxCnt) {\n"
+          "        char *data;\n        uint16_t acquired;\n"
+          "        uint16_t batch = (uint16_t)(maxCnt - drained);\n"
+          f"        if (batch > {depth}) {{\n            batch = {depth};\n        }}\n"
+          "        BFX_FSM_QUEUE_BARRIER();\n"
+          f"        BFX_QfifoRecvAcquireNoSplit({queue}, (uint16_t)(batch * sizeof(BFX_FSM_QUEUED_EVENT)), "
+          "&data, &acquired);\n"
+          "        batch = (uint16_t)(acquired / sizeof(BFX_FSM_QUEUED_EVENT));\n"
+          f"        if (batch == 0) {{\n            BFX_QfifoRecvUndo({queue});\n            break;\n        }}\n"
+          "        BFX_FSM_QUEUED_EVENT const *queued = (BFX_FSM_QUEUED_EVENT const *)data;\n"
+          "        for (uint16_t i = 0; i < batch; i++) {\n"
+          f"            (void)BFX_FsmProcessEvent(&g_{project}_fsmHandle, queued[i].event, queued[i].arg, "
+          "queued[i].argSize);\n        }\n"
+          f"        BFX_FSM_QUEUE_BARRIER();\n        BFX_QfifoRecvCommit({queue});\n"
+          "        drained = (uint16_t)(drained + batch);\n    }\n    return drained;\n}\n")
+
+def emit_tables(context: Dict) -> str:
+    """native后端：按TABLES_TEMPLATE的格式拼接<项目名>_tables.c内容"""
+    project = context['project_name']
+    out = [f"/**\n * @file {project}_tables.c\n * @brief transition tables of {project}\n"
+           " * @generator BufferFlowX\n**/\n"
+           '#ifdef __cplusplus\nextern "C" {\n#endif\n',
+           _banner("headers import"), f'#include <stddef.h>\n#include "{project}.h"\n\n']
+    _emit_tables_body(context, out.append)
+    out.append("#ifdef __cplusplus\n}\n#endif")
+    return ''.join(out)
+
+def _emit_tables_body(context: Dict, write):
+    """按TABLES_TEMPLATE_BODY的格式输出转移表、状态表、分发表与句柄"""
+    project = context['project_name']
+    upper = project.upper()
+    state_info = context['state_info']
+    write(_banner("state table"))
+    for table in context['trans_tables']:
+        if table['shared_by']:
+            write(f"// also used by {', '.join(table['shared_by'])}\n")
+        write(f"const BFX_FSM_TRAN_RECORD {table['trans_tbl_name']}[] = {{\n    ")
+        for event, target, comment in table['transitions']:
+            write(f"{{ {event}, {target} }}, ///< {comment}\n    " if comment else f"{{ {event}, {target} }},\n    ")
+        write("\n};\n")
+    write("\n")
+    if context['comb_slots']:
+        write(f"const BFX_FSM_TRAN_RECORD g_{project}_combTbl[] = {{\n    ")
+        for slot in context['comb_slots']:
+            write(f"{{ {slot[0]}, {slot[1]} }}, ///< {slot[2]}\n    " if slot else "{ 0, 0 },\n    ")
+        write("\n};\n")
+    write(f"const BFX_FSM_STATE g_{project}_allstatus[] = {{\n    ")
+    for index, state in enumerate(state_info, 1):
+        comb_row = state.get('comb_row')
+        if comb_row:
+            records = f"{comb_row['span']}, &g_{project}_combTbl[{comb_row['base']}],"
+        elif not state['empty_trans_tbl']:
+            records = f"sizeof({state['trans_tbl_name']}) / sizeof(BFX_FSM_TRAN_RECORD), {state['trans_tbl_name']},"
+        else:
+            records = "0, (BFX_FSM_TRAN_RECORD const *)NULL,"
+        tran_tbl_type = f", {state['tran_tbl_type']}" if state.get('tran_tbl_type') else ""
+        write(f"{{\n        {state['state_id']}, {state['default_id']}, {state['father_id']},\n        {records}\n"
+              f"        {state['callback_name']}{tran_tbl_type}\n    }}{',' if index < len(state_info) else ''}\n    ")
+    write("\n};\n")
+    dispatch_rows, event_cnt = context['dispatch_rows'], context['event_cnt']
+    if dispatch_rows:
+        write(_banner("dispatch table") +
+              f"const BFX_FSM_STATE_ID g_{project}_dispatchTbl[{len(dispatch_rows)}][{event_cnt}] = {{\n    ")
+        for row in dispatch_rows:
+            write(f"{{ {', '.join(row['targets'])} }}, ///< {row['macro_name']}\n    ")
+        write("\n};\n")
+    if context['trace']:
+        write(_banner("transition trace") +
+              f"#ifdef BFX_FSM_TRACE_ENABLE\nBFX_FSM_TRACE_RECORD g_{project}_traceBuf[{upper}_TRACE_DEPTH];\n"
+              f"BFX_FSM_TRACE g_{project}_trace = {{\n    .buf = g_{project}_traceBuf,\n"
+              f"    .depth = {upper}_TRACE_DEPTH,\n}};\n#endif\n")
+    if context['image']:
+        write(_banner("image callbacks") +
+              f"#ifdef BFX_FSM_IMAGE_ENABLE\nBFX_FSM_ACTION_CALLBACK const g_{project}_actionTbl[] = {{\n    ")
+        for state in state_info:
+            write(f"{state['callback_name']},\n    ")
+        write("\n};\n#endif\n")
+    if context['name_indexes']:
+        _emit_name_indexes(context, write)
+    write(_banner("FSM handle") +
+          f"BFX_FSM_HANDLE g_{project}_fsmHandle = {{\n    .stateTbl = g_{project}_allstatus,\n"
+          f"    .stateCnt = sizeof(g_{project}_allstatus) / sizeof(BFX_FSM_STATE),\n"
+          f"    .currentStateId = {context['initial_state_macro']},\n    .leafTargets = 1,\n")
+    if dispatch_rows:
+        write(f"    .maxStateId = {len(dispatch_rows)},\n    .maxEventId = {event_cnt},\n"
+              f"    .dispatchTbl = &g_{project}_dispatchTbl[0][0],\n")
+    if context['trace']:
+        write(f"#ifdef BFX_FSM_TRACE_ENABLE\n    .trace = &g_{project}_trace,\n#endif\n")
+    write("};\n")
+
+def _emit_name_indexes(context: Dict, write):
+    """按TABLES_TEMPLATE_BODY的格式输出--names的种子表、槽位表与名称池"""
+    write(_banner("name index") + "#ifdef BFX_FSM_NAMES_ENABLE\n")
+    for index in context['name_indexes']:
+        prefix = index['prefix']
+        if index['cnt']:
+            write(f"const uint16_t {prefix}Seeds[] BFX_FSM_NAMES_SECTION = {{\n" +
+                  ''.join(f"    {row},\n" for row in index['seed_rows']) +
+                  f"}};\nconst uint16_t {prefix}Slots[] BFX_FSM_NAMES_SECTION = {{\n" +
+                  ''.join(f"    {slot},\n" for slot in index['slots']) +
+                  f"}};\nconst uint32_t {prefix}Offsets[] BFX_FSM_NAMES_SECTION = {{\n" +
+                  ''.join(f"    {row},\n" for row in index['offset_rows']) +
+                  f"}};\nconst char {prefix}Pool[] BFX_FSM_NAMES_SECTION =" +
+                  ''.join(f'\n    "{name}\\0"' for name in index['pool']) + ";\n")
+        write(f"const BFX_FSM_NAME_INDEX {prefix}s BFX_FSM_NAMES_SECTION = {{\n")
+        if index['cnt']:
+            write(f"    .seedTbl = {prefix}Seeds,\n    .slotTbl = {prefix}Slots,\n"
+                  f"    .nameOffsetTbl = {prefix}Offsets,\n    .namePool = {prefix}Pool,\n")
+        write(f"    .cnt = {index['cnt']},\n}};\n")
+    write("#endif\n")
+
+def generate_header_file(parser: PlantUMLParser, template_str: Optional[str] = None,
+                         options: Optional[GenerateOptions] = None) -> str:
+    """生成.h文件，template_str为None时使用native后端"""
+    options = options or GenerateOptions()
     
     # 准备状态和事件宏定义
     state_macros = []
@@ -348,21 +1330,63 @@ def generate_header_file(parser: PlantUMLParser, template_str: str) -> str:
             'id': event.id
         })
     state_info = parser.get_state_info()
+    state_id_width, event_id_width = parser.get_id_widths()
 
-    return template.render(
+    context = dict(
         project_name=parser.project_name,
+        state_id_width=state_id_width,
+        event_id_width=event_id_width,
+        trace=options.trace,
+        instances=options.instances,
+        queue_depth=event_queue_depth(parser, options),
+        names=options.names,
+        image_signature=f"0x{model_signature(parser):08X}u" if options.image else None,
         state_macros=state_macros,
         state_info=state_info,
         event_macros=event_macros,
         initial_state_macro=f"{parser.project_name.upper()}_INITIAL_STATE" if parser.top_level_initial else None,
-        initial_state_id=next((s.id for s in parser.states.values() 
-                             if s.get_full_name() == parser.top_level_initial), 0)
+        initial_state_id=parser.resolve_default_leaf(parser.states[parser.top_level_initial]).id
+                         if parser.top_level_initial in parser.states else 0
     )
+    return _render(template_str, emit_header, context)
+
+def dedupe_trans_tables(parser: PlantUMLParser, trans_tables: List[Dict], state_info: List[Dict]) -> Tuple[List[Dict], int]:
+    """内容完全相同的转移表只保留第一张，其余状态指向它，返回(保留的转移表, 节省的转移记录数)
+
+    比较的是生成到ROM中的(事件, 目标状态)序列，注释不参与比较。
+    """
+    info_by_state = {state.full_name: info for state, info in zip(parser.states.values(), state_info)}
+    canonical: Dict[Tuple, Dict] = {}
+    kept = []
+    saved_records = 0
+    for table in trans_tables:
+        key = tuple((event, target) for event, target, _ in table['transitions'])
+        shared = canonical.get(key)
+        if shared is None:
+            canonical[key] = table
+            table['shared_by'] = []
+            kept.append(table)
+            continue
+        shared['shared_by'].append(table['macro_name'])
+        info_by_state[table['state_name']]['trans_tbl_name'] = shared['trans_tbl_name']
+        saved_records += len(key)
+    return kept, saved_records
+
+def generate_source_file(parser: PlantUMLParser, template_str: Optional[str] = None,
+                         options: Optional[GenerateOptions] = None, stats: Optional[Dict] = None) -> str:
+    """生成.c文件，template_str为None时使用native后端，stats不为None时写入生成统计（如去重节省的ROM字节数）"""
+    context = source_context(parser, options or GenerateOptions(), stats)
+    return _render(template_str, emit_source, context)
+
+def generate_tables_file(parser: PlantUMLParser, template_str: Optional[str] = None,
+                         options: Optional[GenerateOptions] = None, stats: Optional[Dict] = None) -> str:
+    """生成--split时的<项目名>_tables.c文件，参数同generate_source_file"""
+    context = source_context(parser, options or GenerateOptions(), stats)
+    return _render(template_str, emit_tables, context)
+
+def source_context(parser: PlantUMLParser, options: GenerateOptions, stats: Optional[Dict] = None) -> Dict:
+    """.c与转移表.c共用的渲染变量"""
 
-def generate_source_file(parser: PlantUMLParser, template_str: str) -> str:
-    """生成.c文件"""
-    template = Template(template_str)
-    
     # 获取状态转移表
     state_transitions = parser.get_state_transitions()
     
@@ -370,15 +1394,11 @@ def generate_source_file(parser: PlantUMLParser, template_str: str) -> str:
     trans_tables = []
     for state_full_name, transitions in state_transitions.items():
         # 查找状态对象
-        state_obj = None
-        for state in parser.states.values():
-            if state.get_full_name() == state_full_name:
-                state_obj = state
-                break
+        state_obj = parser.states.get(state_full_name)
         
         if state_obj:
             trans_tables.append({
-                'state_name': state_obj.get_full_name(),
+                'state_name': state_obj.full_name,
                 'macro_name': state_obj.get_macro_name(parser.project_name),
                 'transitions': transitions,
                 'trans_tbl_name': f"g_{parser.project_name}_{state_full_name.lower()}_TransTbl"
@@ -386,12 +1406,87 @@ def generate_source_file(parser: PlantUMLParser, template_str: str) -> str:
     
     # 获取状态信息
     state_info = parser.get_state_info()
-    
-    return template.render(
+
+    # 稠密分发：以状态×事件矩阵代替线性转移表，没有事件时仍使用线性表
+    dispatch_rows = []
+    if options.dispatch == 'dense' and parser.events:
+        for state, row in parser.get_dispatch_matrix():
+            dispatch_rows.append({
+                'macro_name': state.get_macro_name(parser.project_name),
+                'targets': [target.get_macro_name(parser.project_name) if target is not None else '0'
+                            for target in row]
+            })
+        trans_tables = []
+        for state in state_info:
+            state['empty_trans_tbl'] = True
+
+    # 稀疏分发：按状态选择编码，梳状压缩的状态指向共享表中的一行
+    comb_slots = []
+    if options.dispatch == 'sparse':
+        plans, comb_slots = parser.plan_transition_tables(options.flash_budget)
+        for table in trans_tables:
+            table['transitions'] = plans[table['state_name']]['records']
+        trans_tables = [table for table in trans_tables if table['transitions']]
+        for state_obj, state in zip(parser.states.values(), state_info):
+            plan = plans.get(state_obj.full_name)
+            if plan is None or plan['encoding'] == TRAN_TBL_LINEAR:
+                continue
+            state['tran_tbl_type'] = plan['encoding']
+            if plan['encoding'] == TRAN_TBL_COMB:
+                state['comb_row'] = {'base': plan['base'], 'span': plan['span']}
+
+    # 相同内容的转移表只生成一份
+    trans_tables, saved_records = dedupe_trans_tables(parser, trans_tables, state_info)
+    if stats is not None:
+        state_id_width, event_id_width = parser.get_id_widths()
+        stats['dedup_tables'] = sum(len(table['shared_by']) for table in trans_tables)
+        stats['dedup_bytes_saved'] = saved_records * _tran_record_size(state_id_width, event_id_width)
+        # 各表的规模，按目标ABI换算为ROM/RAM占用见compute_footprint
+        stats['layout'] = {
+            'state_id_width': state_id_width,
+            'event_id_width': event_id_width,
+            'states': len(state_info),
+            'tran_records': sum(len(table['transitions']) for table in trans_tables),
+            'comb_slots': len(comb_slots),
+            'dispatch_cells': len(dispatch_rows) * len(parser.events),
+            'instances': options.instances,
+            'queue_depth': event_queue_depth(parser, options),
+            'trace': options.trace,
+            'image': options.image,
+        }
+    initial_state_macro = f"{parser.project_name.upper()}_INITIAL_STATE" if parser.top_level_initial else None
+
+    # 名称索引：状态与事件各一个最小完美哈希
+    name_indexes = []
+    if options.names:
+        states = sorted(parser.states.values(), key=lambda s: s.id)
+        events = sorted(parser.events.values(), key=lambda e: e.id)
+        name_indexes = [
+            name_index_context(parser, 'state', states,
+                               [state.get_macro_name(parser.project_name) for state in states]),
+            name_index_context(parser, 'event', events,
+                               [f"{parser.project_name.upper()}_{event.name.upper()}" for event in events]),
+        ]
+        if stats is not None:
+            stats['layout']['names'] = [{'cnt': index['cnt'], 'pool_size': index['pool_size']}
+                                        for index in name_indexes]
+
+    return dict(
         project_name=parser.project_name,
         trans_tables=trans_tables,
-        initial_state_macro=f"{parser.project_name.upper()}_INITIAL_STATE" if parser.top_level_initial else None,
-        state_info=state_info
+        initial_state_macro=initial_state_macro,
+        state_info=state_info,
+        comb_slots=comb_slots,
+        dispatch_rows=dispatch_rows,
+        event_cnt=len(parser.events),
+        trace=options.trace,
+        image=options.image,
+        split=options.split,
+        instances=options.instances,
+        queue_depth=event_queue_depth(parser, options),
+        name_indexes=name_indexes,
+        instance_rows=[[initial_state_macro] * min(INSTANCES_PER_LINE, options.instances - start)
+                       for start in range(0, options.instances, INSTANCES_PER_LINE)]
     )
 
 # Jinja2模板
@@ -405,6 +1500,14 @@ HEADER_TEMPLATE = """/**
 
 /* headers import ---------------------------------------------------------------------------------------------*/
 #include "bfx_fsm.h"
+{% if queue_depth %}#include "bfx_qfifo.h"
+{% endif %}
+/* ID width ---------------------------------------------------------------------------------------------------*/
+#define {{ project_name.upper() }}_STATE_ID_WIDTH {{ state_id_width }}
+#define {{ project_name.upper() }}_EVENT_ID_WIDTH {{ event_id_width }}
+#if BFX_FSM_STATE_ID_WIDTH < {{ project_name.upper() }}_STATE_ID_WIDTH || BFX_FSM_EVENT_ID_WIDTH < {{ project_name.upper() }}_EVENT_ID_WIDTH
+#error "{{ project_name }} needs BFX_FSM_STATE_ID_WIDTH >= {{ state_id_width }} and BFX_FSM_EVENT_ID_WIDTH >= {{ event_id_width }}"
+#endif
 
 /* state macros -----------------------------------------------------------------------------------------------*/
 {% for macro in state_macros %}#define {{ macro.name }} {{ macro.id }}{% if macro.comment %} // {{ macro.comment }}{% endif %}
@@ -417,13 +1520,117 @@ HEADER_TEMPLATE = """/**
 {% endfor %}
 /* FSM generated ----------------------------------------------------------------------------------------------*/
 extern BFX_FSM_HANDLE g_{{ project_name }}_fsmHandle;
-
+{% if trace %}#ifdef BFX_FSM_TRACE_ENABLE
+#ifndef {{ project_name.upper() }}_TRACE_DEPTH
+#define {{ project_name.upper() }}_TRACE_DEPTH 64
+#endif
+extern BFX_FSM_TRACE g_{{ project_name }}_trace;
+#endif
+{% endif %}{% if image_signature %}#ifdef BFX_FSM_IMAGE_ENABLE
+#define {{ project_name.upper() }}_IMAGE_SIGNATURE {{ image_signature }}
+extern BFX_FSM_ACTION_CALLBACK const g_{{ project_name }}_actionTbl[];
+#endif
+{% endif %}{% if instances %}#define {{ project_name.upper() }}_INSTANCE_CNT {{ instances }}
+extern BFX_FSM_STATE_ID g_{{ project_name }}_instances[{{ project_name.upper() }}_INSTANCE_CNT];
+{% endif %}{% if queue_depth %}#ifndef {{ project_name.upper() }}_QUEUE_DEPTH
+#define {{ project_name.upper() }}_QUEUE_DEPTH {{ queue_depth }}
+#endif
+#ifdef __cplusplus
+extern "C" {
+#endif
+extern BFX_QFIFO g_{{ project_name }}_eventQueue;
+uint8_t BFX_{{ project_name }}_PostEvent(BFX_FSM_EVENT_ID event, void *arg, uint16_t argSize);
+uint16_t BFX_{{ project_name }}_DrainEvents(uint16_t maxCnt);
+#ifdef __cplusplus
+}
+#endif
+{% endif %}{% if names %}#ifdef BFX_FSM_NAMES_ENABLE
+extern BFX_FSM_NAME_INDEX const g_{{ project_name }}_stateNames;
+extern BFX_FSM_NAME_INDEX const g_{{ project_name }}_eventNames;
+#endif
+{% endif %}
 /* state callback ---------------------------------------------------------------------------------------------*/
 {% for state in state_info %}
 __attribute__((weak)) void {{ state.callback_name }}(BFX_FSM_ACTION_CTX *ctx, void *arg, uint16_t argSize);{% endfor %}
 #endif
 """
 
+# 转移表部分：不拆分时位于.c中，--split时单独生成<项目名>_tables.c
+TABLES_TEMPLATE_BODY = """/* state table ------------------------------------------------------------------------------------------------*/
+{% for table in trans_tables %}{% if table.shared_by %}// also used by {{ table.shared_by|join(', ') }}
+{% endif %}const BFX_FSM_TRAN_RECORD {{ table.trans_tbl_name }}[] = {
+    {% for trans in table.transitions %}{ {{ trans[0] }}, {{ trans[1] }} },{% if trans[2] %} ///< {{ trans[2] }}{% endif %}
+    {% endfor %}
+};
+{% endfor %}
+{% if comb_slots %}const BFX_FSM_TRAN_RECORD g_{{ project_name }}_combTbl[] = {
+    {% for slot in comb_slots %}{% if slot %}{ {{ slot[0] }}, {{ slot[1] }} }, ///< {{ slot[2] }}{% else %}{ 0, 0 },{% endif %}
+    {% endfor %}
+};
+{% endif %}const BFX_FSM_STATE g_{{ project_name }}_allstatus[] = {
+    {% for state in state_info %}{
+        {{ state.state_id }}, {{ state.default_id }}, {{ state.father_id }},
+        {% if state.comb_row %}{{ state.comb_row.span }}, &g_{{ project_name }}_combTbl[{{ state.comb_row.base }}],{% elif not state.empty_trans_tbl %}sizeof({{ state.trans_tbl_name }}) / sizeof(BFX_FSM_TRAN_RECORD), {{ state.trans_tbl_name }},{% else %}0, (BFX_FSM_TRAN_RECORD const *)NULL,{% endif %}
+        {{ state.callback_name }}{% if state.tran_tbl_type %}, {{ state.tran_tbl_type }}{% endif %}
+    }{% if not loop.last %},{% endif %}
+    {% endfor %}
+};
+{% if dispatch_rows %}/* dispatch table ---------------------------------------------------------------------------------------------*/
+const BFX_FSM_STATE_ID g_{{ project_name }}_dispatchTbl[{{ dispatch_rows|length }}][{{ event_cnt }}] = {
+    {% for row in dispatch_rows %}{ {{ row.targets|join(', ') }} }, ///< {{ row.macro_name }}
+    {% endfor %}
+};
+{% endif %}{% if trace %}/* transition trace -------------------------------------------------------------------------------------------*/
+#ifdef BFX_FSM_TRACE_ENABLE
+BFX_FSM_TRACE_RECORD g_{{ project_name }}_traceBuf[{{ project_name.upper() }}_TRACE_DEPTH];
+BFX_FSM_TRACE g_{{ project_name }}_trace = {
+    .buf = g_{{ project_name }}_traceBuf,
+    .depth = {{ project_name.upper() }}_TRACE_DEPTH,
+};
+#endif
+{% endif %}{% if image %}/* image callbacks --------------------------------------------------------------------------------------------*/
+#ifdef BFX_FSM_IMAGE_ENABLE
+BFX_FSM_ACTION_CALLBACK const g_{{ project_name }}_actionTbl[] = {
+    {% for state in state_info %}{{ state.callback_name }},
+    {% endfor %}
+};
+#endif
+{% endif %}{% if name_indexes %}/* name index -------------------------------------------------------------------------------------------------*/
+#ifdef BFX_FSM_NAMES_ENABLE
+{% for index in name_indexes %}{% if index.cnt %}const uint16_t {{ index.prefix }}Seeds[] BFX_FSM_NAMES_SECTION = {
+{% for row in index.seed_rows %}    {{ row }},
+{% endfor %}};
+const uint16_t {{ index.prefix }}Slots[] BFX_FSM_NAMES_SECTION = {
+{% for slot in index.slots %}    {{ slot }},
+{% endfor %}};
+const uint32_t {{ index.prefix }}Offsets[] BFX_FSM_NAMES_SECTION = {
+{% for row in index.offset_rows %}    {{ row }},
+{% endfor %}};
+const char {{ index.prefix }}Pool[] BFX_FSM_NAMES_SECTION ={% for name in index.pool %}
+    "{{ name }}\\0"{% endfor %};
+{% endif %}const BFX_FSM_NAME_INDEX {{ index.prefix }}s BFX_FSM_NAMES_SECTION = {
+{% if index.cnt %}    .seedTbl = {{ index.prefix }}Seeds,
+    .slotTbl = {{ index.prefix }}Slots,
+    .nameOffsetTbl = {{ index.prefix }}Offsets,
+    .namePool = {{ index.prefix }}Pool,
+{% endif %}    .cnt = {{ index.cnt }},
+};
+{% endfor %}#endif
+{% endif %}/* FSM handle -------------------------------------------------------------------------------------------------*/
+BFX_FSM_HANDLE g_{{ project_name }}_fsmHandle = {
+    .stateTbl = g_{{ project_name }}_allstatus,
+    .stateCnt = sizeof(g_{{ project_name }}_allstatus) / sizeof(BFX_FSM_STATE),
+    .currentStateId = {{ initial_state_macro }},
+    .leafTargets = 1,
+{% if dispatch_rows %}    .maxStateId = {{ dispatch_rows|length }},
+    .maxEventId = {{ event_cnt }},
+    .dispatchTbl = &g_{{ project_name }}_dispatchTbl[0][0],
+{% endif %}{% if trace %}#ifdef BFX_FSM_TRACE_ENABLE
+    .trace = &g_{{ project_name }}_trace,
+#endif
+{% endif %}};
+"""
+
 SOURCE_TEMPLATE = """/**
  * @file {{ project_name }}.c
  * @brief FSM of {{ project_name }}
@@ -442,69 +1649,647 @@ __attribute__((weak)) void {{ state.callback_name }}(BFX_FSM_ACTION_CTX *ctx, vo
 {
 }{% endfor %}
 
-/* state table ------------------------------------------------------------------------------------------------*/
-{% for table in trans_tables %}const BFX_FSM_TRAN_RECORD {{ table.trans_tbl_name }}[] = {
-    {% for trans in table.transitions %}{ {{ trans[0] }}, {{ trans[1] }} },{% if trans[2] %} ///< {{ trans[2] }}{% endif %}
-    {% endfor %}
-};
-{% endfor %}
-const BFX_FSM_STATE g_{{ project_name }}_allstatus[] = {
-    {% for state in state_info %}{
-        {{ state.state_id }}, {{ state.default_id }}, {{ state.father_id }},
-        {% if not state.empty_trans_tbl %}sizeof({{ state.trans_tbl_name }}) / sizeof(BFX_FSM_TRAN_RECORD), {{ state.trans_tbl_name }},{% else %}0, (BFX_FSM_TRAN_RECORD const *)NULL,{% endif %}
-        {{ state.callback_name }}
-    }{% if not loop.last %},{% endif %}
-    {% endfor %}
-};
-/* FSM handle -------------------------------------------------------------------------------------------------*/
-BFX_FSM_HANDLE g_{{ project_name }}_fsmHandle = {
-    .stateTbl = g_{{ project_name }}_allstatus,
-    .stateCnt = sizeof(g_{{ project_name }}_allstatus) / sizeof(BFX_FSM_STATE),
-    .currentStateId = {{ initial_state_macro }},
+{% if not split %}""" + TABLES_TEMPLATE_BODY + """{% endif %}{% if instances %}/* instances --------------------------------------------------------------------------------------------------*/
+BFX_FSM_STATE_ID g_{{ project_name }}_instances[{{ project_name.upper() }}_INSTANCE_CNT]{% if initial_state_macro %} = {
+{% for row in instance_rows %}    {{ row|join(', ') }},
+{% endfor %}}{% endif %};
+{% endif %}{% if queue_depth %}/* event queue ------------------------------------------------------------------------------------------------*/
+BFX_FSM_QUEUED_EVENT g_{{ project_name }}_eventQueueBuf[{{ project_name.upper() }}_QUEUE_DEPTH + 1];
+/* BFX_QFIFO.size is an int16_t byte count, an overridden depth must not wrap it */
+typedef char BFX_{{ project_name }}_QueueSizeCheck[(sizeof(g_{{ project_name }}_eventQueueBuf) <= INT16_MAX) ? 1 : -1];
+BFX_QFIFO g_{{ project_name }}_eventQueue = {
+    .buf = (char *)g_{{ project_name }}_eventQueueBuf,
+    .size = sizeof(g_{{ project_name }}_eventQueueBuf),
 };
+
+uint8_t BFX_{{ project_name }}_PostEvent(BFX_FSM_EVENT_ID event, void *arg, uint16_t argSize)
+{
+    char *data;
+    uint16_t acquired;
+    BFX_QfifoSendAcquireNoSplit(&g_{{ project_name }}_eventQueue, sizeof(BFX_FSM_QUEUED_EVENT), &data, &acquired);
+    if (acquired < sizeof(BFX_FSM_QUEUED_EVENT)) {
+        BFX_QfifoSendUndo(&g_{{ project_name }}_eventQueue);
+        return 1;
+    }
+    BFX_FSM_QUEUED_EVENT *queued = (BFX_FSM_QUEUED_EVENT *)data;
+    queued->arg = arg;
+    queued->argSize = argSize;
+    queued->event = event;
+    BFX_FSM_QUEUE_BARRIER();
+    BFX_QfifoSendCommit(&g_{{ project_name }}_eventQueue);
+    return 0;
+}
+
+uint16_t BFX_{{ project_name }}_DrainEvents(uint16_t maxCnt)
+{
+    uint16_t drained = 0;
+    while (drained < maxCnt) {
+        char *data;
+        uint16_t acquired;
+        uint16_t batch = (uint16_t)(maxCnt - drained);
+        if (batch > {{ project_name.upper() }}_QUEUE_DEPTH) {
+            batch = {{ project_name.upper() }}_QUEUE_DEPTH;
+        }
+        BFX_FSM_QUEUE_BARRIER();
+        BFX_QfifoRecvAcquireNoSplit(&g_{{ project_name }}_eventQueue, (uint16_t)(batch * sizeof(BFX_FSM_QUEUED_EVENT)), &data, &acquired);
+        batch = (uint16_t)(acquired / sizeof(BFX_FSM_QUEUED_EVENT));
+        if (batch == 0) {
+            BFX_QfifoRecvUndo(&g_{{ project_name }}_eventQueue);
+            break;
+        }
+        BFX_FSM_QUEUED_EVENT const *queued = (BFX_FSM_QUEUED_EVENT const *)data;
+        for (uint16_t i = 0; i < batch; i++) {
+            (void)BFX_FsmProcessEvent(&g_{{ project_name }}_fsmHandle, queued[i].event, queued[i].arg, queued[i].argSize);
+        }
+        BFX_FSM_QUEUE_BARRIER();
+        BFX_QfifoRecvCommit(&g_{{ project_name }}_eventQueue);
+        drained = (uint16_t)(drained + batch);
+    }
+    return drained;
+}
+{% endif %}#ifdef __cplusplus
+}
+#endif
+"""
+
+TABLES_TEMPLATE = """/**
+ * @file {{ project_name }}_tables.c
+ * @brief transition tables of {{ project_name }}
+ * @generator BufferFlowX
+**/
 #ifdef __cplusplus
+extern "C" {
+#endif
+/* headers import ---------------------------------------------------------------------------------------------*/
+#include <stddef.h>
+#include "{{ project_name }}.h"
+
+""" + TABLES_TEMPLATE_BODY + """#ifdef __cplusplus
 }
 #endif
 """
 
-def main():
-    """主函数"""
-    if len(sys.argv) < 2 or len(sys.argv) > 3:
-        print("usage: python plantuml_to_c.py <plantuml_file> [output_dir]")
-        sys.exit(1)
+def write_if_changed(path: str, content: Union[str, bytes]) -> bool:
+    """内容与现有文件不同时才写入，保持未变化文件的时间戳，返回是否写入；bytes按二进制写入"""
+    binary = isinstance(content, bytes)
+    try:
+        with open(path, 'rb' if binary else 'r', encoding=None if binary else 'utf-8') as f:
+            if f.read() == content:
+                return False
+    except (FileNotFoundError, UnicodeDecodeError):
+        pass
+    with open(path, 'wb' if binary else 'w', encoding=None if binary else 'utf-8') as f:
+        f.write(content)
+    return True
+
+# 阶段计时 ==================================================================
+
+class PhaseTimer:
+    """按阶段（parse/resolve/cache/render/write）累计墙钟时间；启动时已开启tracemalloc则同时记录各阶段的峰值内存"""
+
+    def __init__(self):
+        self.phases: Dict[str, Dict] = {}
+        self.start = time.perf_counter()
+
+    @contextmanager
+    def measure(self, name: str) -> Iterator[None]:
+        """计量一个阶段，同名阶段多次执行时累加时间、取峰值内存的最大值；阶段不可嵌套"""
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            entry = self.phases.setdefault(name, {'calls': 0, 'seconds': 0.0, 'peak_bytes': 0})
+            entry['calls'] += 1
+            entry['seconds'] += time.perf_counter() - start
+            if tracing:
+                entry['peak_bytes'] = max(entry['peak_bytes'], tracemalloc.get_traced_memory()[1])
+
+    def report(self) -> Dict:
+        """计时结果，可直接序列化为JSON"""
+        report = {
+            'phases': {name: dict(entry, seconds=round(entry['seconds'], 6)) for name, entry in self.phases.items()},
+            'total_seconds': round(time.perf_counter() - self.start, 6),
+        }
+        try:
+            import resource
+            # Linux上ru_maxrss以KB为单位，macOS上以字节为单位
+            scale = 1 if sys.platform == 'darwin' else 1024
+            report['max_rss_bytes'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+        except ImportError:
+            pass
+        return report
+
+# 当前进程的阶段计时器，None时不计时
+_phase_timer: Optional[PhaseTimer] = None
+
+def start_phase_timing(trace_memory: bool = True) -> PhaseTimer:
+    """开始按阶段计时，trace_memory为True时开启tracemalloc统计峰值内存（会明显拖慢解析）"""
+    global _phase_timer
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    _phase_timer = PhaseTimer()
+    return _phase_timer
+
+def stop_phase_timing() -> Optional[PhaseTimer]:
+    """停止计时并返回计时器"""
+    global _phase_timer
+    timer, _phase_timer = _phase_timer, None
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+    return timer
+
+def _phase(name: str) -> ContextManager:
+    return _phase_timer.measure(name) if _phase_timer is not None else nullcontext()
+
+# 模型缓存 ==================================================================
+
+# 常驻服务进程内的缓存：输入文件 -> (各来源文件摘要, 模型摘要, 解析器)，(模型摘要, 生成选项, profile摘要) -> 渲染结果
+_MODEL_MEMO: Dict[str, Tuple[List[Tuple[str, str]], str, PlantUMLParser]] = {}
+_RENDER_MEMO: Dict[Tuple[str, GenerateOptions, Optional[str]], Tuple[str, str, str, Dict]] = {}
+_MEMO_LIMIT = 64
+
+def _file_digest(path: str) -> str:
+    """文件内容摘要"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _sources_unchanged(sources: List[Tuple[str, str]]) -> bool:
+    """输入文件及全部!include文件的内容摘要是否都与记录一致"""
+    try:
+        return all(_file_digest(path) == digest for path, digest in sources)
+    except OSError:
+        return False
+
+def _model_cache_path(cache_dir: str, plantuml_file: str) -> str:
+    """缓存文件按输入文件路径命名，同一输入只保留最新一份"""
+    name = hashlib.sha256(plantuml_file.encode('utf-8')).hexdigest()[:32]
+    return os.path.join(cache_dir, f"{name}.model")
+
+def _cache_version() -> str:
+    """缓存版本：生成器脚本摘要加marshal格式版本"""
+    return f"{generator_digest()}-{marshal.version}"
+
+def clear_memo():
+    """清空进程内的模型与渲染缓存"""
+    _MODEL_MEMO.clear()
+    _RENDER_MEMO.clear()
+
+def _memo_put(memo: Dict, key, value):
+    if len(memo) >= _MEMO_LIMIT:
+        memo.clear()
+    memo[key] = value
+
+def load_model(plantuml_file: str, cache_dir: Optional[str] = None) -> Tuple[PlantUMLParser, str]:
+    """解析并分配ID，返回(解析器, 模型摘要)
+    
+    模型摘要由生成器版本与输入、全部!include文件的内容摘要决定；摘要一致时直接还原缓存的模型，
+    跳过切分与名称解析。cache_dir为None时只使用进程内缓存。
+    """
+    plantuml_file = os.path.abspath(plantuml_file)
     
-    # 获取输入文件路径
-    plantuml_file = sys.argv[1]
+    # 进程内缓存（常驻服务）
+    memo = _MODEL_MEMO.get(plantuml_file)
+    if memo is not None and _sources_unchanged(memo[0]):
+        return memo[2], memo[1]
     
-    # 获取输出目录，默认为当前目录
-    output_dir = sys.argv[2] if len(sys.argv) == 3 else "."
+    # 磁盘缓存，格式或版本不符时视为未命中
+    cache_path = _model_cache_path(cache_dir, plantuml_file) if cache_dir else None
+    if cache_path and os.path.exists(cache_path):
+        try:
+            with _phase('cache'):
+                with open(cache_path, 'rb') as f:
+                    entry = marshal.load(f)
+                if entry['generator'] == _cache_version() and _sources_unchanged(entry['sources']):
+                    parser = PlantUMLParser.from_model(entry['model'])
+                    _memo_put(_MODEL_MEMO, plantuml_file, (entry['sources'], entry['key'], parser))
+                    return parser, entry['key']
+        except (OSError, EOFError, ValueError, TypeError, KeyError):
+            pass
     
+    # 未命中，完整解析
+    parser = PlantUMLParser()
+    parser.parse_file(plantuml_file)
+    with _phase('resolve'):
+        parser.assign_ids()
+    sources = [(path, _file_digest(path)) for path in parser.sources]
+    key = hashlib.sha256('\n'.join([_cache_version()] + [digest for _, digest in sources])
+                         .encode('utf-8')).hexdigest()
+    _memo_put(_MODEL_MEMO, plantuml_file, (sources, key, parser))
+    
+    if cache_path:
+        with _phase('cache'):
+            os.makedirs(cache_dir, exist_ok=True)
+            entry = {'generator': _cache_version(), 'sources': sources, 'key': key, 'model': parser.to_model()}
+            # 先写临时文件再替换，并行生成时不会读到半个缓存文件
+            tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                marshal.dump(entry, f)
+            os.replace(tmp_path, cache_path)
+    return parser, key
+
+def prepare_model(parser: PlantUMLParser, options: GenerateOptions) -> Tuple[PlantUMLParser, List[str]]:
+    """按生成选项删减死代码、按profile重排，返回(生成代码所用的模型, 删减警告)
+
+    生成的代码、仿真与跟踪解码都应使用这里得到的模型，状态与事件ID才一致。
+    """
+    if options.profile or options.prune != 'off':
+        # 缓存的模型会被其他渲染复用，在副本上删减与重排
+        parser = PlantUMLParser.from_model(parser.to_model())
+    warnings = parser.prune_dead_code() if options.prune != 'off' else []
+    if warnings and options.prune == 'error':
+        raise ValueError(f"{len(warnings)} dead state(s)/transition(s): " + '; '.join(warnings))
+    if options.profile:
+        parser.apply_profile(read_profile(options.profile))
+    return parser, warnings
+
+def render_fsm(plantuml_file: str, cache_dir: Optional[str] = None,
+               options: Optional[GenerateOptions] = None) -> Tuple[str, str, str, Optional[str], Dict, Optional[bytes]]:
+    """解析PlantUML文件并渲染，返回(项目名, .h内容, .c内容, 转移表.c内容或None, 生成统计, 二进制镜像或None)
+
+    模型、生成选项与profile未变化时直接复用渲染结果。
+    """
+    options = options or GenerateOptions()
+    parser, key = load_model(plantuml_file, cache_dir)
+    header_template, source_template, tables_template = load_templates(options)
+    render_key = (key, options, _file_digest(options.profile) if options.profile else None,
+                  header_template, source_template, tables_template if options.split else None)
+    rendered = _RENDER_MEMO.get(render_key)
+    if rendered is None:
+        parser, warnings = prepare_model(parser, options)
+        stats = {'project': parser.project_name, 'warnings': warnings, 'sources': list(parser.sources)}
+        with _phase('render'):
+            context = source_context(parser, options, stats)
+            rendered = (parser.project_name,
+                        generate_header_file(parser, header_template, options),
+                        _render(source_template, emit_source, context),
+                        _render(tables_template, emit_tables, context) if options.split else None,
+                        stats,
+                        build_image(parser) if options.image else None)
+        _memo_put(_RENDER_MEMO, render_key, rendered)
+    return rendered
+
+def translate_file(plantuml_file: str, output_dir: str, cache_dir: Optional[str] = None,
+                   options: Optional[GenerateOptions] = None) -> List[Tuple[str, bool]]:
+    """将单个PlantUML文件转换为.h/.c（及_tables.c、.bin镜像），返回生成的文件路径及是否被更新"""
+    return _translate_one(plantuml_file, output_dir, cache_dir, options)[0]
+
+def _translate_one(plantuml_file: str, output_dir: str, cache_dir: Optional[str] = None,
+                   options: Optional[GenerateOptions] = None) -> Tuple[List[Tuple[str, bool]], Dict]:
+    """转换单个文件，返回(生成的文件路径及是否被更新, 生成统计)"""
     # 确保输出目录存在
-    import os
     os.makedirs(output_dir, exist_ok=True)
     
-    # 读取PlantUML文件
-    with open(plantuml_file, 'r', encoding='utf-8') as f:
-        uml_content = f.read()
+    # 解析并生成.h/.c内容
+    project_name, header_content, source_content, tables_content, stats, image = render_fsm(plantuml_file, cache_dir,
+                                                                                           options)
+    header_path = os.path.join(output_dir, f"{project_name}.h")
+    source_path = os.path.join(output_dir, f"{project_name}.c")
     
-    # 解析PlantUML
-    parser = PlantUMLParser()
-    parser.parse(uml_content)
-    parser.assign_ids()
+    # 内容未变化的文件不重写，避免触发依赖它们的编译单元重新编译
+    with _phase('write'):
+        outputs = [(header_path, write_if_changed(header_path, header_content)),
+                   (source_path, write_if_changed(source_path, source_content))]
+        if tables_content is not None:
+            tables_path = os.path.join(output_dir, f"{project_name}_tables.c")
+            outputs.append((tables_path, write_if_changed(tables_path, tables_content)))
+        if image is not None:
+            image_path = os.path.join(output_dir, f"{project_name}.bin")
+            outputs.append((image_path, write_if_changed(image_path, image)))
+    return outputs, stats
+
+def read_profile(profile_file: str) -> Dict[Tuple[str, str], int]:
+    """读取事件频度文件：每行"状态 事件 次数"（空白或逗号分隔），忽略空行和#注释
+
+    状态可写完整名（RunMain_LedOn）或点号路径（RunMain.LedOn），同一(状态, 事件)出现多次时累加。
+    """
+    profile: Dict[Tuple[str, str], int] = {}
+    with open(profile_file, 'r', encoding='utf-8') as f:
+        for lineno, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            fields = re.split(r'[\s,]+', line)
+            if len(fields) != 3 or not fields[2].isdigit():
+                raise ValueError(f"{profile_file}:{lineno}: expected '<state> <event> <count>'")
+            key = (fields[0].replace('.', '_'), fields[1])
+            profile[key] = profile.get(key, 0) + int(fields[2])
+    return profile
+
+def read_manifest(manifest_file: str) -> List[str]:
+    """读取清单文件：每行一个.puml路径，忽略空行和#注释，相对路径以清单所在目录为基准"""
+    base_dir = os.path.dirname(os.path.abspath(manifest_file))
+    plantuml_files = []
+    with open(manifest_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            plantuml_files.append(os.path.join(base_dir, line))
+    return plantuml_files
+
+def run_batch(plantuml_files: List[str], output_dir: str, jobs: int = 0,
+              cache_dir: Optional[str] = None, options: Optional[GenerateOptions] = None) -> List[Tuple]:
+    """批量转换，多个文件时分发到进程池并行生成，返回每个文件的(输入, 输出列表, 错误信息, 生成统计)"""
+    if jobs <= 0:
+        jobs = os.cpu_count() or 1
+    jobs = min(jobs, len(plantuml_files))
+    
+    results = []
+    if jobs <= 1:
+        for plantuml_file in plantuml_files:
+            try:
+                outputs, stats = _translate_one(plantuml_file, output_dir, cache_dir, options)
+                results.append((plantuml_file, outputs, None, stats))
+            except Exception as e:
+                results.append((plantuml_file, None, str(e), None))
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = [(plantuml_file, pool.submit(_translate_one, plantuml_file, output_dir, cache_dir, options))
+                       for plantuml_file in plantuml_files]
+            for plantuml_file, future in futures:
+                try:
+                    outputs, stats = future.result()
+                    results.append((plantuml_file, outputs, None, stats))
+                except Exception as e:
+                    results.append((plantuml_file, None, str(e), None))
+    return results
+
+def report_results(results: List[Tuple]) -> int:
+    """打印生成结果，返回失败的文件数"""
+    failed = 0
+    for plantuml_file, outputs, error, stats in results:
+        if error is not None:
+            failed += 1
+            print(f"-- FSM generate FAILED: {plantuml_file}: {error}", file=sys.stderr)
+            continue
+        updated = [path for path, changed in outputs if changed]
+        if updated:
+            print(f"-- FSM generated OK: {' and '.join(updated)}")
+        else:
+            print(f"-- FSM up to date: {plantuml_file}")
+        for warning in stats.get('warnings', ()):
+            print(f"-- FSM {stats['project']}: warning: {warning}", file=sys.stderr)
+        if stats.get('dedup_bytes_saved'):
+            print(f"-- FSM {stats['project']}: {stats['dedup_tables']} duplicate transition table(s) shared, "
+                  f"{stats['dedup_bytes_saved']} bytes flash saved")
+    return failed
+
+def write_footprint_report(results: List[Tuple], report_file: str, abi_name: str = DEFAULT_ABI) -> bool:
+    """把生成成功的各FSM在目标ABI上的ROM/RAM占用写成JSON，键有序、内容不变时不重写，返回是否写入"""
+    report = {
+        'abi': abi_name,
+        'fsms': {stats['project']: compute_footprint(stats['layout'], abi_name)
+                 for _, _, error, stats in results if error is None},
+    }
+    report['rom_total'] = sum(fsm['rom']['total'] for fsm in report['fsms'].values())
+    report['ram_total'] = sum(fsm['ram']['total'] for fsm in report['fsms'].values())
+    report_dir = os.path.dirname(os.path.abspath(report_file))
+    os.makedirs(report_dir, exist_ok=True)
+    return write_if_changed(report_file, json.dumps(report, indent=2, sort_keys=True) + '\n')
+
+def write_depfile(depfile: str, sources: List[str]) -> bool:
+    """写入Makefile格式的依赖文件，目标为去掉.d后缀的depfile（CMake中为stamp文件），依赖为sources，
+    内容不变时不重写，返回是否写入"""
+    def escape(path: str) -> str:
+        return path.replace(os.sep, '/').replace('$', '$$').replace('#', '\\#').replace(' ', '\\ ')
+    target = os.path.splitext(os.path.abspath(depfile))[0]
+    lines = [f"{escape(target)}:"] + [f" {escape(path)}" for path in dict.fromkeys(sources)]
+    os.makedirs(os.path.dirname(os.path.abspath(depfile)), exist_ok=True)
+    return write_if_changed(depfile, ' \\\n'.join(lines) + '\n')
+
+def translate_batch(plantuml_files: List[str], output_dir: str, jobs: int = 0,
+                    cache_dir: Optional[str] = None, options: Optional[GenerateOptions] = None) -> int:
+    """批量转换并打印结果，返回失败的文件数"""
+    return report_results(run_batch(plantuml_files, output_dir, jobs, cache_dir, options))
+
+# 常驻生成服务 ==============================================================
+
+@lru_cache(maxsize=None)
+def generator_digest() -> str:
+    """生成器脚本自身的摘要，脚本升级后旧服务不会再被使用"""
+    with open(os.path.abspath(__file__), 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def default_socket_path() -> str:
+    """默认的Unix域套接字路径，按用户区分"""
+    uid = os.getuid() if hasattr(os, 'getuid') else 0
+    return os.path.join(tempfile.gettempdir(), f"bfx_puml_translate_{uid}.sock")
+
+def _send_request(socket_path: str, request: Dict, timeout: Optional[float] = None) -> Optional[Dict]:
+    """向服务发送一行JSON请求并读取一行JSON应答，服务不可用时返回None"""
+    if not hasattr(socket, 'AF_UNIX'):
+        return None
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(socket_path)
+            sock.sendall(json.dumps(request).encode('utf-8') + b'\n')
+            with sock.makefile('rb') as f:
+                line = f.readline()
+    except OSError:
+        return None
+    if not line:
+        return None
+    return json.loads(line)
+
+def request_server(socket_path: str, plantuml_files: List[str], output_dir: str,
+                   cache_dir: Optional[str] = None,
+                   options: Optional[GenerateOptions] = None) -> Optional[List[Tuple]]:
+    """客户端模式：请求常驻服务生成，服务未运行或版本不一致时返回None"""
+    response = _send_request(socket_path, {
+        'op': 'translate',
+        'digest': generator_digest(),
+        'inputs': [os.path.abspath(path) for path in plantuml_files],
+        'output_dir': os.path.abspath(output_dir),
+        'cache_dir': os.path.abspath(cache_dir) if cache_dir else None,
+        'options': asdict(options or GenerateOptions()),
+    })
+    if response is None or not response.get('ok'):
+        return None
+    return [(plantuml_file, [tuple(output) for output in outputs] if outputs is not None else None, error, stats)
+            for plantuml_file, outputs, error, stats in response['results']]
+
+def stop_server(socket_path: str) -> bool:
+    """请求常驻服务退出，返回服务是否在运行"""
+    return _send_request(socket_path, {'op': 'shutdown'}, timeout=5) is not None
+
+def serve(socket_path: str):
+    """常驻生成服务：解析结果与渲染结果在进程内保持缓存，jinja2模板首次使用时编译，逐个处理客户端请求"""
+    import socketserver
+    import threading
+    
+    # 清理残留的套接字文件，已有服务在运行时不重复启动
+    if os.path.exists(socket_path):
+        if _send_request(socket_path, {'op': 'ping'}, timeout=5) is not None:
+            print(f"-- FSM server already running: {socket_path}", file=sys.stderr)
+            sys.exit(1)
+        os.unlink(socket_path)
+    
+    digest = generator_digest()
+    
+    class RequestHandler(socketserver.StreamRequestHandler):
+        def handle(self):
+            request = json.loads(self.rfile.readline())
+            op = request.get('op')
+            if op == 'translate' and request.get('digest') == digest:
+                results = run_batch(request['inputs'], request['output_dir'], jobs=1,
+                                    cache_dir=request.get('cache_dir'),
+                                    options=GenerateOptions(**request.get('options', {})))
+                response = {'ok': True, 'results': results}
+            elif op == 'translate':
+                response = {'ok': False, 'error': 'generator version mismatch'}
+            else:
+                response = {'ok': True}
+            self.wfile.write(json.dumps(response).encode('utf-8') + b'\n')
+            if op == 'shutdown':
+                threading.Thread(target=self.server.shutdown).start()
+    
+    with socketserver.UnixStreamServer(socket_path, RequestHandler) as server:
+        print(f"-- FSM server listening: {socket_path}")
+        sys.stdout.flush()
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if os.path.exists(socket_path):
+                os.unlink(socket_path)
+
+def main():
+    """主函数"""
+    arg_parser = argparse.ArgumentParser(
+        description="PlantUML状态图转C代码生成器",
+        usage="%(prog)s [-o output_dir] [-m manifest] [-j jobs] [plantuml_file ...]\n"
+              "       %(prog)s <plantuml_file> <output_dir>  (deprecated)")
+    arg_parser.add_argument('inputs', nargs='*',
+                            help="PlantUML文件；旧用法<plantuml_file> <output_dir>仍可使用但已不推荐，请改用-o")
+    arg_parser.add_argument('-o', '--output-dir', help="输出目录，默认为当前目录")
+    arg_parser.add_argument('-m', '--manifest', help="清单文件，每行一个PlantUML文件")
+    arg_parser.add_argument('-j', '--jobs', type=int, default=0, help="并行进程数，默认为CPU核数")
+    arg_parser.add_argument('--cache-dir', default=os.environ.get('BFX_PUML_CACHE_DIR'),
+                            help="解析模型缓存目录，输入及!include文件未变化时跳过解析；"
+                                 "也可通过环境变量BFX_PUML_CACHE_DIR指定")
+    arg_parser.add_argument('--dispatch', choices=DISPATCH_MODES, default='linear',
+                            help="转移分发方式：linear为线性转移表（默认），dense为状态×事件稠密矩阵，O(1)查找；"
+                                 "sparse按状态在线性表、排序表和压缩共享表之间选择")
+    arg_parser.add_argument('--flash-budget', type=int, metavar='BYTES',
+                            help="sparse模式下转移表的ROM预算（字节），超出预算时不再把状态放入O(1)查找的压缩共享表")
+    arg_parser.add_argument('--profile', metavar='FILE',
+                            help="事件频度文件，每行\"状态 事件 次数\"，高频状态与转移排在表的前部")
+    arg_parser.add_argument('--prune', choices=PRUNE_MODES, default='off',
+                            help="死代码分析：warn删除从初始状态不可达的状态和被遮蔽、永远不会触发的转移并警告，"
+                                 "error发现时生成失败，off不分析（默认）")
+    arg_parser.add_argument('--trace', action='store_true',
+                            help="生成转移跟踪缓冲区，定义BFX_FSM_TRACE_ENABLE时记录每次转移，用bfx_fsm_trace.py解码")
+    arg_parser.add_argument('--image', action='store_true',
+                            help="同时生成<项目名>.bin二进制镜像，可由BFX_FsmLoadImage直接在flash中加载，"
+                                 "用bfx_fsm_image.py校验")
+    arg_parser.add_argument('--backend', choices=EMIT_BACKENDS, default='native',
+                            help="代码生成后端：native直接拼接输出，不需要jinja2（默认）；jinja2渲染内置模板，"
+                                 "两者输出逐字节一致")
+    arg_parser.add_argument('--templates', metavar='DIR',
+                            help=f"自定义jinja2模板目录，可包含{'、'.join(TEMPLATE_FILES)}（--split时的转移表.c），"
+                                 "缺少的文件使用内置模板；指定时总是使用jinja2渲染")
+    arg_parser.add_argument('--split', action='store_true',
+                            help="转移表、状态表与句柄单独生成到<项目名>_tables.c，.c只保留回调桩；"
+                                 "只改动转移时.h与.c保持不变，只有转移表.c需要重新编译")
+    arg_parser.add_argument('--instances', type=int, default=0, metavar='N',
+                            help="生成N个实例共享同一组常量表的实例数组g_<项目名>_instances，每个实例只占一个状态ID，"
+                                 "用BFX_FsmProcessInstance(s)处理事件")
+    arg_parser.add_argument('--queue', type=int, nargs='?', const=0, metavar='DEPTH',
+                            help="生成基于BFX_QFIFO的事件队列：中断中用BFX_<项目名>_PostEvent投递，"
+                                 "任务中用BFX_<项目名>_DrainEvents批量处理；"
+                                 f"未指定DEPTH时深度为事件数（至少{QUEUE_MIN_DEPTH}）")
+    arg_parser.add_argument('--names', action='store_true',
+                            help="生成状态名与事件名的最小完美哈希及名称池，定义BFX_FSM_NAMES_ENABLE时"
+                                 "可用BFX_FsmLookupName按名称O(1)查找ID、BFX_FsmGetName由ID取名称")
+    arg_parser.add_argument('--depfile', metavar='FILE',
+                            help="写入Makefile格式的依赖文件，列出输入及全部!include文件，目标为去掉.d后缀的FILE；"
+                                 "CMake通过DEPFILE在被包含的文件变化时重新生成")
+    arg_parser.add_argument('--footprint', metavar='FILE',
+                            help="把各FSM的ROM/RAM占用（含结构体填充）写入JSON文件，便于CI跟踪")
+    arg_parser.add_argument('--abi', choices=sorted(TARGET_ABIS), default=DEFAULT_ABI,
+                            help=f"占用统计的目标ABI，默认{DEFAULT_ABI}")
+    arg_parser.add_argument('--timing', metavar='FILE',
+                            help="把各阶段（解析、名称解析、缓存、渲染、写文件）的耗时与峰值内存写入JSON文件，"
+                                 "-表示输出到stderr；计时时在本进程内串行生成")
+    arg_parser.add_argument('--serve', nargs='?', const=default_socket_path(), metavar='SOCKET',
+                            help="作为常驻生成服务运行，监听Unix域套接字")
+    arg_parser.add_argument('--server', nargs='?', const=default_socket_path(), metavar='SOCKET',
+                            default=os.environ.get('BFX_PUML_SERVER'),
+                            help="客户端模式，请求常驻服务生成，服务未运行时在本进程生成；"
+                                 "也可通过环境变量BFX_PUML_SERVER指定")
+    arg_parser.add_argument('--stop-server', nargs='?', const=default_socket_path(), metavar='SOCKET',
+                            help="请求常驻服务退出")
+    args = arg_parser.parse_args()
+    
+    if args.serve:
+        serve(args.serve)
+        return
+    if args.stop_server:
+        if not stop_server(args.stop_server):
+            print(f"-- FSM server not running: {args.stop_server}", file=sys.stderr)
+        return
     
-    # 生成.h文件
-    header_content = generate_header_file(parser, HEADER_TEMPLATE)
-    header_path = os.path.join(output_dir, f"{parser.project_name}.h")
-    with open(header_path, 'w', encoding='utf-8') as f:
-        f.write(header_content)
+    plantuml_files = list(args.inputs)
+    output_dir = args.output_dir
     
-    # 生成.c文件
-    source_content = generate_source_file(parser, SOURCE_TEMPLATE)
-    source_path = os.path.join(output_dir, f"{parser.project_name}.c")
-    with open(source_path, 'w', encoding='utf-8') as f:
-        f.write(source_content)
+    # 兼容旧用法: <plantuml_file> <output_dir>，批量生成需用-o指定输出目录，不按扩展名猜测
+    if output_dir is None and not args.manifest and len(plantuml_files) == 2:
+        if os.path.isfile(plantuml_files[1]):
+            arg_parser.error("use -o/--output-dir when generating more than one PlantUML file")
+        output_dir = plantuml_files.pop()
+        print("-- FSM warning: positional output_dir is deprecated, use -o/--output-dir", file=sys.stderr)
     
-    print(f"-- FSM generated OK: {header_path} and {source_path}")
+    if args.manifest:
+        plantuml_files.extend(read_manifest(args.manifest))
+    
+    if not plantuml_files:
+        arg_parser.print_usage()
+        sys.exit(1)
+    
+    output_dir = output_dir or "."
+    if not 0 <= args.instances <= 0xFFFF:
+        arg_parser.error("--instances must be between 0 and 65535")
+    if args.queue is not None and not 0 <= args.queue <= QUEUE_MAX_DEPTH:
+        arg_parser.error(f"--queue DEPTH must be between 0 and {QUEUE_MAX_DEPTH}")
+    options = GenerateOptions(dispatch=args.dispatch, flash_budget=args.flash_budget,
+                              profile=os.path.abspath(args.profile) if args.profile else None, prune=args.prune,
+                              trace=args.trace, image=args.image, split=args.split, instances=args.instances,
+                              queue=args.queue, names=args.names, backend=args.backend,
+                              templates=os.path.abspath(args.templates) if args.templates else None)
+    results = None
+    if args.timing:
+        # 计时只覆盖本进程，不使用进程池和常驻服务
+        start_phase_timing()
+        results = run_batch(plantuml_files, output_dir, 1, args.cache_dir, options)
+        report = dict(stop_phase_timing().report(), files=len(plantuml_files))
+        report_json = json.dumps(report, indent=2, sort_keys=True)
+        if args.timing == '-':
+            print(report_json, file=sys.stderr)
+        else:
+            with open(args.timing, 'w', encoding='utf-8') as f:
+                f.write(report_json + '\n')
+    if args.server and results is None:
+        results = request_server(args.server, plantuml_files, output_dir, args.cache_dir, options)
+    if results is None:
+        results = run_batch(plantuml_files, output_dir, args.jobs, args.cache_dir, options)
+    
+    failed = report_results(results)
+    if args.footprint:
+        write_footprint_report(results, args.footprint, args.abi)
+    if args.depfile:
+        write_depfile(args.depfile, [path for _, _, error, stats in results if error is None
+                                     for path in stats['sources']])
+    if failed != 0:
+        sys.exit(1)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -45,6 +45,8 @@ extern "C" {
 #define BFX_QFIFO_LIKELY(x)   __builtin_expect(!!(x), 1)
 #define BFX_QFIFO_UNLIKELY(x) __builtin_expect(!!(x), 0)
 #define BFX_QFIFO_DMB()       __asm__ volatile("dmb" : : : "memory")
+/* index owned by the other side is read once, it may move between two reads when used from an ISR */
+#define BFX_QFIFO_READ_ONCE(x) (*(volatile uint16_t *)&(x))
 
 #define BFX_QFIFO_ALIGN_TYPE(x) __attribute__((aligned(x)))
 #define BFX_QFIFO_WEAK_TYPE __attribute__((weak))
@@ -94,9 +96,10 @@ static inline void BFX_QfifoInit(BFX_QFIFO *pFifo, char *pBuf, uint16_t uiSize)
  * @return [uint16_t] Free size of the FIFO.
  */
 static inline uint16_t BFX_QfifoFreeSize(BFX_QFIFO *pFifo) {
-    return (pFifo->tailReady > pFifo->headPend) ?
-           (pFifo->tailReady - pFifo->headPend - 1) :
-           (pFifo->size - (pFifo->headPend - pFifo->tailReady) - 1);
+    uint16_t tailReady = BFX_QFIFO_READ_ONCE(pFifo->tailReady);
+    return (tailReady > pFifo->headPend) ?
+           (tailReady - pFifo->headPend - 1) :
+           (pFifo->size - (pFifo->headPend - tailReady) - 1);
 }
 
 /**
@@ -106,9 +109,10 @@ static inline uint16_t BFX_QfifoFreeSize(BFX_QFIFO *pFifo) {
  * @return [uint16_t] Free size of the FIFO without split.
  */
 static inline uint16_t BFX_QfifoFreeNoSplitSize(BFX_QFIFO *pFifo) {
-    return (pFifo->tailReady > pFifo->headPend) ?
-           (pFifo->tailReady - pFifo->headPend - 1) :
-           (pFifo->size - pFifo->headPend - ((pFifo->tailReady == 0) ? 1 : 0));
+    uint16_t tailReady = BFX_QFIFO_READ_ONCE(pFifo->tailReady);
+    return (tailReady > pFifo->headPend) ?
+           (tailReady - pFifo->headPend - 1) :
+           (pFifo->size - pFifo->headPend - ((tailReady == 0) ? 1 : 0));
 }
 
 /**
@@ -130,9 +134,10 @@ static inline uint16_t BFX_QfifoFreeVariSize(BFX_QFIFO *pFifo) {
  * @return [uint16_t] Received size of the FIFO.
  */
 static inline uint16_t BFX_QfifoRecvSize(BFX_QFIFO *pFifo) {
-    return (pFifo->headReady >= pFifo->tailPend) ?
-           (pFifo->headReady - pFifo->tailPend) :
-           (pFifo->size - (pFifo->tailPend - pFifo->headReady));
+    uint16_t headReady = BFX_QFIFO_READ_ONCE(pFifo->headReady);
+    return (headReady >= pFifo->tailPend) ?
+           (headReady - pFifo->tailPend) :
+           (pFifo->size - (pFifo->tailPend - headReady));
 }
 
 /**
@@ -142,8 +147,9 @@ static inline uint16_t BFX_QfifoRecvSize(BFX_QFIFO *pFifo) {
  * @return [uint16_t] Received size of the FIFO without split.
  */
 static inline uint16_t BFX_QfifoRecvNoSplitSize(BFX_QFIFO *pFifo) {
-    return (pFifo->headReady >= pFifo->tailPend) ?
-           (pFifo->headReady - pFifo->tailPend) :
+    uint16_t headReady = BFX_QFIFO_READ_ONCE(pFifo->headReady);
+    return (headReady >= pFifo->tailPend) ?
+           (headReady - pFifo->tailPend) :
            (pFifo->size - pFifo->tailPend);
 }
 
@@ -168,14 +174,14 @@ static inline uint16_t BFX_QfifoRecvVariSize(BFX_QFIFO *pFifo) {
  * @param uiAcquiredSize [OUT] [uint16_t]  Pointer to the acquired size, can be smaller than uiSize.
  */
 static inline void BFX_QfifoSendAcquireNoSplit(BFX_QFIFO *pFifo, uint16_t uiSize, char **pData, uint16_t *uiAcquiredSize) {
+    uint16_t noSplitFreeSize = (BFX_QfifoFreeNoSplitSize(pFifo));
     if (BFX_QFIFO_UNLIKELY(((pFifo)->headReady != (pFifo)->headPend) ||
-        (BFX_QfifoFreeNoSplitSize(pFifo)) == 0)) {
+        noSplitFreeSize == 0)) {
             *pData = NULL;
             *uiAcquiredSize = 0;
             return;
     }
-    *uiAcquiredSize = (uiSize) < (BFX_QfifoFreeNoSplitSize(pFifo)) ?
-                        (uiSize) : (BFX_QfifoFreeNoSplitSize(pFifo));
+    *uiAcquiredSize = (uiSize) < noSplitFreeSize ? (uiSize) : noSplitFreeSize;
     *pData = &((pFifo)->buf[(pFifo)->headReady]);
     (pFifo)->headPend = ((pFifo)->headReady + (*uiAcquiredSize)) % (pFifo)->size;
 }
@@ -189,23 +195,24 @@ static inline void BFX_QfifoSendAcquireNoSplit(BFX_QFIFO *pFifo, uint16_t uiSize
  * @param ppAcquiredSize [OUT] [uint16_t[2]] Pointer to the acquired size array, can be smaller than uiSize.
  */
 static inline void BFX_QfifoSendAcquireSplit(BFX_QFIFO *pFifo, uint16_t uiSize, char *ppData[2], uint16_t ppAcquiredSize[2]) {
+    uint16_t allFreeSize = (BFX_QfifoFreeSize(pFifo));
     if (BFX_QFIFO_UNLIKELY(((pFifo)->headReady != (pFifo)->headPend) ||
-        (BFX_QfifoFreeSize(pFifo)) == 0)) {
+        allFreeSize == 0)) {
             ppData[0] = NULL;
             ppData[1] = NULL;
             ppAcquiredSize[0] = 0;
             ppAcquiredSize[1] = 0;
             return;
     }
-    uint16_t acquiredSize = (uiSize) < (BFX_QfifoFreeSize(pFifo)) ?
-                            (uiSize) : (BFX_QfifoFreeSize(pFifo));
-    if ((acquiredSize) <= (BFX_QfifoFreeNoSplitSize(pFifo))) {
+    uint16_t acquiredSize = (uiSize) < allFreeSize ? (uiSize) : allFreeSize;
+    uint16_t noSplitFreeSize = (BFX_QfifoFreeNoSplitSize(pFifo));
+    if ((acquiredSize) <= noSplitFreeSize) {
         ppAcquiredSize[0] = (acquiredSize);
         ppAcquiredSize[1] = 0;
         ppData[1] = NULL;
     } else {
-        ppAcquiredSize[0] = (BFX_QfifoFreeNoSplitSize(pFifo));
-        ppAcquiredSize[1] = (acquiredSize) - (BFX_QfifoFreeNoSplitSize(pFifo));
+        ppAcquiredSize[0] = noSplitFreeSize;
+        ppAcquiredSize[1] = (acquiredSize) - noSplitFreeSize;
         ppData[1] = &((pFifo)->buf[0]);
     }
     ppData[0] = &((pFifo)->buf[(pFifo)->headReady]);
@@ -278,14 +285,14 @@ static inline void BFX_QfifoSendUndo(BFX_QFIFO *pFifo) {
  * @param uiAcquiredSize [OUT] [uint16_t]  Pointer to the acquired size, can be smaller than uiSize.
  */
 static inline void BFX_QfifoRecvAcquireNoSplit(BFX_QFIFO *pFifo, uint16_t uiSize, char **pData, uint16_t *uiAcquiredSize) {
+    uint16_t noSplitRecvSize = (BFX_QfifoRecvNoSplitSize(pFifo));
     if (BFX_QFIFO_UNLIKELY(((pFifo)->tailReady != (pFifo)->tailPend ||
-        (BFX_QfifoRecvNoSplitSize(pFifo)) == 0))) {
+        noSplitRecvSize == 0))) {
             *pData = NULL;
             *uiAcquiredSize = 0;
             return;
     }
-    *uiAcquiredSize = (uiSize) < (BFX_QfifoRecvNoSplitSize(pFifo)) ?
-                        (uiSize) : (BFX_QfifoRecvNoSplitSize(pFifo));
+    *uiAcquiredSize = (uiSize) < noSplitRecvSize ? (uiSize) : noSplitRecvSize;
     *pData = &((pFifo)->buf[(pFifo)->tailReady]);
     (pFifo)->tailPend = ((pFifo)->tailReady + (*uiAcquiredSize)) % (pFifo)->size;
 }
@@ -299,23 +306,24 @@ static inline void BFX_QfifoRecvAcquireNoSplit(BFX_QFIFO *pFifo, uint16_t uiSize
  * @param ppAcquiredSize [OUT] [uint16_t[2]] Pointer to the acquired size array, can be smaller than uiSize.
  */
 static inline void BFX_QfifoRecvAcquireSplit(BFX_QFIFO *pFifo, uint16_t uiSize, char *ppData[2], uint16_t ppAcquiredSize[2]) {
+    uint16_t allRecvSize = (BFX_QfifoRecvSize(pFifo));
     if (BFX_QFIFO_UNLIKELY(((pFifo)->tailReady != (pFifo)->tailPend ||
-        (BFX_QfifoRecvSize(pFifo)) == 0))) {
+        allRecvSize == 0))) {
             ppData[0] = NULL;
             ppData[1] = NULL;
             ppAcquiredSize[0] = 0;
             ppAcquiredSize[1] = 0;
             return;
     }
-    uint16_t acquiredSize = (uiSize) < (BFX_QfifoRecvSize(pFifo)) ?
-                        (uiSize) : (BFX_QfifoRecvSize(pFifo));
-    if ((acquiredSize) <= BFX_QfifoRecvNoSplitSize(pFifo)) {
+    uint16_t acquiredSize = (uiSize) < allRecvSize ? (uiSize) : allRecvSize;
+    uint16_t noSplitRecvSize = (BFX_QfifoRecvNoSplitSize(pFifo));
+    if ((acquiredSize) <= noSplitRecvSize) {
         ppAcquiredSize[0] = (acquiredSize);
         ppAcquiredSize[1] = 0;
         ppData[1] = NULL;
     } else {
-        ppAcquiredSize[0] = (BFX_QfifoRecvNoSplitSize(pFifo));
-        ppAcquiredSize[1] = (acquiredSize) - (BFX_QfifoRecvNoSplitSize(pFifo));
+        ppAcquiredSize[0] = noSplitRecvSize;
+        ppAcquiredSize[1] = (acquiredSize) - noSplitRecvSize;
         ppData[1] = &((pFifo)->buf[0]);
     }
     ppData[0] = &((pFifo)->buf[(pFifo)->tailReady]);
@@ -0,0 +1,178 @@
+"""
+BufferFlowX 链接器脚本生成器 - 命令行入口
+不依赖tkinter，按GUI保存的项目文件批量生成链接器脚本与头文件，供CI和构建系统调用
+"""
+import argparse
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+# 导入自定义模块
+from src.data_manager import DataManager
+from src.template_handler import TemplateHandler
+
+LINKER_TYPES = ("gcc", "keil")
+LINKER_EXTENSIONS = {"gcc": ".ld", "keil": ".sct"}
+
+# 模板第二行的生成时间每次渲染都不同，判断内容是否变化时不计
+_TIMESTAMP_RE = re.compile(r"^(/\* |; )Generated at: [^\n]*$", re.MULTILINE)
+
+# 每个进程、每个模板目录只加载一次模板
+_template_handlers = {}
+
+
+def get_template_handler(template_dir=None):
+    """获取模板处理器，template_dir为None时使用内置模板"""
+    handler = _template_handlers.get(template_dir)
+    if handler is None:
+        handler = TemplateHandler(template_dir)
+        _template_handlers[template_dir] = handler
+    return handler
+
+
+def write_if_changed(filepath, content):
+    """除生成时间外内容有变化时才写入，保持未变化文件的时间戳，返回是否写入"""
+    try:
+        with open(filepath, 'r', encoding='utf-8') as f:
+            if _TIMESTAMP_RE.sub("", f.read()) == _TIMESTAMP_RE.sub("", content):
+                return False
+    except (FileNotFoundError, UnicodeDecodeError):
+        pass
+    directory = os.path.dirname(filepath)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(filepath, 'w', encoding='utf-8') as f:
+        f.write(content)
+    return True
+
+
+def _linker_type_of(filepath):
+    """按扩展名推断链接器类型，与GUI保存时的默认扩展名一致"""
+    return "keil" if filepath.lower().endswith(LINKER_EXTENSIONS["keil"]) else "gcc"
+
+
+def plan_outputs(project_file, data, linker=None, output_dir=None):
+    """返回项目的输出列表[(类型, 路径)]，类型为gcc、keil或header
+
+    指定output_dir时输出<项目名>.ld/.sct与<项目名>.h；否则使用项目中的output_paths，
+    相对路径相对于项目文件所在目录。linker为None时按已保存的脚本扩展名推断，"all"表示gcc与keil都生成。
+    """
+    paths = data.get("output_paths") or {}
+    script_path = paths.get("linker_script", "")
+    header_path = paths.get("header_file", "")
+    if output_dir is not None:
+        stem = os.path.splitext(os.path.basename(project_file))[0]
+        script_path = os.path.join(output_dir, stem + LINKER_EXTENSIONS[linker if linker in LINKER_TYPES else "gcc"])
+        header_path = os.path.join(output_dir, stem + ".h")
+    else:
+        project_dir = os.path.dirname(os.path.abspath(project_file))
+        script_path = os.path.join(project_dir, script_path) if script_path else ""
+        header_path = os.path.join(project_dir, header_path) if header_path else ""
+
+    outputs = []
+    if script_path:
+        saved_type = _linker_type_of(script_path)
+        if linker == "all":
+            linker_types = list(LINKER_TYPES)
+        else:
+            linker_types = [linker or saved_type]
+        for linker_type in linker_types:
+            # 与已保存路径类型不同的脚本改用对应的扩展名
+            if linker_type == saved_type:
+                outputs.append((linker_type, script_path))
+            else:
+                outputs.append((linker_type, os.path.splitext(script_path)[0] + LINKER_EXTENSIONS[linker_type]))
+    if header_path:
+        outputs.append(("header", header_path))
+    return outputs
+
+
+def generate_project(project_file, linker=None, output_dir=None, template_dir=None):
+    """生成单个项目的链接器脚本与头文件，返回[(路径, 是否被更新)]，项目无效时抛出ValueError"""
+    data_manager = DataManager()
+    success, message = data_manager.load_from_json(project_file)
+    if not success:
+        raise ValueError(message)
+    errors = data_manager.validate_sections()
+    if errors:
+        raise ValueError("; ".join(errors))
+    outputs = plan_outputs(project_file, data_manager.data, linker, output_dir)
+    if not outputs:
+        raise ValueError("项目未设置输出路径，请在GUI中设置或使用 --output-dir")
+
+    handler = get_template_handler(template_dir)
+    sections = data_manager.data["custom_sections"]
+    results = []
+    for kind, filepath in outputs:
+        if kind == "header":
+            content = handler.generate_header_file(sections, data_manager.data.get("component", "DEFAULT"))
+        else:
+            content = handler.generate_linker_script(sections, kind)
+        results.append((filepath, write_if_changed(filepath, content)))
+    return results
+
+
+def run_batch(project_files, jobs=0, linker=None, output_dir=None, template_dir=None):
+    """批量生成，多个项目时分发到进程池并行渲染，返回每个项目的(项目文件, 输出列表, 错误信息)"""
+    if jobs <= 0:
+        jobs = os.cpu_count() or 1
+    jobs = min(jobs, len(project_files))
+
+    results = []
+    if jobs <= 1:
+        for project_file in project_files:
+            try:
+                results.append((project_file, generate_project(project_file, linker, output_dir, template_dir), None))
+            except Exception as e:
+                results.append((project_file, None, str(e)))
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = [(project_file, pool.submit(generate_project, project_file, linker, output_dir, template_dir))
+                       for project_file in project_files]
+            for project_file, future in futures:
+                try:
+                    results.append((project_file, future.result(), None))
+                except Exception as e:
+                    results.append((project_file, None, str(e)))
+    return results
+
+
+def report_results(results):
+    """打印生成结果，返回失败的项目数"""
+    failed = 0
+    for project_file, outputs, error in results:
+        if error is not None:
+            failed += 1
+            print(f"-- Linker generate FAILED: {project_file}: {error}", file=sys.stderr)
+            continue
+        updated = [filepath for filepath, changed in outputs if changed]
+        if updated:
+            print(f"-- Linker generated OK: {' and '.join(updated)}")
+        else:
+            print(f"-- Linker up to date: {project_file}")
+    return failed
+
+
+def main():
+    """主函数"""
+    arg_parser = argparse.ArgumentParser(description="BufferFlowX 链接器脚本生成器（命令行）")
+    arg_parser.add_argument('projects', nargs='+', help="GUI保存的JSON项目文件")
+    arg_parser.add_argument('-o', '--output-dir',
+                            help="输出目录，生成<项目名>.ld/.sct与<项目名>.h；默认使用项目中保存的输出路径")
+    arg_parser.add_argument('--linker', choices=LINKER_TYPES + ("all",),
+                            help="链接器类型，all表示gcc与keil都生成；默认按项目中脚本路径的扩展名推断，"
+                                 "使用--output-dir时默认为gcc")
+    arg_parser.add_argument('-j', '--jobs', type=int, default=0, help="并行进程数，默认为CPU核数")
+    arg_parser.add_argument('--templates', metavar='DIR', help="自定义模板目录，默认使用template/")
+    args = arg_parser.parse_args()
+
+    output_dir = os.path.abspath(args.output_dir) if args.output_dir else None
+    template_dir = os.path.abspath(args.templates) if args.templates else None
+    results = run_batch(args.projects, args.jobs, args.linker, output_dir, template_dir)
+    if report_results(results) != 0:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
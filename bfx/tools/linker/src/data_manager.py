@@ -41,7 +41,7 @@ class DataManager:
         if size_str.startswith("0x") or size_str.startswith("0X"):
             try:
                 int(size_str, 16)
-                return True
+                return True, ""
             except ValueError:
                 return False, "无效的十六进制大小值"
         else:
@@ -66,6 +66,38 @@ class DataManager:
         
         return True, ""
     
+    def validate_sections(self):
+        """检查全部段的必填字段与数值格式，返回错误信息列表，用于命令行生成前的校验"""
+        errors = []
+        names = set()
+        for index, section in enumerate(self.data["custom_sections"]):
+            name = section.get("name")
+            label = f"段 {index + 1} ({name})" if name else f"段 {index + 1}"
+            if not name:
+                errors.append(f"{label}: 缺少段名")
+            elif name in names:
+                errors.append(f"{label}: 段名重复")
+            names.add(name)
+            if not section.get("memory_region"):
+                errors.append(f"{label}: 缺少内存区域")
+            if "max_size" in section and "fixed_size" in section:
+                errors.append(f"{label}: max_size与fixed_size不能同时指定")
+            for key in ("max_size", "fixed_size"):
+                if key in section:
+                    is_valid, error_msg = self.validate_size_value(section[key])
+                    if not is_valid:
+                        errors.append(f"{label}: {key}: {error_msg}")
+            if "start_address" in section:
+                is_valid, error_msg = self.validate_address_value(section["start_address"])
+                if not is_valid:
+                    errors.append(f"{label}: start_address: {error_msg}")
+            if "alignment" in section:
+                try:
+                    int(str(section["alignment"]))
+                except ValueError:
+                    errors.append(f"{label}: 对齐方式应为整数")
+        return errors
+    
     def add_section(self, section_data):
         """添加新段"""
         # 检查段名是否已存在
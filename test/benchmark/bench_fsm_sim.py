@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+bfx_fsm_sim.py 仿真吞吐量：单条长轨迹与多条轨迹批量仿真
+用法: python3 bench_fsm_sim.py [plantuml_file] [-n events] [-b traces]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'bfx', 'fsm'))
+DEFAULT_PUML = os.path.join(ROOT_DIR, 'test', 'testcase', 'FsmTest.puml')
+
+import bfx_fsm_sim  # noqa: E402
+
+
+def best_of(func, rounds=3):
+    """执行若干次，返回最短耗时(s)"""
+    best = float('inf')
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument('plantuml_file', nargs='?', default=DEFAULT_PUML)
+    arg_parser.add_argument('-n', '--events', type=int, default=2_000_000)
+    arg_parser.add_argument('-b', '--traces', type=int, default=10_000)
+    args = arg_parser.parse_args()
+
+    sim = bfx_fsm_sim.FsmSimulator.from_file(args.plantuml_file)
+    rng = np.random.default_rng(0)
+    events = rng.integers(1, sim.event_cnt + 1, args.events)
+    traces = rng.integers(1, sim.event_cnt + 1, (args.traces, max(1, args.events // args.traces)))
+
+    cases = (
+        ('single', events.size, lambda: sim.run(events)),
+        ('single+states', events.size, lambda: sim.run(events, return_states=True)),
+        ('batch', traces.size, lambda: sim.run_batch(traces)),
+        ('batch+states', traces.size, lambda: sim.run_batch(traces, return_states=True)),
+    )
+    print(f"states={sim.state_cnt} events={sim.event_cnt}")
+    print(f"{'mode':<16}{'events':>12}{'Mevents/s':>12}")
+    for name, count, func in cases:
+        print(f"{name:<16}{count:>12}{count / best_of(func) / 1e6:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
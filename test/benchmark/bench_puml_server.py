@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+bfx_puml_translate.py 冷启动与常驻服务生成延迟对比
+用法: python3 bench_puml_server.py [plantuml_file] [-n rounds]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+SCRIPT = os.path.join(ROOT_DIR, 'bfx', 'fsm', 'bfx_puml_translate.py')
+DEFAULT_PUML = os.path.join(ROOT_DIR, 'test', 'testcase', 'FsmTest.puml')
+
+
+def time_runs(cmd, rounds):
+    """执行命令若干次，返回每次的耗时(ms)"""
+    costs = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL)
+        costs.append((time.perf_counter() - start) * 1000)
+    return costs
+
+
+def wait_for_socket(socket_path, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not os.path.exists(socket_path):
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"server did not start: {socket_path}")
+        time.sleep(0.01)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument('plantuml_file', nargs='?', default=DEFAULT_PUML)
+    arg_parser.add_argument('-n', '--rounds', type=int, default=20)
+    args = arg_parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        out_dir = os.path.join(work_dir, 'out')
+        socket_path = os.path.join(work_dir, 'bench.sock')
+
+        cold = time_runs([sys.executable, SCRIPT, args.plantuml_file, '-o', out_dir], args.rounds)
+
+        server = subprocess.Popen([sys.executable, SCRIPT, '--serve', socket_path], stdout=subprocess.DEVNULL)
+        try:
+            wait_for_socket(socket_path)
+            warm = time_runs([sys.executable, SCRIPT, '--server', socket_path, args.plantuml_file,
+                              '-o', out_dir], args.rounds)
+        finally:
+            subprocess.run([sys.executable, SCRIPT, '--stop-server', socket_path], check=False)
+            server.wait(timeout=10)
+
+    print(f"{'mode':<8}{'median(ms)':>12}{'min(ms)':>12}")
+    for name, costs in (('cold', cold), ('warm', warm)):
+        print(f"{name:<8}{statistics.median(costs):>12.1f}{min(costs):>12.1f}")
+    print(f"speedup {statistics.median(cold) / statistics.median(warm):.2f}x")
+
+
+if __name__ == '__main__':
+    main()
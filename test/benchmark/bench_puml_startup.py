@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+bfx_puml_translate.py 生成后端启动耗时对比：native直接拼接与jinja2模板渲染
+用法: python3 bench_puml_startup.py [plantuml_file] [-n rounds]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+FSM_DIR = os.path.join(ROOT_DIR, 'bfx', 'fsm')
+SCRIPT = os.path.join(FSM_DIR, 'bfx_puml_translate.py')
+DEFAULT_PUML = os.path.join(ROOT_DIR, 'test', 'testcase', 'FsmTest.puml')
+
+# 子进程内测量：导入生成器到写完第一个FSM的耗时，不含解释器自身启动
+FIRST_RENDER = """
+import sys, time
+start = time.perf_counter()
+import bfx_puml_translate as translate
+translate.translate_file(sys.argv[1], sys.argv[2], options=translate.GenerateOptions(backend=sys.argv[3]))
+print((time.perf_counter() - start) * 1000)
+"""
+
+
+def time_runs(cmd, rounds):
+    """执行命令若干次，返回每次的耗时(ms)"""
+    costs = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL)
+        costs.append((time.perf_counter() - start) * 1000)
+    return costs
+
+
+def first_render_runs(plantuml_file, out_dir, backend, rounds):
+    """在新进程中导入生成器并渲染一次，返回每次的耗时(ms)"""
+    return [float(subprocess.run([sys.executable, '-c', FIRST_RENDER, plantuml_file, out_dir, backend],
+                                 check=True, capture_output=True, text=True, cwd=FSM_DIR).stdout)
+            for _ in range(rounds)]
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument('plantuml_file', nargs='?', default=DEFAULT_PUML)
+    arg_parser.add_argument('-n', '--rounds', type=int, default=20)
+    args = arg_parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        for backend in ('native', 'jinja2'):
+            out_dir = os.path.join(work_dir, backend)
+            process = time_runs([sys.executable, SCRIPT, args.plantuml_file, '-o', out_dir, '--backend', backend],
+                                args.rounds)
+            results[backend] = (process, first_render_runs(args.plantuml_file, out_dir, backend, args.rounds))
+        for suffix in ('.h', '.c'):
+            name = os.path.splitext(os.path.basename(args.plantuml_file))[0] + suffix
+            with open(os.path.join(work_dir, 'native', name), 'rb') as f, \
+                 open(os.path.join(work_dir, 'jinja2', name), 'rb') as g:
+                if f.read() != g.read():
+                    sys.exit(f"{name}: native and jinja2 outputs differ")
+
+    print(f"{'backend':<10}{'process(ms)':>14}{'import+render(ms)':>20}")
+    for backend, (process, first_render) in results.items():
+        print(f"{backend:<10}{statistics.median(process):>14.1f}{statistics.median(first_render):>20.1f}")
+    native, jinja2 = results['native'], results['jinja2']
+    print(f"speedup {statistics.median(jinja2[0]) / statistics.median(native[0]):.2f}x process, "
+          f"{statistics.median(jinja2[1]) / statistics.median(native[1]):.2f}x import+render")
+
+
+if __name__ == '__main__':
+    main()
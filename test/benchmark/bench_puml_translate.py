@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+bfx_puml_translate.py 各阶段吞吐量：在合成状态图上分别统计解析、名称解析、渲染与写文件
+用法: python3 bench_puml_translate.py [-s 1000,10000] [-d depth] [-e events] [-f fanout] [-n rounds]
+                                      [--memory] [--json FILE] [--baseline FILE] [--tolerance 0.3]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'bfx', 'fsm'))
+
+import bfx_puml_translate as translate  # noqa: E402
+from puml_workload import make_workload  # noqa: E402
+
+PHASES = ('parse', 'resolve', 'render', 'write')
+
+
+def bench_size(work_dir, states, args):
+    """同一规模执行若干轮，每个阶段取最短耗时；每轮清空缓存与输出目录，保证各阶段都真实执行"""
+    plantuml_file = os.path.join(work_dir, f'workload_{states}.puml')
+    with open(plantuml_file, 'w', encoding='utf-8') as f:
+        f.write(make_workload(states, args.depth, args.events, args.fanout))
+    output_dir = os.path.join(work_dir, 'out')
+
+    best = {}
+    for _ in range(args.rounds):
+        translate.clear_memo()
+        shutil.rmtree(output_dir, ignore_errors=True)
+        translate.start_phase_timing(trace_memory=args.memory)
+        try:
+            translate.translate_file(plantuml_file, output_dir)
+        finally:
+            timer = translate.stop_phase_timing()
+        for name, entry in timer.phases.items():
+            if name not in best or entry['seconds'] < best[name]['seconds']:
+                best[name] = entry
+
+    return {name: {
+        'seconds': round(best[name]['seconds'], 6),
+        'states_per_s': round(states / best[name]['seconds']) if best[name]['seconds'] > 0 else None,
+        'peak_bytes': best[name]['peak_bytes'] if args.memory else None,
+    } for name in PHASES if name in best}
+
+
+def find_regressions(results, baseline, tolerance):
+    """与基线相比吞吐量下降超过tolerance的(规模, 阶段, 当前, 基线)"""
+    regressions = []
+    for size, phases in results.items():
+        for name, entry in phases.items():
+            base = baseline.get(size, {}).get(name, {}).get('states_per_s')
+            if base and entry['states_per_s'] is not None and entry['states_per_s'] < base * (1 - tolerance):
+                regressions.append((size, name, entry['states_per_s'], base))
+    return regressions
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument('-s', '--states', default='1000,10000', help="状态数，逗号分隔多个规模")
+    arg_parser.add_argument('-d', '--depth', type=int, default=3)
+    arg_parser.add_argument('-e', '--events', type=int, default=16)
+    arg_parser.add_argument('-f', '--fanout', type=int, default=2)
+    arg_parser.add_argument('-n', '--rounds', type=int, default=3)
+    arg_parser.add_argument('--memory', action='store_true', help="用tracemalloc统计各阶段峰值内存，耗时会偏高")
+    arg_parser.add_argument('--json', metavar='FILE', help="结果写入JSON文件，可作为之后的基线")
+    arg_parser.add_argument('--baseline', metavar='FILE', help="基线JSON，吞吐量下降超过容差时返回1")
+    arg_parser.add_argument('--tolerance', type=float, default=0.3)
+    args = arg_parser.parse_args()
+
+    sizes = [int(size) for size in args.states.split(',')]
+    results = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        for states in sizes:
+            results[str(states)] = bench_size(work_dir, states, args)
+
+    print(f"depth={args.depth} events={args.events} fanout={args.fanout} rounds={args.rounds}")
+    print(f"{'states':>8} {'phase':<8}{'ms':>10}{'kstates/s':>12}{'peak MB':>10}")
+    for size, phases in results.items():
+        for name, entry in phases.items():
+            peak = f"{entry['peak_bytes'] / 1e6:>10.1f}" if entry['peak_bytes'] is not None else f"{'-':>10}"
+            rate = f"{entry['states_per_s'] / 1e3:>12.1f}" if entry['states_per_s'] is not None else f"{'-':>12}"
+            print(f"{size:>8} {name:<8}{entry['seconds'] * 1e3:>10.2f}{rate}{peak}")
+
+    report = {
+        'params': {'depth': args.depth, 'events': args.events, 'fanout': args.fanout, 'rounds': args.rounds},
+        'results': results,
+    }
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+            f.write('\n')
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)['results']
+        regressions = find_regressions(results, baseline, args.tolerance)
+        for size, name, current, base in regressions:
+            print(f"REGRESSION {size} states {name}: {current} states/s, baseline {base}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
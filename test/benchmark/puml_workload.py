@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+合成PlantUML状态图，用于生成器基准测试
+用法: python3 puml_workload.py [-s states] [-d depth] [-e events] [-f fanout] [--seed N] [-o file]
+"""
+
+import argparse
+import random
+import sys
+from typing import Dict, List, Optional
+
+
+def make_workload(states: int, depth: int = 3, events: int = 16, fanout: int = 2, seed: int = 0,
+                  project: str = 'Workload') -> str:
+    """生成状态图文本
+
+    states为状态总数，depth为最大嵌套层数（1为无嵌套），events为事件种类数，fanout为每个状态的转移数。
+    状态名全局唯一，转移写在源状态所在的作用域内，目标随机，相同参数总是生成相同的文本。
+    """
+    rng = random.Random(seed)
+    parents: List[Optional[int]] = []
+    levels: List[int] = []
+    for index in range(states):
+        # 约一半的状态挂在可继续嵌套的已有状态下，其余为顶层状态
+        nestable = [i for i in range(max(0, index - 64), index) if levels[i] < depth]
+        parent = rng.choice(nestable) if nestable and rng.random() < 0.5 else None
+        parents.append(parent)
+        levels.append(1 if parent is None else levels[parent] + 1)
+
+    children: Dict[Optional[int], List[int]] = {}
+    for index, parent in enumerate(parents):
+        children.setdefault(parent, []).append(index)
+
+    lines = [f'@startuml {project}']
+
+    def emit(scope: Optional[int], indent: str):
+        members = children[scope]
+        for index in members:
+            lines.append(f'{indent}S{index}: state {index}')
+        lines.append(f'{indent}[*] --> S{members[0]}')
+        for index in members:
+            for _ in range(fanout):
+                lines.append(f'{indent}S{index} --> S{rng.randrange(states)} : Ev{rng.randrange(events)}')
+        for index in members:
+            if index in children:
+                lines.append(f'{indent}state S{index} {{')
+                emit(index, indent + '    ')
+                lines.append(f'{indent}}}')
+
+    emit(None, '    ')
+    lines.append('@enduml')
+    return '\n'.join(lines) + '\n'
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument('-s', '--states', type=int, default=1000)
+    arg_parser.add_argument('-d', '--depth', type=int, default=3)
+    arg_parser.add_argument('-e', '--events', type=int, default=16)
+    arg_parser.add_argument('-f', '--fanout', type=int, default=2)
+    arg_parser.add_argument('--seed', type=int, default=0)
+    arg_parser.add_argument('-o', '--output', help="输出文件，默认stdout")
+    args = arg_parser.parse_args()
+
+    text = make_workload(args.states, args.depth, args.events, args.fanout, args.seed)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+    else:
+        sys.stdout.write(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,9 @@
+# FsmTest 事件频度：<状态> <事件> <次数>
+RunMain.LedOn Tmr200Ms 5000
+RunMain.LedOff Tmr200Ms 5000
+RunMain.LedOn BottonPressed 12
+RunMain.LedOff BottonPressed 9
+RunMain.DisplayOLED.ShowText TextUpdated 300
+BootLoader FileLoaded 20
+BootLoader ErrOccur 1
+Setup SelfCheckDone 20
@@ -103,3 +103,34 @@ TEST(fsm, TurnToGrandFatherTransfer) {
 
     BFX_FsmResetTo(&g_FsmTest_fsmHandle, FSMTEST_SETUP);
 }
+
+TEST(fsm, TargetsResolvedToLeaf) {
+    EXPECT_EQ(g_FsmTest_fsmHandle.leafTargets, 1);
+    (void)BFX_FsmProcessEvent(&g_FsmTest_fsmHandle, FSMTEST_SELFCHECKDONE, NULL, 0);
+    (void)BFX_FsmProcessEvent(&g_FsmTest_fsmHandle, FSMTEST_FILELOADED, NULL, 0);
+    (void)BFX_FsmProcessEvent(&g_FsmTest_fsmHandle, FSMTEST_BOTTONPRESSED, NULL, 0);
+    uint8_t state = BFX_FsmGetCurrentStateID(&g_FsmTest_fsmHandle);
+    EXPECT_EQ(state, FSMTEST_RUNMAIN_DISPLAYOLED_SETUPIIC);
+
+    BFX_FsmResetTo(&g_FsmTest_fsmHandle, FSMTEST_SETUP);
+}
+
+static void BFX_FsmTest_Manual_ActionCb(BFX_FSM_ACTION_CTX *ctx, void *arg, uint16_t argSize)
+{
+}
+TEST(fsm, UnresolvedTargetsWalkDefaultChain) {
+    /* 1 -> 2(composite) -> 3(composite) -> 4 */
+    const BFX_FSM_TRAN_RECORD tranTbl[] = { { 1, 2 } };
+    const BFX_FSM_STATE stateTbl[] = {
+        { 1, 1, BFX_STATUS_FATHER_NONE, 1, tranTbl, BFX_FsmTest_Manual_ActionCb },
+        { 2, 3, BFX_STATUS_FATHER_NONE, 0, NULL, BFX_FsmTest_Manual_ActionCb },
+        { 3, 4, 2, 0, NULL, BFX_FsmTest_Manual_ActionCb },
+        { 4, 4, 3, 0, NULL, BFX_FsmTest_Manual_ActionCb },
+    };
+    BFX_FSM_HANDLE handle = {};
+    handle.stateTbl = stateTbl;
+    handle.stateCnt = 4;
+    handle.currentStateId = 1;
+    EXPECT_EQ(BFX_FsmProcessEvent(&handle, 1, NULL, 0), 0);
+    EXPECT_EQ(BFX_FsmGetCurrentStateID(&handle), 4);
+}
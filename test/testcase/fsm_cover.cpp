@@ -0,0 +1,67 @@
+/**
+ * @file fsm_cover.cpp
+ * @author CYK-Dot
+ * @brief Replay the transition-covering sequences generated by bfx_fsm_cover.py
+ * @version 0.1
+ * @date 2026-10-17
+ *
+ * @copyright Copyright (c) 2025 CYK-Dot, MIT License.
+ */
+
+/* Header import ------------------------------------------------------------------*/
+#include <gtest/gtest.h>
+#include <set>
+#include <utility>
+#include "bfx_fsm.h"
+#include "generated/FsmTest_cover.h"
+#include "generated/FsmSparseTest_cover.h"
+
+/* Config macros ------------------------------------------------------------------*/
+
+/* Mock variables and functions  --------------------------------------------------*/
+
+/**
+ * @brief replay every sequence from the initial state, return the (state, event) pairs taken
+ */
+static std::set<std::pair<int, int>> ReplayCover(BFX_FSM_HANDLE *handle, BFX_FSM_STATE_ID initialState,
+                                                 const BFX_FSM_COVER_STEP *steps,
+                                                 const BFX_FSM_COVER_SEQ *seqs, uint16_t seqCnt)
+{
+    std::set<std::pair<int, int>> taken;
+    for (uint16_t seq = 0; seq < seqCnt; seq++) {
+        BFX_FsmResetTo(handle, initialState);
+        for (uint16_t i = seqs[seq].first; i < seqs[seq].first + seqs[seq].cnt; i++) {
+            BFX_FSM_STATE_ID from = BFX_FsmGetCurrentStateID(handle);
+            EXPECT_EQ(BFX_FsmProcessEvent(handle, steps[i].event, NULL, 0), 0) << "sequence " << seq << " step " << i;
+            EXPECT_EQ(BFX_FsmGetCurrentStateID(handle), steps[i].expected) << "sequence " << seq << " step " << i;
+            taken.insert({ from, steps[i].event });
+        }
+    }
+    BFX_FsmResetTo(handle, initialState);
+    return taken;
+}
+
+/* Test suites --------------------------------------------------------------------*/
+
+/* Test cases ---------------------------------------------------------------------*/
+
+TEST(fsm_cover, FsmTestSequencesCoverEveryTransition) {
+#ifdef BFX_FSM_TRACE_ENABLE
+    BFX_FSM_TRACE *trace = g_FsmTest_fsmHandle.trace;
+    g_FsmTest_fsmHandle.trace = NULL;
+#endif
+    std::set<std::pair<int, int>> taken = ReplayCover(&g_FsmTest_fsmHandle, FSMTEST_INITIAL_STATE,
+                                                      g_FsmTest_coverSteps, g_FsmTest_coverSeqs, FSMTEST_COVER_SEQ_CNT);
+#ifdef BFX_FSM_TRACE_ENABLE
+    g_FsmTest_fsmHandle.trace = trace;
+#endif
+    EXPECT_EQ(taken.size(), (size_t)FSMTEST_COVER_TRAN_CNT);
+    EXPECT_LT(FSMTEST_COVER_STEP_CNT, 3 * FSMTEST_COVER_TRAN_CNT);
+}
+
+TEST(fsm_cover, FsmSparseTestSequencesCoverEveryTransition) {
+    std::set<std::pair<int, int>> taken = ReplayCover(&g_FsmSparseTest_fsmHandle, FSMSPARSETEST_INITIAL_STATE,
+                                                      g_FsmSparseTest_coverSteps, g_FsmSparseTest_coverSeqs,
+                                                      FSMSPARSETEST_COVER_SEQ_CNT);
+    EXPECT_EQ(taken.size(), (size_t)FSMSPARSETEST_COVER_TRAN_CNT);
+}
@@ -0,0 +1,87 @@
+/**
+ * @file fsm_dense.cpp
+ * @author CYK-Dot
+ * @brief FSM generated with the dense dispatch table
+ * @version 0.1
+ * @date 2026-10-17
+ *
+ * @copyright Copyright (c) 2025 CYK-Dot, MIT License.
+ */
+
+/* Header import ------------------------------------------------------------------*/
+#include <gtest/gtest.h>
+#include "bfx_fsm.h"
+#include "generated/FsmDenseTest.h"
+
+/* Config macros ------------------------------------------------------------------*/
+
+/* Mock variables and functions  --------------------------------------------------*/
+
+/* Test suites --------------------------------------------------------------------*/
+
+/* Test cases ---------------------------------------------------------------------*/
+
+TEST(fsm_dense, SetUp) {
+    EXPECT_NE(g_FsmDenseTest_fsmHandle.dispatchTbl, (uint8_t const *)NULL);
+    uint8_t state = BFX_FsmGetCurrentStateID(&g_FsmDenseTest_fsmHandle);
+    EXPECT_EQ(state, FSMDENSETEST_SETUP);
+}
+
+TEST(fsm_dense, ZeroLayerMultiTransfer) {
+    (void)BFX_FsmProcessEvent(&g_FsmDenseTest_fsmHandle, FSMDENSETEST_SELFCHECKDONE, NULL, 0);
+    (void)BFX_FsmProcessEvent(&g_FsmDenseTest_fsmHandle, FSMDENSETEST_ERROCCUR, NULL, 0);
+    uint8_t state = BFX_FsmGetCurrentStateID(&g_FsmDenseTest_fsmHandle);
+    EXPECT_EQ(state, FSMDENSETEST_COREDUMP);
+
+    BFX_FsmResetTo(&g_FsmDenseTest_fsmHandle, FSMDENSETEST_SETUP);
+}
+
+TEST(fsm_dense, SameLayerTransferAfterCrossLayerTransfer) {
+    (void)BFX_FsmProcessEvent(&g_FsmDenseTest_fsmHandle, FSMDENSETEST_SELFCHECKDONE, NULL, 0);
+    (void)BFX_FsmProcessEvent(&g_FsmDenseTest_fsmHandle, FSMDENSETEST_FILELOADED, NULL, 0);
+    uint8_t state = BFX_FsmGetCurrentStateID(&g_FsmDenseTest_fsmHandle);
+    EXPECT_EQ(state, FSMDENSETEST_RUNMAIN_LEDON);
+
+    (void)BFX_FsmProcessEvent(&g_FsmDenseTest_fsmHandle, FSMDENSETEST_TMR200MS, NULL, 0);
+    state = BFX_FsmGetCurrentStateID(&g_FsmDenseTest_fsmHandle);
+    EXPECT_EQ(state, FSMDENSETEST_RUNMAIN_LEDOFF);
+
+    (void)BFX_FsmProcessEvent(&g_FsmDenseTest_fsmHandle, FSMDENSETEST_TMR200MS, NULL, 0);
+    state = BFX_FsmGetCurrentStateID(&g_FsmDenseTest_fsmHandle);
+    EXPECT_EQ(state, FSMDENSETEST_RUNMAIN_LEDON);
+
+    BFX_FsmResetTo(&g_FsmDenseTest_fsmHandle, FSMDENSETEST_SETUP);
+}
+
+TEST(fsm_dense, TurnToGrandFatherTransfer) {
+    (void)BFX_FsmProcessEvent(&g_FsmDenseTest_fsmHandle, FSMDENSETEST_SELFCHECKDONE, NULL, 0);
+    (void)BFX_FsmProcessEvent(&g_FsmDenseTest_fsmHandle, FSMDENSETEST_FILELOADED, NULL, 0);
+    (void)BFX_FsmProcessEvent(&g_FsmDenseTest_fsmHandle, FSMDENSETEST_BOTTONPRESSED, NULL, 0);
+    (void)BFX_FsmProcessEvent(&g_FsmDenseTest_fsmHandle, FSMDENSETEST_IICINITDONE, NULL, 0);
+    uint8_t state = BFX_FsmGetCurrentStateID(&g_FsmDenseTest_fsmHandle);
+    EXPECT_EQ(state, FSMDENSETEST_RUNMAIN_DISPLAYOLED_INITOLED);
+
+    (void)BFX_FsmProcessEvent(&g_FsmDenseTest_fsmHandle, FSMDENSETEST_ERROCCUR, NULL, 0);
+    state = BFX_FsmGetCurrentStateID(&g_FsmDenseTest_fsmHandle);
+    EXPECT_EQ(state, FSMDENSETEST_COREDUMP);
+
+    BFX_FsmResetTo(&g_FsmDenseTest_fsmHandle, FSMDENSETEST_SETUP);
+}
+
+TEST(fsm_dense, UnhandledEvent) {
+    EXPECT_EQ(BFX_FsmProcessEvent(&g_FsmDenseTest_fsmHandle, FSMDENSETEST_TMR200MS, NULL, 0), 1);
+    EXPECT_EQ(BFX_FsmProcessEvent(&g_FsmDenseTest_fsmHandle, 0, NULL, 0), 1);
+    EXPECT_EQ(BFX_FsmProcessEvent(&g_FsmDenseTest_fsmHandle, g_FsmDenseTest_fsmHandle.maxEventId + 1, NULL, 0), 1);
+    uint8_t state = BFX_FsmGetCurrentStateID(&g_FsmDenseTest_fsmHandle);
+    EXPECT_EQ(state, FSMDENSETEST_SETUP);
+}
+
+TEST(fsm_dense, OutOfRangeState) {
+    BFX_FSM_STATE_ID invalid[] = { 0, (BFX_FSM_STATE_ID)(g_FsmDenseTest_fsmHandle.maxStateId + 1) };
+    for (BFX_FSM_STATE_ID stateId : invalid) {
+        g_FsmDenseTest_fsmHandle.currentStateId = stateId;
+        EXPECT_EQ(BFX_FsmProcessEvent(&g_FsmDenseTest_fsmHandle, FSMDENSETEST_SELFCHECKDONE, NULL, 0), 1);
+        EXPECT_EQ(BFX_FsmGetCurrentStateID(&g_FsmDenseTest_fsmHandle), stateId);
+    }
+    BFX_FsmResetTo(&g_FsmDenseTest_fsmHandle, FSMDENSETEST_SETUP);
+}
@@ -0,0 +1,179 @@
+/**
+ * @file fsm_image.cpp
+ * @author CYK-Dot
+ * @brief FSMs loaded from binary images generated with --image
+ * @version 0.1
+ * @date 2026-10-17
+ *
+ * @copyright Copyright (c) 2025 CYK-Dot, MIT License.
+ */
+
+/* Header import ------------------------------------------------------------------*/
+#include <gtest/gtest.h>
+#include <cstddef>
+#include <cstdio>
+#include <random>
+#include <string>
+#include <vector>
+#include "bfx_fsm.h"
+#include "generated/FsmTest.h"
+
+/* Config macros ------------------------------------------------------------------*/
+
+/* Mock variables and functions  --------------------------------------------------*/
+
+static BFX_FSM_STATE_ID s_enteredState = 0;
+static BFX_FSM_EVENT_ID s_enteredEvent = 0;
+
+static void RecordLedOn(BFX_FSM_ACTION_CTX *ctx, void *arg, uint16_t argSize)
+{
+    s_enteredState = FSMTEST_RUNMAIN_LEDON;
+    s_enteredEvent = ctx->eventID;
+}
+
+static void RecordCoreDump(BFX_FSM_ACTION_CTX *ctx, void *arg, uint16_t argSize)
+{
+    s_enteredState = FSMTEST_COREDUMP;
+    s_enteredEvent = ctx->eventID;
+}
+
+/* the generated image sits next to this file, loaded into a 4-byte aligned buffer */
+static std::vector<uint32_t> LoadImageFile(uint32_t *imageSize)
+{
+    std::string path = __FILE__;
+    path = path.substr(0, path.find_last_of("/\\") + 1) + "generated/FsmTest.bin";
+    std::vector<uint32_t> words;
+    *imageSize = 0;
+    FILE *file = fopen(path.c_str(), "rb");
+    if (file == NULL) {
+        return words;
+    }
+    words.resize(4096);
+    *imageSize = (uint32_t)fread(words.data(), 1, words.size() * sizeof(uint32_t), file);
+    fclose(file);
+    return words;
+}
+
+static uint32_t Crc32(uint32_t crc, uint8_t const *data, size_t size)
+{
+    crc = ~crc;
+    for (size_t i = 0; i < size; i++) {
+        crc ^= data[i];
+        for (int bit = 0; bit < 8; bit++) {
+            crc = (crc >> 1) ^ (0xEDB88320u & (0u - (crc & 1u)));
+        }
+    }
+    return ~crc;
+}
+
+static void ResealImage(std::vector<uint32_t> &words)
+{
+    BFX_FSM_IMAGE_HEADER *header = (BFX_FSM_IMAGE_HEADER *)words.data();
+    uint8_t const *bytes = (uint8_t const *)words.data();
+    size_t crcOffset = offsetof(BFX_FSM_IMAGE_HEADER, crc);
+    uint32_t crc = Crc32(0, bytes, crcOffset);
+    header->crc = Crc32(crc, bytes + crcOffset + 4, header->imageSize - crcOffset - 4);
+}
+
+/* Test suites --------------------------------------------------------------------*/
+
+/* Test cases ---------------------------------------------------------------------*/
+
+TEST(fsm_image, MatchesGeneratedTables) {
+    uint32_t imageSize;
+    std::vector<uint32_t> words = LoadImageFile(&imageSize);
+    ASSERT_GT(imageSize, 0u);
+    BFX_FSM_IMAGE_HEADER const *header = (BFX_FSM_IMAGE_HEADER const *)words.data();
+    EXPECT_EQ(header->signature, FSMTEST_IMAGE_SIGNATURE);
+
+    BFX_FSM_HANDLE image = {};
+    ASSERT_EQ(BFX_FsmLoadImage(&image, words.data(), imageSize, FSMTEST_IMAGE_SIGNATURE, g_FsmTest_actionTbl,
+                               g_FsmTest_fsmHandle.stateCnt), BFX_FSM_IMAGE_OK);
+    EXPECT_EQ(BFX_FsmGetCurrentStateID(&image), FSMTEST_INITIAL_STATE);
+    EXPECT_EQ(image.stateCnt, g_FsmTest_fsmHandle.stateCnt);
+    /* tables are used in place */
+    EXPECT_EQ((void const *)image.imageStateTbl, (void const *)((uint8_t const *)words.data() + header->stateTblOffset));
+
+    BFX_FSM_HANDLE tables = g_FsmTest_fsmHandle;
+#ifdef BFX_FSM_TRACE_ENABLE
+    tables.trace = NULL;
+#endif
+    BFX_FsmResetTo(&tables, FSMTEST_INITIAL_STATE);
+    std::mt19937 rng(7);
+    for (int i = 0; i < 2000; i++) {
+        BFX_FSM_EVENT_ID event = (BFX_FSM_EVENT_ID)(rng() % 12); // 9 events, plus 0 and unknown IDs
+        ASSERT_EQ(BFX_FsmProcessEvent(&image, event, NULL, 0), BFX_FsmProcessEvent(&tables, event, NULL, 0));
+        ASSERT_EQ(BFX_FsmGetCurrentStateID(&image), BFX_FsmGetCurrentStateID(&tables));
+    }
+}
+
+TEST(fsm_image, CallsActionsByStateId) {
+    uint32_t imageSize;
+    std::vector<uint32_t> words = LoadImageFile(&imageSize);
+    std::vector<BFX_FSM_ACTION_CALLBACK> actionTbl(g_FsmTest_fsmHandle.stateCnt, (BFX_FSM_ACTION_CALLBACK)NULL);
+    actionTbl[FSMTEST_RUNMAIN_LEDON - 1] = RecordLedOn;
+    actionTbl[FSMTEST_COREDUMP - 1] = RecordCoreDump;
+
+    BFX_FSM_HANDLE image = {};
+    ASSERT_EQ(BFX_FsmLoadImage(&image, words.data(), imageSize, FSMTEST_IMAGE_SIGNATURE, actionTbl.data(),
+                               (BFX_FSM_STATE_ID)actionTbl.size()), BFX_FSM_IMAGE_OK);
+    s_enteredState = 0;
+    EXPECT_EQ(BFX_FsmProcessEvent(&image, FSMTEST_SELFCHECKDONE, NULL, 0), 0); // no callback for BootLoader
+    EXPECT_EQ(s_enteredState, 0);
+    EXPECT_EQ(BFX_FsmProcessEvent(&image, FSMTEST_FILELOADED, NULL, 0), 0); // RunMain resolved to LedOn
+    EXPECT_EQ(s_enteredState, FSMTEST_RUNMAIN_LEDON);
+    EXPECT_EQ(s_enteredEvent, FSMTEST_FILELOADED);
+    EXPECT_EQ(BFX_FsmProcessEvent(&image, FSMTEST_IICINITDONE, NULL, 0), 1);
+    EXPECT_EQ(BFX_FsmProcessEvent(&image, FSMTEST_ERROCCUR, NULL, 0), 0); // handled by father RunMain
+    EXPECT_EQ(s_enteredState, FSMTEST_COREDUMP);
+    EXPECT_EQ(BFX_FsmGetCurrentStateID(&image), FSMTEST_COREDUMP);
+}
+
+TEST(fsm_image, RejectsBadImages) {
+    uint32_t imageSize;
+    std::vector<uint32_t> words = LoadImageFile(&imageSize);
+    ASSERT_EQ(BFX_FsmCheckImage(words.data(), imageSize), BFX_FSM_IMAGE_OK);
+    EXPECT_EQ(BFX_FsmCheckImage((uint8_t const *)words.data() + 2, imageSize), BFX_FSM_IMAGE_ERR_ALIGN);
+    EXPECT_EQ(BFX_FsmCheckImage(words.data(), imageSize - 4), BFX_FSM_IMAGE_ERR_HEADER);
+    EXPECT_EQ(BFX_FsmCheckImage(words.data(), 8), BFX_FSM_IMAGE_ERR_HEADER);
+
+    BFX_FSM_HANDLE handle = {};
+    handle.currentStateId = 3;
+    ((uint8_t *)words.data())[imageSize - 1] ^= 0x01;
+    EXPECT_EQ(BFX_FsmLoadImage(&handle, words.data(), imageSize, FSMTEST_IMAGE_SIGNATURE, NULL, 0),
+              BFX_FSM_IMAGE_ERR_CRC);
+    EXPECT_EQ(handle.currentStateId, 3);
+    EXPECT_EQ(handle.imageStateTbl, (BFX_FSM_IMAGE_STATE const *)NULL);
+
+    /* a valid CRC does not make inconsistent tables acceptable */
+    words = LoadImageFile(&imageSize);
+    BFX_FSM_IMAGE_HEADER *header = (BFX_FSM_IMAGE_HEADER *)words.data();
+    BFX_FSM_IMAGE_STATE *stateTbl = (BFX_FSM_IMAGE_STATE *)((uint8_t *)words.data() + header->stateTblOffset);
+    stateTbl[FSMTEST_RUNMAIN - 1].fatherStateID = FSMTEST_RUNMAIN_LEDON; // LedOn -> RunMain -> LedOn
+    ResealImage(words);
+    EXPECT_EQ(BFX_FsmCheckImage(words.data(), imageSize), BFX_FSM_IMAGE_ERR_RANGE);
+
+    words = LoadImageFile(&imageSize);
+    header = (BFX_FSM_IMAGE_HEADER *)words.data();
+    header->initialState = (uint16_t)(header->stateCnt + 1);
+    ResealImage(words);
+    EXPECT_EQ(BFX_FsmCheckImage(words.data(), imageSize), BFX_FSM_IMAGE_ERR_RANGE);
+}
+
+TEST(fsm_image, RejectsOtherModels) {
+    uint32_t imageSize;
+    std::vector<uint32_t> words = LoadImageFile(&imageSize);
+    BFX_FSM_HANDLE handle = g_FsmTest_fsmHandle;
+    BFX_FsmResetTo(&handle, FSMTEST_COREDUMP);
+
+    /* image of a diagram with renumbered states: structurally valid, but for other IDs */
+    BFX_FSM_IMAGE_HEADER *header = (BFX_FSM_IMAGE_HEADER *)words.data();
+    header->signature ^= 0x5A5A5A5Au;
+    ResealImage(words);
+    ASSERT_EQ(BFX_FsmCheckImage(words.data(), imageSize), BFX_FSM_IMAGE_OK);
+    EXPECT_EQ(BFX_FsmLoadImage(&handle, words.data(), imageSize, FSMTEST_IMAGE_SIGNATURE, g_FsmTest_actionTbl,
+                               g_FsmTest_fsmHandle.stateCnt), BFX_FSM_IMAGE_ERR_SIGNATURE);
+    EXPECT_EQ(handle.stateTbl, g_FsmTest_fsmHandle.stateTbl);
+    EXPECT_EQ(handle.imageStateTbl, (BFX_FSM_IMAGE_STATE const *)NULL);
+    EXPECT_EQ(BFX_FsmGetCurrentStateID(&handle), FSMTEST_COREDUMP);
+}
@@ -0,0 +1,122 @@
+/**
+ * @file fsm_instances.cpp
+ * @author CYK-Dot
+ * @brief Many instances sharing the const tables of one generated FSM (--instances)
+ * @version 0.1
+ * @date 2026-10-17
+ *
+ * @copyright Copyright (c) 2025 CYK-Dot, MIT License.
+ */
+
+/* Header import ------------------------------------------------------------------*/
+#include <gtest/gtest.h>
+#include <random>
+#include <vector>
+#include "bfx_fsm.h"
+#include "generated/FsmTest.h"
+#include "generated/FsmDenseTest.h"
+#include "generated/FsmSparseTest.h"
+
+/* Config macros ------------------------------------------------------------------*/
+
+/* Mock variables and functions  --------------------------------------------------*/
+
+static std::vector<uint16_t> s_enteredInstances;
+
+static void RecordInstance(BFX_FSM_ACTION_CTX *ctx, void *arg, uint16_t argSize)
+{
+    s_enteredInstances.push_back(ctx->instance);
+}
+
+/* Test suites --------------------------------------------------------------------*/
+
+/* Test cases ---------------------------------------------------------------------*/
+
+TEST(fsm_instances, GeneratedArrayStartsInInitialState) {
+    EXPECT_EQ(sizeof(g_FsmSparseTest_instances), FSMSPARSETEST_INSTANCE_CNT * sizeof(BFX_FSM_STATE_ID));
+    for (uint16_t i = 0; i < FSMSPARSETEST_INSTANCE_CNT; i++) {
+        EXPECT_EQ(g_FsmSparseTest_instances[i], FSMSPARSETEST_INITIAL_STATE);
+    }
+
+    EXPECT_EQ(BFX_FsmProcessInstance(&g_FsmSparseTest_fsmHandle, g_FsmSparseTest_instances, 3,
+                                     FSMSPARSETEST_KEYPLAY, NULL, 0), 0);
+    EXPECT_EQ(g_FsmSparseTest_instances[3], FSMSPARSETEST_PLAY_NORMAL);
+    EXPECT_EQ(g_FsmSparseTest_instances[2], FSMSPARSETEST_IDLE);
+    EXPECT_EQ(BFX_FsmGetCurrentStateID(&g_FsmSparseTest_fsmHandle), FSMSPARSETEST_IDLE); // handle untouched
+
+    BFX_FsmResetInstances(g_FsmSparseTest_instances, FSMSPARSETEST_INSTANCE_CNT, FSMSPARSETEST_INITIAL_STATE);
+    EXPECT_EQ(g_FsmSparseTest_instances[3], FSMSPARSETEST_IDLE);
+}
+
+TEST(fsm_instances, MatchesOneHandlePerInstance) {
+    BFX_FSM_HANDLE const *shared[] = { &g_FsmTest_fsmHandle, &g_FsmDenseTest_fsmHandle, &g_FsmSparseTest_fsmHandle };
+    std::mt19937 rng(11);
+#ifdef BFX_FSM_TRACE_ENABLE
+    uint16_t traceCount = g_FsmTest_trace.count;
+#endif
+    for (BFX_FSM_HANDLE const *handle : shared) {
+        std::vector<BFX_FSM_STATE_ID> instances(16);
+        std::vector<BFX_FSM_HANDLE> handles(16, *handle);
+        BFX_FsmResetInstances(instances.data(), (uint16_t)instances.size(), handle->currentStateId);
+        for (BFX_FSM_HANDLE &single : handles) {
+#ifdef BFX_FSM_TRACE_ENABLE
+            single.trace = NULL;
+#endif
+        }
+        for (int round = 0; round < 500; round++) {
+            uint16_t instance = (uint16_t)(rng() % instances.size());
+            BFX_FSM_EVENT_ID event = (BFX_FSM_EVENT_ID)(rng() % 16);
+            if (round % 5 == 0) {
+                /* broadcast to every instance */
+                uint16_t processed = 0;
+                for (BFX_FSM_HANDLE &single : handles) {
+                    processed += (uint16_t)(BFX_FsmProcessEvent(&single, event, NULL, 0) == 0);
+                }
+                ASSERT_EQ(BFX_FsmProcessInstances(handle, instances.data(), (uint16_t)instances.size(), event, NULL, 0),
+                          processed);
+            } else {
+                ASSERT_EQ(BFX_FsmProcessInstance(handle, instances.data(), instance, event, NULL, 0),
+                          BFX_FsmProcessEvent(&handles[instance], event, NULL, 0));
+            }
+            for (size_t i = 0; i < instances.size(); i++) {
+                ASSERT_EQ(instances[i], BFX_FsmGetCurrentStateID(&handles[i]));
+            }
+        }
+    }
+#ifdef BFX_FSM_TRACE_ENABLE
+    EXPECT_EQ(g_FsmTest_trace.count, traceCount); // instances are not traced
+#endif
+}
+
+TEST(fsm_instances, BatchReportsInstanceIndex) {
+    /* 1 --1--> 2, 2 --1--> 1, 3 has no transition */
+    const BFX_FSM_TRAN_RECORD tranTbl1[] = { { 1, 2 } };
+    const BFX_FSM_TRAN_RECORD tranTbl2[] = { { 1, 1 } };
+    const BFX_FSM_STATE stateTbl[] = {
+        { 1, 1, BFX_STATUS_FATHER_NONE, 1, tranTbl1, RecordInstance },
+        { 2, 2, BFX_STATUS_FATHER_NONE, 1, tranTbl2, RecordInstance },
+        { 3, 3, BFX_STATUS_FATHER_NONE, 0, NULL, RecordInstance },
+    };
+    BFX_FSM_HANDLE handle = {};
+    handle.stateTbl = stateTbl;
+    handle.stateCnt = 3;
+    handle.currentStateId = 1;
+    handle.leafTargets = 1;
+
+    /* grouped by state, state 0 marks instances that are not started */
+    BFX_FSM_STATE_ID instances[] = { 1, 1, 1, 2, 2, 3, 0, 1 };
+    s_enteredInstances.clear();
+    EXPECT_EQ(BFX_FsmProcessInstances(&handle, instances, 8, 1, NULL, 0), 6);
+    BFX_FSM_STATE_ID const expected[] = { 2, 2, 2, 1, 1, 3, 0, 2 };
+    for (int i = 0; i < 8; i++) {
+        EXPECT_EQ(instances[i], expected[i]);
+    }
+    EXPECT_EQ(s_enteredInstances, (std::vector<uint16_t>{ 0, 1, 2, 3, 4, 7 }));
+    EXPECT_EQ(BFX_FsmProcessInstance(&handle, instances, 6, 1, NULL, 0), 1);
+    EXPECT_EQ(BFX_FsmProcessInstances(&handle, instances, 8, 2, NULL, 0), 0);
+    EXPECT_EQ(handle.currentStateId, 1);
+
+    s_enteredInstances.clear();
+    EXPECT_EQ(BFX_FsmProcessEvent(&handle, 1, NULL, 0), 0);
+    EXPECT_EQ(s_enteredInstances, (std::vector<uint16_t>{ BFX_FSM_INSTANCE_NONE }));
+}
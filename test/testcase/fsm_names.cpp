@@ -0,0 +1,79 @@
+/**
+ * @file fsm_names.cpp
+ * @author CYK-Dot
+ * @brief Name to ID lookup through the perfect hash generated with --names
+ * @version 0.1
+ * @date 2026-10-17
+ *
+ * @copyright Copyright (c) 2025 CYK-Dot, MIT License.
+ */
+
+/* Header import ------------------------------------------------------------------*/
+#include <gtest/gtest.h>
+#include <cstring>
+#include <string>
+#include "bfx_fsm.h"
+#include "bfx_cli_core.h"
+#include "generated/FsmTest.h"
+
+/* Config macros ------------------------------------------------------------------*/
+
+/* Mock variables and functions  --------------------------------------------------*/
+
+static uint16_t LookupName(BFX_FSM_NAME_INDEX const *index, std::string const &name)
+{
+    return BFX_FsmLookupName(index, name.data(), (uint16_t)name.size());
+}
+
+/* Test suites --------------------------------------------------------------------*/
+
+/* Test cases ---------------------------------------------------------------------*/
+
+TEST(fsm_names, EveryNameMapsToItsId) {
+    EXPECT_EQ(g_FsmTest_eventNames.cnt, 9);
+    for (uint16_t id = 1; id <= g_FsmTest_eventNames.cnt; id++) {
+        char const *name = BFX_FsmGetName(&g_FsmTest_eventNames, id);
+        ASSERT_NE(name, nullptr);
+        EXPECT_EQ(LookupName(&g_FsmTest_eventNames, name), id) << name;
+    }
+    for (uint16_t id = 1; id <= g_FsmTest_stateNames.cnt; id++) {
+        char const *name = BFX_FsmGetName(&g_FsmTest_stateNames, id);
+        ASSERT_NE(name, nullptr);
+        EXPECT_EQ(LookupName(&g_FsmTest_stateNames, name), id) << name;
+    }
+    EXPECT_EQ(LookupName(&g_FsmTest_eventNames, "SelfCheckDone"), FSMTEST_SELFCHECKDONE);
+    EXPECT_EQ(LookupName(&g_FsmTest_stateNames, "RunMain_DisplayOLED_ShowText"), FSMTEST_RUNMAIN_DISPLAYOLED_SHOWTEXT);
+    EXPECT_STREQ(BFX_FsmGetName(&g_FsmTest_stateNames, FSMTEST_RUNMAIN_LEDON), "RunMain_LedOn");
+    EXPECT_EQ(BFX_FsmGetName(&g_FsmTest_eventNames, 0), nullptr);
+    EXPECT_EQ(BFX_FsmGetName(&g_FsmTest_eventNames, 10), nullptr);
+}
+
+TEST(fsm_names, UnknownNamesAreRejected) {
+    char const *unknown[] = { "", "Setu", "SetupX", "setup", "RunMain_", "SelfCheckDone ", "Tmr200M", "Tmr200MsX" };
+    for (char const *name : unknown) {
+        EXPECT_EQ(LookupName(&g_FsmTest_stateNames, name), 0) << name;
+        EXPECT_EQ(LookupName(&g_FsmTest_eventNames, name), 0) << name;
+    }
+    EXPECT_EQ(LookupName(&g_FsmTest_eventNames, "Setup"), 0); // states and events are separate indexes
+    EXPECT_EQ(LookupName(&g_FsmTest_stateNames, std::string("Setup\0", 6)), 0);
+}
+
+TEST(fsm_names, InjectEventFromShell) {
+    char cmd[] = "fsm event SelfCheckDone\n";
+    uint16_t paramIndex[4] = { 0 };
+    ASSERT_EQ(BFX_CliRawMatch(cmd, "fsm event $", paramIndex, 4), 1);
+    char const *name = &cmd[paramIndex[0]];
+    BFX_FSM_EVENT_ID event = (BFX_FSM_EVENT_ID)BFX_FsmLookupName(&g_FsmTest_eventNames, name, (uint16_t)strlen(name));
+    ASSERT_EQ(event, FSMTEST_SELFCHECKDONE);
+
+#ifdef BFX_FSM_TRACE_ENABLE
+    BFX_FSM_TRACE *trace = g_FsmTest_fsmHandle.trace;
+    g_FsmTest_fsmHandle.trace = NULL;
+#endif
+    EXPECT_EQ(BFX_FsmProcessEvent(&g_FsmTest_fsmHandle, event, NULL, 0), 0);
+    EXPECT_STREQ(BFX_FsmGetName(&g_FsmTest_stateNames, BFX_FsmGetCurrentStateID(&g_FsmTest_fsmHandle)), "BootLoader");
+    BFX_FsmResetTo(&g_FsmTest_fsmHandle, FSMTEST_INITIAL_STATE);
+#ifdef BFX_FSM_TRACE_ENABLE
+    g_FsmTest_fsmHandle.trace = trace;
+#endif
+}
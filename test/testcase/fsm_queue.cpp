@@ -0,0 +1,111 @@
+/**
+ * @file fsm_queue.cpp
+ * @author CYK-Dot
+ * @brief Event queue generated with --queue, posted from ISR context and drained from task context
+ * @version 0.1
+ * @date 2026-10-17
+ *
+ * @copyright Copyright (c) 2025 CYK-Dot, MIT License.
+ */
+
+/* Header import ------------------------------------------------------------------*/
+#include <gtest/gtest.h>
+#include <thread>
+#include <vector>
+#include "bfx_fsm.h"
+#include "generated/FsmDenseTest.h"
+
+/* Config macros ------------------------------------------------------------------*/
+
+/* Mock variables and functions  --------------------------------------------------*/
+
+static void *s_enteredArg;
+static uint16_t s_enteredArgSize;
+
+static void RecordArg(BFX_FSM_ACTION_CTX *ctx, void *arg, uint16_t argSize)
+{
+    s_enteredArg = arg;
+    s_enteredArgSize = argSize;
+}
+
+/* Test suites --------------------------------------------------------------------*/
+
+/* Test cases ---------------------------------------------------------------------*/
+
+TEST(fsm_queue, DepthDerivedFromModel) {
+    EXPECT_EQ(FSMDENSETEST_QUEUE_DEPTH, 9); // one slot for each event of the model
+    EXPECT_EQ(BFX_FsmDenseTest_DrainEvents(16), 0);
+}
+
+TEST(fsm_queue, DrainProcessesInPostOrder) {
+    /* same tables with every callback recording the event data */
+    BFX_FSM_STATE const *stateTbl = g_FsmDenseTest_fsmHandle.stateTbl;
+    std::vector<BFX_FSM_STATE> recording(stateTbl, stateTbl + g_FsmDenseTest_fsmHandle.stateCnt);
+    for (BFX_FSM_STATE &state : recording) {
+        state.actionTbl = RecordArg;
+    }
+    g_FsmDenseTest_fsmHandle.stateTbl = recording.data();
+
+    char reason[] = "checksum";
+    EXPECT_EQ(BFX_FsmDenseTest_PostEvent(FSMDENSETEST_SELFCHECKDONE, NULL, 0), 0);
+    EXPECT_EQ(BFX_FsmDenseTest_PostEvent(FSMDENSETEST_ERROCCUR, reason, sizeof(reason)), 0);
+    EXPECT_EQ(BFX_FsmGetCurrentStateID(&g_FsmDenseTest_fsmHandle), FSMDENSETEST_SETUP); // nothing processed yet
+
+    EXPECT_EQ(BFX_FsmDenseTest_DrainEvents(1), 1);
+    EXPECT_EQ(BFX_FsmGetCurrentStateID(&g_FsmDenseTest_fsmHandle), FSMDENSETEST_BOOTLOADER);
+    EXPECT_EQ(BFX_FsmDenseTest_DrainEvents(16), 1);
+    EXPECT_EQ(BFX_FsmGetCurrentStateID(&g_FsmDenseTest_fsmHandle), FSMDENSETEST_COREDUMP);
+    EXPECT_EQ(s_enteredArg, (void *)reason);
+    EXPECT_EQ(s_enteredArgSize, sizeof(reason));
+
+    g_FsmDenseTest_fsmHandle.stateTbl = stateTbl;
+    BFX_FsmResetTo(&g_FsmDenseTest_fsmHandle, FSMDENSETEST_SETUP);
+}
+
+TEST(fsm_queue, FullQueueRejectsPost) {
+    /* events not handled in Setup only pass through the queue */
+    for (int round = 0; round < 3; round++) {
+        for (int i = 0; i < FSMDENSETEST_QUEUE_DEPTH; i++) {
+            ASSERT_EQ(BFX_FsmDenseTest_PostEvent(FSMDENSETEST_TMR200MS, NULL, 0), 0);
+        }
+        EXPECT_EQ(BFX_FsmDenseTest_PostEvent(FSMDENSETEST_TMR200MS, NULL, 0), 1);
+        EXPECT_EQ(BFX_FsmDenseTest_DrainEvents(4), 4);
+        for (int i = 0; i < 4; i++) {
+            ASSERT_EQ(BFX_FsmDenseTest_PostEvent(FSMDENSETEST_TMR200MS, NULL, 0), 0); // wraps around
+        }
+        EXPECT_EQ(BFX_FsmDenseTest_PostEvent(FSMDENSETEST_TMR200MS, NULL, 0), 1);
+        EXPECT_EQ(BFX_FsmDenseTest_DrainEvents(0xFFFF), FSMDENSETEST_QUEUE_DEPTH);
+    }
+    EXPECT_EQ(BFX_FsmGetCurrentStateID(&g_FsmDenseTest_fsmHandle), FSMDENSETEST_SETUP);
+}
+
+TEST(fsm_queue, ProducerThreadAsIsr) {
+    (void)BFX_FsmProcessEvent(&g_FsmDenseTest_fsmHandle, FSMDENSETEST_SELFCHECKDONE, NULL, 0);
+    (void)BFX_FsmProcessEvent(&g_FsmDenseTest_fsmHandle, FSMDENSETEST_FILELOADED, NULL, 0);
+    ASSERT_EQ(BFX_FsmGetCurrentStateID(&g_FsmDenseTest_fsmHandle), FSMDENSETEST_RUNMAIN_LEDON);
+
+    const uint32_t total = 100001;
+    std::thread isr([&]() {
+        for (uint32_t posted = 0; posted < total;) {
+            if (BFX_FsmDenseTest_PostEvent(FSMDENSETEST_TMR200MS, NULL, 0) == 0) {
+                posted++;
+            } else {
+                std::this_thread::yield(); // queue full
+            }
+        }
+    });
+    uint32_t drained = 0;
+    while (drained < total) {
+        uint16_t batch = BFX_FsmDenseTest_DrainEvents(3);
+        drained += batch;
+        if (batch == 0) {
+            std::this_thread::yield();
+        }
+    }
+    isr.join();
+    EXPECT_EQ(drained, total);
+    EXPECT_EQ(BFX_FsmDenseTest_DrainEvents(16), 0);
+    EXPECT_EQ(BFX_FsmGetCurrentStateID(&g_FsmDenseTest_fsmHandle), FSMDENSETEST_RUNMAIN_LEDOFF); // odd toggles
+
+    BFX_FsmResetTo(&g_FsmDenseTest_fsmHandle, FSMDENSETEST_SETUP);
+}
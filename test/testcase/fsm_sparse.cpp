@@ -0,0 +1,73 @@
+/**
+ * @file fsm_sparse.cpp
+ * @author CYK-Dot
+ * @brief FSM generated with per-state sparse transition tables
+ * @version 0.1
+ * @date 2026-10-17
+ *
+ * @copyright Copyright (c) 2025 CYK-Dot, MIT License.
+ */
+
+/* Header import ------------------------------------------------------------------*/
+#include <gtest/gtest.h>
+#include "bfx_fsm.h"
+#include "generated/FsmSparseTest.h"
+
+/* Config macros ------------------------------------------------------------------*/
+
+/* Mock variables and functions  --------------------------------------------------*/
+
+/* Test suites --------------------------------------------------------------------*/
+
+/* Test cases ---------------------------------------------------------------------*/
+
+TEST(fsm_sparse, Encodings) {
+    BFX_FSM_STATE const *stateTbl = g_FsmSparseTest_fsmHandle.stateTbl;
+    EXPECT_EQ(stateTbl[FSMSPARSETEST_IDLE - 1].tranTblType, BFX_FSM_TRAN_SORTED);
+    EXPECT_EQ(stateTbl[FSMSPARSETEST_PLAY - 1].tranTblType, BFX_FSM_TRAN_COMB);
+    EXPECT_EQ(stateTbl[FSMSPARSETEST_PAUSE - 1].tranTblType, BFX_FSM_TRAN_COMB);
+    EXPECT_EQ(stateTbl[FSMSPARSETEST_MENU - 1].tranTblType, BFX_FSM_TRAN_LINEAR);
+}
+
+TEST(fsm_sparse, SortedTableTransfer) {
+    uint8_t const events[] = {
+        FSMSPARSETEST_KEYMENU, FSMSPARSETEST_KEYPLAY, FSMSPARSETEST_KEYRECORD,
+        FSMSPARSETEST_KEYSETTINGS, FSMSPARSETEST_FAULT, FSMSPARSETEST_KEYBACK,
+    };
+    uint8_t const states[] = {
+        FSMSPARSETEST_MENU, FSMSPARSETEST_PLAY_NORMAL, FSMSPARSETEST_RECORD,
+        FSMSPARSETEST_SETTINGS, FSMSPARSETEST_ERROR, FSMSPARSETEST_IDLE,
+    };
+    for (size_t i = 0; i < sizeof(events); i++) {
+        EXPECT_EQ(BFX_FsmProcessEvent(&g_FsmSparseTest_fsmHandle, events[i], NULL, 0), 0);
+        EXPECT_EQ(BFX_FsmGetCurrentStateID(&g_FsmSparseTest_fsmHandle), states[i]);
+        BFX_FsmResetTo(&g_FsmSparseTest_fsmHandle, FSMSPARSETEST_IDLE);
+    }
+    EXPECT_EQ(BFX_FsmProcessEvent(&g_FsmSparseTest_fsmHandle, FSMSPARSETEST_KEYSTOP, NULL, 0), 1);
+    EXPECT_EQ(BFX_FsmGetCurrentStateID(&g_FsmSparseTest_fsmHandle), FSMSPARSETEST_IDLE);
+}
+
+TEST(fsm_sparse, CombTableTransferFromChild) {
+    (void)BFX_FsmProcessEvent(&g_FsmSparseTest_fsmHandle, FSMSPARSETEST_KEYPLAY, NULL, 0);
+    (void)BFX_FsmProcessEvent(&g_FsmSparseTest_fsmHandle, FSMSPARSETEST_KEYFORWARD, NULL, 0);
+    EXPECT_EQ(BFX_FsmGetCurrentStateID(&g_FsmSparseTest_fsmHandle), FSMSPARSETEST_PLAY_FAST);
+
+    (void)BFX_FsmProcessEvent(&g_FsmSparseTest_fsmHandle, FSMSPARSETEST_KEYPLAY, NULL, 0);
+    EXPECT_EQ(BFX_FsmGetCurrentStateID(&g_FsmSparseTest_fsmHandle), FSMSPARSETEST_PAUSE);
+
+    (void)BFX_FsmProcessEvent(&g_FsmSparseTest_fsmHandle, FSMSPARSETEST_KEYPLAY, NULL, 0);
+    EXPECT_EQ(BFX_FsmGetCurrentStateID(&g_FsmSparseTest_fsmHandle), FSMSPARSETEST_PLAY_NORMAL);
+
+    (void)BFX_FsmProcessEvent(&g_FsmSparseTest_fsmHandle, FSMSPARSETEST_KEYSTOP, NULL, 0);
+    EXPECT_EQ(BFX_FsmGetCurrentStateID(&g_FsmSparseTest_fsmHandle), FSMSPARSETEST_IDLE);
+}
+
+TEST(fsm_sparse, CombTableRejectsOtherRows) {
+    BFX_FsmResetTo(&g_FsmSparseTest_fsmHandle, FSMSPARSETEST_PAUSE);
+    EXPECT_EQ(BFX_FsmProcessEvent(&g_FsmSparseTest_fsmHandle, 0, NULL, 0), 1);
+    EXPECT_EQ(BFX_FsmProcessEvent(&g_FsmSparseTest_fsmHandle, FSMSPARSETEST_KEYMENU, NULL, 0), 1);
+    EXPECT_EQ(BFX_FsmProcessEvent(&g_FsmSparseTest_fsmHandle, FSMSPARSETEST_KEYFORWARD, NULL, 0), 1);
+    EXPECT_EQ(BFX_FsmGetCurrentStateID(&g_FsmSparseTest_fsmHandle), FSMSPARSETEST_PAUSE);
+
+    BFX_FsmResetTo(&g_FsmSparseTest_fsmHandle, FSMSPARSETEST_IDLE);
+}
@@ -0,0 +1,89 @@
+/**
+ * @file fsm_trace.cpp
+ * @author CYK-Dot
+ * @brief Transition trace of FSMs generated with --trace
+ * @version 0.1
+ * @date 2026-10-17
+ *
+ * @copyright Copyright (c) 2025 CYK-Dot, MIT License.
+ */
+
+/* Header import ------------------------------------------------------------------*/
+#include <gtest/gtest.h>
+#include "bfx_fsm.h"
+#include "generated/FsmTest.h"
+
+/* Config macros ------------------------------------------------------------------*/
+
+/* Mock variables and functions  --------------------------------------------------*/
+
+static uint32_t s_fakeTicks = 0;
+
+extern "C" uint32_t BFX_FsmTraceTimestamp(void)
+{
+    /* every call advances 3 ticks, so each callback takes 3 ticks */
+    s_fakeTicks += 3;
+    return s_fakeTicks;
+}
+
+static void DrainAll(void)
+{
+    BFX_FSM_TRACE_RECORD records[FSMTEST_TRACE_DEPTH];
+    while (BFX_FsmTraceDrain(&g_FsmTest_trace, records, FSMTEST_TRACE_DEPTH) != 0) {
+    }
+    g_FsmTest_trace.lost = 0;
+}
+
+/* Test suites --------------------------------------------------------------------*/
+
+/* Test cases ---------------------------------------------------------------------*/
+
+TEST(fsm_trace, RecordsEveryTransition) {
+    BFX_FsmResetTo(&g_FsmTest_fsmHandle, FSMTEST_SETUP);
+    DrainAll();
+
+    (void)BFX_FsmProcessEvent(&g_FsmTest_fsmHandle, FSMTEST_SELFCHECKDONE, NULL, 0);
+    (void)BFX_FsmProcessEvent(&g_FsmTest_fsmHandle, FSMTEST_FILELOADED, NULL, 0);
+    (void)BFX_FsmProcessEvent(&g_FsmTest_fsmHandle, FSMTEST_IICINITDONE, NULL, 0); // not handled, not traced
+    (void)BFX_FsmProcessEvent(&g_FsmTest_fsmHandle, FSMTEST_ERROCCUR, NULL, 0); // handled by father RunMain
+
+    BFX_FSM_TRACE_RECORD records[4];
+    ASSERT_EQ(BFX_FsmTraceDrain(&g_FsmTest_trace, records, 4), 3);
+    EXPECT_EQ(records[0].fromState, FSMTEST_SETUP);
+    EXPECT_EQ(records[0].toState, FSMTEST_BOOTLOADER);
+    EXPECT_EQ(records[0].event, FSMTEST_SELFCHECKDONE);
+    EXPECT_EQ(records[1].fromState, FSMTEST_BOOTLOADER);
+    EXPECT_EQ(records[1].toState, FSMTEST_RUNMAIN_LEDON);
+    EXPECT_EQ(records[2].fromState, FSMTEST_RUNMAIN_LEDON);
+    EXPECT_EQ(records[2].toState, FSMTEST_COREDUMP);
+    EXPECT_EQ(records[2].event, FSMTEST_ERROCCUR);
+    EXPECT_EQ(records[0].duration, 3);
+    EXPECT_LT(records[0].timestamp, records[1].timestamp);
+    EXPECT_EQ(BFX_FsmTraceDrain(&g_FsmTest_trace, records, 4), 0);
+
+    BFX_FsmResetTo(&g_FsmTest_fsmHandle, FSMTEST_SETUP);
+}
+
+TEST(fsm_trace, RingKeepsNewestRecords) {
+    BFX_FsmResetTo(&g_FsmTest_fsmHandle, FSMTEST_RUNMAIN_LEDON);
+    DrainAll();
+
+    for (int i = 0; i < FSMTEST_TRACE_DEPTH + 6; i++) {
+        (void)BFX_FsmProcessEvent(&g_FsmTest_fsmHandle, FSMTEST_TMR200MS, NULL, 0);
+    }
+    EXPECT_EQ(g_FsmTest_trace.count, FSMTEST_TRACE_DEPTH);
+    EXPECT_EQ(g_FsmTest_trace.lost, 6u);
+
+    /* drained in chunks, oldest first: the 7th transition comes out first */
+    BFX_FSM_TRACE_RECORD records[FSMTEST_TRACE_DEPTH];
+    uint16_t cnt = BFX_FsmTraceDrain(&g_FsmTest_trace, records, 10);
+    cnt += BFX_FsmTraceDrain(&g_FsmTest_trace, &records[cnt], FSMTEST_TRACE_DEPTH);
+    ASSERT_EQ(cnt, FSMTEST_TRACE_DEPTH);
+    EXPECT_EQ(records[0].fromState, FSMTEST_RUNMAIN_LEDON);
+    for (int i = 1; i < FSMTEST_TRACE_DEPTH; i++) {
+        EXPECT_EQ(records[i].fromState, records[i - 1].toState);
+        EXPECT_GT(records[i].timestamp, records[i - 1].timestamp);
+    }
+
+    BFX_FsmResetTo(&g_FsmTest_fsmHandle, FSMTEST_SETUP);
+}
@@ -0,0 +1,12 @@
+import os
+import sys
+
+# 生成器脚本不是安装包，直接把 bfx/fsm 加入搜索路径
+FSM_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'bfx', 'fsm'))
+if FSM_DIR not in sys.path:
+    sys.path.insert(0, FSM_DIR)
+
+# 合成状态图生成器与基准测试脚本放在 test/benchmark
+BENCHMARK_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'benchmark'))
+if BENCHMARK_DIR not in sys.path:
+    sys.path.append(BENCHMARK_DIR)
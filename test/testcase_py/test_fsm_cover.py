@@ -0,0 +1,148 @@
+"""
+bfx_fsm_cover.py 测试用例
+"""
+
+import itertools
+import json
+import os
+import random
+import subprocess
+import sys
+
+import pytest
+
+import bfx_fsm_cover as cover
+import bfx_puml_translate as translate
+from puml_workload import make_workload
+
+TESTCASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'testcase'))
+PUML_FILES = [os.path.join(TESTCASE_DIR, name) for name in ('FsmTest.puml', 'FsmDenseTest.puml', 'FsmSparseTest.puml')]
+
+
+def load_parser(uml_text: str) -> translate.PlantUMLParser:
+    parser = translate.PlantUMLParser()
+    parser.parse(uml_text)
+    parser.assign_ids()
+    return parser
+
+
+def reference_process_event(parser: translate.PlantUMLParser, state_id: int, event_id: int):
+    """按bfx_fsm.c的线性表逻辑逐条查找：先本状态后父状态，目标沿初始子状态走到叶子，未处理时返回None"""
+    by_id = {state.id: state for state in parser.states.values()}
+    event_name = next(e.name for e in parser.events.values() if e.id == event_id)
+    node = by_id[state_id]
+    while node is not None:
+        for transition in parser.transitions:
+            if transition.from_state == node.full_name and transition.event == event_name:
+                return parser.resolve_default_leaf(parser.states[transition.to_state]).id
+        node = node.parent
+    return None
+
+
+def check_plan(parser: translate.PlantUMLParser, plan: cover.CoverPlan):
+    """逐步回放每条序列，返回实际走过的(状态, 事件)，并检查覆盖了从初始状态可达的全部转移"""
+    taken = set()
+    for sequence in plan.sequences:
+        state = plan.initial_state
+        for event_id, expected in sequence:
+            target = reference_process_event(parser, state, event_id)
+            assert target == expected
+            taken.add((state, event_id))
+            state = target
+
+    # 从初始状态出发遍历全部可达的停留状态
+    reachable, pending = {plan.initial_state}, [plan.initial_state]
+    required = set()
+    while pending:
+        state = pending.pop()
+        for event_id in range(1, len(parser.events) + 1):
+            target = reference_process_event(parser, state, event_id)
+            if target is not None:
+                required.add((state, event_id))
+                if target not in reachable:
+                    reachable.add(target)
+                    pending.append(target)
+    assert taken == required
+    assert plan.transition_cnt == len(required)
+    return taken
+
+
+@pytest.mark.parametrize('puml_file', PUML_FILES, ids=os.path.basename)
+def test_sequences_cover_every_transition(puml_file):
+    parser = load_parser(open(puml_file, encoding='utf-8').read())
+    for reset_cost in (0, 1, 4, 100):
+        plan = cover.plan_cover(parser, reset_cost)
+        check_plan(parser, plan)
+        assert plan.event_cnt <= plan.naive_event_cnt
+        assert plan.uncovered == []
+    assert len(cover.plan_cover(parser, 100).sequences) == 1
+
+
+@pytest.mark.parametrize('seed', range(6))
+def test_random_models_are_covered(seed):
+    parser = load_parser(make_workload(40, depth=3, events=6, fanout=2, seed=seed, project='Cover'))
+    plan = cover.plan_cover(parser)
+    check_plan(parser, plan)
+    assert plan.event_cnt <= plan.naive_event_cnt
+
+
+def test_known_optimum():
+    # 环：一条序列恰好走一圈
+    ring = load_parser('@startuml Ring\nA: a\nB: b\nC: c\n[*] --> A\nA --> B : a\nB --> C : b\nC --> A : c\n@enduml\n')
+    plan = cover.plan_cover(ring)
+    assert plan.event_cnt == 3 and len(plan.sequences) == 1
+
+    # 两个终止状态：复位一次，不必为回到初始状态多走事件
+    fork = load_parser('@startuml Fork\nI: i\nX: x\nY: y\n[*] --> I\nI --> X : a\nI --> Y : b\n@enduml\n')
+    plan = cover.plan_cover(fork)
+    assert sorted(len(sequence) for sequence in plan.sequences) == [1, 1]
+
+    # 父状态的转移在每个子状态上各覆盖一次
+    nested = load_parser('@startuml Nested\nP: p\nOut: o\n[*] --> P\nstate P {\nC1: c1\nC2: c2\n[*] --> C1\nC1 --> C2 : next\n}\n'
+                         'P --> Out : leave\nOut --> P : enter\n@enduml\n')
+    plan = cover.plan_cover(nested)
+    taken = check_plan(nested, plan)
+    leave = nested.events['leave'].id
+    assert {state for state, event_id in taken if event_id == leave} == {
+        nested.states['P_C1'].id, nested.states['P_C2'].id}
+
+
+def test_transport_is_minimal():
+    rng = random.Random(3)
+    for _ in range(40):
+        size = rng.randint(1, 5)
+        cost = {(u, v): rng.randint(0, 9) for u in range(size) for v in range(10, 10 + size)}
+        flow = cover._transport({u: 1 for u in range(size)}, {v: 1 for v in range(10, 10 + size)}, cost)
+        best = min(sum(cost[u, 10 + v] for u, v in enumerate(order))
+                   for order in itertools.permutations(range(size)))
+        assert sum(cost[pair] * amount for pair, amount in flow.items()) == best
+        assert sum(flow.values()) == size
+
+
+def test_unreachable_states_and_missing_initial():
+    parser = load_parser('@startuml Island\nA: a\nB: b\nC: c\nD: d\n[*] --> A\nA --> B : go\nC --> D : lost\n@enduml\n')
+    plan = cover.plan_cover(parser)
+    check_plan(parser, plan)
+    assert plan.uncovered == [(parser.states['C'].id, parser.events['lost'].id)]
+    with pytest.raises(ValueError):
+        cover.plan_cover(load_parser('@startuml NoInit\nA: a\nB: b\nA --> B : go\n@enduml\n'))
+
+
+def test_cli_writes_header_and_json(tmp_path):
+    script = os.path.join(os.path.dirname(cover.__file__), 'bfx_fsm_cover.py')
+    json_file = tmp_path / 'cover.json'
+    result = subprocess.run([sys.executable, script, PUML_FILES[0], '-o', str(tmp_path), '--json', str(json_file)],
+                            capture_output=True, text=True, check=True)
+    assert 'transitions covered by' in result.stderr
+    header = (tmp_path / 'FsmTest_cover.h').read_text(encoding='utf-8')
+    report = json.loads(json_file.read_text(encoding='utf-8'))
+    assert report['initial'] == 'Setup'
+    assert report['sequences'][0][0] == {'event': 'SelfCheckDone', 'state': 'BootLoader'}
+    assert f"#define FSMTEST_COVER_STEP_CNT {report['events']}\n" in header
+    assert f"#define FSMTEST_COVER_TRAN_CNT {report['transitions']}\n" in header
+    assert header.count('{ FSMTEST_') == report['events']
+
+    # 内容不变时不重写
+    mtime = os.stat(tmp_path / 'FsmTest_cover.h').st_mtime_ns
+    subprocess.run([sys.executable, script, PUML_FILES[0], '-o', str(tmp_path)], capture_output=True, check=True)
+    assert os.stat(tmp_path / 'FsmTest_cover.h').st_mtime_ns == mtime
@@ -0,0 +1,149 @@
+"""
+bfx_fsm_image.py 与 --image 镜像生成测试用例
+"""
+
+import os
+import shutil
+import struct
+import subprocess
+import sys
+
+import pytest
+
+import bfx_fsm_image as image_module
+import bfx_puml_translate as translate
+from test_puml_translate import FSM_TEST_PUML, TESTCASE_DIR, load_parser, make_uml
+
+FSM_DIR = os.path.join(TESTCASE_DIR, '..', '..', 'bfx', 'fsm')
+
+
+def fsm_test_parser() -> translate.PlantUMLParser:
+    with open(FSM_TEST_PUML, encoding='utf-8') as f:
+        return load_parser(f.read())
+
+
+def reseal(data: bytearray) -> bytes:
+    struct.pack_into('<I', data, translate.IMAGE_CRC_OFFSET, translate.image_crc(bytes(data)))
+    return bytes(data)
+
+
+def test_image_round_trip_matches_model():
+    parser = fsm_test_parser()
+    data = translate.build_image(parser)
+    assert len(data) % 4 == 0
+    image = image_module.read_image(data)
+    assert (image.state_cnt, image.event_cnt) == (len(parser.states), len(parser.events))
+    assert image.signature == translate.model_signature(parser)
+    assert image.initial_state == parser.states['Setup'].id
+    assert image_module.compare_with_model(image, parser) == []
+
+    # 每个状态只存自身的转移，按事件ID排序
+    run_main = parser.states['RunMain']
+    records = image.state_transitions(run_main.id)
+    assert [event for event, _ in records] == sorted(event for event, _ in records)
+    assert image.states[parser.states['RunMain_LedOn'].id - 1].father_state == run_main.id
+
+
+def test_image_detects_corruption_and_limits():
+    data = bytearray(translate.build_image(fsm_test_parser()))
+    assert image_module.validate_image(bytes(data)) == []
+    assert image_module.validate_image(bytes(data[:-4]))[0].startswith('truncated')
+    assert image_module.validate_image(b'XXXX' + bytes(data[4:]))[0].startswith('not a BFX FSM image')
+
+    flipped = bytearray(data)
+    flipped[-1] ^= 1
+    assert image_module.validate_image(bytes(flipped))[0].startswith('CRC mismatch')
+
+    # CRC正确但表内容不一致
+    unsorted = bytearray(data)
+    state_tbl_offset, tran_tbl_offset = struct.unpack_from('<II', data, 20)
+    tran_index = next(tran_index for tran_index, tran_cnt, _, _, _ in
+                      (translate.IMAGE_STATE.unpack_from(data, state_tbl_offset + i * translate.IMAGE_STATE.size)
+                       for i in range(10)) if tran_cnt >= 2)
+    first = tran_tbl_offset + tran_index * translate.IMAGE_TRAN.size
+    unsorted[first:first + 8] = unsorted[first + 4:first + 8] + unsorted[first:first + 4]
+    with pytest.raises(ValueError, match='not sorted by event'):
+        image_module.read_image(reseal(unsorted))
+
+    wide = translate.build_image(load_parser(make_uml(300)))
+    assert image_module.validate_image(wide, 16, 8) == []
+    assert image_module.validate_image(wide, 8, 8) == ["330 states do not fit 8-bit state IDs"]
+
+
+def test_image_signature_tracks_ids(tmp_path):
+    parser = fsm_test_parser()
+    profile = os.path.join(TESTCASE_DIR, 'FsmTest.profile')
+    profiled, _ = translate.prepare_model(parser, translate.GenerateOptions(profile=profile))
+    image = image_module.read_image(translate.build_image(profiled))
+    assert image_module.compare_with_model(image, profiled) == []
+    assert image_module.compare_with_model(image, parser)[0].startswith('signature')
+
+
+def test_generator_writes_image_and_keeps_it_when_unchanged(tmp_path):
+    options = translate.GenerateOptions(image=True)
+    outputs = translate.translate_file(FSM_TEST_PUML, str(tmp_path), options=options)
+    image_path = str(tmp_path / 'FsmTest.bin')
+    assert (image_path, True) in outputs
+    header = (tmp_path / 'FsmTest.h').read_text()
+    signature = translate.model_signature(fsm_test_parser())
+    assert f'#define FSMTEST_IMAGE_SIGNATURE 0x{signature:08X}u' in header
+    assert 'g_FsmTest_actionTbl[] = {' in (tmp_path / 'FsmTest.c').read_text()
+    assert (image_path, False) in translate.translate_file(FSM_TEST_PUML, str(tmp_path), options=options)
+
+    result = subprocess.run([sys.executable, image_module.__file__, image_path, '--model', FSM_TEST_PUML],
+                            capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert '10 states, 9 events' in result.stdout
+
+
+@pytest.mark.skipif(shutil.which('cc') is None, reason="no C compiler")
+@pytest.mark.parametrize('state_id_width', [8, 16])
+def test_runtime_loads_image_in_place(tmp_path, state_id_width):
+    """主机上编译运行时，直接运行镜像：转移结果与模型一致，8位运行时拒绝300个状态的镜像"""
+    parser = load_parser(make_uml(300))
+    (tmp_path / 'Scale.bin').write_bytes(translate.build_image(parser))
+    events = {event.name: event.id for event in parser.events.values()}
+    sequence = [events['Next']] * 29 + [events['Step'], 0, events['Step'], events['Next']]
+    (tmp_path / 'main.c').write_text('\n'.join([
+        '#include <stdio.h>',
+        '#include <stdlib.h>',
+        '#include "bfx_fsm.h"',
+        'static uint32_t s_image[4096];',
+        'int main(int argc, char **argv)',
+        '{',
+        '    FILE *file = fopen(argv[1], "rb");',
+        '    uint32_t size = (uint32_t)fread(s_image, 1, sizeof(s_image), file);',
+        '    fclose(file);',
+        '    BFX_FSM_HANDLE handle = {0};',
+        f'    uint8_t result = BFX_FsmLoadImage(&handle, s_image, size, 0x{translate.model_signature(parser):08X}u,'
+        '                                      NULL, 0);',
+        '    printf("%d %d", result, BFX_FsmGetCurrentStateID(&handle));',
+        '    for (int i = 2; i < argc && result == BFX_FSM_IMAGE_OK; i++) {',
+        '        uint8_t ret = BFX_FsmProcessEvent(&handle, (BFX_FSM_EVENT_ID)atoi(argv[i]), NULL, 0);',
+        '        printf(" %d:%d", ret, BFX_FsmGetCurrentStateID(&handle));',
+        '    }',
+        '    return 0;',
+        '}',
+    ]))
+    build = subprocess.run(['cc', '-std=c99', '-DBFX_FSM_IMAGE_ENABLE', f'-DBFX_FSM_STATE_ID_WIDTH={state_id_width}',
+                            '-I', FSM_DIR, '-o', str(tmp_path / 'fsm'), str(tmp_path / 'main.c'),
+                            os.path.join(FSM_DIR, 'bfx_fsm.c')], capture_output=True, text=True)
+    assert build.returncode == 0, build.stderr
+    output = subprocess.run([str(tmp_path / 'fsm'), str(tmp_path / 'Scale.bin')] + [str(e) for e in sequence],
+                            capture_output=True, text=True, check=True).stdout.split()
+    if state_id_width == 8:
+        assert output[0] == '4'  # BFX_FSM_IMAGE_ERR_RANGE
+        return
+
+    matrix = {state.id: row for state, row in parser.get_dispatch_matrix()}
+    state = parser.resolve_default_leaf(parser.states['G0']).id
+    assert output[:2] == ['0', str(state)]
+    visited = []
+    for event, step in zip(sequence, output[2:]):
+        target = matrix[state][event - 1] if event else None
+        if target is not None:
+            state = target.id
+        assert step == f"{0 if target is not None else 1}:{state}"
+        visited.append(state)
+    assert visited[29] == parser.states['G29_S1'].id
+    assert visited[-1] == parser.states['G0_S0'].id  # G29 --Next--> G0，解析到初始子状态
@@ -0,0 +1,109 @@
+"""
+bfx_fsm_replay.py 测试用例
+"""
+
+import subprocess
+import sys
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+import bfx_fsm_replay as replay_module
+import bfx_fsm_trace as trace_module
+from test_fsm_trace import FSM_TEST_PUML, load_parser, make_records
+
+
+@pytest.fixture
+def parser():
+    return load_parser(FSM_TEST_PUML)
+
+
+@pytest.fixture
+def records(parser):
+    return make_records(trace_module.TraceDecoder(parser), 1000)
+
+
+def chunked(records, size):
+    return [records[start:start + size] for start in range(0, len(records), size)]
+
+
+def test_replay_matching_trace(parser, records):
+    replayer = replay_module.TraceReplayer(parser, context=4)
+    assert replayer.replay(chunked(records, 64)) is None
+    assert replayer.position == 1000
+    assert replayer.state == int(records['to_state'][-1])
+    assert len(replayer.history) == 4
+
+
+@pytest.mark.parametrize('chunk', [1, 7, 1000])
+def test_replay_reports_wrong_target_with_context(parser, records, chunk):
+    records[500]['to_state'] = records[500]['from_state']
+    replayer = replay_module.TraceReplayer(parser, context=5)
+    divergence = replayer.replay(chunked(records, chunk))
+    assert divergence.index == 500
+    assert divergence.reason == replay_module.DIVERGENCE_TRANSITION
+    assert divergence.model_state == int(records['from_state'][500])
+    assert divergence.expected_state != divergence.model_state
+    assert np.array_equal(divergence.before, records[495:500])
+    assert np.array_equal(divergence.after, records[501:506])
+    assert replayer.position == 500
+
+
+def test_replay_reports_lost_record(parser, records):
+    records = np.delete(records, 300)
+    replayer = replay_module.TraceReplayer(parser)
+    divergence = replayer.replay(chunked(records, 128))
+    assert (divergence.index, divergence.reason) == (300, replay_module.DIVERGENCE_STATE)
+    assert divergence.model_state == int(records['to_state'][299])
+    lines = replayer.format_divergence(divergence)
+    assert lines[0].startswith('-- first divergence at record 300: device left')
+    assert sum(line.startswith('>>') for line in lines) == 1
+
+
+def test_replay_invalid_and_start_state(parser, records):
+    records[0]['event'] = 200
+    divergence = replay_module.TraceReplayer(parser).replay([records])
+    assert (divergence.index, divergence.reason) == (0, replay_module.DIVERGENCE_INVALID)
+    assert len(divergence.before) == 0
+
+    # 从模型初始状态开始回放时，第一条记录的源状态也要一致
+    start = int(records['from_state'][1])
+    wrong_start = 1 if start != 1 else 2
+    replayer = replay_module.TraceReplayer(parser, start_state=wrong_start)
+    assert replayer.replay([records[1:]]).reason == replay_module.DIVERGENCE_STATE
+
+
+def test_stream_chunks_keep_partial_records():
+    records = np.zeros(10, dtype=trace_module.TRACE_RECORD_DTYPE)
+    records['timestamp'] = np.arange(10)
+
+    class TrickleStream:
+        """每次最多返回5字节，模拟管道的零碎读取"""
+        def __init__(self, data):
+            self.data = data
+
+        def read(self, size):
+            chunk, self.data = self.data[:min(size, 5)], self.data[min(size, 5):]
+            return chunk
+
+    chunks = list(trace_module.iter_stream_chunks(TrickleStream(records.tobytes() + b'\x00' * 7), 3))
+    assert np.array_equal(np.concatenate(chunks)['timestamp'], np.arange(10))
+
+
+def test_replay_cli(tmp_path, parser, records):
+    trace_file = tmp_path / 'trace.bin'
+    trace_file.write_bytes(records.tobytes())
+    script = replay_module.__file__
+    result = subprocess.run([sys.executable, script, FSM_TEST_PUML, '-'], input=records.tobytes(),
+                            capture_output=True)
+    assert result.returncode == 0, result.stderr
+    assert b'1000 records match the model' in result.stdout
+
+    records[700]['to_state'] = records[700]['from_state']
+    trace_file.write_bytes(records.tobytes())
+    result = subprocess.run([sys.executable, script, FSM_TEST_PUML, str(trace_file), '--context', '2'],
+                            capture_output=True, text=True)
+    assert result.returncode == 1
+    assert 'first divergence at record 700' in result.stdout
+    assert len(result.stdout.splitlines()) == 2 + 2 + 1 + 2
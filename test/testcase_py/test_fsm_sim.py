@@ -0,0 +1,109 @@
+"""
+bfx_fsm_sim.py 测试用例
+"""
+
+import os
+import random
+import re
+import subprocess
+import sys
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+import bfx_fsm_sim as sim_module
+import bfx_puml_translate as translate
+
+TESTCASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'testcase'))
+FSM_TEST_PUML = os.path.join(TESTCASE_DIR, 'FsmTest.puml')
+
+
+def load_parser(plantuml_file: str) -> translate.PlantUMLParser:
+    parser = translate.PlantUMLParser()
+    parser.parse_file(plantuml_file)
+    parser.assign_ids()
+    return parser
+
+
+def reference_process_event(parser: translate.PlantUMLParser, state_id: int, event_id: int):
+    """按bfx_fsm.c的线性表逻辑逐条查找：先本状态后父状态，目标沿defaultStateID走到叶子"""
+    by_id = {state.id: state for state in parser.states.values()}
+    event_name = next((e.name for e in parser.events.values() if e.id == event_id), None)
+    node = by_id[state_id]
+    while node is not None:
+        for transition in parser.transitions:
+            if transition.from_state == node.full_name and transition.event == event_name:
+                target = parser.states[transition.to_state]
+                while target.initial_substate:
+                    target = target.children[target.initial_substate]
+                return target.id, 0
+        node = node.parent
+    return state_id, 1
+
+
+def test_tables_match_runtime_semantics():
+    parser = load_parser(FSM_TEST_PUML)
+    sim = sim_module.FsmSimulator(parser)
+    assert sim.state_names[sim.initial_state] == 'Setup'
+    for state_id in range(1, sim.state_cnt + 1):
+        for event_id in range(1, sim.event_cnt + 1):
+            assert sim.process_event(state_id, event_id) == reference_process_event(parser, state_id, event_id)
+    assert sim.process_event(sim.initial_state, sim.event_cnt + 1) == (sim.initial_state, 1)
+
+
+def test_single_trace_matches_step_by_step():
+    parser = load_parser(FSM_TEST_PUML)
+    sim = sim_module.FsmSimulator(parser)
+    rng = random.Random(1)
+    # 含越界事件，长度不是段数的整数倍
+    events = [rng.randint(0, sim.event_cnt + 2) for _ in range(5003)]
+    expected = []
+    state = sim.initial_state
+    for event in events:
+        state, _ = sim.process_event(state, event)
+        expected.append(state)
+    assert sim.run(events) == expected[-1]
+    assert sim.run(events, return_states=True).tolist() == expected
+    # 状态数较多时走逐事件查表
+    assert sim._run_sequential(sim.encode_events(events), sim.initial_state, True).tolist() == expected
+
+    names = ['SelfCheckDone', 'FileLoaded', 'Tmr200Ms', 'NoSuchEvent']
+    assert sim.state_names[sim.run(names)] == 'RunMain_LedOff'
+
+
+def test_batch_traces_match_single_runs():
+    parser = load_parser(FSM_TEST_PUML)
+    sim = sim_module.FsmSimulator(parser)
+    rng = np.random.default_rng(2)
+    traces = rng.integers(1, sim.event_cnt + 1, size=(64, 300))
+    lengths = rng.integers(0, 301, size=64)
+    finals = sim.run_batch(traces, lengths=lengths)
+    history = sim.run_batch(traces, return_states=True)
+    for index in range(len(traces)):
+        assert finals[index] == sim.run(traces[index][:lengths[index]])
+        assert history[index].tolist() == sim.run(traces[index], return_states=True).tolist()
+
+    ragged = [['SelfCheckDone'], ['SelfCheckDone', 'ErrOccur'], []]
+    assert [sim.state_names[state] for state in sim.run_batch(ragged)] == ['BootLoader', 'CoreDump', 'Setup']
+
+
+def test_simulator_ids_follow_generation_options(tmp_path):
+    profile = os.path.join(TESTCASE_DIR, 'FsmTest.profile')
+    options = translate.GenerateOptions(profile=profile)
+    translate.translate_file(FSM_TEST_PUML, str(tmp_path), options=options)
+    macros = dict((name, int(value)) for name, value in
+                  re.findall(r'#define FSMTEST_(\w+) (\d+)', (tmp_path / 'FsmTest.h').read_text(encoding='utf-8')))
+    sim = sim_module.FsmSimulator.from_file(FSM_TEST_PUML, options=options)
+    assert {name: macros[name.upper()] for name in sim.state_ids} == sim.state_ids
+    assert {name: macros[name.upper()] for name in sim.event_ids} == sim.event_ids
+    assert sim.initial_state == macros['INITIAL_STATE']
+    # 不带profile时ID与生成代码不一致
+    assert sim_module.FsmSimulator.from_file(FSM_TEST_PUML).state_ids != sim.state_ids
+
+    trace_file = tmp_path / 'trace.txt'
+    trace_file.write_text('SelfCheckDone ErrOccur\n', encoding='utf-8')
+    result = subprocess.run([sys.executable, sim_module.__file__, FSM_TEST_PUML, str(trace_file), '--profile', profile,
+                             '--prune', 'warn'], capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout == f"{trace_file}: CoreDump\n"
@@ -0,0 +1,119 @@
+"""
+bfx_fsm_trace.py 测试用例
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+import bfx_fsm_trace as trace_module
+import bfx_puml_translate as translate
+
+TESTCASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'testcase'))
+FSM_TEST_PUML = os.path.join(TESTCASE_DIR, 'FsmTest.puml')
+
+
+def load_parser(plantuml_file: str) -> translate.PlantUMLParser:
+    parser = translate.PlantUMLParser()
+    parser.parse_file(plantuml_file)
+    parser.assign_ids()
+    return parser
+
+
+def make_records(decoder: trace_module.TraceDecoder, event_cnt: int, seed: int = 0) -> np.ndarray:
+    """按模型随机游走生成跟踪记录，只记录发生转移的事件，与运行时一致"""
+    rng = np.random.default_rng(seed)
+    state = 1
+    rows = []
+    timestamp = 0
+    while len(rows) < event_cnt:
+        event = int(rng.integers(0, decoder.event_cnt + 1))
+        target = int(decoder.expected[state, event])
+        if target == 0:
+            continue
+        timestamp += 10
+        rows.append((timestamp, state, target, event, int(rng.integers(0, 8))))
+        state = target
+    return np.array(rows, dtype=trace_module.TRACE_RECORD_DTYPE)
+
+
+def test_decode_counts_match_records(tmp_path):
+    decoder = trace_module.TraceDecoder(load_parser(FSM_TEST_PUML))
+    records = make_records(decoder, 500)
+    trace_file = tmp_path / 'trace.bin'
+    with open(trace_file, 'wb') as f:
+        f.write(records.tobytes())
+        f.write(b'\x01\x02\x03')  # 转储被截断时末尾的半条记录
+
+    decoder.feed_file(str(trace_file), chunk_records=37)
+    summary = decoder.summary()
+    assert summary['records'] == 500
+    assert (summary['invalid'], summary['unexpected']) == (0, 0)
+    assert summary['first_timestamp'] == 10 and summary['last_timestamp'] == 5000
+    assert summary['max_duration'] == int(records['duration'].max())
+
+    expected = {}
+    for record in records:
+        key = (decoder.state_names[record['from_state']], decoder.event_names[record['event']])
+        expected[key] = expected.get(key, 0) + 1
+    assert {(t['from'], t['event']): t['count'] for t in summary['transitions']} == expected
+    counts = [t['count'] for t in summary['transitions']]
+    assert counts == sorted(counts, reverse=True)
+    for transition in summary['transitions']:
+        assert sum(transition['latency_hist']) == transition['count']
+        assert transition['latency_p50'] <= transition['latency_p99'] <= 4
+
+    heatmap = np.array(summary['heatmap'])
+    assert heatmap.sum() == 500
+    assert summary['state_visits'] == {
+        decoder.state_names[state]: int(cnt) for state, cnt in enumerate(heatmap.sum(axis=0)) if cnt}
+
+
+def test_decode_flags_invalid_and_unexpected():
+    decoder = trace_module.TraceDecoder(load_parser(FSM_TEST_PUML))
+    records = make_records(decoder, 10)
+    records[3]['to_state'] = records[3]['from_state']  # 模型中该转移的目标不是自身
+    records[5]['event'] = decoder.event_cnt + 7
+    decoder.feed(records)
+    summary = decoder.summary()
+    assert (summary['invalid'], summary['unexpected']) == (1, 1)
+    assert sum(t['count'] for t in summary['transitions']) == 9
+
+
+def test_latency_bins_and_saturation():
+    decoder = trace_module.TraceDecoder(load_parser(FSM_TEST_PUML))
+    records = make_records(decoder, 4)
+    records['from_state'] = records['from_state'][0]
+    records['event'] = records['event'][0]
+    records['to_state'] = records['to_state'][0]
+    records['duration'] = [0, 3, 1000, 0xFFFF]
+    decoder.feed(records)
+    transition, = decoder.summary()['transitions']
+    bins = list(trace_module.DEFAULT_LATENCY_BINS)
+    hist = transition['latency_hist']
+    assert hist[bins.index(0)] == 1 and hist[bins.index(2)] == 1
+    assert hist[bins.index(512)] == 1 and hist[-1] == 1
+    assert transition['latency_p50'] == 2
+
+
+def test_decode_cli_uses_generation_options(tmp_path):
+    profile = os.path.join(TESTCASE_DIR, 'FsmTest.profile')
+    parser, _ = translate.prepare_model(load_parser(FSM_TEST_PUML), translate.GenerateOptions(profile=profile))
+    decoder = trace_module.TraceDecoder(parser)
+    trace_file = tmp_path / 'trace.bin'
+    trace_file.write_bytes(make_records(decoder, 50).tobytes())
+
+    script = trace_module.__file__
+    result = subprocess.run([sys.executable, script, FSM_TEST_PUML, str(trace_file), '--profile', profile,
+                             '--json', str(tmp_path / 'out.json')], capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert json.loads((tmp_path / 'out.json').read_text())['unexpected'] == 0
+
+    # 不带--profile时ID与生成代码不一致，解码结果与模型对不上
+    result = subprocess.run([sys.executable, script, FSM_TEST_PUML, str(trace_file)], capture_output=True, text=True)
+    assert result.returncode == 1
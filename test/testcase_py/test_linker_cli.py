@@ -0,0 +1,128 @@
+"""
+bfx_linker_cli.py 测试用例
+"""
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+pytest.importorskip('jinja2')
+
+LINKER_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'bfx', 'tools', 'linker'))
+LINKER_CLI = os.path.join(LINKER_DIR, 'bfx_linker_cli.py')
+BFX_DIR = os.path.dirname(os.path.dirname(LINKER_DIR))
+if LINKER_DIR not in sys.path:
+    sys.path.append(LINKER_DIR)
+
+import bfx_linker_cli as linker_cli
+from src.data_manager import DataManager
+
+SECTIONS = [
+    {"name": ".fsm_names", "memory_region": "FLASH", "alignment": "4", "max_size": "0x400"},
+    {"name": ".ram_func", "memory_region": "RAM", "load_region": "FLASH", "fixed_size": "256"},
+]
+
+
+def write_project(path, sections=SECTIONS, component="Demo", output_paths=None):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({"custom_sections": sections, "component": component, "metadata": {},
+                   "output_paths": output_paths or {"linker_script": "", "header_file": ""}}, f)
+    return str(path)
+
+
+def run_cli(*args):
+    return subprocess.run([sys.executable, LINKER_CLI, *map(str, args)], capture_output=True, text=True)
+
+
+def test_cli_does_not_import_tkinter():
+    script = 'import sys, bfx_linker_cli\nprint("tkinter" in sys.modules)\n'
+    result = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True,
+                            cwd=LINKER_DIR)
+    assert result.stdout.strip() == 'False'
+
+
+def test_batch_writes_only_changed_outputs(tmp_path):
+    projects = [write_project(tmp_path / f'proj{i}.json', component=f"Comp{i}") for i in range(3)]
+    out = tmp_path / 'out'
+    result = run_cli(*projects, '-o', out, '--linker', 'all', '-j', 2)
+    assert result.returncode == 0, result.stderr
+    names = sorted(os.listdir(out))
+    assert names == sorted(f'proj{i}{ext}' for i in range(3) for ext in ('.ld', '.sct', '.h'))
+    assert 'KEEP(*(.fsm_names .fsm_names.*))' in (out / 'proj0.ld').read_text(encoding='utf-8')
+    assert 'LOAD FLASH' in (out / 'proj0.sct').read_text(encoding='utf-8')
+    header = (out / 'proj1.h').read_text(encoding='utf-8')
+    assert '#define BFX_COMP1__RAM_FUNC __attribute__((section(".ram_func")))' in header
+
+    # 只有生成时间不同的输出不重写
+    mtimes = {name: os.stat(out / name).st_mtime_ns for name in names}
+    result = run_cli(*projects, '-o', out, '--linker', 'all')
+    assert result.stdout.count('up to date') == 3
+    assert {name: os.stat(out / name).st_mtime_ns for name in names} == mtimes
+
+    # 只改动一个项目时只重写它的输出
+    write_project(tmp_path / 'proj2.json', sections=SECTIONS[:1], component="Comp2")
+    result = run_cli(*projects, '-o', out, '--linker', 'all')
+    changed = {name for name in names if os.stat(out / name).st_mtime_ns != mtimes[name]}
+    assert changed == {'proj2.ld', 'proj2.sct', 'proj2.h'}
+
+
+def test_saved_output_paths_and_linker_type(tmp_path):
+    project = write_project(tmp_path / 'proj.json',
+                            output_paths={"linker_script": "build/sections.sct", "header_file": "inc/sections.h"})
+    results = linker_cli.run_batch([project], jobs=1)
+    assert results[0][2] is None
+    assert [os.path.relpath(path, tmp_path) for path, _ in results[0][1]] == [
+        os.path.join('build', 'sections.sct'), os.path.join('inc', 'sections.h')]
+    assert (tmp_path / 'build' / 'sections.sct').read_text(encoding='utf-8').startswith('; BUFFERFLOWX')
+
+    # 指定另一种链接器时改用对应的扩展名
+    outputs = linker_cli.plan_outputs(project, json.load(open(project, encoding='utf-8')), 'all')
+    assert [(kind, os.path.basename(path)) for kind, path in outputs] == [
+        ('gcc', 'sections.ld'), ('keil', 'sections.sct'), ('header', 'sections.h')]
+
+
+def test_invalid_projects_fail_without_blocking_others(tmp_path):
+    good = write_project(tmp_path / 'good.json', output_paths={"linker_script": "good.ld", "header_file": ""})
+    bad = write_project(tmp_path / 'bad.json', sections=[{"name": ".x", "max_size": "0xZZ"}])
+    unsaved = write_project(tmp_path / 'unsaved.json')
+    result = run_cli(good, bad, unsaved, str(tmp_path / 'missing.json'))
+    assert result.returncode == 1
+    assert result.stderr.count('FAILED') == 3
+    assert '缺少内存区域' in result.stderr and '无效的十六进制大小值' in result.stderr
+    assert 'generated OK' in result.stdout and (tmp_path / 'good.ld').exists()
+
+    result = run_cli(good, '-o', tmp_path / 'out')
+    assert result.returncode == 0
+    assert sorted(os.listdir(tmp_path / 'out')) == ['good.h', 'good.ld']
+
+
+def test_validate_size_value_returns_tuple():
+    data_manager = DataManager()
+    assert data_manager.validate_size_value("0x100") == (True, "")
+    assert data_manager.validate_size_value("256") == (True, "")
+    assert data_manager.validate_size_value("0xZZ")[0] is False
+    data_manager.data["custom_sections"] = [dict(SECTIONS[0]), dict(SECTIONS[0], fixed_size="16")]
+    assert data_manager.validate_sections() == ["段 2 (.fsm_names): 段名重复",
+                                                "段 2 (.fsm_names): max_size与fixed_size不能同时指定"]
+
+
+@pytest.mark.skipif(shutil.which('cmake') is None or shutil.which('cc') is None, reason="no cmake or C compiler")
+def test_cmake_regenerates_sections(tmp_path):
+    project = write_project(tmp_path / 'sections.json')
+    (tmp_path / 'main.c').write_text('#include "sections.h"\n'
+                                     'const int g_value BFX_DEMO__FSM_NAMES = 1;\n'
+                                     'int main(void) { return g_value - 1; }\n')
+    (tmp_path / 'CMakeLists.txt').write_text(
+        'cmake_minimum_required(VERSION 3.10)\nproject(linker_sections C)\n'
+        f'include({BFX_DIR}/bfx_cmake_util.cmake)\n'
+        'add_executable(app main.c)\n'
+        f'bfx_add_linker_sections(app ${{CMAKE_CURRENT_BINARY_DIR}}/generated {project})\n')
+    build = tmp_path / 'build'
+    subprocess.run(['cmake', '-S', str(tmp_path), '-B', str(build)], capture_output=True, check=True)
+    subprocess.run(['cmake', '--build', str(build)], capture_output=True, check=True)
+    assert sorted(os.listdir(build / 'generated')) == ['sections.h', 'sections.ld']
+    assert subprocess.run([str(build / 'app')]).returncode == 0
@@ -0,0 +1,910 @@
+"""
+bfx_puml_translate.py 测试用例
+"""
+
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+
+import bfx_puml_translate as translate
+from puml_workload import make_workload
+
+TESTCASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'testcase'))
+FSM_TEST_PUML = os.path.join(TESTCASE_DIR, 'FsmTest.puml')
+
+
+def make_uml(state_cnt: int, group_size: int = 10) -> str:
+    """生成带单层嵌套的合成状态图：每 group_size 个子状态挂在一个复合状态下"""
+    lines = ['@startuml Scale']
+    group_cnt = max(1, state_cnt // group_size)
+    for g in range(group_cnt):
+        lines.append(f'    G{g}: group {g}')
+    lines.append('    [*] --> G0')
+    for g in range(group_cnt):
+        lines.append(f'    G{g} --> G{(g + 1) % group_cnt} : Next')
+    for g in range(group_cnt):
+        lines.append(f'    state G{g} {{')
+        for c in range(group_size):
+            lines.append(f'        S{c}: child {c}')
+        lines.append('        [*] --> S0')
+        for c in range(group_size):
+            lines.append(f'        S{c} --> S{(c + 1) % group_size} : Step')
+        lines.append('    }')
+    lines.append('@enduml')
+    return '\n'.join(lines)
+
+
+def load_parser(uml_text: str) -> translate.PlantUMLParser:
+    parser = translate.PlantUMLParser()
+    parser.parse(uml_text)
+    parser.assign_ids()
+    return parser
+
+
+def generate(uml_text: str):
+    parser = load_parser(uml_text)
+    return (translate.generate_header_file(parser, translate.HEADER_TEMPLATE),
+            translate.generate_source_file(parser, translate.SOURCE_TEMPLATE))
+
+
+def test_symbol_table_resolves_nested_names():
+    with open(FSM_TEST_PUML, encoding='utf-8') as f:
+        parser = load_parser(f.read())
+    assert parser.top_level_initial == 'Setup'
+    assert parser.states['RunMain'].initial_substate == 'LedOn'
+    assert parser.states['RunMain_DisplayOLED'].initial_substate == 'SetupIIC'
+    assert parser.short_names['LedOff'] is parser.states['RunMain_LedOff']
+    shown = parser.states['RunMain_DisplayOLED_ShowText']
+    assert shown.get_macro_name(parser.project_name) == 'FSMTEST_RUNMAIN_DISPLAYOLED_SHOWTEXT'
+    trans = parser.get_state_transitions()['RunMain_LedOn']
+    assert ('FSMTEST_BOTTONPRESSED', 'FSMTEST_RUNMAIN_DISPLAYOLED_SETUPIIC', '按钮按下') in trans
+
+
+def test_generation_scales_linearly():
+    costs = {}
+    for state_cnt in (10, 100, 1000, 10000):
+        uml_text = make_uml(state_cnt)
+        rounds = 1 if state_cnt >= 10000 else 3
+        best = float('inf')
+        for _ in range(rounds):
+            start = time.perf_counter()
+            generate(uml_text)
+            best = min(best, time.perf_counter() - start)
+        costs[state_cnt] = best
+    # 状态数增加 10 倍时，平方复杂度会带来约 100 倍耗时；这里要求不超过 30 倍
+    assert costs[10000] < costs[1000] * 30, costs
+    assert costs[1000] < costs[100] * 30, costs
+
+
+def test_batch_generates_every_manifest_entry(tmp_path):
+    for name in ('FsmA', 'FsmB'):
+        with open(FSM_TEST_PUML, encoding='utf-8') as f:
+            (tmp_path / f'{name}.puml').write_text(f.read().replace('FsmTest', name), encoding='utf-8')
+    manifest = tmp_path / 'fsm.manifest'
+    manifest.write_text('# all FSMs\nFsmA.puml\n\nFsmB.puml\n', encoding='utf-8')
+
+    plantuml_files = translate.read_manifest(str(manifest))
+    assert plantuml_files == [str(tmp_path / 'FsmA.puml'), str(tmp_path / 'FsmB.puml')]
+
+    out_dir = tmp_path / 'out'
+    assert translate.translate_batch(plantuml_files, str(out_dir), jobs=2) == 0
+    assert sorted(os.listdir(out_dir)) == ['FsmA.c', 'FsmA.h', 'FsmB.c', 'FsmB.h']
+    assert translate.translate_batch([str(tmp_path / 'missing.puml')], str(out_dir)) == 1
+
+
+def test_positional_output_dir_is_only_the_legacy_call(tmp_path):
+    for name in ('FsmA.puml', 'FsmB.pu'):
+        with open(FSM_TEST_PUML, encoding='utf-8') as f:
+            (tmp_path / name).write_text(f.read().replace('FsmTest', name.split('.')[0]), encoding='utf-8')
+    def run(*args):
+        return subprocess.run([sys.executable, translate.__file__, *map(str, args)], capture_output=True, text=True,
+                              cwd=tmp_path)
+
+    # 第二个文件不因扩展名不是.puml而被当作输出目录
+    result = run(tmp_path / 'FsmA.puml', tmp_path / 'FsmB.pu')
+    assert result.returncode == 2 and '-o/--output-dir' in result.stderr
+    result = run('-o', tmp_path / 'out', tmp_path / 'FsmA.puml', tmp_path / 'FsmB.pu')
+    assert result.returncode == 0, result.stderr
+    assert sorted(os.listdir(tmp_path / 'out')) == ['FsmA.c', 'FsmA.h', 'FsmB.c', 'FsmB.h']
+
+    result = run(tmp_path / 'FsmA.puml', tmp_path / 'legacy')
+    assert result.returncode == 0 and 'deprecated' in result.stderr
+    assert sorted(os.listdir(tmp_path / 'legacy')) == ['FsmA.c', 'FsmA.h']
+
+
+def test_unchanged_outputs_are_not_rewritten(tmp_path):
+    outputs = translate.translate_file(FSM_TEST_PUML, str(tmp_path))
+    assert all(changed for _, changed in outputs)
+    mtimes = {path: os.stat(path).st_mtime_ns for path, _ in outputs}
+
+    outputs = translate.translate_file(FSM_TEST_PUML, str(tmp_path))
+    assert not any(changed for _, changed in outputs)
+    assert mtimes == {path: os.stat(path).st_mtime_ns for path, _ in outputs}
+
+    header_path = outputs[0][0]
+    with open(header_path, 'a', encoding='utf-8') as f:
+        f.write('// edited by hand\n')
+    outputs = translate.translate_file(FSM_TEST_PUML, str(tmp_path))
+    assert [changed for _, changed in outputs] == [True, False]
+
+
+@pytest.mark.skipif(not hasattr(socket, 'AF_UNIX'), reason="需要Unix域套接字")
+def test_server_round_trip_and_fallback(tmp_path):
+    socket_path = str(tmp_path / 'fsm.sock')
+    assert translate.request_server(socket_path, [FSM_TEST_PUML], str(tmp_path)) is None
+
+    server = subprocess.Popen([sys.executable, translate.__file__, '--serve', socket_path],
+                              stdout=subprocess.DEVNULL)
+    try:
+        deadline = time.monotonic() + 10
+        while not os.path.exists(socket_path) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        results = translate.request_server(socket_path, [FSM_TEST_PUML], str(tmp_path / 'out'))
+        assert results is not None
+        (plantuml_file, outputs, error, stats), = results
+        assert error is None and stats['project'] == 'FsmTest'
+        assert [os.path.basename(path) for path, changed in outputs if changed] == ['FsmTest.h', 'FsmTest.c']
+        with open(outputs[1][0], encoding='utf-8') as f:
+            assert f.read() == translate.render_fsm(FSM_TEST_PUML)[2]
+    finally:
+        assert translate.stop_server(socket_path)
+        server.wait(timeout=10)
+
+
+def model_signature(parser: translate.PlantUMLParser):
+    return (parser.project_name, parser.top_level_initial,
+            [(name, s.line, s.initial_substate, s.parent.full_name if s.parent else None)
+             for name, s in parser.states.items()],
+            [(t.from_state, t.to_state, t.event, t.event_comment, t.line) for t in parser.transitions])
+
+
+@pytest.mark.parametrize('use_mmap', [False, True])
+def test_streaming_parse_matches_text_parse(tmp_path, use_mmap):
+    uml_text = make_uml(500)
+    puml_file = tmp_path / 'Scale.puml'
+    puml_file.write_text(uml_text, encoding='utf-8')
+
+    expected = translate.PlantUMLParser()
+    expected.parse(uml_text)
+    parser = translate.PlantUMLParser()
+    parser.parse_file(str(puml_file), use_mmap=use_mmap)
+    assert model_signature(parser) == model_signature(expected)
+
+    # 小块读取时块边界落在行中间，结果必须一致
+    with open(puml_file, 'rb') as f:
+        tokens = [(lineno, kind, m.group(0)) for lineno, kind, m in translate.tokenize_puml(f, chunk_size=7)]
+    assert tokens == [(lineno, kind, m.group(0)) for lineno, kind, m in translate.tokenize_puml(uml_text)]
+
+
+def test_tokens_keep_line_numbers():
+    with open(FSM_TEST_PUML, encoding='utf-8') as f:
+        lines = f.read().split('\n')
+    with open(FSM_TEST_PUML, 'rb') as f:
+        for lineno, kind, m in translate.tokenize_puml(f):
+            assert m.group(0).strip() == lines[lineno - 1].strip()
+    parser = translate.PlantUMLParser()
+    parser.parse_file(FSM_TEST_PUML)
+    transition = parser.transitions[0]
+    assert lines[transition.line - 1].strip() == 'Setup --> BootLoader : SelfCheckDone/自检完成'
+
+
+def write_include_fsm(tmp_path):
+    (tmp_path / 'sub').mkdir()
+    (tmp_path / 'Main.puml').write_text(
+        '@startuml Main\n'
+        '    Idle: idle\n'
+        '    Busy: busy\n'
+        '    [*] --> Idle\n'
+        '    Idle --> Busy : Go\n'
+        '    !include sub/busy.iuml\n'
+        '@enduml\n', encoding='utf-8')
+    (tmp_path / 'sub' / 'busy.iuml').write_text(
+        '    state Busy {\n'
+        '        A: a\n'
+        '        B: b\n'
+        '        [*] --> A\n'
+        '        A --> B : Step\n'
+        '    }\n'
+        '    Busy --> Idle : Stop\n', encoding='utf-8')
+    return str(tmp_path / 'Main.puml'), str(tmp_path / 'sub' / 'busy.iuml')
+
+
+def test_include_expands_in_place(tmp_path):
+    main_file, include_file = write_include_fsm(tmp_path)
+    parser = translate.PlantUMLParser()
+    parser.parse_file(main_file)
+    assert parser.sources == [main_file, include_file]
+    assert parser.states['Busy'].initial_substate == 'A'
+    assert [(t.from_state, t.to_state, t.event) for t in parser.transitions] == [
+        ('Idle', 'Busy', 'Go'), ('Busy_A', 'Busy_B', 'Step'), ('Busy', 'Idle', 'Stop')]
+
+
+def test_model_round_trip():
+    parser = translate.PlantUMLParser()
+    parser.parse_file(FSM_TEST_PUML)
+    parser.assign_ids()
+    restored = translate.PlantUMLParser.from_model(parser.to_model())
+    assert model_signature(restored) == model_signature(parser)
+    assert translate.generate_source_file(restored, translate.SOURCE_TEMPLATE) == \
+        translate.generate_source_file(parser, translate.SOURCE_TEMPLATE)
+
+
+def test_model_cache_skips_parse_until_include_changes(tmp_path, monkeypatch):
+    main_file, include_file = write_include_fsm(tmp_path)
+    cache_dir = str(tmp_path / 'cache')
+    _, key = translate.load_model(main_file, cache_dir)
+
+    # 清空进程内缓存，只依赖磁盘缓存
+    translate._MODEL_MEMO.clear()
+    def no_parse(*args, **kwargs):
+        raise AssertionError("cache hit must not parse")
+    monkeypatch.setattr(translate.PlantUMLParser, 'parse_file', no_parse)
+    parser, cached_key = translate.load_model(main_file, cache_dir)
+    assert cached_key == key
+    assert 'Busy_B' in parser.states
+    monkeypatch.undo()
+
+    with open(include_file, 'a', encoding='utf-8') as f:
+        f.write('    Idle --> Idle : Tick\n')
+    translate._MODEL_MEMO.clear()
+    parser, changed_key = translate.load_model(main_file, cache_dir)
+    assert changed_key != key
+    assert 'Tick' in parser.events
+
+
+def test_depfile_lists_include_files(tmp_path):
+    (tmp_path / 'my dir').mkdir()
+    main_file, include_file = write_include_fsm(tmp_path / 'my dir')
+    depfile = tmp_path / 'Main_fsm.stamp.d'
+    subprocess.run([sys.executable, translate.__file__, main_file, '-o', str(tmp_path / 'out'),
+                    '--depfile', str(depfile)], capture_output=True, check=True)
+    escape = lambda path: path.replace(' ', '\\ ')
+    assert depfile.read_text(encoding='utf-8') == (f"{escape(str(tmp_path / 'Main_fsm.stamp'))}: \\\n"
+                                                   f" {escape(main_file)} \\\n {escape(include_file)}\n")
+
+
+@pytest.mark.skipif(shutil.which('cmake') is None or shutil.which('cc') is None, reason="no cmake or C compiler")
+def test_cmake_regenerates_on_include_edits(tmp_path):
+    main_file, include_file = write_include_fsm(tmp_path)
+    (tmp_path / 'main.c').write_text('#include "Main.h"\nint main(void) { return MAIN_BUSY_B == 0; }\n')
+    (tmp_path / 'CMakeLists.txt').write_text(
+        'cmake_minimum_required(VERSION 3.10)\nproject(puml_include C)\n'
+        f'include({os.path.dirname(os.path.dirname(translate.__file__))}/bfx_cmake_util.cmake)\n'
+        'bfx_get_include_dirs(BFX_INCLUDE_DIRS)\nbfx_get_fsm_srcs(BFX_SRCS)\n'
+        'add_executable(app main.c ${BFX_SRCS})\ntarget_include_directories(app PRIVATE ${BFX_INCLUDE_DIRS})\n'
+        'bfx_add_puml_fsm(app ${CMAKE_CURRENT_SOURCE_DIR}/Main.puml ${CMAKE_CURRENT_BINARY_DIR}/generated)\n')
+    build = tmp_path / 'build'
+    subprocess.run(['cmake', '-S', str(tmp_path), '-B', str(build)], capture_output=True, check=True)
+    subprocess.run(['cmake', '--build', str(build)], capture_output=True, check=True)
+    assert 'MAIN_BUSY_C' not in (build / 'generated' / 'Main.h').read_text(encoding='utf-8')
+
+    # 只改动被包含的文件也会重新生成
+    with open(include_file, 'a', encoding='utf-8') as f:
+        f.write('    state Busy {\n        C: c\n        B --> C : Step\n    }\n')
+    subprocess.run(['cmake', '--build', str(build)], capture_output=True, check=True)
+    assert 'MAIN_BUSY_C' in (build / 'generated' / 'Main.h').read_text(encoding='utf-8')
+
+
+def test_dense_dispatch_matrix_inherits_father_transitions():
+    with open(FSM_TEST_PUML, encoding='utf-8') as f:
+        parser = load_parser(f.read())
+    matrix = dict((state.full_name, row) for state, row in parser.get_dispatch_matrix())
+    err_occur = parser.events['ErrOccur'].id - 1
+    # 重复的 ErrOccur 转移取先出现的一条，孙状态继承祖父状态 RunMain 的转移
+    assert matrix['BootLoader'][err_occur] is parser.states['CoreDump']
+    assert matrix['RunMain_DisplayOLED_ShowText'][err_occur] is parser.states['CoreDump']
+    assert matrix['Setup'][err_occur] is None
+
+    options = translate.GenerateOptions(dispatch='dense')
+    source = translate.generate_source_file(parser, translate.SOURCE_TEMPLATE, options)
+    assert f'g_FsmTest_dispatchTbl[{len(parser.states)}][{len(parser.events)}]' in source
+    assert '.dispatchTbl = &g_FsmTest_dispatchTbl[0][0],' in source
+    assert '_TransTbl[]' not in source
+
+
+def test_sparse_tables_follow_flash_budget():
+    parser = translate.PlantUMLParser()
+    parser.parse_file(os.path.join(TESTCASE_DIR, 'FsmSparseTest.puml'))
+    parser.assign_ids()
+
+    def encodings(flash_budget):
+        plans, slots = parser.plan_transition_tables(flash_budget)
+        size = sum(len(plan['records']) for plan in plans.values()) + len(slots)
+        return {name: plan['encoding'] for name, plan in plans.items()}, size * translate.TRAN_RECORD_SIZE
+
+    unlimited, unlimited_size = encodings(None)
+    tight, tight_size = encodings(34)
+    assert unlimited['Idle'] == translate.TRAN_TBL_COMB
+    assert tight['Idle'] == translate.TRAN_TBL_SORTED
+    assert tight['Play'] == translate.TRAN_TBL_COMB
+    assert tight['Menu'] == translate.TRAN_TBL_LINEAR
+    assert tight_size <= 34 < unlimited_size
+    # 同一模型与预算的结果完全一致
+    assert encodings(34) == (tight, tight_size)
+
+    # 梳状压缩表中每一行只能命中自己的事件
+    event_macros = {event.id: f"FSMSPARSETEST_{event.name.upper()}" for event in parser.events.values()}
+    plans, slots = parser.plan_transition_tables(None)
+    for name, plan in plans.items():
+        if plan['encoding'] != translate.TRAN_TBL_COMB:
+            continue
+        own = {parser.events[t.event].id for t in parser.transitions if t.from_state == name}
+        for event_id in range(1, plan['span'] + 1):
+            slot = slots[plan['base'] + event_id - 1]
+            assert (slot is not None and slot[0] == event_macros[event_id]) == (event_id in own)
+
+
+def test_multi_level_nesting_resolves_scopes_and_leaf_targets():
+    parser = load_parser('\n'.join([
+        '@startuml Deep',
+        '    Idle: idle',
+        '    [*] --> Idle',
+        '    Idle --> Work : Start',
+        '    state Work {',
+        '        [*] --> Stage',
+        '        Stage: stage',
+        '        state Stage {',
+        '            [*] --> Step',
+        '            Step --> Done : Next',  # Done在后面声明，且外层也有同名状态
+        '            Step: step',
+        '            Done: done',
+        '            Step --> Idle : Abort',  # 回到顶层
+        '        }',
+        '        Done: work done',
+        '    }',
+        '    state Other {',
+        '        Stage: other stage',
+        '        state Stage {',
+        '            Step: other step',
+        '        }',
+        '    }',
+        '@enduml',
+    ]))
+    transitions = {(t.from_state, t.event): t.to_state for t in parser.transitions}
+    assert transitions[('Work_Stage_Step', 'Next')] == 'Work_Stage_Done'
+    assert transitions[('Work_Stage_Step', 'Abort')] == 'Idle'
+    assert parser.states['Work'].initial_substate == 'Stage'
+
+    # 进入复合状态的转移直接指向最终的叶子状态
+    assert parser.resolve_default_leaf(parser.states['Work']) is parser.states['Work_Stage_Step']
+    idle_records = parser.get_state_transitions()['Idle']
+    assert idle_records == [('DEEP_START', 'DEEP_WORK_STAGE_STEP', '')]
+
+    # 父状态名+状态名重名时回调名使用完整路径
+    callbacks = {state.get_callback_name('Deep') for state in parser.states.values()}
+    assert len(callbacks) == len(parser.states)
+    assert 'BFX_Deep_Work_Stage_Step_ActionCb' in callbacks
+    assert 'BFX_Deep_Other_Stage_Step_ActionCb' in callbacks
+    assert 'BFX_Deep_Work_Stage_ActionCb' in callbacks
+
+    restored = translate.PlantUMLParser.from_model(parser.to_model())
+    assert restored.states['Other_Stage_Step'].get_callback_name('Deep') == 'BFX_Deep_Other_Stage_Step_ActionCb'
+
+
+def test_profile_reorders_hot_states_and_transitions(tmp_path):
+    profile_file = os.path.join(TESTCASE_DIR, 'FsmTest.profile')
+    profile = translate.read_profile(profile_file)
+    assert profile[('RunMain_LedOn', 'Tmr200Ms')] == 5000
+
+    with open(FSM_TEST_PUML, encoding='utf-8') as f:
+        parser = load_parser(f.read())
+    parser.apply_profile(profile)
+    names = list(parser.states)
+    assert names[:2] == ['RunMain_LedOn', 'RunMain_LedOff']
+    assert [state.id for state in parser.states.values()] == list(range(1, len(names) + 1))
+    # 冷状态保持声明顺序
+    assert names[-3:] == ['RunMain_DisplayOLED', 'RunMain_DisplayOLED_SetupIIC', 'RunMain_DisplayOLED_InitOLED']
+    # 同一事件的多条转移仍按图中顺序
+    bootloader = parser.get_state_transitions()['BootLoader']
+    assert [record[2] for record in bootloader] == ['文件加载完成', '校验错误', '加载错误']
+
+    output_dir = tmp_path / 'out'
+    options = translate.GenerateOptions(profile=profile_file)
+    translate.translate_file(FSM_TEST_PUML, str(output_dir), options=options)
+    first = (output_dir / 'FsmTest.c').read_text(encoding='utf-8')
+    assert first.index('g_FsmTest_runmain_ledon_TransTbl') < first.index('g_FsmTest_setup_TransTbl')
+    translate._RENDER_MEMO.clear()
+    translate.translate_file(FSM_TEST_PUML, str(output_dir), options=options)
+    assert (output_dir / 'FsmTest.c').read_text(encoding='utf-8') == first
+
+    bad_profile = tmp_path / 'bad.profile'
+    bad_profile.write_text('Setup SelfCheckDone many\n', encoding='utf-8')
+    with pytest.raises(ValueError, match='bad.profile:1'):
+        translate.read_profile(str(bad_profile))
+
+
+def test_identical_transition_tables_are_emitted_once(capsys):
+    parser = load_parser('\n'.join([
+        '@startuml Dedup',
+        '    Idle: idle',
+        '    Busy: busy',
+        '    ErrA: error a',
+        '    ErrB: error b',
+        '    [*] --> Idle',
+        '    Idle --> Busy : Start',
+        '    Busy --> ErrA : Fail',
+        '    ErrA --> Idle : Reset/复位',
+        '    ErrA --> ErrB : Fail',
+        '    ErrB --> Idle : Reset/另一条注释',
+        '    ErrB --> ErrA : Fail',
+        '    Busy --> Idle : Reset',
+        '@enduml',
+    ]))
+    stats = {}
+    source = translate.generate_source_file(parser, translate.SOURCE_TEMPLATE, stats=stats)
+    # ErrA与ErrB的目标不同，Busy与ErrA的事件顺序不同，都不能共享
+    assert (stats['dedup_tables'], stats['dedup_bytes_saved']) == (0, 0)
+
+    parser = load_parser('\n'.join([
+        '@startuml Dedup',
+        '    Idle: idle',
+        '    ErrA: error a',
+        '    ErrB: error b',
+        '    ErrC: error c',
+        '    [*] --> Idle',
+        '    Idle --> ErrA : Fail',
+        '    ErrA --> Idle : Reset/复位',
+        '    ErrB --> Idle : Reset/另一条注释',
+        '    ErrC --> Idle : Reset',
+        '@enduml',
+    ]))
+    stats = {}
+    source = translate.generate_source_file(parser, translate.SOURCE_TEMPLATE, stats=stats)
+    assert (stats['dedup_tables'], stats['dedup_bytes_saved']) == (2, 2 * translate.TRAN_RECORD_SIZE)
+    assert source.count('const BFX_FSM_TRAN_RECORD') == 2
+    assert '// also used by DEDUP_ERRB, DEDUP_ERRC' in source
+    assert source.count('sizeof(g_Dedup_erra_TransTbl) / sizeof(BFX_FSM_TRAN_RECORD), g_Dedup_erra_TransTbl,') == 3
+
+    translate.report_results([('dedup.puml', [], None, {'project': 'Dedup', **stats})])
+    assert '2 duplicate transition table(s) shared, 4 bytes flash saved' in capsys.readouterr().out
+
+
+def test_id_width_is_the_narrowest_that_fits():
+    assert load_parser(open(FSM_TEST_PUML, encoding='utf-8').read()).get_id_widths() == (8, 8)
+    parser = load_parser(make_uml(300))
+    assert parser.get_id_widths() == (16, 8)
+    header = translate.generate_header_file(parser, translate.HEADER_TEMPLATE)
+    assert '#define SCALE_STATE_ID_WIDTH 16' in header
+    assert '#define SCALE_EVENT_ID_WIDTH 8' in header
+
+
+def test_footprint_counts_struct_padding(tmp_path):
+    parser = load_parser(open(FSM_TEST_PUML, encoding='utf-8').read())
+    stats = {'project': parser.project_name}
+    translate.generate_source_file(parser, translate.SOURCE_TEMPLATE, stats=stats)
+    layout = stats['layout']
+    assert layout['tran_records'] == sum(len(records) for records in parser.get_state_transitions().values())
+
+    # ilp32：4个ID + 2个指针 + tranTblType，补齐到4字节
+    footprint = translate.compute_footprint(layout, 'ilp32')
+    assert footprint['sizeof'] == {'BFX_FSM_TRAN_RECORD': 2, 'BFX_FSM_STATE': 16, 'BFX_FSM_HANDLE': 16}
+    assert footprint['rom']['state_table'] == len(parser.states) * 16
+    assert footprint['rom']['total'] == len(parser.states) * 16 + layout['tran_records'] * 2
+    assert footprint['ram']['total'] == 16
+    # avr没有对齐要求
+    assert translate.compute_footprint(layout, 'avr')['sizeof']['BFX_FSM_STATE'] == 9
+    # 16位状态ID与8位事件ID：记录按2字节对齐
+    wide = dict(layout, state_id_width=16)
+    assert translate.compute_footprint(wide, 'ilp32')['sizeof'] == {
+        'BFX_FSM_TRAN_RECORD': 4, 'BFX_FSM_STATE': 20, 'BFX_FSM_HANDLE': 20}
+
+    report_file = tmp_path / 'footprint.json'
+    results = [('FsmTest.puml', [], None, stats), ('Broken.puml', None, 'error', None)]
+    assert translate.write_footprint_report(results, str(report_file), 'ilp32')
+    assert not translate.write_footprint_report(results, str(report_file), 'ilp32')
+    report = json.loads(report_file.read_text())
+    assert report['abi'] == 'ilp32'
+    assert list(report['fsms']) == ['FsmTest']
+    assert report['rom_total'] == footprint['rom']['total']
+
+
+@pytest.mark.skipif(shutil.which('cc') is None, reason="no C compiler")
+@pytest.mark.parametrize('state_id_width', [8, 16])
+def test_footprint_matches_host_compiler(tmp_path, state_id_width):
+    """在主机上编译生成的代码，sizeof与占用统计一致；16位ID的状态机只能在16位运行时下编译"""
+    parser = load_parser(make_uml(300))
+    stats = {'project': parser.project_name}
+    (tmp_path / 'Scale.h').write_text(translate.generate_header_file(parser, translate.HEADER_TEMPLATE))
+    (tmp_path / 'Scale.c').write_text(translate.generate_source_file(parser, translate.SOURCE_TEMPLATE, stats=stats))
+    (tmp_path / 'main.c').write_text('\n'.join([
+        '#include <stdio.h>',
+        '#include "Scale.c"',
+        'int main(void)',
+        '{',
+        '    for (int i = 0; i < 29; i++) {',
+        '        BFX_FsmProcessEvent(&g_Scale_fsmHandle, SCALE_NEXT, NULL, 0);',
+        '    }',
+        '    BFX_FsmProcessEvent(&g_Scale_fsmHandle, SCALE_STEP, NULL, 0);',
+        '    printf("%d %d %d %d %d\\n", BFX_FsmGetCurrentStateID(&g_Scale_fsmHandle) == SCALE_G29_S1,',
+        '           (int)sizeof(BFX_FSM_TRAN_RECORD), (int)sizeof(BFX_FSM_STATE), (int)sizeof(BFX_FSM_HANDLE),',
+        '           (int)sizeof(g_Scale_allstatus));',
+        '    return 0;',
+        '}',
+    ]))
+    fsm_dir = os.path.join(TESTCASE_DIR, '..', '..', 'bfx', 'fsm')
+    build = subprocess.run(['cc', '-std=c99', f'-DBFX_FSM_STATE_ID_WIDTH={state_id_width}', '-I', fsm_dir,
+                            '-I', str(tmp_path), '-o', str(tmp_path / 'fsm'), str(tmp_path / 'main.c'),
+                            os.path.join(fsm_dir, 'bfx_fsm.c')],
+                           capture_output=True, text=True)
+    if state_id_width == 8:
+        assert build.returncode != 0
+        assert 'Scale needs BFX_FSM_STATE_ID_WIDTH >= 16' in build.stderr
+        return
+    assert build.returncode == 0, build.stderr
+
+    output = subprocess.run([str(tmp_path / 'fsm')], capture_output=True, text=True, check=True).stdout.split()
+    reached, record, state, handle, state_table = map(int, output)
+    assert reached == 1
+    footprint = translate.compute_footprint(stats['layout'], 'lp64' if sys.maxsize > 2 ** 32 else 'ilp32')
+    assert footprint['sizeof'] == {'BFX_FSM_TRAN_RECORD': record, 'BFX_FSM_STATE': state, 'BFX_FSM_HANDLE': handle}
+    assert footprint['rom']['state_table'] == state_table
+
+
+
+def compile_sizes(tmp_path, options: translate.GenerateOptions, defines, expressions) -> dict:
+    """生成FsmTest并在主机上编译，返回各C表达式的值，用于核对占用统计"""
+    stats = translate.render_fsm(FSM_TEST_PUML, options=options)[4]
+    translate.translate_file(FSM_TEST_PUML, str(tmp_path), options=options)
+    (tmp_path / 'main.c').write_text('\n'.join(
+        ['#include <stdio.h>', '#include "FsmTest.c"', 'int main(void)', '{'] +
+        [f'    printf("%d\\n", (int)({expression}));' for expression in expressions.values()] +
+        ['    return 0;', '}']))
+    fsm_dir = os.path.join(TESTCASE_DIR, '..', '..', 'bfx', 'fsm')
+    subprocess.run(['cc', '-std=c99', *[f'-D{define}' for define in defines], '-I', fsm_dir, '-I', str(tmp_path),
+                    '-o', str(tmp_path / 'sizes'), str(tmp_path / 'main.c'), os.path.join(fsm_dir, 'bfx_fsm.c')],
+                   capture_output=True, check=True)
+    output = subprocess.run([str(tmp_path / 'sizes')], capture_output=True, text=True, check=True).stdout.split()
+    footprint = translate.compute_footprint(stats['layout'], 'lp64' if sys.maxsize > 2 ** 32 else 'ilp32')
+    return footprint, dict(zip(expressions, map(int, output)))
+
+
+@pytest.mark.skipif(shutil.which('cc') is None, reason="no C compiler")
+def test_footprint_counts_trace_buffer(tmp_path):
+    footprint, sizes = compile_sizes(tmp_path, translate.GenerateOptions(trace=True), ['BFX_FSM_TRACE_ENABLE'], {
+        'handle': 'sizeof(g_FsmTest_fsmHandle)',
+        'trace_buffer': 'sizeof(g_FsmTest_traceBuf) + sizeof(g_FsmTest_trace)',
+        'state_table': 'sizeof(g_FsmTest_allstatus)',
+    })
+    assert footprint['ram'] == {'handle': sizes['handle'], 'trace_buffer': sizes['trace_buffer'],
+                                'total': sizes['handle'] + sizes['trace_buffer']}
+    assert footprint['rom']['state_table'] == sizes['state_table']
+
+
+@pytest.mark.skipif(shutil.which('cc') is None, reason="no C compiler")
+def test_footprint_counts_image_fields(tmp_path):
+    options = translate.GenerateOptions(trace=True, image=True)
+    footprint, sizes = compile_sizes(tmp_path, options, ['BFX_FSM_TRACE_ENABLE', 'BFX_FSM_IMAGE_ENABLE'], {
+        'handle': 'sizeof(g_FsmTest_fsmHandle)',
+        'action_table': 'sizeof(g_FsmTest_actionTbl)',
+    })
+    assert footprint['ram']['handle'] == sizes['handle']
+    assert footprint['rom']['action_table'] == sizes['action_table']
+    assert 'action_table' not in translate.compute_footprint(
+        translate.render_fsm(FSM_TEST_PUML)[4]['layout'])['rom']
+
+
+@pytest.mark.skipif(shutil.which('cc') is None, reason="no C compiler")
+def test_footprint_counts_name_tables(tmp_path):
+    tables = ' + '.join(f'sizeof(g_FsmTest_{kind}Name{table})' for kind in ('state', 'event')
+                        for table in ('Seeds', 'Slots', 'Offsets', 'Pool', 's'))
+    footprint, sizes = compile_sizes(tmp_path, translate.GenerateOptions(names=True), ['BFX_FSM_NAMES_ENABLE'], {
+        'name_index': tables,
+        'index': 'sizeof(BFX_FSM_NAME_INDEX)',
+    })
+    assert footprint['rom']['name_index'] == sizes['name_index']
+    assert footprint['sizeof']['BFX_FSM_NAME_INDEX'] == sizes['index']
+    # 没有事件时只有一个空索引
+    stats = {}
+    translate.generate_source_file(load_parser('@startuml Bare\nIdle: idle\n@enduml\n'), None,
+                                   translate.GenerateOptions(names=True), stats)
+    bare = translate.compute_footprint(stats['layout'], 'ilp32')
+    assert bare['rom']['name_index'] == 20 + (1 * 8 + len('Idle') + 2) + 20
+
+
+DEAD_CODE_UML = '\n'.join([
+    '@startuml Dead',
+    '    Idle: idle',
+    '    Work: work',
+    '    Orphan: unreachable',
+    '    [*] --> Idle',
+    '    Idle --> Work : Start',
+    '    Idle --> Orphan : Start',
+    '    Work --> Idle : Stop',
+    '    Orphan --> Idle : Stop',
+    '    state Work {',
+    '        A: a',
+    '        B: b',
+    '        Spare: never entered',
+    '        [*] --> A',
+    '        A --> B : Next',
+    '        B --> A : Next',
+    '        Spare --> A : Next',
+    '    }',
+    '    Work --> Idle : Next',
+    '@enduml',
+])
+
+
+def test_dead_code_analysis_finds_unreachable_states_and_shadowed_transitions():
+    parser = load_parser(DEAD_CODE_UML)
+    dead_states, dead_transitions = parser.find_dead_code()
+    assert [state.full_name for state in dead_states] == ['Orphan', 'Work_Spare']
+    # 同表中第二条Start被第一条遮蔽，Work的Next被A、B遮蔽，死状态的转移一并删除
+    assert [(t.from_state, t.to_state, t.event) for t in dead_transitions] == [
+        ('Idle', 'Orphan', 'Start'), ('Orphan', 'Idle', 'Stop'), ('Work_Spare', 'Work_A', 'Next'),
+        ('Work', 'Idle', 'Next')]
+
+    messages = parser.prune_dead_code()
+    assert messages == [
+        'line 4: state Orphan is unreachable from the initial state',
+        'line 13: state Work_Spare is unreachable from the initial state',
+        'line 7: transition Idle --> Orphan : Start is shadowed and never fires',
+        'line 19: transition Work --> Idle : Next is shadowed and never fires',
+    ]
+    assert [(state.full_name, state.id) for state in parser.states.values()] == [
+        ('Idle', 1), ('Work', 2), ('Work_A', 3), ('Work_B', 4)]
+    assert list(parser.states['Work'].children) == ['A', 'B']
+    assert parser.find_dead_code() == ([], [])
+    assert parser.prune_dead_code() == []
+
+
+def test_prune_option_warns_or_fails(tmp_path, capsys):
+    plantuml_file = tmp_path / 'dead.puml'
+    plantuml_file.write_text(DEAD_CODE_UML, encoding='utf-8')
+    output_dir = tmp_path / 'out'
+
+    assert translate.translate_batch([str(plantuml_file)], str(output_dir), jobs=1) == 0
+    assert 'DEAD_ORPHAN' in (output_dir / 'Dead.h').read_text(encoding='utf-8')
+    assert 'warning' not in capsys.readouterr().err
+
+    options = translate.GenerateOptions(prune='warn')
+    assert translate.translate_batch([str(plantuml_file)], str(output_dir), jobs=1, options=options) == 0
+    header = (output_dir / 'Dead.h').read_text(encoding='utf-8')
+    assert 'DEAD_ORPHAN' not in header and '#define DEAD_WORK_B 4' in header
+    assert ('-- FSM Dead: warning: line 4: state Orphan is unreachable from the initial state'
+            in capsys.readouterr().err)
+
+    options = translate.GenerateOptions(prune='error')
+    assert translate.translate_batch([str(plantuml_file)], str(output_dir), jobs=1, options=options) == 1
+    assert '4 dead state(s)/transition(s)' in capsys.readouterr().err
+    assert translate.translate_batch([FSM_TEST_PUML], str(output_dir), jobs=1, options=options) == 1
+
+
+BACKEND_OPTIONS = [
+    translate.GenerateOptions(),
+    translate.GenerateOptions(dispatch='dense', trace=True),
+    translate.GenerateOptions(dispatch='sparse', image=True),
+    translate.GenerateOptions(dispatch='sparse', flash_budget=34, trace=True, image=True, split=True),
+    translate.GenerateOptions(dispatch='dense', split=True, instances=9),
+    translate.GenerateOptions(instances=200),
+    translate.GenerateOptions(trace=True, queue=0),
+    translate.GenerateOptions(dispatch='dense', split=True, instances=2, queue=3),
+    translate.GenerateOptions(names=True),
+    translate.GenerateOptions(dispatch='sparse', split=True, image=True, names=True),
+    translate.GenerateOptions(profile=os.path.join(TESTCASE_DIR, 'FsmTest.profile'), prune='warn'),
+]
+
+
+@pytest.mark.parametrize('uml_text', [
+    pytest.param(None, id='testcase'),
+    pytest.param(make_uml(40, group_size=4), id='scale'),
+    pytest.param('@startuml Dedup\n[*] --> Idle\nIdle --> ErrA : Fail\nErrA --> Idle : Reset/复位\n'
+                 'ErrB --> Idle : Reset\n@enduml\n', id='dedup'),
+    pytest.param('@startuml Bare\nIdle: idle\n@enduml\n', id='no-initial-no-event'),
+])
+@pytest.mark.parametrize('options', BACKEND_OPTIONS, ids=lambda options: f"{options.dispatch}")
+def test_native_backend_matches_jinja2(uml_text, options):
+    pytest.importorskip('jinja2')
+    texts = [open(os.path.join(TESTCASE_DIR, name), encoding='utf-8').read()
+             for name in ('FsmTest.puml', 'FsmDenseTest.puml', 'FsmSparseTest.puml')] if uml_text is None else [uml_text]
+    for text in texts:
+        parser, _ = translate.prepare_model(load_parser(text), options)
+        assert (translate.generate_header_file(parser, None, options) ==
+                translate.generate_header_file(parser, translate.HEADER_TEMPLATE, options))
+        native_stats, jinja2_stats = {}, {}
+        assert (translate.generate_source_file(parser, None, options, native_stats) ==
+                translate.generate_source_file(parser, translate.SOURCE_TEMPLATE, options, jinja2_stats))
+        assert native_stats == jinja2_stats
+        assert (translate.generate_tables_file(parser, None, options) ==
+                translate.generate_tables_file(parser, translate.TABLES_TEMPLATE, options))
+
+
+def test_native_backend_does_not_import_jinja2(tmp_path):
+    script = ('import sys, bfx_puml_translate as t\n'
+              f't.translate_file({FSM_TEST_PUML!r}, {str(tmp_path)!r})\n'
+              'print("jinja2" in sys.modules)\n')
+    result = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(translate.__file__))
+    assert result.stdout.strip() == 'False'
+
+
+def test_custom_templates_replace_builtin_files(tmp_path):
+    pytest.importorskip('jinja2')
+    template_dir = tmp_path / 'templates'
+    template_dir.mkdir()
+    (template_dir / 'fsm.h.j2').write_text(
+        '// {{ project_name }}: {{ state_macros|length }} states\n', encoding='utf-8')
+    native_dir, custom_dir = tmp_path / 'native', tmp_path / 'custom'
+    translate.translate_file(FSM_TEST_PUML, str(native_dir))
+    options = translate.GenerateOptions(templates=str(template_dir))
+    translate.translate_file(FSM_TEST_PUML, str(custom_dir), options=options)
+    assert (custom_dir / 'FsmTest.h').read_text(encoding='utf-8') == '// FsmTest: 10 states'
+    # 目录中没有的模板使用内置模板
+    assert (custom_dir / 'FsmTest.c').read_bytes() == (native_dir / 'FsmTest.c').read_bytes()
+
+    # 模板内容参与渲染结果缓存的键
+    (template_dir / 'fsm.h.j2').write_text('// {{ project_name }}\n', encoding='utf-8')
+    assert (str(custom_dir / 'FsmTest.h'), True) in translate.translate_file(FSM_TEST_PUML, str(custom_dir),
+                                                                              options=options)
+
+
+@pytest.mark.skipif(shutil.which('cmake') is None or shutil.which('cc') is None, reason="no cmake or C compiler")
+def test_cmake_regenerates_on_tables_template_edits(tmp_path):
+    pytest.importorskip('jinja2')
+    template_dir = tmp_path / 'templates'
+    template_dir.mkdir()
+    (template_dir / 'fsm_tables.c.j2').write_text('int g_{{ project_name }}_version = 1;\n', encoding='utf-8')
+    shutil.copy(FSM_TEST_PUML, tmp_path / 'FsmTest.puml')
+    (tmp_path / 'main.c').write_text('#include "FsmTest.h"\nint main(void) { return 0; }\n')
+    (tmp_path / 'CMakeLists.txt').write_text(
+        'cmake_minimum_required(VERSION 3.10)\nproject(puml_templates C)\n'
+        f'include({os.path.dirname(os.path.dirname(translate.__file__))}/bfx_cmake_util.cmake)\n'
+        'bfx_get_include_dirs(BFX_INCLUDE_DIRS)\nbfx_get_fsm_srcs(BFX_SRCS)\n'
+        'add_executable(app main.c ${BFX_SRCS})\ntarget_include_directories(app PRIVATE ${BFX_INCLUDE_DIRS})\n'
+        'bfx_add_puml_fsm(app ${CMAKE_CURRENT_SOURCE_DIR}/FsmTest.puml ${CMAKE_CURRENT_BINARY_DIR}/generated\n'
+        '    OPTIONS --split --templates ${CMAKE_CURRENT_SOURCE_DIR}/templates)\n')
+    build = tmp_path / 'build'
+    subprocess.run(['cmake', '-S', str(tmp_path), '-B', str(build)], capture_output=True, check=True)
+    subprocess.run(['cmake', '--build', str(build)], capture_output=True, check=True)
+    tables_file = build / 'generated' / 'FsmTest_tables.c'
+    assert tables_file.read_text(encoding='utf-8') == 'int g_FsmTest_version = 1;'
+
+    # 转移表模板与.h、.c模板一样是生成的依赖
+    (template_dir / 'fsm_tables.c.j2').write_text('int g_{{ project_name }}_version = 2;\n', encoding='utf-8')
+    subprocess.run(['cmake', '--build', str(build)], capture_output=True, check=True)
+    assert tables_file.read_text(encoding='utf-8') == 'int g_FsmTest_version = 2;'
+
+
+def test_split_output_rewrites_only_tables_on_transition_edits(tmp_path):
+    plantuml_file = tmp_path / 'FsmTest.puml'
+    with open(FSM_TEST_PUML, encoding='utf-8') as f:
+        uml_text = f.read()
+    plantuml_file.write_text(uml_text, encoding='utf-8')
+    output_dir = tmp_path / 'out'
+    options = translate.GenerateOptions(split=True)
+    header, source, tables = (str(output_dir / name) for name in ('FsmTest.h', 'FsmTest.c', 'FsmTest_tables.c'))
+    assert translate.translate_file(str(plantuml_file), str(output_dir), options=options) == [
+        (header, True), (source, True), (tables, True)]
+
+    # 稳定部分只有回调桩，表与句柄都在_tables.c中
+    unsplit = translate.render_fsm(FSM_TEST_PUML)[2]
+    assert 'g_FsmTest_allstatus' not in (output_dir / 'FsmTest.c').read_text(encoding='utf-8')
+    assert 'BFX_FsmTest_Setup_ActionCb(' not in (output_dir / 'FsmTest_tables.c').read_text(encoding='utf-8')
+    assert unsplit.startswith((output_dir / 'FsmTest.c').read_text(encoding='utf-8')[:-len('#ifdef __cplusplus\n}\n#endif')])
+
+    plantuml_file.write_text(uml_text.replace('@enduml', 'Setup --> CoreDump : ErrOccur\n@enduml'), encoding='utf-8')
+    assert translate.translate_file(str(plantuml_file), str(output_dir), options=options) == [
+        (header, False), (source, False), (tables, True)]
+    assert '{ FSMTEST_ERROCCUR, FSMTEST_COREDUMP },' in (output_dir / 'FsmTest_tables.c').read_text(encoding='utf-8')
+
+
+def test_instances_share_tables_with_one_state_id_each():
+    parser = load_parser(open(FSM_TEST_PUML, encoding='utf-8').read())
+    options = translate.GenerateOptions(instances=6)
+    header = translate.generate_header_file(parser, None, options)
+    stats = {}
+    source = translate.generate_source_file(parser, None, options, stats)
+    assert '#define FSMTEST_INSTANCE_CNT 6\nextern BFX_FSM_STATE_ID g_FsmTest_instances[FSMTEST_INSTANCE_CNT];' in header
+    assert source.split('g_FsmTest_instances')[1].count('FSMTEST_INITIAL_STATE') == 6
+    # 表只生成一份
+    assert source.count('const BFX_FSM_STATE g_FsmTest_allstatus[]') == 1
+    footprint = translate.compute_footprint(stats['layout'], 'ilp32')
+    assert footprint['ram']['instances'] == 6
+    assert footprint['ram']['total'] == footprint['sizeof']['BFX_FSM_HANDLE'] + 6
+
+    # 没有初始状态时不初始化，由BFX_FsmResetInstances设置
+    bare = load_parser('@startuml Bare\nIdle: idle\n@enduml\n')
+    assert 'BFX_FSM_STATE_ID g_Bare_instances[BARE_INSTANCE_CNT];' in translate.generate_source_file(bare, None, options)
+    assert 'INSTANCE' not in translate.generate_header_file(parser, None)
+
+
+def test_queue_depth_derived_from_model():
+    parser = load_parser(open(FSM_TEST_PUML, encoding='utf-8').read())
+    options = translate.GenerateOptions(queue=0)
+    header = translate.generate_header_file(parser, None, options)
+    stats = {}
+    source = translate.generate_source_file(parser, None, options, stats)
+    assert '#include "bfx_qfifo.h"' in header
+    assert f'#define FSMTEST_QUEUE_DEPTH {len(parser.events)}\n' in header
+    assert 'uint8_t BFX_FsmTest_PostEvent(BFX_FSM_EVENT_ID event, void *arg, uint16_t argSize);' in header
+    assert 'BFX_FSM_QUEUED_EVENT g_FsmTest_eventQueueBuf[FSMTEST_QUEUE_DEPTH + 1];' in source
+    assert ('typedef char BFX_FsmTest_QueueSizeCheck[(sizeof(g_FsmTest_eventQueueBuf) <= INT16_MAX) ? 1 : -1];'
+            in source)
+    assert 'uint16_t BFX_FsmTest_DrainEvents(uint16_t maxCnt)\n{' in source
+    # ilp32：每个元素8字节，环形缓冲区空出一个元素，加上16字节的BFX_QFIFO
+    footprint = translate.compute_footprint(stats['layout'], 'ilp32')
+    assert footprint['sizeof']['BFX_FSM_QUEUED_EVENT'] == 8
+    assert footprint['ram']['event_queue'] == (len(parser.events) + 1) * 8 + 16
+
+    # 事件很少时不小于QUEUE_MIN_DEPTH，也可指定深度
+    small = load_parser('@startuml Small\nIdle: idle\nRun: run\nIdle --> Run : go\n@enduml\n')
+    assert f'#define SMALL_QUEUE_DEPTH {translate.QUEUE_MIN_DEPTH}\n' in translate.generate_header_file(small, None, options)
+    fixed = translate.GenerateOptions(queue=32)
+    assert '#define SMALL_QUEUE_DEPTH 32\n' in translate.generate_header_file(small, None, fixed)
+    assert 'QUEUE' not in translate.generate_header_file(parser, None)
+    assert 'event_queue' not in translate.compute_footprint({**stats['layout'], 'queue_depth': 0})['ram']
+
+
+def test_queue_depth_stays_below_int16_max(tmp_path):
+    # 事件数超过QUEUE_MAX_DEPTH时推导的深度也不超过它
+    many = load_parser('@startuml Many\nIdle: idle\nRun: run\n' +
+                       ''.join(f'Idle --> Run : E{i}\n' for i in range(1100)) + '@enduml\n')
+    options = translate.GenerateOptions(queue=0)
+    assert f'#define MANY_QUEUE_DEPTH {translate.QUEUE_MAX_DEPTH}\n' in translate.generate_header_file(many, None,
+                                                                                                   options)
+    for depth in (-1, translate.QUEUE_MAX_DEPTH + 1):
+        result = subprocess.run([sys.executable, translate.__file__, FSM_TEST_PUML, '-o', str(tmp_path),
+                                 f'--queue={depth}'], capture_output=True, text=True)
+        assert result.returncode == 2 and '--queue DEPTH' in result.stderr
+
+    # 编译选项中覆盖的深度由生成的.c检查：BFX_QFIFO.size为int16_t字节数，按队列缓冲区的字节数比较
+    if shutil.which('cc') is None:
+        return
+    stats = translate.render_fsm(FSM_TEST_PUML, options=options)[4]
+    translate.translate_file(FSM_TEST_PUML, str(tmp_path), options=options)
+    record = translate.compute_footprint(stats['layout'], 'lp64' if sys.maxsize > 2 ** 32 else 'ilp32')[
+        'sizeof']['BFX_FSM_QUEUED_EVENT']
+    bfx_dir = os.path.join(TESTCASE_DIR, '..', '..', 'bfx')
+    def compile_with(depth: int) -> subprocess.CompletedProcess:
+        return subprocess.run(['cc', '-std=c99', f'-DFSMTEST_QUEUE_DEPTH={depth}', '-I', os.path.join(bfx_dir, 'fsm'),
+                               '-I', os.path.join(bfx_dir, 'siso_fifo'), '-I', str(tmp_path), '-c', '-o',
+                               str(tmp_path / 'FsmTest.o'), str(tmp_path / 'FsmTest.c')], capture_output=True,
+                              text=True)
+    largest = 0x7FFF // record - 1
+    assert compile_with(largest).returncode == 0, compile_with(largest).stderr
+    for depth in (largest + 1, 5000):
+        result = compile_with(depth)
+        assert result.returncode != 0 and 'QueueSizeCheck' in result.stderr
+
+
+def test_name_index_is_minimal_perfect_hash():
+    parser = load_parser(make_workload(3000, depth=3, events=200, fanout=2, seed=5, project='Names'))
+    for names in ([state.full_name for state in sorted(parser.states.values(), key=lambda s: s.id)],
+                  [event.name for event in sorted(parser.events.values(), key=lambda e: e.id)],
+                  ['Idle', '空闲', 'a"b\\c', 'Why??=', 'x'], ['Only'], []):
+        index = translate.NameIndex.build(names)
+        assert sorted(index.slots) == list(range(1, len(names) + 1))
+        assert len(index.seeds) == len(names)
+        assert [index.lookup(name) for name in names] == list(range(1, len(names) + 1))
+        for unknown in ('', 'Idle_', 'idle', 'Onl', names[0] + '0' if names else 'x0'):
+            assert index.lookup(unknown) == 0
+
+    # 槽位与BFX_FSM_NAME_DIRECT共用种子表的16位
+    with pytest.raises(ValueError):
+        translate.NameIndex.build([f'S{i}' for i in range(translate.NAME_DIRECT)])
+
+
+def test_names_emit_index_tables():
+    parser = load_parser(open(FSM_TEST_PUML, encoding='utf-8').read())
+    options = translate.GenerateOptions(names=True)
+    header = translate.generate_header_file(parser, None, options)
+    source = translate.generate_source_file(parser, None, options)
+    assert 'extern BFX_FSM_NAME_INDEX const g_FsmTest_eventNames;' in header
+    assert 'const uint16_t g_FsmTest_stateNameSlots[] BFX_FSM_NAMES_SECTION = {' in source
+    assert '    "RunMain_DisplayOLED_SetupIIC\\0"\n' in source
+    assert f'    .cnt = {len(parser.events)},\n}};' in source
+    assert 'NAMES' not in translate.generate_header_file(parser, None)
+
+    # 名称池按C字符串转义，非ASCII字节转为八进制
+    assert translate._c_string('空"a\\?'.encode('utf-8')) == '\\347\\251\\272\\"a\\\\\\?'
+
+    # 没有事件时只生成空索引
+    bare = translate.generate_source_file(load_parser('@startuml Bare\nIdle: idle\n@enduml\n'), None, options)
+    assert 'const BFX_FSM_NAME_INDEX g_Bare_eventNames BFX_FSM_NAMES_SECTION = {\n    .cnt = 0,\n};' in bare
+    assert 'g_Bare_eventNameSeeds' not in bare
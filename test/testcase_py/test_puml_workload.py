@@ -0,0 +1,72 @@
+"""
+合成状态图、阶段计时与生成器基准测试脚本的测试用例
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+import bfx_puml_translate as translate
+from puml_workload import make_workload
+
+BENCHMARK_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'benchmark'))
+SCRIPT = os.path.join(os.path.dirname(translate.__file__), 'bfx_puml_translate.py')
+
+
+def state_depth(state: translate.State) -> int:
+    depth = 0
+    while state is not None:
+        depth += 1
+        state = state.parent
+    return depth
+
+
+def test_workload_follows_parameters():
+    text = make_workload(300, depth=4, events=8, fanout=3, seed=1)
+    assert text == make_workload(300, depth=4, events=8, fanout=3, seed=1)
+    parser = translate.PlantUMLParser()
+    parser.parse(text)
+    parser.assign_ids()
+
+    assert len(parser.states) == 300
+    assert max(state_depth(state) for state in parser.states.values()) == 4
+    assert len(parser.events) == 8
+    transitions = [t for t in parser.transitions if t.from_state != '[*]']
+    assert len(transitions) == 300 * 3
+    assert all(t.from_state in parser.states and t.to_state in parser.states for t in transitions)
+
+
+def test_timing_report_lists_every_phase(tmp_path):
+    plantuml_file = tmp_path / 'workload.puml'
+    plantuml_file.write_text(make_workload(200), encoding='utf-8')
+    timing_file = tmp_path / 'timing.json'
+    subprocess.run([sys.executable, SCRIPT, '--timing', str(timing_file), '--cache-dir', str(tmp_path / 'cache'),
+                    '-o', str(tmp_path / 'out'), str(plantuml_file)], check=True, capture_output=True)
+
+    report = json.loads(timing_file.read_text(encoding='utf-8'))
+    assert report['files'] == 1
+    assert set(report['phases']) == {'parse', 'resolve', 'cache', 'render', 'write'}
+    for entry in report['phases'].values():
+        assert entry['calls'] >= 1 and entry['seconds'] >= 0 and entry['peak_bytes'] > 0
+    assert report['total_seconds'] >= sum(entry['seconds'] for entry in report['phases'].values())
+    assert translate._phase_timer is None
+
+
+def test_benchmark_runs_and_checks_baseline(tmp_path):
+    bench = os.path.join(BENCHMARK_DIR, 'bench_puml_translate.py')
+    result_file = tmp_path / 'bench.json'
+    subprocess.run([sys.executable, bench, '-s', '100', '-n', '1', '--json', str(result_file)],
+                   check=True, capture_output=True)
+    results = json.loads(result_file.read_text(encoding='utf-8'))['results']
+    assert set(results['100']) == {'parse', 'resolve', 'render', 'write'}
+
+    # 基线吞吐量远高于实际时判定为退化
+    for entry in results['100'].values():
+        entry['states_per_s'] = 10 ** 12
+    baseline_file = tmp_path / 'baseline.json'
+    baseline_file.write_text(json.dumps({'results': results}), encoding='utf-8')
+    run = subprocess.run([sys.executable, bench, '-s', '100', '-n', '1', '--baseline', str(baseline_file)],
+                         capture_output=True, text=True)
+    assert run.returncode == 1
+    assert 'REGRESSION 100 states parse' in run.stderr